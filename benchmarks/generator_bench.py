@@ -0,0 +1,458 @@
+# benchmarks/generator_bench.py
+"""
+Laufzeit und Planqualität des Schichtplan-Generators auf synthetischen
+Mitarbeiterlisten (SQLite im Speicher oder als Datei, keine Produktionsdaten
+nötig). Ergebnis als JSON, zum Vergleich zwischen Commits.
+
+Je Szenario (Anzahl Mitarbeiter) und Engine wird ein reproduzierbarer
+Datensatz aufgebaut (gleicher Seed = gleiche Daten):
+- Schichtarten T./N./6 mit min_staff_* je Wochentag und Feiertag (skaliert
+  mit der Mitarbeiterzahl), dazu QA/S-Schulungen, U, X, EU
+- Feiertage, Urlaubsblöcke (U), Wunschfrei-Anfragen, Vormonats-Ende
+- Diensthunde, die sich je zwei Hundeführer teilen
+- Partner-/Avoid-Paare und Schicht-Ausschlüsse in der Generator-Konfiguration
+
+Danach läuft die Engine komplett (laden, planen, speichern). Gemessen werden
+Laufzeit (inkl. Phasen aus generator/instrumentation.py), Spitzen-Speicher,
+unbesetzte Slots, Stunden-Spreizung und Regelverletzungen je Regel
+(violation_rules.py) im gespeicherten Plan. Jeder Lauf startet in einem
+eigenen Prozess (frische Datenbank und Caches, eigener Speicher-Höchstwert).
+
+Aufruf (aus dem Projektverzeichnis):
+    python benchmarks/generator_bench.py [--users 20,60,150] [--engines greedy,cpsat]
+        [--repeat 1] [--seed 1] [--output bench.json] [--config '{"generator_portfolio_runs": 4}']
+"""
+
+import argparse
+import calendar
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+# resource gibt es nur unter Unix; sonst wird kein Speicher-Höchstwert gemessen
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+DEFAULT_USERS = (20, 60, 150)
+
+# Generator-Konfiguration wie die Standardwerte in routes_generator.get_generator_config
+BASE_CONFIG = {
+    "max_consecutive_same_shift": 4,
+    "mandatory_rest_days_after_max_shifts": 2,
+    "generator_fill_rounds": 3,
+    "fairness_threshold_hours": 10.0,
+    "min_hours_score_multiplier": 5.0,
+    "max_monthly_hours": 170.0,
+    "shifts_to_plan": ["6", "T.", "N."],
+    "generator_portfolio_runs": 1,
+    "generator_local_search_seconds": 0,
+    "generator_solver_time_limit_seconds": 10,
+    "generator_critical_preplanning": True,
+    "ensure_one_weekend_free": True,
+}
+
+
+class FixtureSpec:
+    """Parameter eines synthetischen Datensatzes (Dichten je Mitarbeiter und Tag)."""
+
+    def __init__(self, users, year, month, seed=1, vacation_density=0.06, wishfree_density=0.04,
+                 training_density=0.01, dog_share=0.5, partner_ratio=0.1, holidays=2):
+        self.users = users
+        self.year = year
+        self.month = month
+        self.seed = seed
+        self.vacation_density = vacation_density
+        self.wishfree_density = wishfree_density
+        self.training_density = training_density
+        self.dog_share = dog_share
+        self.partner_ratio = partner_ratio
+        self.holidays = holidays
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+def _staffing(num_users):
+    """Mindestbesetzung (Werktag, Wochenende, Feiertag, 6er Mo/Fr), skaliert mit der Mitarbeiterzahl."""
+    weekday = max(2, round(num_users / 9))
+    weekend = max(1, weekday - 1)
+    return weekday, weekend, weekend, max(1, num_users // 40)
+
+
+def build_fixture(spec, extra_config=None):
+    """Legt Schichtarten, Mitarbeiter, Vorgaben und die Generator-Konfiguration an."""
+    from dhf_app.extensions import db
+    from dhf_app.models import User, ShiftType, Shift, SpecialDate, GlobalSetting, ShiftQuery
+
+    rnd = random.Random(spec.seed)
+    weekday, weekend, holiday, six = _staffing(spec.users)
+
+    def staffed(name, abbreviation, hours, start, end, week, sat_sun, on_holiday, **kwargs):
+        mo, di, mi, do, fr = week
+        return ShiftType(name=name, abbreviation=abbreviation, hours=hours, is_work_shift=True,
+                         start_time=start, end_time=end,
+                         min_staff_mo=mo, min_staff_di=di, min_staff_mi=mi, min_staff_do=do, min_staff_fr=fr,
+                         min_staff_sa=sat_sun, min_staff_so=sat_sun, min_staff_holiday=on_holiday, **kwargs)
+
+    types = [
+        staffed('Tag', 'T.', 12, '06:00', '18:00', (weekday,) * 5, weekend, holiday),
+        staffed('Nacht', 'N.', 12, '18:00', '06:00', (weekday,) * 5, weekday, weekday, hours_spillover=6),
+        staffed('6er', '6', 6, '06:00', '12:00', (six, 0, 0, 0, six), 0, 0),
+        ShiftType(name='QA', abbreviation='QA', hours=8, is_work_shift=True, start_time='08:00', end_time='16:00'),
+        ShiftType(name='Schießen', abbreviation='S', hours=4, is_work_shift=True, start_time='08:00', end_time='12:00'),
+        ShiftType(name='Urlaub', abbreviation='U', hours=0, is_work_shift=False),
+        ShiftType(name='Frei', abbreviation='X', hours=0, is_work_shift=False),
+        ShiftType(name='EU', abbreviation='EU', hours=8, is_work_shift=False),
+    ]
+    db.session.add_all(types)
+    db.session.commit()
+    by_abbrev = {st.abbreviation: st.id for st in types}
+
+    # Diensthunde: je zwei Hundeführer teilen sich einen Hund
+    handlers = set(rnd.sample(range(spec.users), int(spec.users * spec.dog_share)))
+    dog_of, next_dog = {}, 0
+    for index in sorted(handlers):
+        dog_of[index] = f'Hund{next_dog // 2}'
+        next_dog += 1
+    users = [User(vorname=f'V{i}', name=f'N{i:03d}', passwort_hash='x', shift_plan_visible=True,
+                  shift_plan_sort_order=i, diensthund=dog_of.get(i, '---'))
+             for i in range(spec.users)]
+    db.session.add_all(users)
+    db.session.commit()
+
+    days_in_month = calendar.monthrange(spec.year, spec.month)[1]
+    first = date(spec.year, spec.month, 1)
+    for day in rnd.sample(range(1, days_in_month + 1), min(spec.holidays, days_in_month)):
+        db.session.add(SpecialDate(name=f'Feiertag {day}', date=date(spec.year, spec.month, day), type='holiday'))
+
+    shifts, queries = [], []
+    vacation_days = round(days_in_month * spec.vacation_density)
+    for user in users:
+        # Ende des Vormonats (Ruhezeiten und Serien über die Monatsgrenze)
+        for offset in range(1, 6):
+            if rnd.random() < 0.5:
+                shifts.append({"user_id": user.id, "date": first - timedelta(days=offset),
+                               "shifttype_id": by_abbrev[rnd.choice(['T.', 'N.', '6'])]})
+        # Urlaub als zusammenhängender Block, je nach Dichte
+        vacation = set()
+        if vacation_days and rnd.random() < 0.7:
+            start = rnd.randint(1, days_in_month - vacation_days + 1)
+            vacation = set(range(start, start + vacation_days))
+        for day in range(1, days_in_month + 1):
+            current = date(spec.year, spec.month, day)
+            if day in vacation:
+                shifts.append({"user_id": user.id, "date": current, "shifttype_id": by_abbrev['U']})
+            elif rnd.random() < spec.training_density:
+                shifts.append({"user_id": user.id, "date": current, "shifttype_id": by_abbrev[rnd.choice(['QA', 'S'])]})
+            elif rnd.random() < spec.wishfree_density:
+                queries.append(ShiftQuery(sender_user_id=user.id, target_user_id=user.id, shift_date=current,
+                                          message=f"Anfrage für: {rnd.choice(['T.', 'N.', ''])}?", status='offen'))
+    db.session.add_all(Shift(variant_id=None, **row) for row in shifts)
+    db.session.add_all(queries)
+
+    user_ids = [u.id for u in users]
+    num_pairs = int(spec.users * spec.partner_ratio)
+
+    def pairs():
+        result = []
+        for priority in range(1, num_pairs + 1):
+            id_a, id_b = rnd.sample(user_ids, 2)
+            result.append({'id_a': id_a, 'id_b': id_b, 'priority': priority})
+        return result
+
+    config = dict(BASE_CONFIG)
+    config.update({
+        'preferred_partners_prioritized': pairs(),
+        'avoid_partners_prioritized': pairs(),
+        'user_preferences': {str(user_ids[i]): {'shift_exclusions': ['N.']} for i in range(0, spec.users, 10)},
+    })
+    config.update(extra_config or {})
+    db.session.add(GlobalSetting(key='generator_config', value=json.dumps(config)))
+    db.session.commit()
+    return config
+
+
+def evaluate_saved_plan(gen, year, month, config):
+    """Kennzahlen des gespeicherten Hauptplans (unabhängig von der Engine)."""
+    from sqlalchemy import select
+
+    from dhf_app.extensions import db
+    from dhf_app.models import Shift, ShiftType
+    from dhf_app.reference_data import shift_type_data, get_month_roster
+    from dhf_app.violation_rules import np, PlanMatrix, DEFAULT_RULES, generator_rules
+    from dhf_app.violation_manager import ViolationManager
+
+    days_in_month = calendar.monthrange(year, month)[1]
+    first, last = date(year, month, 1), date(year, month, days_in_month)
+    rows = db.session.execute(
+        select(Shift.user_id, Shift.date, ShiftType.abbreviation, ShiftType.hours, ShiftType.is_work_shift)
+        .join(ShiftType, Shift.shifttype_id == ShiftType.id)
+        .where(Shift.variant_id.is_(None),
+               Shift.date >= first - timedelta(days=1), Shift.date <= last + timedelta(days=1))
+    ).all()
+
+    assigned = defaultdict(int)
+    hours = defaultdict(float)
+    for user_id, day, abbrev, shift_hours, is_work in rows:
+        if first <= day <= last:
+            assigned[(day, abbrev)] += 1
+            if is_work:
+                hours[user_id] += shift_hours or 0.0
+
+    unfilled = 0
+    for day in range(1, days_in_month + 1):
+        current = date(year, month, day)
+        for abbrev, needed in gen.data_manager.get_min_staffing_for_date(current).items():
+            if abbrev in gen.shifts_to_plan:
+                unfilled += max(0, needed - assigned[(current, abbrev)])
+
+    users = list(get_month_roster(year, month))
+    user_hours = [hours.get(u['id'], 0.0) for u in users]
+
+    type_data = shift_type_data()
+    shift_types = [st.to_dict() for st in type_data.shift_types]
+    shifts = [{'user_id': user_id, 'date': day.strftime('%Y-%m-%d'), 'shifttype_abbreviation': abbrev}
+              for user_id, day, abbrev, _hours, _is_work in rows]
+    rules = DEFAULT_RULES + generator_rules(config)
+    if np is not None:
+        matrix = PlanMatrix(year, month, shifts, users, {st['abbreviation']: st for st in shift_types},
+                            type_data.preprocessed_times)
+        violations = {rule.name: int(rule.evaluate(matrix).sum()) for rule in rules}
+        violations['total_cells'] = len(ViolationManager(
+            shift_types, rules, type_data.preprocessed_times
+        ).calculate_all_violations(year, month, shifts, users))
+    else:
+        # Ohne NumPy nur die Schleifen-Prüfung (Ruhezeit und Hunde)
+        violations = {'total_cells': len(ViolationManager(
+            shift_types, preprocessed_shift_times=type_data.preprocessed_times
+        ).calculate_all_violations(year, month, shifts, users))}
+
+    return {
+        'assigned_shifts': sum(count for (_day, abbrev), count in assigned.items() if abbrev in gen.shifts_to_plan),
+        'unfilled_slots': unfilled,
+        'hours_spread': round(statistics.pstdev(user_hours), 2) if len(user_hours) > 1 else 0.0,
+        'hours_min': min(user_hours, default=0.0),
+        'hours_max': max(user_hours, default=0.0),
+        'hours_mean': round(statistics.fmean(user_hours), 2) if user_hours else 0.0,
+        'violations': violations,
+    }
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB, macOS: Byte
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_once(spec_dict, engine, extra_config, database_url, verbose=False):
+    """Ein Lauf: Datensatz aufbauen, Engine ausführen, Kennzahlen sammeln (im Kindprozess)."""
+    os.environ['DATABASE_URL'] = database_url
+    spec = FixtureSpec(**spec_dict)
+    from dhf_app import create_app
+    from dhf_app.extensions import db
+    from dhf_app.services_generator import GENERATOR_ENGINES
+
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        config = build_fixture(spec, extra_config)
+        fixture_seconds = time.perf_counter() - start
+
+        warnings = []
+
+        def log_callback(msg, progress=None):
+            if msg.startswith("[WARN]"):
+                warnings.append(msg)
+            if verbose:
+                print(msg)
+
+        rss_before = _peak_rss_mb()
+        gen = GENERATOR_ENGINES[engine](db, spec.year, spec.month, log_callback)
+        start = time.perf_counter()
+        success = gen.run()
+        runtime = time.perf_counter() - start
+        rss_after = _peak_rss_mb()
+
+        result = {
+            'success': bool(success),
+            'fixture_seconds': round(fixture_seconds, 3),
+            'runtime_seconds': round(runtime, 4),
+            'peak_rss_mb': rss_after,
+            'peak_rss_growth_mb': round(rss_after - rss_before, 1) if rss_after is not None else None,
+            'warnings': len(warnings),
+            'profile': gen.profiler.to_dict(include_capture=False),
+        }
+        if success:
+            result.update(evaluate_saved_plan(gen, spec.year, spec.month, config))
+        return result
+
+
+def _silence_stdout(verbose):
+    """
+    Ausgaben von App und Generator (auch aus Portfolio-Prozessen) nicht auf
+    stdout, dort steht nur der JSON-Bericht: mit --verbose auf stderr, sonst verworfen.
+    """
+    sys.stdout.flush()
+    target = sys.stderr.fileno() if verbose else os.open(os.devnull, os.O_WRONLY)
+    os.dup2(target, 1)
+
+
+def _child(conn, *args):
+    try:
+        _silence_stdout(args[-1])
+        conn.send(('ok', run_once(*args)))
+    except Exception:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def run_isolated(*args):
+    """run_once in einem frischen Prozess (spawn): eigene DB, leere Caches, eigener Speicher-Höchstwert."""
+    context = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(child_conn,) + args)
+    process.start()
+    child_conn.close()
+    try:
+        status, payload = parent_conn.recv()
+    except EOFError:
+        status, payload = 'error', f'Prozess beendet (Exit-Code {process.exitcode})'
+    process.join()
+    if status != 'ok':
+        return {'success': False, 'error': payload}
+    return payload
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _summary(runs):
+    ok = [run for run in runs if run.get('success')]
+    if not ok:
+        return {'success': False}
+    runtimes = [run['runtime_seconds'] for run in ok]
+    rss = [run['peak_rss_mb'] for run in ok if run.get('peak_rss_mb') is not None]
+    first = ok[0]
+    return {
+        'success': len(ok) == len(runs),
+        'runtime_median_seconds': round(statistics.median(runtimes), 4),
+        'runtime_min_seconds': min(runtimes),
+        'peak_rss_mb': max(rss) if rss else None,
+        'unfilled_slots': first['unfilled_slots'],
+        'hours_spread': first['hours_spread'],
+        'violations': first['violations']['total_cells'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', default=','.join(map(str, DEFAULT_USERS)),
+                        help="Mitarbeiterzahlen, kommagetrennt (je eine Szenario-Gruppe)")
+    parser.add_argument('--engines', default=None,
+                        help="Engines aus services_generator.GENERATOR_ENGINES, kommagetrennt (Standard: alle)")
+    parser.add_argument('--year', type=int, default=2025)
+    parser.add_argument('--month', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=1, help="Läufe je Szenario und Engine")
+    parser.add_argument('--vacation-density', type=float, default=0.06)
+    parser.add_argument('--wishfree-density', type=float, default=0.04)
+    parser.add_argument('--dog-share', type=float, default=0.5, help="Anteil der Hundeführer")
+    parser.add_argument('--partner-ratio', type=float, default=0.1, help="Partner- und Avoid-Paare je Mitarbeiter")
+    parser.add_argument('--holidays', type=int, default=2)
+    parser.add_argument('--config', default='{}', help="JSON, überschreibt Werte der Generator-Konfiguration")
+    parser.add_argument('--sqlite-dir', default=None,
+                        help="SQLite-Dateien in diesem Verzeichnis statt im Speicher")
+    parser.add_argument('--output', default=None, help="JSON-Datei (Standard: Ausgabe auf stdout)")
+    parser.add_argument('--verbose', action='store_true', help="Log des Generators auf stderr")
+    args = parser.parse_args()
+
+    extra_config = json.loads(args.config)
+    user_counts = [int(value) for value in args.users.split(',') if value.strip()]
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    from dhf_app.services_generator import GENERATOR_ENGINES
+    available = [name for name, cls in GENERATOR_ENGINES.items() if cls is not None]
+    engines = [name.strip() for name in args.engines.split(',')] if args.engines else available
+    unknown = [name for name in engines if name not in available]
+    if unknown:
+        parser.error(f"Unbekannte Engine(s): {', '.join(unknown)} (verfügbar: {', '.join(available)})")
+
+    results = []
+    for num_users in user_counts:
+        spec = FixtureSpec(num_users, args.year, args.month, args.seed, args.vacation_density,
+                           args.wishfree_density, dog_share=args.dog_share, partner_ratio=args.partner_ratio,
+                           holidays=args.holidays)
+        for engine in engines:
+            runs = []
+            for index in range(args.repeat):
+                if args.sqlite_dir:
+                    path = os.path.abspath(os.path.join(args.sqlite_dir, f'bench_{num_users}_{engine}_{index}.db'))
+                    if os.path.exists(path):
+                        os.remove(path)
+                    database_url = 'sqlite:///' + path
+                else:
+                    database_url = 'sqlite://'
+                run = run_isolated(spec.to_dict(), engine, extra_config, database_url, args.verbose)
+                runs.append(run)
+                if run.get('success'):
+                    print(f"{num_users:4d} Mitarbeiter  {engine:8s} Lauf {index + 1}: {run['runtime_seconds']:7.2f}s  "
+                          f"Lücken {run['unfilled_slots']:3d}  Spreizung {run['hours_spread']:5.1f}h  "
+                          f"Verletzungen {run['violations']['total_cells']:3d}  RSS {run['peak_rss_mb']} MB",
+                          file=sys.stderr)
+                else:
+                    print(f"{num_users:4d} Mitarbeiter  {engine:8s} Lauf {index + 1}: FEHLER\n{run.get('error', '')}",
+                          file=sys.stderr)
+            results.append({
+                'scenario': f'users_{num_users}',
+                'users': num_users,
+                'engine': engine,
+                'summary': _summary(runs),
+                'runs': runs,
+            })
+
+    report = {
+        'meta': {
+            'revision': _git_revision(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'year': args.year,
+            'month': args.month,
+            'seed': args.seed,
+            'fixture': {key: value for key, value in spec.to_dict().items() if key != 'users'} if user_counts else {},
+            'config_overrides': extra_config,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            handle.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
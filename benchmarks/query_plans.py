@@ -0,0 +1,140 @@
+# benchmarks/query_plans.py
+"""
+Abfragepläne und Laufzeiten der Monatsabfragen auf einem synthetischen
+Mehrjahres-Datensatz (SQLite im Speicher, keine Produktionsdaten nötig).
+
+Vergleicht je Abfrage den bisherigen Filter extract('year'/'month', ...) mit dem
+Datumsbereich aus dhf_app/date_ranges.py. Erwartet wird beim Bereich ein
+"SEARCH ... USING INDEX" statt "SCAN shift".
+
+Aufruf (aus dem Projektverzeichnis):
+    python benchmarks/query_plans.py [--years 4] [--users 60] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+# Vor dem Import der App: eigene In-Memory-Datenbank
+os.environ['DATABASE_URL'] = 'sqlite://'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select, func, extract, insert, text
+
+from dhf_app import create_app
+from dhf_app.extensions import db
+from dhf_app.models import User, Shift, ShiftType, ShiftQuery, PlanVariant
+from dhf_app.date_ranges import in_month, in_year
+
+SHIFT_TYPES = [('T.', 12), ('N.', 12), ('6', 6), ('EU', 8), ('X', 0), ('QA', 8), ('S', 4)]
+
+
+def build_dataset(years, num_users, seed=1):
+    """Schichten für alle Mitarbeiter über 'years' Jahre, dazu Varianten und Anfragen."""
+    rnd = random.Random(seed)
+    types = [ShiftType(name=abbrev, abbreviation=abbrev, hours=hours, is_work_shift=hours > 0)
+             for abbrev, hours in SHIFT_TYPES]
+    db.session.add_all(types)
+    users = [User(vorname=f'V{i}', name=f'N{i}', passwort_hash='x') for i in range(num_users)]
+    db.session.add_all(users)
+    db.session.commit()
+
+    first_year = date.today().year - years + 1
+    shift_rows, query_rows = [], []
+    for year in range(first_year, first_year + years):
+        for month in range(1, 13):
+            variant = PlanVariant(name=f'Variante {year}-{month}', year=year, month=month)
+            db.session.add(variant)
+            db.session.flush()
+            day = date(year, month, 1)
+            while day.month == month:
+                for user in users:
+                    if rnd.random() < 0.7:
+                        shifttype_id = rnd.choice(types).id
+                        shift_rows.append({"user_id": user.id, "shifttype_id": shifttype_id, "date": day})
+                        if rnd.random() < 0.3:
+                            shift_rows.append({"user_id": user.id, "shifttype_id": shifttype_id,
+                                               "date": day, "variant_id": variant.id})
+                    if rnd.random() < 0.03:
+                        query_rows.append({"sender_user_id": user.id, "target_user_id": user.id,
+                                           "shift_date": day, "message": "Anfrage für: T.?",
+                                           "status": rnd.choice(['offen', 'erledigt'])})
+                day += timedelta(days=1)
+
+    db.session.execute(insert(Shift), [{"variant_id": None, **row} for row in shift_rows])
+    db.session.execute(insert(ShiftQuery), query_rows)
+    db.session.commit()
+    return first_year, users, types
+
+
+def benchmark_queries(year, month, user_id, eu_type_id):
+    """Paare (Name, alte Abfrage, neue Abfrage) der häufigsten Monatsabfragen."""
+    return [
+        ("Monat Hauptplan (GET /shifts)",
+         select(Shift.id, Shift.user_id, Shift.date).where(
+             extract('year', Shift.date) == year, extract('month', Shift.date) == month,
+             Shift.variant_id.is_(None)),
+         select(Shift.id, Shift.user_id, Shift.date).where(
+             in_month(Shift.date, year, month), Shift.variant_id.is_(None))),
+        ("Monat eines Mitarbeiters (Stunden)",
+         select(Shift.id).where(
+             Shift.user_id == user_id, extract('year', Shift.date) == year,
+             extract('month', Shift.date) == month, Shift.variant_id.is_(None)),
+         select(Shift.id).where(
+             Shift.user_id == user_id, in_month(Shift.date, year, month), Shift.variant_id.is_(None))),
+        ("Urlaubsverbrauch im Jahr",
+         select(Shift.user_id, func.count(Shift.id)).where(
+             Shift.shifttype_id == eu_type_id, extract('year', Shift.date) == year,
+             Shift.variant_id.is_(None)).group_by(Shift.user_id),
+         select(Shift.user_id, func.count(Shift.id)).where(
+             Shift.shifttype_id == eu_type_id, in_year(Shift.date, year),
+             Shift.variant_id.is_(None)).group_by(Shift.user_id)),
+        ("Anfragen des Monats",
+         select(ShiftQuery.id).where(
+             extract('year', ShiftQuery.shift_date) == year,
+             extract('month', ShiftQuery.shift_date) == month),
+         select(ShiftQuery.id).where(in_month(ShiftQuery.shift_date, year, month))),
+    ]
+
+
+def explain(stmt):
+    sql = str(stmt.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).all()
+    return '; '.join(row[-1] for row in rows)
+
+
+def timed(stmt, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        db.session.execute(stmt).all()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=4)
+    parser.add_argument('--users', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        first_year, users, types = build_dataset(args.years, args.users)
+        total = db.session.execute(select(func.count(Shift.id))).scalar()
+        print(f"Datensatz: {total} Schichten, {args.users} Mitarbeiter, {args.years} Jahre "
+              f"({time.perf_counter() - start:.1f}s)\n")
+
+        year = first_year + args.years - 1
+        eu_type_id = next(t.id for t in types if t.abbreviation == 'EU')
+        for name, old_stmt, new_stmt in benchmark_queries(year, 6, users[0].id, eu_type_id):
+            print(name)
+            print(f"  alt  {timed(old_stmt, args.repeat):7.2f} ms  {explain(old_stmt)}")
+            print(f"  neu  {timed(new_stmt, args.repeat):7.2f} ms  {explain(new_stmt)}")
+
+
+if __name__ == '__main__':
+    main()
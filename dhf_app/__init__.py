@@ -1,5 +1,6 @@
 import os
-from flask import Flask, jsonify
+from flask import Flask, jsonify, current_app
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from flask_cors import CORS
 from .config import config
 from .extensions import db, bcrypt, login_manager, mail, socketio
@@ -47,6 +48,11 @@ def create_app(config_name='default'):
     from . import models_audit
     from . import models_market
     from . import models_dogs
+    # Versionszähler für den Snapshot-Cache, Änderungsjournal, Ausbildungsstand und Urlaubsverbrauch (Flush-Listener)
+    from . import plan_cache
+    from . import shift_journal
+    from . import training_status
+    from . import vacation_usage
 
     @login_manager.user_loader
     def load_user(user_id):
@@ -118,17 +124,35 @@ def create_app(config_name='default'):
     # 6. Startup-Logik
     with app.app_context():
         db.create_all()
+        create_missing_indexes(db)
         create_default_roles(db)
         create_default_holidays(db)
         create_default_settings(db)
         create_default_email_templates(db)
         create_default_shop_items(db)
+        training_status.init_training_status()
+        vacation_usage.init_vacation_usage()
 
     return app
 
 
 # --- Startup-Funktionen ---
 
+def create_missing_indexes(db_instance):
+    """
+    Legt Indizes an, die nach dem Erstellen der Tabelle hinzugekommen sind
+    (create_all erzeugt Indizes nur zusammen mit neuen Tabellen).
+    """
+    from .models import Shift, ShiftQuery, SpecialDate
+    for model in (Shift, ShiftQuery, SpecialDate):
+        for index in model.__table__.indexes:
+            try:
+                index.create(bind=db_instance.engine, checkfirst=True)
+            except (OperationalError, ProgrammingError) as e:
+                # z.B. hat ein parallel startender Worker den Index gerade angelegt
+                current_app.logger.warning(f"Index {index.name} konnte nicht angelegt werden: {e}")
+
+
 def create_default_roles(db_instance):
     from .models import Role
     roles_to_create = {
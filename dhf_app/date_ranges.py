@@ -0,0 +1,35 @@
+# dhf_app/date_ranges.py
+
+import calendar
+from datetime import date, timedelta
+
+from sqlalchemy import and_
+
+# --- Datumsbereiche für Abfragen ---
+# Filter wie extract('year', Shift.date) == year können keinen Index auf der
+# Datumsspalte nutzen. Die Helfer hier formulieren dieselbe Bedingung als
+# halboffenen Bereich [Anfang, Anfang der Folgeperiode), den die Datenbank per
+# Index-Range-Scan auflöst.
+
+
+def month_bounds(year, month):
+    """Erster Tag des Monats und erster Tag des Folgemonats."""
+    start = date(int(year), int(month), 1)
+    return start, start + timedelta(days=calendar.monthrange(start.year, start.month)[1])
+
+
+def year_bounds(year):
+    """1. Januar des Jahres und 1. Januar des Folgejahres."""
+    return date(int(year), 1, 1), date(int(year) + 1, 1, 1)
+
+
+def in_month(column, year, month):
+    """Ersetzt extract('year', column) == year UND extract('month', column) == month."""
+    start, end = month_bounds(year, month)
+    return and_(column >= start, column < end)
+
+
+def in_year(column, year):
+    """Ersetzt extract('year', column) == year."""
+    start, end = year_bounds(year)
+    return and_(column >= start, column < end)
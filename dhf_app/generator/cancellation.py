@@ -0,0 +1,51 @@
+# dhf_app/generator/cancellation.py
+
+import threading
+import time
+
+
+class GenerationCancelled(Exception):
+    """Wird im Generator ausgelöst, wenn der Lauf abgebrochen wurde."""
+
+
+class CancellationToken:
+    """
+    Kooperativer Abbruch für einen Generator-Lauf.
+
+    Der Generator prüft das Token an festen Punkten (Tagesschleife, lokale
+    Suche, zwischen Portfolio-Läufen und Horizont-Monaten) und bricht dort
+    mit GenerationCancelled ab. Gespeichert wird in diesem Fall nichts.
+
+    'poll' ist optional eine Funktion, die einen Abbruch von außen meldet
+    (z.B. das cancel_requested-Flag des Jobs in der DB, gesetzt von einem
+    anderen Worker-Prozess). Sie wird höchstens alle 'poll_interval'
+    Sekunden aufgerufen.
+    """
+
+    def __init__(self, poll=None, poll_interval=1.0):
+        self._event = threading.Event()
+        self._poll = poll
+        self._poll_interval = poll_interval
+        self._last_poll = 0.0
+
+    def cancel(self):
+        self._event.set()
+
+    def is_cancelled(self):
+        if self._event.is_set():
+            return True
+        if self._poll is not None:
+            now = time.monotonic()
+            if now - self._last_poll >= self._poll_interval:
+                self._last_poll = now
+                try:
+                    if self._poll():
+                        self._event.set()
+                except Exception:
+                    # Ein fehlgeschlagener Poll darf den Lauf nicht beenden
+                    pass
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self.is_cancelled():
+            raise GenerationCancelled("Generator-Lauf wurde abgebrochen.")
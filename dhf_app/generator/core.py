@@ -3,6 +3,8 @@
 from collections import defaultdict
 from datetime import date, timedelta
 import calendar
+import math
+import random
 
 # Import der Komponenten
 from .data_manager import ShiftPlanDataManager
@@ -11,7 +13,14 @@ from .helpers import GeneratorHelpers
 from .generator_scoring import GeneratorScoring
 from .generator_rounds import GeneratorRounds
 from .generator_pre_planning import GeneratorPrePlanner
+from .supply_demand import SupplyDemandProfile
 from .generator_persistence import save_generation_batch_to_db
+from .state_grid import ShiftStateGrid
+from .eligibility import CandidateEligibility
+from .portfolio import GeneratorPortfolio
+from .cancellation import GenerationCancelled
+from .local_search import GeneratorLocalSearch
+from .instrumentation import GeneratorProfiler
 # <<< NEU: Import des WeekendManagers
 from .weekend_manager import WeekendManager
 
@@ -22,16 +31,26 @@ class ShiftPlanGenerator:
     Daten laden -> Konfiguration -> Planung -> Speichern.
     """
 
-    def __init__(self, db_session, year, month, log_callback=None, variant_id=None):
+    def __init__(self, db_session, year, month, log_callback=None, variant_id=None, seed=None, cancel_token=None):
         self.db = db_session
         self.year = year
         self.month = month
         self.variant_id = variant_id  # <<< NEU: Ziel-Variante
+        # Tie-Break-Seed für Portfolio-Läufe (None/0 = Reihenfolge wie geladen)
+        self.seed = seed
+        # Rolling Horizon: Stunden-Abweichung zum Durchschnitt aus den bereits geplanten Vormonaten
+        # {user_id_int: Stunden}, leer bei Einzelmonaten
+        self.horizon_hour_offsets = {}
+        # Anzahl gleichzeitig laufender Portfolio-Läufe, die sich die Solver-Threads teilen (1 = Einzellauf)
+        self.parallel_runs = 1
+        # Kooperativer Abbruch (CancellationToken oder None)
+        self.cancel_token = cancel_token
         # Logging-Funktion (Default: print, falls nichts übergeben)
         self.log = log_callback if log_callback else lambda msg, p=None: print(msg)
 
         # --- Status-Speicher (Live-Daten während der Generierung) ---
-        self.live_shifts_data = defaultdict(dict)  # {user_id_str: {date_str: shift_abbrev}}
+        # Kompaktes Raster (Vormonat + Monat + Folgemonat), wird nach dem Laden aufgebaut
+        self.state_grid = None
         self.live_user_hours = defaultdict(float)  # {user_id_int: hours}
         self.live_shift_counts = defaultdict(lambda: defaultdict(int))
         self.live_shift_counts_ratio = defaultdict(lambda: defaultdict(int))
@@ -40,10 +59,11 @@ class ShiftPlanGenerator:
         # Standardwert, wird später durch Config überschrieben
         self.shifts_to_plan = ["6", "T.", "N."]
         self.free_shifts_indicators = {"", "FREI", "U", "X", "EU", "WF"}
+        # Schichten, die als "harte" Arbeitstage zählen (inkl. QA und S, da Anwesenheiten)
+        self.hard_work_indicators = {'T.', 'N.', '6', '24', 'QA', 'S'}
         self.holidays_in_month = set()
 
-        # Puffer für Pre-Planning
-        self.CRITICAL_LOOKAHEAD_DAYS = 3
+        # Puffer für Pre-Planning (Slot ist kritisch, wenn Angebot <= offener Bedarf + Puffer)
         self.CRITICAL_BUFFER = 1
 
         # --- Komponenten-Placeholder ---
@@ -54,6 +74,16 @@ class ShiftPlanGenerator:
         self.rounds = None
         self.pre_planner = None
         self.weekend_manager = None  # <<< NEU
+        self.eligibility = None
+
+        # Anzahl der Slots, die nach allen Runden unbesetzt blieben
+        self.unfilled_slots = 0
+        self.unfilled_by_slot = {}  # {(date_obj, shift_abbrev): fehlende Anzahl}
+        # Vom Pre-Planning vorab vergebene Zellen {(user_id_str, date_obj): abbrev};
+        # die Runden prüfen ihre Zuweisungen davor zusätzlich vorwärts gegen diese Zellen
+        self.preplanned_cells = {}
+        # Phasen-Zeiten, Zähler und optionales Funktionsprofil (instrumentation.py)
+        self.profiler = GeneratorProfiler()
 
         # Kompatibilität für PrePlanner (erwartet self.gen.app.staffing_rules)
         self.app = self
@@ -69,173 +99,31 @@ class ShiftPlanGenerator:
 
             # 1. Daten laden (DataManager)
             # <<< NEU: variant_id übergeben
-            self.data_manager = ShiftPlanDataManager(self.db, self.year, self.month, self.variant_id)
-            self.data_manager.load_data()
-
-            # Daten in Generator-Scope übernehmen (für schnellen Zugriff der Helfer)
-            self.all_users = self.data_manager.all_users
-            self.user_data_map = self.data_manager.user_data_map
-            self.holidays_in_month = self.data_manager.holidays_in_month
-            self.vacation_requests = self.data_manager.vacation_requests
-            self.wunschfrei_requests = self.data_manager.wunschfrei_requests
-            self.staffing_rules = self.data_manager.staffing_rules  # Wichtig für PrePlanner
-            self.locked_shifts_data = self.data_manager.locked_shifts_data
-
-            # Schicht-Stunden mappen
-            self.shift_hours = {
-                st.abbreviation: st.hours
-                for st in self.data_manager.shift_types.values()
-            }
-
-            # Live-Daten mit existierenden (gelockten/bereits gesetzten) Daten initialisieren
-            for uid, days in self.data_manager.existing_shifts_data.items():
-                self.live_shifts_data[uid] = days.copy()
-
-            # Initiale Stunden berechnen (falls wir auf einem teilweise gefüllten Plan aufsetzen)
-            for uid_str, days in self.live_shifts_data.items():
-                uid_int = int(uid_str)
-                for s_abbr in days.values():
-                    self.live_user_hours[uid_int] += self.shift_hours.get(s_abbr, 0.0)
-
-            # 2. Konfiguration laden
-            self.log("Lade Konfiguration...", 10)
-            self.config = GeneratorConfig(self.data_manager)
-
-            # Config-Werte auf self mappen (erwartet von Helfer-Klassen)
-            self.HARD_MAX_CONSECUTIVE_SHIFTS = self.config.max_consecutive_same_shift_limit
-            self.SOFT_MAX_CONSECUTIVE_SHIFTS = self.config.max_consecutive_same_shift_limit
-            self.max_consecutive_same_shift_limit = self.config.max_consecutive_same_shift_limit
-            self.mandatory_rest_days = self.config.mandatory_rest_days
-            self.avoid_understaffing_hard = self.config.avoid_understaffing_hard
-            self.wunschfrei_respect_level = self.config.wunschfrei_respect_level
-
-            # Dynamische Werte aus Config übernehmen
-            self.MAX_MONTHLY_HOURS = self.config.max_monthly_hours
-            self.shifts_to_plan = self.config.shifts_to_plan
-            self.log(f"Aktive Schichten: {', '.join(self.shifts_to_plan)}", 12)
-            self.log(f"Max. Stunden: {self.MAX_MONTHLY_HOURS}", 12)
-
-            self.min_hours_fairness_threshold = self.config.min_hours_fairness_threshold
-            self.min_hours_score_multiplier = self.config.min_hours_score_multiplier
-            self.fairness_threshold_hours = self.config.fairness_threshold_hours
-            self.fairness_score_multiplier = self.config.fairness_score_multiplier
-            self.isolation_score_multiplier = self.config.isolation_score_multiplier
-            self.AVOID_PARTNER_PENALTY_SCORE = self.config.AVOID_PARTNER_PENALTY_SCORE
-
-            self.partner_priority_map = self.config.partner_priority_map
-            self.avoid_priority_map = self.config.avoid_priority_map
-            self.user_preferences = self.config.user_preferences
-
-            # --- NEU: WeekendManager initialisieren (wenn Option aktiv) ---
-            if self.config.ensure_one_weekend_free:
-                self.log("Work-Life-Balance: 'Mind. 1 Wochenende frei' aktiviert.", 13)
-                self.weekend_manager = WeekendManager(self)
-            else:
-                self.weekend_manager = None
-
-            # 3. Helfer initialisieren
-            self.helpers = GeneratorHelpers(self)
-            self.scoring = GeneratorScoring(self)
-            self.rounds = GeneratorRounds(self, self.helpers, self.scoring)
-            self.pre_planner = GeneratorPrePlanner(self, self.helpers)
-
-            # 4. Hauptschleife (Tag für Tag)
-            days_in_month = calendar.monthrange(self.year, self.month)[1]
-
-            for day in range(1, days_in_month + 1):
-                current_date = date(self.year, self.month, day)
-                date_str = current_date.strftime('%Y-%m-%d')
-
-                # Fortschritt berechnen (10% bis 90%)
-                progress = 10 + int((day / days_in_month) * 80)
-                self.log(f"Plane Tag {day} ({date_str})...", progress)
-
-                # Soll-Besetzung für diesen Tag
-                min_staffing = self.data_manager.get_min_staffing_for_date(current_date)
-
-                # Tracking-Listen für den aktuellen Tag
-                users_unavailable_today = set()
-                existing_dog_assignments = defaultdict(list)  # {dog_name: [{user_id, shift}]}
-                assignments_today_by_shift = defaultdict(set)  # {shift_abbrev: {user_ids}}
-
-                # a) Bereits gesetzte Schichten (Locked/Urlaub/Manuell) erfassen
-                for uid_str, user_shifts in self.live_shifts_data.items():
-                    shift = user_shifts.get(date_str)
-
-                    # --- KORREKTUR: Prüfe auf gesicherte Schichten (DB) ---
-                    # Wir prüfen, ob dieser Tag für diesen User bereits in der DB existierte
-                    # (auch wenn es 'X' oder 'U' ist).
-                    is_locked = self.locked_shifts_data.get(uid_str, {}).get(date_str) is not None
-
-                    # User ist nicht verfügbar, wenn er arbeitet ODER wenn der Eintrag gelockt ist
-                    if (shift and shift not in self.free_shifts_indicators) or is_locked:
-                        uid_int = int(uid_str)
-                        users_unavailable_today.add(uid_str)
-
-                        # Wenn eine Schicht eingetragen ist (auch manuell), zählen wir sie zur Besetzung
-                        if shift:
-                            assignments_today_by_shift[shift].add(uid_int)
-
-                        # Hund prüfen
-                        user_data = self.user_data_map.get(uid_int)
-                        if user_data and user_data.get('diensthund'):
-                            dog = user_data['diensthund']
-                            if dog != '---' and shift:  # Nur wenn eine echte Schicht da ist
-                                existing_dog_assignments[dog].append({'user_id': uid_int, 'shift': shift})
-                    # --- ENDE KORREKTUR ---
-
-                # b) Abwesenheiten (Urlaub/WF) erfassen
-                # (Dies ist jetzt teilweise redundant durch den 'is_locked' check oben,
-                # aber wichtig für frisch genehmigte Anträge, die noch nicht im Plan stehen)
-                # ... (wird implizit in den Runden geprüft oder durch locked_shifts abgedeckt)
-
-                # c) Planungsschleife für die Schichtarten (in konfigurierter Reihenfolge)
-                for shift_abbrev in self.shifts_to_plan:
-                    needed = min_staffing.get(shift_abbrev, 0)
-                    if needed <= 0:
-                        continue
-
-                    current_count = len(assignments_today_by_shift.get(shift_abbrev, set()))
-                    needed_now = max(0, needed - current_count)
-
-                    if needed_now > 0:
-                        # Runde 1: Faire Zuweisung
-                        assigned_fair = self.rounds.run_fair_assignment_round(
-                            shift_abbrev, current_date,
-                            users_unavailable_today, existing_dog_assignments, assignments_today_by_shift,
-                            self.live_user_hours, self.live_shift_counts, self.live_shift_counts_ratio,
-                            needed_now, days_in_month
-                        )
-
-                        remaining = needed_now - assigned_fair
+            with self.profiler.phase('load'):
+                data_manager = ShiftPlanDataManager(self.db, self.year, self.month, self.variant_id)
+                data_manager.load_data()
 
-                        # Runde 2-4: Auffüllen (Regeln lockern)
-                        if remaining > 0:
-                            for r in range(2, self.config.generator_fill_rounds + 2):
-                                if remaining <= 0: break
-
-                                assigned_fill = self.rounds.run_fill_round(
-                                    shift_abbrev, current_date,
-                                    users_unavailable_today, existing_dog_assignments, assignments_today_by_shift,
-                                    self.live_user_hours, self.live_shift_counts, self.live_shift_counts_ratio,
-                                    remaining, r
-                                )
-                                remaining -= assigned_fill
+            # 2.-3. Konfiguration und Komponenten
+            with self.profiler.phase('config'):
+                self.prepare(data_manager)
+            self.profiler.start_capture(self.config.generator_profile_capture)
 
-                        if remaining > 0:
-                            self.log(
-                                f"[WARN] Tag {day}: Konnte {shift_abbrev} nicht voll besetzen (Fehlen: {remaining})")
+            # 4. Planung: einzelner Lauf oder Portfolio aus mehreren Läufen
+            with self.profiler.phase('plan'):
+                plan_data = self.plan_prepared()
 
             # 5. Speichern
+            self.check_cancelled()
             self.log("Speichere Plan in Datenbank...", 95)
 
             # <<< NEU: variant_id übergeben
-            success, count, err = save_generation_batch_to_db(
-                self.live_shifts_data,
-                self.year,
-                self.month,
-                self.variant_id
-            )
+            with self.profiler.phase('persistence'):
+                success, count, err = save_generation_batch_to_db(
+                    plan_data,
+                    self.year,
+                    self.month,
+                    self.variant_id
+                )
 
             if success:
                 self.log(f"Erfolgreich! {count} Einträge gespeichert.", 100)
@@ -244,8 +132,253 @@ class ShiftPlanGenerator:
                 self.log(f"[FEHLER] DB-Speichern fehlgeschlagen: {err}", 100)
                 return False
 
+        except GenerationCancelled:
+            self.log("[ABBRUCH] Generator-Lauf abgebrochen, es wurde nichts gespeichert.")
+            raise
+
         except Exception as e:
             self.log(f"[CRASH] Kritischer Fehler im Generator: {str(e)}", 0)
             import traceback
             traceback.print_exc()
-            return False
\ No newline at end of file
+            return False
+
+        finally:
+            self.profiler.stop_capture()
+
+    def prepare(self, data_manager):
+        """
+        Übernimmt die geladenen Daten, liest die Konfiguration und baut Raster
+        und Komponenten auf. Greift nicht auf die Datenbank zu, daher auch mit
+        einer losgelösten DataManager-Kopie (Portfolio-Worker) nutzbar.
+        """
+        self.data_manager = data_manager
+
+        # Daten in Generator-Scope übernehmen (für schnellen Zugriff der Helfer)
+        self.all_users = self.data_manager.all_users
+        if self.seed:
+            # Andere Reihenfolge = andere Tie-Breaks bei gleichen Scores
+            self.all_users = list(self.all_users)
+            random.Random(self.seed).shuffle(self.all_users)
+        self.user_data_map = self.data_manager.user_data_map
+        self.holidays_in_month = self.data_manager.holidays_in_month
+        self.vacation_requests = self.data_manager.vacation_requests
+        self.wunschfrei_requests = self.data_manager.wunschfrei_requests
+        self.staffing_rules = self.data_manager.staffing_rules  # Wichtig für PrePlanner
+        self.locked_shifts_data = self.data_manager.locked_shifts_data
+
+        # Schicht-Stunden mappen
+        self.shift_hours = {
+            st.abbreviation: st.hours
+            for st in self.data_manager.shift_types.values()
+        }
+
+        # Live-Status als Raster aufbauen (Vormonat, existierende/gelockte Daten, Folgemonat)
+        self.state_grid = ShiftStateGrid.from_data_manager(
+            self.data_manager, self.free_shifts_indicators, self.hard_work_indicators
+        )
+
+        # Initiale Stunden berechnen (falls wir auf einem teilweise gefüllten Plan aufsetzen)
+        for uid_str, days in self.data_manager.existing_shifts_data.items():
+            uid_int = int(uid_str)
+            for s_abbr in days.values():
+                self.live_user_hours[uid_int] += self.shift_hours.get(s_abbr, 0.0)
+
+        # 2. Konfiguration laden
+        self.log("Lade Konfiguration...", 10)
+        self.config = GeneratorConfig(self.data_manager)
+
+        # Config-Werte auf self mappen (erwartet von Helfer-Klassen)
+        self.HARD_MAX_CONSECUTIVE_SHIFTS = self.config.max_consecutive_same_shift_limit
+        self.SOFT_MAX_CONSECUTIVE_SHIFTS = self.config.max_consecutive_same_shift_limit
+        self.max_consecutive_same_shift_limit = self.config.max_consecutive_same_shift_limit
+        self.mandatory_rest_days = self.config.mandatory_rest_days
+        self.avoid_understaffing_hard = self.config.avoid_understaffing_hard
+        self.wunschfrei_respect_level = self.config.wunschfrei_respect_level
+
+        # Dynamische Werte aus Config übernehmen
+        self.MAX_MONTHLY_HOURS = self.config.max_monthly_hours
+        self.shifts_to_plan = self.config.shifts_to_plan
+        self.log(f"Aktive Schichten: {', '.join(self.shifts_to_plan)}", 12)
+        self.log(f"Max. Stunden: {self.MAX_MONTHLY_HOURS}", 12)
+
+        self.min_hours_fairness_threshold = self.config.min_hours_fairness_threshold
+        self.min_hours_score_multiplier = self.config.min_hours_score_multiplier
+        self.fairness_threshold_hours = self.config.fairness_threshold_hours
+        self.fairness_score_multiplier = self.config.fairness_score_multiplier
+        self.isolation_score_multiplier = self.config.isolation_score_multiplier
+        self.AVOID_PARTNER_PENALTY_SCORE = self.config.AVOID_PARTNER_PENALTY_SCORE
+
+        self.partner_priority_map = self.config.partner_priority_map
+        self.avoid_priority_map = self.config.avoid_priority_map
+        self.user_preferences = self.config.user_preferences
+
+        # --- NEU: WeekendManager initialisieren (wenn Option aktiv) ---
+        if self.config.ensure_one_weekend_free:
+            self.log("Work-Life-Balance: 'Mind. 1 Wochenende frei' aktiviert.", 13)
+            self.weekend_manager = WeekendManager(self)
+        else:
+            self.weekend_manager = None
+
+        # 3. Helfer initialisieren
+        self.helpers = GeneratorHelpers(self)
+        self.scoring = GeneratorScoring(self)
+        self.rounds = GeneratorRounds(self, self.helpers, self.scoring)
+        self.pre_planner = GeneratorPrePlanner(self, self.helpers)
+
+        # Statische Verfügbarkeit je (Tag, Schicht) einmalig vorberechnen
+        self.eligibility = CandidateEligibility(self)
+
+    def supply_demand_profile(self):
+        """
+        Lädt den Monat und gibt das Angebot/Bedarf-Profil zurück, ohne zu planen
+        (Engpass-Vorschau für /api/generator/profile, siehe supply_demand.py).
+        """
+        data_manager = ShiftPlanDataManager(self.db, self.year, self.month, self.variant_id)
+        data_manager.load_data()
+        self.prepare(data_manager)
+        return SupplyDemandProfile(self)
+
+    def check_cancelled(self):
+        """Wirft GenerationCancelled, wenn der Lauf abgebrochen wurde."""
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
+    def plan_prepared(self):
+        """
+        Plant den vorbereiteten Monat (siehe prepare), ohne zu speichern.
+        Einzellauf oder Portfolio, je nach Konfiguration.
+        Gibt die Plandaten zurück ({user_id_str: {date_str: abbrev}}).
+        """
+        portfolio_runs = self.config.generator_portfolio_runs
+        if portfolio_runs > 1:
+            portfolio = GeneratorPortfolio(self, portfolio_runs, self.config.generator_portfolio_workers)
+            with self.profiler.phase('portfolio'):
+                return portfolio.run()
+
+        self.plan_month()
+        self.improve_plan()
+        days_in_month = calendar.monthrange(self.year, self.month)[1]
+        return self.state_grid.to_dict(date(self.year, self.month, 1), date(self.year, self.month, days_in_month))
+
+    def improve_plan(self):
+        """
+        Optionale lokale Suche nach der Hauptschleife (Zeitbudget aus der Konfiguration,
+        'generator_local_search_seconds'). Schließt Lücken und gleicht Stunden aus.
+        """
+        time_budget = self.config.generator_local_search_seconds
+        if time_budget <= 0:
+            return
+
+        self.log(f"Lokale Suche (max. {time_budget:.0f}s)...", 91)
+        with self.profiler.phase('local_search'):
+            stats = GeneratorLocalSearch(self, time_budget, self.seed).run()
+        self.log(
+            f"Lokale Suche: {stats['filled_slots']} Lücken geschlossen, Stunden-Spreizung "
+            f"{math.sqrt(stats['variance_before']):.1f}h -> {math.sqrt(stats['variance_after']):.1f}h "
+            f"({stats['accepted']}/{stats['iterations']} Züge angenommen).", 92
+        )
+
+    def plan_month(self):
+        """
+        Hauptschleife (Tag für Tag): besetzt alle Schichten des Monats im Raster.
+        Setzt self.unfilled_slots auf die Anzahl der nicht besetzbaren Slots.
+        """
+        self.unfilled_slots = 0
+        self.unfilled_by_slot = {}
+        days_in_month = calendar.monthrange(self.year, self.month)[1]
+
+        # Engpässe im ganzen Monat vorab besetzen (Angebot/Bedarf-Profil)
+        self.preplanned_cells = {}
+        if self.config.generator_critical_preplanning:
+            with self.profiler.phase('pre_plan'):
+                critical_count, preplanned = self.pre_planner.pre_plan_critical_shifts(
+                    self.live_user_hours, self.live_shift_counts, self.live_shift_counts_ratio
+                )
+            if critical_count:
+                self.log(f"Pre-Planning: {critical_count} kritische Slots, {preplanned} Schichten vorab vergeben.", 10)
+
+        for day in range(1, days_in_month + 1):
+            self.check_cancelled()
+            current_date = date(self.year, self.month, day)
+            date_str = current_date.strftime('%Y-%m-%d')
+
+            # Fortschritt berechnen (10% bis 90%)
+            progress = 10 + int((day / days_in_month) * 80)
+            self.log(f"Plane Tag {day} ({date_str})...", progress)
+
+            # Soll-Besetzung für diesen Tag
+            min_staffing = self.data_manager.get_min_staffing_for_date(current_date)
+
+            # Tracking-Listen für den aktuellen Tag
+            users_unavailable_today = set()
+            existing_dog_assignments = defaultdict(list)  # {dog_name: [{user_id, shift}]}
+            assignments_today_by_shift = defaultdict(set)  # {shift_abbrev: {user_ids}}
+
+            # a) Bereits gesetzte Schichten (Locked/Urlaub/Manuell) erfassen
+            for uid_str, shift, is_locked in self.state_grid.entries_on(current_date):
+                # --- KORREKTUR: Prüfe auf gesicherte Schichten (DB) ---
+                # is_locked: Dieser Tag existierte für diesen User bereits in der DB
+                # (auch wenn es 'X' oder 'U' ist).
+
+                # User ist nicht verfügbar, wenn er arbeitet ODER wenn der Eintrag gelockt ist
+                if (shift and shift not in self.free_shifts_indicators) or is_locked:
+                    uid_int = int(uid_str)
+                    users_unavailable_today.add(uid_str)
+
+                    # Wenn eine Schicht eingetragen ist (auch manuell), zählen wir sie zur Besetzung
+                    if shift:
+                        assignments_today_by_shift[shift].add(uid_int)
+
+                    # Hund prüfen
+                    user_data = self.user_data_map.get(uid_int)
+                    if user_data and user_data.get('diensthund'):
+                        dog = user_data['diensthund']
+                        if dog != '---' and shift:  # Nur wenn eine echte Schicht da ist
+                            existing_dog_assignments[dog].append({'user_id': uid_int, 'shift': shift})
+                # --- ENDE KORREKTUR ---
+
+            # b) Abwesenheiten (Urlaub/WF) erfassen
+            # (Dies ist jetzt teilweise redundant durch den 'is_locked' check oben,
+            # aber wichtig für frisch genehmigte Anträge, die noch nicht im Plan stehen)
+            # ... (wird implizit in den Runden geprüft oder durch locked_shifts abgedeckt)
+
+            # c) Planungsschleife für die Schichtarten (in konfigurierter Reihenfolge)
+            for shift_abbrev in self.shifts_to_plan:
+                needed = min_staffing.get(shift_abbrev, 0)
+                if needed <= 0:
+                    continue
+
+                current_count = len(assignments_today_by_shift.get(shift_abbrev, set()))
+                needed_now = max(0, needed - current_count)
+
+                if needed_now > 0:
+                    # Runde 1: Faire Zuweisung
+                    with self.profiler.phase('round_fair'):
+                        assigned_fair = self.rounds.run_fair_assignment_round(
+                            shift_abbrev, current_date,
+                            users_unavailable_today, existing_dog_assignments, assignments_today_by_shift,
+                            self.live_user_hours, self.live_shift_counts, self.live_shift_counts_ratio,
+                            needed_now, days_in_month
+                        )
+
+                    remaining = needed_now - assigned_fair
+
+                    # Runde 2-4: Auffüllen (Regeln lockern)
+                    if remaining > 0:
+                        for r in range(2, self.config.generator_fill_rounds + 2):
+                            if remaining <= 0: break
+
+                            with self.profiler.phase(f'round_fill_{r}'):
+                                assigned_fill = self.rounds.run_fill_round(
+                                    shift_abbrev, current_date,
+                                    users_unavailable_today, existing_dog_assignments, assignments_today_by_shift,
+                                    self.live_user_hours, self.live_shift_counts, self.live_shift_counts_ratio,
+                                    remaining, r
+                                )
+                            remaining -= assigned_fill
+
+                    if remaining > 0:
+                        self.unfilled_slots += remaining
+                        self.unfilled_by_slot[(current_date, shift_abbrev)] = remaining
+                        self.log(
+                            f"[WARN] Tag {day}: Konnte {shift_abbrev} nicht voll besetzen (Fehlen: {remaining})")
\ No newline at end of file
@@ -1,13 +1,16 @@
 # dhf_app/generator/data_manager.py
 
 import calendar
+import copy
 import json
-from datetime import date, timedelta, datetime
+from types import SimpleNamespace
+from datetime import date, timedelta
 from collections import defaultdict
-from sqlalchemy import extract, or_, and_
+from sqlalchemy import or_, and_
 from sqlalchemy.orm import joinedload
 
-from ..models import User, Shift, ShiftType, SpecialDate, GlobalSetting, ShiftQuery
+from ..models import Shift, GlobalSetting, ShiftQuery
+from ..reference_data import shift_type_data, get_special_dates, get_month_roster
 
 
 class ShiftPlanDataManager:
@@ -15,6 +18,10 @@ class ShiftPlanDataManager:
     Zentrale Klasse für das Laden und Bereitstellen aller planungsrelevanten Daten.
     Optimiert für Performance (Regel 2): Lädt Daten in Batches und hält sie im Speicher.
     Unterstützt jetzt Plan-Varianten.
+
+    Schichtarten, Besetzungsregeln, Sondertermine und Mitarbeiter kommen aus dem
+    Stammdaten-Cache (reference_data.py); aus der DB gelesen werden nur die
+    Schichten, Anfragen und die Generator-Konfiguration.
     """
 
     def __init__(self, db_session, year, month, variant_id=None):
@@ -76,7 +83,6 @@ class ShiftPlanDataManager:
         self._fetch_shifts()  # <<< Hier liegt die Hauptänderung für Varianten
         self._fetch_calendar_events()
         self._fetch_requests()
-        self._build_staffing_rules()
 
         print("[DataManager] Daten erfolgreich geladen.")
 
@@ -92,56 +98,30 @@ class ShiftPlanDataManager:
                 print("[DataManager] Fehler beim Parsen der Generator-Config.")
 
     def _fetch_shift_types(self):
-        """Lädt alle Schichtarten und bereitet Metadaten vor."""
-        types = self.db.session.query(ShiftType).all()
-        for st in types:
-            self.shift_types[st.id] = st
-            self.shift_types_data[st.abbreviation] = st.to_dict()
-
-            if st.is_work_shift and st.start_time and st.end_time:
-                try:
-                    s_t = datetime.strptime(st.start_time, '%H:%M').time()
-                    e_t = datetime.strptime(st.end_time, '%H:%M').time()
-                    s_min = s_t.hour * 60 + s_t.minute
-                    e_min = e_t.hour * 60 + e_t.minute
-                    if e_min <= s_min: e_min += 24 * 60
-                    self._preprocessed_shift_times[st.abbreviation] = (s_min, e_min)
-                except ValueError:
-                    pass
+        """Schichtarten, vorverarbeitete Zeiten und Besetzungsregeln (Stammdaten-Cache)."""
+        data = shift_type_data()
+        self.shift_types = dict(data.by_id)
+        self.shift_types_data = {st.abbreviation: st.to_dict() for st in data.by_id.values()}
+        self._preprocessed_shift_times = dict(data.preprocessed_times)
+        # Eigene Kopie: der Cache-Eintrag wird zwischen Läufen geteilt
+        self.staffing_rules = copy.deepcopy(data.staffing_rules)
 
     def _fetch_users(self):
-        """Lädt alle aktiven und sichtbaren Benutzer."""
-        last_day = calendar.monthrange(self.year, self.month)[1]
-        month_end = date(self.year, self.month, last_day)
-        prev_month_end = date(self.year, self.month, 1) - timedelta(days=1)
-
-        users_query = self.db.session.query(User).filter(
-            User.shift_plan_visible == True,
-            or_(User.aktiv_ab_datum.is_(None), User.aktiv_ab_datum <= month_end)
-        ).order_by(User.shift_plan_sort_order, User.name).all()
-
-        for u in users_query:
-            if u.inaktiv_ab_datum is not None and u.inaktiv_ab_datum <= prev_month_end:
-                continue
+        """Aktive und sichtbare Benutzer des Monats (Stammdaten-Cache)."""
+        self._apply_users(get_month_roster(self.year, self.month))
 
-            u_dict = u.to_dict()
+    def _apply_users(self, users):
+        """Übernimmt die Benutzer-Dicts des Monats (als Kopie, der Cache wird geteilt)."""
+        for user in users:
+            u_dict = dict(user)
             self.all_users.append(u_dict)
-            self.user_data_map[u.id] = u_dict
+            self.user_data_map[u_dict['id']] = u_dict
 
-            if str(u.id) not in self.user_preferences:
-                self.user_preferences[str(u.id)] = {}
+            if str(u_dict['id']) not in self.user_preferences:
+                self.user_preferences[str(u_dict['id'])] = {}
 
-    def _fetch_shifts(self):
-        """
-        Lädt Schichten für den aktuellen, vorherigen und nächsten Monat.
-
-        LOGIK FÜR VARIANTEN:
-        - Vormonat: Lädt IMMER den Hauptplan (variant_id IS NULL), da dies die historische Basis ist.
-        - Aktueller Monat: Lädt die spezifische Variante (self.variant_id) ODER Hauptplan (wenn None).
-        - Nächster Monat: Lädt IMMER den Hauptplan (variant_id IS NULL).
-        """
-
-        # Datumsbereiche berechnen
+    def _month_ranges(self):
+        """(start_prev, end_prev, start_curr, end_curr, start_next, end_next) für diesen Monat."""
         start_curr = date(self.year, self.month, 1)
         last_day = calendar.monthrange(self.year, self.month)[1]
         end_curr = date(self.year, self.month, last_day)
@@ -152,6 +132,24 @@ class ShiftPlanDataManager:
         start_next = end_curr + timedelta(days=1)
         # Ende nächster Monat (ca.)
         end_next = (start_next.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        return start_prev, end_prev, start_curr, end_curr, start_next, end_next
+
+    def _fetch_shifts(self):
+        """
+        Lädt Schichten für den aktuellen, vorherigen und nächsten Monat.
+        """
+        self._apply_shifts(self._query_shifts(*self._month_ranges()))
+
+    def _query_shifts(self, start_prev, end_prev, start_curr, end_curr, start_next, end_next):
+        """
+        Eine Abfrage für Vorbereich, Planungsbereich und Folgebereich.
+
+        LOGIK FÜR VARIANTEN:
+        - Vormonat: Lädt IMMER den Hauptplan (variant_id IS NULL), da dies die historische Basis ist.
+        - Aktueller Monat: Lädt die spezifische Variante (self.variant_id) ODER Hauptplan (wenn None).
+        - Nächster Monat: Lädt IMMER den Hauptplan (variant_id IS NULL).
+        (Beim Rolling Horizon umfasst der Planungsbereich alle Monate des Horizonts.)
+        """
 
         # Filter erstellen
 
@@ -177,10 +175,14 @@ class ShiftPlanDataManager:
         )
 
         # Gesamtabfrage mit OR
-        shifts = self.db.session.query(Shift).options(joinedload(Shift.shift_type)).filter(
+        return self.db.session.query(Shift).options(joinedload(Shift.shift_type)).filter(
             or_(filter_prev, filter_curr, filter_next)
         ).all()
 
+    def _apply_shifts(self, shifts):
+        """Verteilt geladene Schichten auf Vormonat, Planungsmonat und Folgemonat dieses Managers."""
+        start_prev, end_prev, start_curr, end_curr, start_next, end_next = self._month_ranges()
+
         for s in shifts:
             uid = str(s.user_id)
             date_str = s.date.strftime('%Y-%m-%d')
@@ -199,30 +201,36 @@ class ShiftPlanDataManager:
                 self.next_month_shifts[uid][date_str] = abbrev
 
     def _fetch_calendar_events(self):
-        """Lädt Feiertage und Sondertermine."""
-        events = self.db.session.query(SpecialDate).filter(
-            extract('year', SpecialDate.date) == self.year,
-            extract('month', SpecialDate.date) == self.month
-        ).all()
+        """Feiertage und Sondertermine des Monats (Stammdaten-Cache, je Jahr)."""
+        self._apply_calendar_events(get_special_dates(self.year))
 
-        for e in events:
-            self.special_dates_data[e.date.strftime('%Y-%m-%d')] = e.type
-            if e.type == 'holiday':
-                self.holidays_in_month.add(e.date)
+    def _apply_calendar_events(self, events):
+        for event_date, event_type in events:
+            if event_date.year != self.year or event_date.month != self.month:
+                continue
+            self.special_dates_data[event_date.strftime('%Y-%m-%d')] = event_type
+            if event_type == 'holiday':
+                self.holidays_in_month.add(event_date)
 
     def _fetch_requests(self):
         """
         Lädt Urlaubsanträge und Wunschfrei-Anfragen.
         Diese sind global und nicht an Varianten gebunden.
         """
-        queries = self.db.session.query(ShiftQuery).filter(
-            extract('year', ShiftQuery.shift_date) == self.year,
-            extract('month', ShiftQuery.shift_date) == self.month,
+        _, _, start_curr, end_curr, _, _ = self._month_ranges()
+        self._apply_requests(self._query_requests(start_curr, end_curr))
+
+    def _query_requests(self, start_date, end_date):
+        return self.db.session.query(ShiftQuery).filter(
+            ShiftQuery.shift_date >= start_date,
+            ShiftQuery.shift_date <= end_date,
             ShiftQuery.status == 'offen'
         ).all()
 
+    def _apply_requests(self, queries):
         for q in queries:
             if not q.target_user_id: continue
+            if q.shift_date.year != self.year or q.shift_date.month != self.month: continue
             uid = str(q.target_user_id)
             date_str = q.shift_date.strftime('%Y-%m-%d')
 
@@ -233,27 +241,61 @@ class ShiftPlanDataManager:
                     req_shift = parts[1].strip().replace("?", "")
                     self.wunschfrei_requests[uid][date_str] = ('Genehmigt', req_shift)
 
-    def _build_staffing_rules(self):
+    @classmethod
+    def load_horizon(cls, db_session, year, month, num_months, variant_id=None):
         """
-        Erstellt die Besetzungsregeln.
+        Lädt die Daten für 'num_months' aufeinanderfolgende Monate (Rolling Horizon)
+        mit einer Abfrage je Entitätstyp und verteilt sie auf je einen Manager pro Monat.
+        Konfiguration und Schichtarten werden geteilt, Mitarbeiter und Sondertermine
+        kommen je Monat bzw. Jahr aus dem Stammdaten-Cache.
         """
-        for st in self.shift_types.values():
-            mapping = [
-                st.min_staff_mo, st.min_staff_di, st.min_staff_mi,
-                st.min_staff_do, st.min_staff_fr, st.min_staff_sa, st.min_staff_so
-            ]
-
-            for day_idx, amount in enumerate(mapping):
-                if amount > 0:
-                    day_str = str(day_idx)
-                    if day_str not in self.staffing_rules['weekday_staffing']:
-                        self.staffing_rules['weekday_staffing'][day_str] = {}
-                    self.staffing_rules['weekday_staffing'][day_str][st.abbreviation] = amount
-
-            if st.min_staff_holiday > 0:
-                if 'holiday_staffing' not in self.staffing_rules:
-                    self.staffing_rules['holiday_staffing'] = {}
-                self.staffing_rules['holiday_staffing'][st.abbreviation] = st.min_staff_holiday
+        managers = []
+        y, m = year, month
+        for _ in range(num_months):
+            managers.append(cls(db_session, y, m, variant_id))
+            y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+        first, last = managers[0], managers[-1]
+        variant_info = f" (Variante ID: {variant_id})" if variant_id else " (Hauptplan)"
+        print(f"[DataManager] Lade Daten für {first.month:02d}/{first.year} - {last.month:02d}/{last.year}{variant_info}...")
+
+        first._load_generator_config()
+        first._fetch_shift_types()
+
+        first_ranges = first._month_ranges()
+        last_ranges = last._month_ranges()
+        shifts = first._query_shifts(first_ranges[0], first_ranges[1], first_ranges[2], last_ranges[3],
+                                     last_ranges[4], last_ranges[5])
+        queries = first._query_requests(first_ranges[2], last_ranges[3])
+
+        for manager in managers:
+            if manager is not first:
+                manager.generator_config = first.generator_config
+                manager.user_preferences = first.user_preferences
+                manager.shift_types = first.shift_types
+                manager.shift_types_data = first.shift_types_data
+                manager._preprocessed_shift_times = first._preprocessed_shift_times
+                manager.staffing_rules = copy.deepcopy(first.staffing_rules)
+            manager._fetch_users()
+            manager._apply_shifts(shifts)
+            manager._fetch_calendar_events()
+            manager._apply_requests(queries)
+
+        print("[DataManager] Daten erfolgreich geladen.")
+        return managers
+
+    def detached_copy(self):
+        """
+        Gibt eine Kopie ohne DB-Bezug zurück, die sich an Worker-Prozesse
+        übergeben lässt (Portfolio). Die Schichtarten (geteilte Cache-Einträge)
+        werden durch eigene schlanke Objekte ersetzt; die Lade-Strukturen werden geteilt.
+        """
+        clone = copy.copy(self)
+        clone.db = None
+        clone.shift_types = {
+            st_id: SimpleNamespace(**st.to_dict()) for st_id, st in self.shift_types.items()
+        }
+        return clone
 
     # --- Public Getter Methoden ---
 
@@ -0,0 +1,113 @@
+# dhf_app/generator/eligibility.py
+
+import calendar
+from datetime import date
+
+
+class CandidateEligibility:
+    """
+    Vorberechnete Kandidaten-Bitsets je (Tag, Schicht) für einen Generator-Lauf.
+
+    Statische Fakten (Schicht-Ausschlüsse, genehmigtes Wunschfrei, Urlaub,
+    gesicherte Zellen) ändern sich während der Generierung nicht. Sie werden
+    einmal nach dem Laden ausgewertet; die Runden prüfen danach nur noch die
+    dynamischen Regeln (Ruhezeiten, Serien, Stunden, Hunde) für die
+    verbleibenden Kandidaten.
+
+    Bit i eines Sets steht für gen.all_users[i], die Iteration liefert die
+    Kandidaten daher in derselben Reihenfolge wie bisher.
+
+    Drei Sichten je (Tag, Schicht):
+    - 'fair':      Runde 1 (Ausschluss, Sperre, Wunschfrei gemäß Respekt-Level)
+    - 'fill':      Auffüllrunden (Ausschluss, Sperre; Wunschfrei wird dort nicht geprüft)
+    - 'available': Pre-Planning (Ausschluss, Sperre, Urlaub, jedes genehmigte Wunschfrei)
+    """
+
+    APPROVED_STATUSES = ('Approved', 'Genehmigt', 'Akzeptiert')
+
+    def __init__(self, generator_instance):
+        self.gen = generator_instance
+        self.users = [u for u in generator_instance.all_users if u.get('id') is not None]
+        self.user_id_strs = [str(u['id']) for u in self.users]
+
+        # {(date_obj, shift_abbrev): {'fair': int, 'fill': int, 'available': int}}
+        self._masks = {}
+
+        days_in_month = calendar.monthrange(generator_instance.year, generator_instance.month)[1]
+        self.dates = [date(generator_instance.year, generator_instance.month, d)
+                      for d in range(1, days_in_month + 1)]
+
+        for current_date in self.dates:
+            for shift_abbrev in generator_instance.shifts_to_plan:
+                self._masks[(current_date, shift_abbrev)] = self._build_masks(current_date, shift_abbrev)
+
+    def _build_masks(self, current_date, shift_abbrev):
+        gen = self.gen
+        date_str = current_date.strftime('%Y-%m-%d')
+        respect_wf_in_fair_round = gen.wunschfrei_respect_level >= 50
+
+        fair_mask = fill_mask = available_mask = 0
+
+        for idx, user_id_str in enumerate(self.user_id_strs):
+            bit = 1 << idx
+
+            # Schicht-Ausschluss und gesicherte Zellen blockieren in allen Runden
+            if shift_abbrev in gen.user_preferences[user_id_str].get('shift_exclusions', []):
+                continue
+            if gen.state_grid.is_locked(user_id_str, current_date):
+                continue
+
+            fill_mask |= bit
+
+            # Genehmigtes Wunschfrei (ganztags oder für diese Schicht)
+            wf_blocks = False
+            wf_entry = gen.wunschfrei_requests.get(user_id_str, {}).get(date_str)
+            if isinstance(wf_entry, tuple) and len(wf_entry) >= 2:
+                if wf_entry[0] in self.APPROVED_STATUSES and wf_entry[1] in ("", shift_abbrev):
+                    wf_blocks = True
+
+            if not (wf_blocks and respect_wf_in_fair_round):
+                fair_mask |= bit
+
+            on_vacation = gen.vacation_requests.get(user_id_str, {}).get(current_date) in ['Approved', 'Genehmigt']
+            if not wf_blocks and not on_vacation:
+                available_mask |= bit
+
+        return {'fair': fair_mask, 'fill': fill_mask, 'available': available_mask}
+
+    def _get_mask(self, current_date, shift_abbrev, kind):
+        masks = self._masks.get((current_date, shift_abbrev))
+        if masks is None:
+            # Schicht außerhalb von shifts_to_plan (z.B. Pre-Planning für QA/S): bei Bedarf nachberechnen
+            masks = self._build_masks(current_date, shift_abbrev)
+            self._masks[(current_date, shift_abbrev)] = masks
+        return masks[kind]
+
+    def _iter_users(self, mask):
+        users = self.users
+        while mask:
+            low_bit = mask & -mask
+            yield users[low_bit.bit_length() - 1]
+            mask ^= low_bit
+
+    # --- Öffentliche Abfragen ---
+
+    def fair_candidates(self, current_date, shift_abbrev):
+        """User-Dicts, die in Runde 1 nicht statisch blockiert sind (Reihenfolge wie all_users)."""
+        return self._iter_users(self._get_mask(current_date, shift_abbrev, 'fair'))
+
+    def fill_candidates(self, current_date, shift_abbrev):
+        """User-Dicts, die in den Auffüllrunden nicht statisch blockiert sind."""
+        return self._iter_users(self._get_mask(current_date, shift_abbrev, 'fill'))
+
+    def available_candidates(self, current_date, shift_abbrev):
+        """User-Dicts ohne Urlaub, Wunschfrei, Sperre oder Ausschluss (Pre-Planning)."""
+        return self._iter_users(self._get_mask(current_date, shift_abbrev, 'available'))
+
+    def available_mask(self, current_date, shift_abbrev):
+        """Bitset der statisch verfügbaren Mitarbeiter (Bit i = users[i], siehe supply_demand.py)."""
+        return self._get_mask(current_date, shift_abbrev, 'available')
+
+    def available_count(self, current_date, shift_abbrev):
+        """Anzahl der statisch verfügbaren Mitarbeiter für (Tag, Schicht)."""
+        return bin(self._get_mask(current_date, shift_abbrev, 'available')).count('1')
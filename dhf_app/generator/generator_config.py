@@ -14,6 +14,11 @@ DEFAULT_MANDATORY_REST_DAYS = 2
 DEFAULT_MAX_CONSECUTIVE_SAME_SHIFT = 4
 DEFAULT_MAX_MONTHLY_HOURS = 170.0
 DEFAULT_SHIFTS_TO_PLAN = ["6", "T.", "N."]
+DEFAULT_PORTFOLIO_RUNS = 1
+DEFAULT_LOCAL_SEARCH_SECONDS = 0.0
+DEFAULT_SOLVER_TIME_LIMIT_SECONDS = 30.0
+DEFAULT_SOLVER_WORKERS = 4
+DEFAULT_CRITICAL_PREPLANNING = True
 AVOID_PARTNER_PENALTY_SCORE = 10000
 
 
@@ -66,6 +71,48 @@ class GeneratorConfig:
             'max_monthly_hours', DEFAULT_MAX_MONTHLY_HOURS
         )
 
+        # --- Portfolio: mehrere unabhängige Läufe, der beste Plan gewinnt ---
+        try:
+            self.generator_portfolio_runs = max(1, int(self.generator_config.get(
+                'generator_portfolio_runs', DEFAULT_PORTFOLIO_RUNS
+            )))
+        except (ValueError, TypeError):
+            self.generator_portfolio_runs = DEFAULT_PORTFOLIO_RUNS
+        # None = Anzahl der CPU-Kerne
+        self.generator_portfolio_workers = self.generator_config.get('generator_portfolio_workers')
+
+        # --- Lokale Suche nach dem Greedy-Durchlauf (Zeitbudget in Sekunden, 0 = aus) ---
+        try:
+            self.generator_local_search_seconds = max(0.0, float(self.generator_config.get(
+                'generator_local_search_seconds', DEFAULT_LOCAL_SEARCH_SECONDS
+            )))
+        except (ValueError, TypeError):
+            self.generator_local_search_seconds = DEFAULT_LOCAL_SEARCH_SECONDS
+
+        # --- Zeitlimit für die Solver-Engine (CP-SAT) ---
+        try:
+            self.generator_solver_time_limit_seconds = max(1.0, float(self.generator_config.get(
+                'generator_solver_time_limit_seconds', DEFAULT_SOLVER_TIME_LIMIT_SECONDS
+            )))
+        except (ValueError, TypeError):
+            self.generator_solver_time_limit_seconds = DEFAULT_SOLVER_TIME_LIMIT_SECONDS
+
+        # --- Such-Threads der Solver-Engine je Job (im Portfolio auf die parallelen Läufe aufgeteilt) ---
+        try:
+            self.generator_solver_workers = max(1, int(self.generator_config.get(
+                'generator_solver_workers', DEFAULT_SOLVER_WORKERS
+            )))
+        except (ValueError, TypeError):
+            self.generator_solver_workers = DEFAULT_SOLVER_WORKERS
+
+        # --- Pre-Planning: engste Slots des Monats vor der Tag-für-Tag-Schleife besetzen ---
+        self.generator_critical_preplanning = bool(self.generator_config.get(
+            'generator_critical_preplanning', DEFAULT_CRITICAL_PREPLANNING
+        ))
+
+        # --- Optionales Funktionsprofil des Laufs: None, 'cprofile' oder 'pyinstrument' ---
+        self.generator_profile_capture = self.generator_config.get('generator_profile_capture') or None
+
         # --- NEU: Work-Life-Balance Schalter ---
         self.ensure_one_weekend_free = self.generator_config.get(
             'ensure_one_weekend_free', False
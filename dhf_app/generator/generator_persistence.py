@@ -2,11 +2,28 @@
 
 from datetime import datetime, date
 import calendar
+from sqlalchemy import select, insert, update, delete, case
 from ..extensions import db
-from ..models import Shift, ShiftType
+from ..models import Shift
+from ..reference_data import shift_type_data
+from ..models_market import ShiftMarketOffer, ShiftMarketResponse
+from ..models_shift_change import ShiftChangeRequest
+from ..models_gamification import GamificationLog
+from ..plan_cache import bump_plan_versions, scopes_for_month_shifts
+from ..shift_journal import record_month_reset
+from ..training_status import refresh_training_status
+from ..vacation_usage import refresh_vacation_usage
 
+# Zeilen je INSERT / UPDATE / DELETE (hält die Parameterzahl je Statement klein)
+CHUNK_SIZE = 500
 
-def save_generation_batch_to_db(live_shifts_data, year, month, variant_id=None):
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def save_generation_batch_to_db(live_shifts_data, year, month, variant_id=None, commit=True):
     """
     Speichert den generierten Plan in die Datenbank.
     Nutzt SQLAlchemy für Transaktionssicherheit und Konsistenz.
@@ -14,16 +31,23 @@ def save_generation_batch_to_db(live_shifts_data, year, month, variant_id=None):
 
     Strategie:
     1. Alle Schichtarten laden (Mapping Abkürzung -> ID).
-    2. Alle existierenden Schichten des Monats (für die Variante) laden.
-    3. Abgleich:
-       - Neue Einträge -> INSERT
-       - Geänderte Einträge -> UPDATE
-       - Leere Einträge (jetzt FREI) -> DELETE
+    2. Alle existierenden Schichten des Monats (für die Variante) als schlanke
+       Zeilen laden (id, user_id, date, shifttype_id) und in Python abgleichen.
+    3. Mengenbasiert schreiben (wenige Statements statt eines je Zelle):
+       - Neue Einträge -> INSERT ... VALUES (...), (...) in Blöcken
+       - Geänderte Einträge -> UPDATE ... SET shifttype_id = CASE id ... END
+       - Leere Einträge (jetzt FREI) -> DELETE ... WHERE id IN (...)
+    4. Da Core-Statements am Flush-Listener vorbeigehen: Cache-Versionen,
+       Änderungsjournal, Ausbildungsstand und Urlaubsverbrauch nachziehen.
+    5. Commit.
+
+    Mit commit=False bleibt die Transaktion offen (kein Commit, kein Rollback):
+    der Aufrufer speichert mehrere Monate gemeinsam (HorizonPlanGenerator) und
+    schließt die Transaktion selbst ab bzw. rollt sie bei einem Fehler zurück.
     """
     try:
         # 1. Mappings laden
-        shift_types = ShiftType.query.all()
-        abbr_to_id = {st.abbreviation: st.id for st in shift_types}
+        abbr_to_id = {abbr: st.id for abbr, st in shift_type_data().by_abbreviation.items()}
 
         # 2. Bestehende Schichten für den Monat laden (Batch)
         # Filtert nach der spezifischen Variante (oder Hauptplan, wenn None)
@@ -31,21 +55,26 @@ def save_generation_batch_to_db(live_shifts_data, year, month, variant_id=None):
         start_date = date(year, month, 1)
         end_date = date(year, month, last_day)
 
-        existing_shifts = Shift.query.filter(
-            Shift.date >= start_date,
-            Shift.date <= end_date,
-            Shift.variant_id == variant_id  # <<< NEU: Filterung nach Variante
+        existing_rows = db.session.execute(
+            select(Shift.id, Shift.user_id, Shift.date, Shift.shifttype_id)
+            .where(
+                Shift.date >= start_date,
+                Shift.date <= end_date,
+                Shift.variant_id == variant_id  # <<< NEU: Filterung nach Variante
+            )
+            .order_by(Shift.id)
         ).all()
 
-        # Map für schnellen Zugriff: (user_id, "YYYY-MM-DD") -> Shift-Objekt
+        # Map für schnellen Zugriff: (user_id, "YYYY-MM-DD") -> (id, shifttype_id)
         existing_map = {
-            (s.user_id, s.date.strftime('%Y-%m-%d')): s
-            for s in existing_shifts
+            (user_id, shift_date.strftime('%Y-%m-%d')): (shift_id, shifttype_id)
+            for shift_id, user_id, shift_date, shifttype_id in existing_rows
         }
 
-        count_updates = 0
-        count_inserts = 0
-        count_deletes = 0
+        inserts = []
+        updates = {}  # id -> neue shifttype_id
+        delete_ids = []
+        affected_users = set()
 
         # 3. Abgleich durchführen
         for user_id_str, day_map in live_shifts_data.items():
@@ -67,31 +96,85 @@ def save_generation_batch_to_db(live_shifts_data, year, month, variant_id=None):
 
                     if current_db_shift:
                         # Update nur, wenn sich der Typ geändert hat
-                        if current_db_shift.shifttype_id != target_type_id:
-                            current_db_shift.shifttype_id = target_type_id
-                            count_updates += 1
+                        shift_id, current_type_id = current_db_shift
+                        if current_type_id != target_type_id:
+                            updates[shift_id] = target_type_id
+                            affected_users.add(user_id)
                     else:
                         # Insert (Neu)
-                        new_shift = Shift(
-                            user_id=user_id,
-                            date=datetime.strptime(date_str, '%Y-%m-%d').date(),
-                            shifttype_id=target_type_id,
-                            variant_id=variant_id  # <<< NEU: Variante setzen
-                        )
-                        db.session.add(new_shift)
-                        count_inserts += 1
+                        inserts.append({
+                            "user_id": user_id,
+                            "date": datetime.strptime(date_str, '%Y-%m-%d').date(),
+                            "shifttype_id": target_type_id,
+                            "variant_id": variant_id,  # <<< NEU: Variante setzen
+                            "is_locked": False,
+                            "is_trade": False
+                        })
+                        affected_users.add(user_id)
 
                 # Fall B: Der Generator hat "Frei" geplant (leerer String oder spezielle Marker)
                 # -> Eintrag muss aus der DB entfernt werden, falls vorhanden
                 else:
                     if current_db_shift:
-                        db.session.delete(current_db_shift)
-                        count_deletes += 1
+                        delete_ids.append(current_db_shift[0])
+                        affected_users.add(user_id)
+
+        table = Shift.__table__
+        connection = db.session.connection()
+
+        for chunk in _chunks(inserts):
+            connection.execute(insert(table).values(chunk))
+
+        update_items = sorted(updates.items())
+        for chunk in _chunks(update_items):
+            ids = [shift_id for shift_id, _ in chunk]
+            connection.execute(
+                update(table)
+                .where(table.c.id.in_(ids))
+                .values(shifttype_id=case(dict(chunk), value=table.c.id))
+            )
+
+        for ids in _chunks(delete_ids):
+            # Wie das Löschen per ORM: Tauschbörsen-Angebote der Schicht samt Antworten
+            # löschen (cascade "all, delete-orphan"), übrige Verweise nur lösen
+            offer_ids = select(ShiftMarketOffer.id).where(ShiftMarketOffer.shift_id.in_(ids))
+            connection.execute(
+                delete(ShiftMarketResponse.__table__)
+                .where(ShiftMarketResponse.offer_id.in_(offer_ids))
+            )
+            connection.execute(
+                delete(ShiftMarketOffer.__table__)
+                .where(ShiftMarketOffer.shift_id.in_(ids))
+            )
+            connection.execute(
+                update(ShiftChangeRequest.__table__)
+                .where(ShiftChangeRequest.original_shift_id.in_(ids))
+                .values(original_shift_id=None)
+            )
+            connection.execute(
+                update(GamificationLog.__table__)
+                .where(GamificationLog.shift_id.in_(ids))
+                .values(shift_id=None)
+            )
+            connection.execute(delete(table).where(table.c.id.in_(ids)))
+
+        count_inserts = len(inserts)
+        count_updates = len(update_items)
+        count_deletes = len(delete_ids)
+        total_ops = count_inserts + count_updates + count_deletes
 
-        # 4. Transaktion abschließen
-        db.session.commit()
+        if total_ops:
+            # Massen-Schreiben läuft am Flush-Listener vorbei
+            bump_plan_versions(scopes_for_month_shifts(year, month, variant_id))
+            record_month_reset(year, month, variant_id)
+            refresh_training_status(affected_users)
+            if variant_id is None:
+                refresh_vacation_usage(affected_users, [year])
+
+        # 5. Transaktion abschließen
+        if commit:
+            db.session.commit()
 
-        total_ops = count_inserts + count_updates + count_deletes
         # Debug-Ausgabe im Server-Log
         variant_label = f"Variante {variant_id}" if variant_id else "Hauptplan"
         print(f"[Persistence] Batch OK ({variant_label}): +{count_inserts} / ~{count_updates} / -{count_deletes}")
@@ -99,5 +182,6 @@ def save_generation_batch_to_db(live_shifts_data, year, month, variant_id=None):
         return True, total_ops, None
 
     except Exception as e:
-        db.session.rollback()
-        return False, 0, str(e)
\ No newline at end of file
+        if commit:
+            db.session.rollback()
+        return False, 0, str(e)
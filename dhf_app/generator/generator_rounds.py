@@ -1,5 +1,6 @@
 # dhf_app/generator/generator_rounds.py
 
+import heapq
 from collections import defaultdict
 from datetime import timedelta
 
@@ -25,214 +26,72 @@ class GeneratorRounds:
         """
 
         assigned_count_this_round = 0
-        search_attempts_fair = 0
-        date_str = current_date_obj.strftime('%Y-%m-%d')
 
         # Datums-Objekte für Helfer bereitstellen
         prev_date_obj = current_date_obj - timedelta(days=1)
         two_days_ago_obj = current_date_obj - timedelta(days=2)
 
-        # Wir versuchen so lange Kandidaten zu finden, bis der Bedarf gedeckt ist
-        # oder wir alle User einmal durchgeprüft haben (Sicherheitsabbruch).
-        while assigned_count_this_round < needed_now and search_attempts_fair < len(self.gen.all_users) + 1:
-            search_attempts_fair += 1
-            possible_candidates = []
-            candidate_total_hours = 0.0
-            num_available_candidates = 0
-
-            # Schritt 1.1: Gültige Kandidaten sammeln
-            for user_dict in self.gen.all_users:
-                user_id_int = user_dict.get('id')
-                if user_id_int is None: continue
-                user_id_str = str(user_id_int)
-
-                # Bereits heute verplant?
-                if user_id_str in users_unavailable_today: continue
-
-                user_dog = user_dict.get('diensthund')
-                current_hours = live_user_hours.get(user_id_int, 0.0)
-                hours_for_this_shift = self.gen.shift_hours.get(shift_abbrev, 0.0)
-
-                user_pref = self.gen.user_preferences[user_id_str]
-                max_hours_override = user_pref.get('max_monthly_hours')
-                max_same_shift_override = user_pref.get('max_consecutive_same_shift_override')
-
-                skip_reason = None
-
-                # Helfer-Methoden verwenden für vergangene Schichten
-                prev_shift = self.helpers.get_previous_shift(user_id_str, prev_date_obj)
-                one_day_ago_raw_shift = self.helpers.get_previous_raw_shift(user_id_str, prev_date_obj)
-                two_days_ago_shift = self.helpers.get_previous_shift(user_id_str, two_days_ago_obj)
-
-                # Für Isolations-Check (Zukunft)
-                next_raw_shift = self.helpers.get_next_raw_shift(user_id_str, current_date_obj)
-                after_next_raw_shift = self.helpers.get_shift_after_next_raw_shift(user_id_str, current_date_obj)
-
-                # --- Diensthund-Logik (Regel 1: Keine Überlappung) ---
-                if user_dog and user_dog != '---' and user_dog in existing_dog_assignments:
-                    for assigned_dog_shift in existing_dog_assignments[user_dog]:
-                        assigned_shift = assigned_dog_shift['shift']
-
-                        # Gleiche Schicht ist okay? Nein, zwei HF mit gleichem Hund können nicht gleichzeitig arbeiten
-                        # (außer es ist explizit erlaubt, aber hier gehen wir von Konflikt aus)
-                        if shift_abbrev == assigned_shift:
-                            skip_reason = "Dog (Same Shift)"
-                            break
-
-                        # Zeitliche Überlappung prüfen
-                        if self.helpers.check_time_overlap_optimized(shift_abbrev, assigned_shift):
-                            skip_reason = "Dog (Overlap)"
-                            break
-                    if skip_reason: continue
-
-                # --- Harte Ruhezeit-Regeln ---
-
-                # N->T/6 Block (Ruhezeit nach Nachtschicht)
-                if not skip_reason and prev_shift == "N." and shift_abbrev in ["T.", "6"]:
-                    skip_reason = "N->T/6"
-
-                # N. -> QA/S Block
-                if not skip_reason and prev_shift == "N." and shift_abbrev in ["QA", "S"]:
-                    skip_reason = "N->QA/S"
-
-                # N-F-T (Ein einzelner freier Tag nach Nacht vor Tag ist oft zu wenig Erholung)
-                if not skip_reason and shift_abbrev == "T." and one_day_ago_raw_shift in self.gen.free_shifts_indicators and two_days_ago_shift == "N.":
-                    skip_reason = "N-F-T"
-
-                # Expliziter Ausschluss
-                if not skip_reason and shift_abbrev in user_pref.get('shift_exclusions', []):
-                    skip_reason = f"Excl({shift_abbrev})"
-
-                # Max. aufeinanderfolgende Arbeitstage (Soft/Hard Limit)
-                consecutive_days = self.helpers.count_consecutive_shifts(user_id_str, current_date_obj)
-                if not skip_reason and consecutive_days >= self.gen.SOFT_MAX_CONSECUTIVE_SHIFTS:
-                    skip_reason = f"MaxConsS({consecutive_days})"
-
-                # Obligatorische Ruhetage nach Block
-                if not skip_reason and self.gen.mandatory_rest_days > 0 and consecutive_days == 0 and not self.helpers.check_mandatory_rest(
-                        user_id_str, current_date_obj):
-                    skip_reason = f"Rest({self.gen.mandatory_rest_days}d)"
-
-                # Wunschfrei (Respekt-Level)
-                if not skip_reason and date_str in self.gen.wunschfrei_requests.get(user_id_str, {}):
-                    wf_entry = self.gen.wunschfrei_requests[user_id_str][date_str]
-                    wf_status, wf_shift = None, None
-                    if isinstance(wf_entry, tuple) and len(wf_entry) >= 2:
-                        wf_status, wf_shift = wf_entry[0], wf_entry[1]
-
-                    # Wenn Wunsch genehmigt/akzeptiert UND (ganztags oder diese Schicht betreffend)
-                    if wf_status in ['Approved', 'Genehmigt', 'Akzeptiert'] and wf_shift in ["", shift_abbrev]:
-                        # Prüfe Respekt-Level (ab 50% wird es in Runde 1 respektiert)
-                        if self.gen.wunschfrei_respect_level >= 50:
-                            skip_reason = f"WF({self.gen.wunschfrei_respect_level})"
-
-                # --- NEU: Work-Life-Balance: Mind. 1 Wochenende frei ---
-                # Dies gilt als "Harte Regel" innerhalb von Runde 1, um Fairness zu garantieren.
-                if not skip_reason and self.gen.weekend_manager:
-                    if self.gen.weekend_manager.would_violate_free_weekend_rule(user_id_str, current_date_obj):
-                        skip_reason = "NoFreeWE"
-                # --- ENDE NEU ---
+        def evaluate(user_dict):
+            return self._evaluate_fair_candidate(
+                user_dict, shift_abbrev, current_date_obj, prev_date_obj, two_days_ago_obj,
+                users_unavailable_today, existing_dog_assignments, live_user_hours
+            )
 
-                # Max. gleiche Schicht in Folge
-                limit = max_same_shift_override if max_same_shift_override is not None else self.gen.max_consecutive_same_shift_limit
-                if not skip_reason:
-                    consecutive_same = self.helpers.count_consecutive_same_shifts(user_id_str, current_date_obj,
-                                                                                  shift_abbrev)
-                    if consecutive_same >= limit:
-                        skip_reason = f"MaxSame({consecutive_same})"
+        # Schritt 1.1: Gültige Kandidaten einmalig sammeln
+        # (Statisch blockierte User - Ausschluss, Sperre, Wunschfrei - sind bereits herausgefiltert)
+        # Die Position in all_users dient als Tie-Breaker wie bei der bisherigen stabilen Sortierung.
+        candidates = {}  # user_id_int -> candidate_data
+        user_dicts = {}
+        for position, user_dict in enumerate(self.gen.eligibility.fair_candidates(current_date_obj, shift_abbrev)):
+            candidate_data = evaluate(user_dict)
+            if candidate_data is None: continue
+            candidate_data['position'] = position
+            candidates[candidate_data['id']] = candidate_data
+            user_dicts[candidate_data['id']] = user_dict
+
+        if not candidates:
+            return assigned_count_this_round
+
+        # Schritt 1.2: Scores berechnen und in eine Priority-Queue legen
+        # Veraltete Heap-Einträge werden über die Version erkannt und beim Entnehmen verworfen.
+        average_hours = self._average_candidate_hours(candidates)
+        available_candidate_ids = set(candidates)
+        candidate_heap = []
+        heap_versions = {}
+
+        def push(candidate):
+            scores = self.scoring.calculate_scores(
+                candidate, average_hours, available_candidate_ids,
+                shift_abbrev, live_shift_counts_ratio,
+                assignments_today_by_shift,
+                current_date_obj, days_in_month
+            )
+            candidate.update(scores)
+            version = heap_versions.get(candidate['id'], 0) + 1
+            heap_versions[candidate['id']] = version
+            heapq.heappush(candidate_heap, (self._fair_sort_key(candidate, shift_abbrev),
+                                            candidate['position'], version, candidate['id']))
 
-                # Max. Monatsstunden
-                max_hours_check = max_hours_override if max_hours_override is not None else self.gen.MAX_MONTHLY_HOURS
-                if not skip_reason and current_hours + hours_for_this_shift > max_hours_check:
-                    skip_reason = f"MaxHrs({current_hours:.1f}+{hours_for_this_shift:.1f}>{max_hours_check})"
+        for candidate in candidates.values():
+            push(candidate)
 
-                # Isolation (Frei - Arbeit - Frei) vermeiden
-                is_isolated = False
-                if not skip_reason:
-                    # Check 1: Gestern Frei, Morgen Frei
-                    iso_case_1 = (one_day_ago_raw_shift in self.gen.free_shifts_indicators and
-                                  self.helpers.get_previous_raw_shift(user_id_str,
-                                                                      two_days_ago_obj) in self.gen.free_shifts_indicators and
-                                  next_raw_shift in self.gen.free_shifts_indicators)
-                    # Check 2: Gestern Frei, Morgen Frei, Übermorgen Frei (Wochenend-Logik)
-                    iso_case_2 = (one_day_ago_raw_shift in self.gen.free_shifts_indicators and
-                                  next_raw_shift in self.gen.free_shifts_indicators and
-                                  after_next_raw_shift in self.gen.free_shifts_indicators)
-
-                    is_isolated = iso_case_1 or iso_case_2
-
-                if skip_reason: continue
-
-                # Kandidat ist gültig -> Daten sammeln
-                candidate_data = {
-                    'id': user_id_int,
-                    'id_str': user_id_str,
-                    'dog': user_dog,
-                    'hours': current_hours,
-                    'prev_shift': prev_shift,
-                    'is_isolated': is_isolated,
-                    'user_pref': user_pref
-                }
-                possible_candidates.append(candidate_data)
-                candidate_total_hours += current_hours
-                num_available_candidates += 1
-
-            if not possible_candidates:
-                break
+        while assigned_count_this_round < needed_now and candidate_heap:
+            # Schritt 1.3: Besten Kandidaten entnehmen (veraltete Einträge überspringen)
+            _sort_key, _position, version, user_id_int = heapq.heappop(candidate_heap)
+            if user_id_int not in candidates or heap_versions[user_id_int] != version:
+                continue
 
-            # Schritt 1.2: Scores berechnen
-            average_hours = (candidate_total_hours / num_available_candidates) if num_available_candidates > 0 else 0.0
-            available_candidate_ids = {c['id'] for c in possible_candidates}
-
-            for candidate in possible_candidates:
-                scores = self.scoring.calculate_scores(
-                    candidate, average_hours, available_candidate_ids,
-                    shift_abbrev, live_shift_counts_ratio,
-                    assignments_today_by_shift,
-                    current_date_obj, days_in_month
-                )
-                candidate.update(scores)
-
-            # Schritt 1.3: Kandidaten sortieren
-            # Kriterien-Hierarchie:
-            # 1. Avoid Score (Strafen vermeiden)
-            # 2. Partner Score (Wunsch-Partner bevorzugen)
-            # 3. Future Conflict Score (Zukunftsprobleme vermeiden)
-            # 4. Min Hours (Unterbelegte bevorzugen)
-            # 5. Fairness (Ausgleich zum Durchschnitt)
-            # 6. Ratio (T/N Verhältnis)
-            # 7. Isolation (Einzelne Arbeitstage vermeiden)
-            # 8. Bonus für gleiche Schicht (Blockbildung)
-            # 9. Weniger Stunden (als Tie-Breaker)
-
-            possible_candidates.sort(
-                key=lambda x: (
-                    x.get('avoid_score', 0),  # Niedriger = Besser
-                    x.get('partner_score', 1000),  # Niedriger = Besser (Prio 1 = beste)
-                    x.get('future_conflict_score', 0),  # Niedriger = Besser
-                    -x.get('min_hours_score', 0),  # Höher = Besser (negieren)
-                    -x.get('fairness_score', 0),  # Höher = Besser (negieren)
-                    x.get('ratio_pref_score', 0),  # Niedriger (näher an 0) = Besser
-                    x.get('isolation_score', 0),  # Niedriger = Besser
-                    0 if x['prev_shift'] == shift_abbrev else 1,  # Gleiche Schicht bevorzugen (0 vor 1)
-                    x['hours']  # Weniger Stunden bevorzugen (als letztes Mittel)
-                )
-            )
-
-            # Schritt 1.4: Besten Kandidaten auswählen und zuweisen
-            chosen_user = possible_candidates[0]
+            # Schritt 1.4: Besten Kandidaten zuweisen
+            chosen_user = candidates.pop(user_id_int)
 
             # Zuweisung durchführen (Nur im Speicher des Generators!)
             assigned_count_this_round += 1
 
-            user_id_int = chosen_user['id']
             user_id_str = chosen_user['id_str']
             user_dog = chosen_user['dog']
 
-            # In Live-Daten schreiben
-            if user_id_str not in self.gen.live_shifts_data:
-                self.gen.live_shifts_data[user_id_str] = {}
-            self.gen.live_shifts_data[user_id_str][date_str] = shift_abbrev
+            # In Live-Daten (Raster) schreiben
+            self.gen.state_grid.set(user_id_str, current_date_obj, shift_abbrev)
 
             # Tracking aktualisieren
             users_unavailable_today.add(user_id_str)
@@ -252,8 +111,214 @@ class GeneratorRounds:
 
             live_shift_counts[user_id_int][shift_abbrev] += 1
 
+            # Schritt 1.5: Nur die von der Zuweisung betroffenen Kandidaten neu bewerten.
+            # Die Regeln der übrigen Kandidaten hängen nur an deren eigener Zeile; geändert haben
+            # sich lediglich die Zeile des Gewählten und die Belegung seines Hundes.
+            removed_candidates = [chosen_user]
+            if user_dog and user_dog != '---':
+                for other_id in [cid for cid, c in candidates.items() if c['dog'] == user_dog]:
+                    if evaluate(user_dicts[other_id]) is None:
+                        removed_candidates.append(candidates.pop(other_id))
+
+            if not candidates:
+                break
+
+            # Partner- und Avoid-Scores hängen an der Verfügbarkeit bzw. Zuweisung der Partner
+            affected_ids = set()
+            for removed in removed_candidates:
+                available_candidate_ids.discard(removed['id'])
+                for _prio, other_id in self.gen.partner_priority_map.get(removed['id'], ()):
+                    affected_ids.add(other_id)
+                for _prio, other_id in self.gen.avoid_priority_map.get(removed['id'], ()):
+                    affected_ids.add(other_id)
+
+            # Der Durchschnitt ändert sich mit der Kandidatenmenge; neu bewertet werden nur
+            # Kandidaten, deren Fairness-Schwelle dadurch kippt.
+            new_average_hours = self._average_candidate_hours(candidates)
+            if new_average_hours != average_hours:
+                threshold = self.gen.fairness_threshold_hours
+                for other_id, other in candidates.items():
+                    if ((average_hours - other['fairness_hours']) > threshold) != ((new_average_hours - other['fairness_hours']) > threshold):
+                        affected_ids.add(other_id)
+                average_hours = new_average_hours
+
+            for other_id in affected_ids:
+                if other_id in candidates:
+                    push(candidates[other_id])
+
         return assigned_count_this_round
 
+    @staticmethod
+    def _average_candidate_hours(candidates):
+        """Durchschnittliche Fairness-Stunden der gültigen Kandidaten (Summe in all_users-Reihenfolge)."""
+        candidate_total_hours = 0.0
+        for candidate in candidates.values():
+            candidate_total_hours += candidate['fairness_hours']
+        return (candidate_total_hours / len(candidates)) if candidates else 0.0
+
+    @staticmethod
+    def _fair_sort_key(candidate, shift_abbrev):
+        """
+        Sortierschlüssel für Runde 1 (niedriger = besser).
+        Kriterien-Hierarchie:
+        1. Avoid Score (Strafen vermeiden)
+        2. Partner Score (Wunsch-Partner bevorzugen)
+        3. Future Conflict Score (Zukunftsprobleme vermeiden)
+        4. Min Hours (Unterbelegte bevorzugen)
+        5. Fairness (Ausgleich zum Durchschnitt)
+        6. Ratio (T/N Verhältnis)
+        7. Isolation (Einzelne Arbeitstage vermeiden)
+        8. Bonus für gleiche Schicht (Blockbildung)
+        9. Weniger Stunden (als Tie-Breaker)
+        """
+        return (
+            candidate.get('avoid_score', 0),  # Niedriger = Besser
+            candidate.get('partner_score', 1000),  # Niedriger = Besser (Prio 1 = beste)
+            candidate.get('future_conflict_score', 0),  # Niedriger = Besser
+            -candidate.get('min_hours_score', 0),  # Höher = Besser (negieren)
+            -candidate.get('fairness_score', 0),  # Höher = Besser (negieren)
+            candidate.get('ratio_pref_score', 0),  # Niedriger (näher an 0) = Besser
+            candidate.get('isolation_score', 0),  # Niedriger = Besser
+            0 if candidate['prev_shift'] == shift_abbrev else 1,  # Gleiche Schicht bevorzugen (0 vor 1)
+            candidate['fairness_hours']  # Weniger Stunden bevorzugen (als letztes Mittel)
+        )
+
+    def _evaluate_fair_candidate(self, user_dict, shift_abbrev, current_date_obj, prev_date_obj, two_days_ago_obj,
+                                 users_unavailable_today, existing_dog_assignments, live_user_hours):
+        """
+        Prüft die dynamischen Regeln für einen Kandidaten in Runde 1.
+        Gibt die Kandidatendaten zurück oder None, falls der Kandidat nicht in Frage kommt.
+        """
+        user_id_int = user_dict.get('id')
+        if user_id_int is None: return None
+        user_id_str = str(user_id_int)
+        profiler = self.gen.profiler
+        profiler.count('fair_candidates_evaluated')
+
+        # Bereits heute verplant?
+        if user_id_str in users_unavailable_today:
+            profiler.reject('fair', 'Unavailable')
+            return None
+
+        user_dog = user_dict.get('diensthund')
+        current_hours = live_user_hours.get(user_id_int, 0.0)
+        hours_for_this_shift = self.gen.shift_hours.get(shift_abbrev, 0.0)
+
+        user_pref = self.gen.user_preferences[user_id_str]
+        max_hours_override = user_pref.get('max_monthly_hours')
+        max_same_shift_override = user_pref.get('max_consecutive_same_shift_override')
+
+        skip_reason = None
+
+        # Helfer-Methoden verwenden für vergangene Schichten
+        prev_shift = self.helpers.get_previous_shift(user_id_str, prev_date_obj)
+        one_day_ago_raw_shift = self.helpers.get_previous_raw_shift(user_id_str, prev_date_obj)
+        two_days_ago_shift = self.helpers.get_previous_shift(user_id_str, two_days_ago_obj)
+
+        # Für Isolations-Check (Zukunft)
+        next_raw_shift = self.helpers.get_next_raw_shift(user_id_str, current_date_obj)
+        after_next_raw_shift = self.helpers.get_shift_after_next_raw_shift(user_id_str, current_date_obj)
+
+        # --- Diensthund-Logik (Regel 1: Keine Überlappung) ---
+        if user_dog and user_dog != '---' and user_dog in existing_dog_assignments:
+            for assigned_dog_shift in existing_dog_assignments[user_dog]:
+                assigned_shift = assigned_dog_shift['shift']
+
+                # Gleiche Schicht ist okay? Nein, zwei HF mit gleichem Hund können nicht gleichzeitig arbeiten
+                # (außer es ist explizit erlaubt, aber hier gehen wir von Konflikt aus)
+                if shift_abbrev == assigned_shift:
+                    skip_reason = "Dog (Same Shift)"
+                    break
+
+                # Zeitliche Überlappung prüfen
+                if self.helpers.check_time_overlap_optimized(shift_abbrev, assigned_shift):
+                    skip_reason = "Dog (Overlap)"
+                    break
+            if skip_reason:
+                profiler.reject('fair', skip_reason)
+                return None
+
+        # --- Harte Ruhezeit-Regeln ---
+
+        # N->T/6 Block (Ruhezeit nach Nachtschicht)
+        if not skip_reason and prev_shift == "N." and shift_abbrev in ["T.", "6"]:
+            skip_reason = "N->T/6"
+
+        # N. -> QA/S Block
+        if not skip_reason and prev_shift == "N." and shift_abbrev in ["QA", "S"]:
+            skip_reason = "N->QA/S"
+
+        # N-F-T (Ein einzelner freier Tag nach Nacht vor Tag ist oft zu wenig Erholung)
+        if not skip_reason and shift_abbrev == "T." and one_day_ago_raw_shift in self.gen.free_shifts_indicators and two_days_ago_shift == "N.":
+            skip_reason = "N-F-T"
+
+        # Max. aufeinanderfolgende Arbeitstage (Soft/Hard Limit)
+        consecutive_days = self.helpers.count_consecutive_shifts(user_id_str, current_date_obj)
+        if not skip_reason and consecutive_days >= self.gen.SOFT_MAX_CONSECUTIVE_SHIFTS:
+            skip_reason = f"MaxConsS({consecutive_days})"
+
+        # Obligatorische Ruhetage nach Block
+        if not skip_reason and self.gen.mandatory_rest_days > 0 and consecutive_days == 0 and not self.helpers.check_mandatory_rest(
+                user_id_str, current_date_obj):
+            skip_reason = f"Rest({self.gen.mandatory_rest_days}d)"
+
+        # --- NEU: Work-Life-Balance: Mind. 1 Wochenende frei ---
+        # Dies gilt als "Harte Regel" innerhalb von Runde 1, um Fairness zu garantieren.
+        if not skip_reason and self.gen.weekend_manager:
+            if self.gen.weekend_manager.would_violate_free_weekend_rule(user_id_str, current_date_obj):
+                skip_reason = "NoFreeWE"
+        # --- ENDE NEU ---
+
+        # Max. gleiche Schicht in Folge
+        limit = max_same_shift_override if max_same_shift_override is not None else self.gen.max_consecutive_same_shift_limit
+        if not skip_reason:
+            consecutive_same = self.helpers.count_consecutive_same_shifts(user_id_str, current_date_obj,
+                                                                          shift_abbrev)
+            if consecutive_same >= limit:
+                skip_reason = f"MaxSame({consecutive_same})"
+
+        # Max. Monatsstunden
+        max_hours_check = max_hours_override if max_hours_override is not None else self.gen.MAX_MONTHLY_HOURS
+        if not skip_reason and current_hours + hours_for_this_shift > max_hours_check:
+            skip_reason = f"MaxHrs({current_hours:.1f}+{hours_for_this_shift:.1f}>{max_hours_check})"
+
+        # Vorab vergebene Schichten (Pre-Planning) in den Folgetagen
+        if not skip_reason and self.helpers.conflicts_with_preplanned(user_id_str, current_date_obj, shift_abbrev):
+            skip_reason = "PrePlan"
+
+        # Isolation (Frei - Arbeit - Frei) vermeiden
+        is_isolated = False
+        if not skip_reason:
+            # Check 1: Gestern Frei, Morgen Frei
+            iso_case_1 = (one_day_ago_raw_shift in self.gen.free_shifts_indicators and
+                          self.helpers.get_previous_raw_shift(user_id_str,
+                                                              two_days_ago_obj) in self.gen.free_shifts_indicators and
+                          next_raw_shift in self.gen.free_shifts_indicators)
+            # Check 2: Gestern Frei, Morgen Frei, Übermorgen Frei (Wochenend-Logik)
+            iso_case_2 = (one_day_ago_raw_shift in self.gen.free_shifts_indicators and
+                          next_raw_shift in self.gen.free_shifts_indicators and
+                          after_next_raw_shift in self.gen.free_shifts_indicators)
+
+            is_isolated = iso_case_1 or iso_case_2
+
+        if skip_reason:
+            profiler.reject('fair', skip_reason)
+            return None
+
+        # Kandidat ist gültig -> Daten sammeln
+        candidate_data = {
+            'id': user_id_int,
+            'id_str': user_id_str,
+            'dog': user_dog,
+            'hours': current_hours,
+            # Für den Fairness-Vergleich zählen im Rolling Horizon auch die Stunden der Vormonate
+            'fairness_hours': current_hours + self.gen.horizon_hour_offsets.get(user_id_int, 0.0),
+            'prev_shift': prev_shift,
+            'is_isolated': is_isolated,
+            'user_pref': user_pref
+        }
+        return candidate_data
+
     def run_fill_round(self, shift_abbrev, current_date_obj, users_unavailable_today, existing_dog_assignments,
                        assignments_today_by_shift, live_user_hours, live_shift_counts, live_shift_counts_ratio,
                        needed, round_num):
@@ -263,7 +328,7 @@ class GeneratorRounds:
         """
         assigned_count = 0
         search_attempts = 0
-        date_str = current_date_obj.strftime('%Y-%m-%d')
+        profiler = self.gen.profiler
 
         prev_date_obj = current_date_obj - timedelta(days=1)
         two_days_ago_obj = current_date_obj - timedelta(days=2)
@@ -272,11 +337,15 @@ class GeneratorRounds:
             search_attempts += 1
             possible_fill_candidates = []
 
-            for user_dict in self.gen.all_users:
+            # (Ausschlüsse und Sperren sind bereits über die Eligibility-Bitsets gefiltert)
+            for user_dict in self.gen.eligibility.fill_candidates(current_date_obj, shift_abbrev):
                 user_id_int = user_dict.get('id')
                 if user_id_int is None: continue
                 user_id_str = str(user_id_int)
-                if user_id_str in users_unavailable_today: continue
+                profiler.count('fill_candidates_evaluated')
+                if user_id_str in users_unavailable_today:
+                    profiler.reject('fill', 'Unavailable')
+                    continue
 
                 user_dog = user_dict.get('diensthund')
                 current_hours = live_user_hours.get(user_id_int, 0.0)
@@ -301,12 +370,15 @@ class GeneratorRounds:
                         if self.helpers.check_time_overlap_optimized(shift_abbrev, assigned_shift):
                             skip_reason = "Dog (Overlap)"
                             break
-                    if skip_reason: continue
+                    if skip_reason:
+                        profiler.reject('fill', skip_reason)
+                        continue
 
                 # --- Harte Ruhezeiten ---
                 # N->T/6 und N->QA/S bleiben auch in Fill-Runden aktiv (Gesundheitsschutz)
                 if prev_shift == "N." and shift_abbrev in ["T.", "6", "QA", "S"]:
-                    continue  # skip_reason = "N->..."
+                    profiler.reject('fill', "N->T/6/QA/S")
+                    continue
 
                 # --- Lockerungen ---
 
@@ -315,11 +387,6 @@ class GeneratorRounds:
                 if round_num <= 2 and shift_abbrev == "T." and one_day_ago_raw_shift in self.gen.free_shifts_indicators and two_days_ago_shift == "N.":
                     skip_reason = "N-F-T"
 
-                # Schicht-Ausschluss
-                # Wird hier als "Hard" betrachtet, außer man würde es explizit lockern wollen
-                if not skip_reason and shift_abbrev in user_pref.get('shift_exclusions', []):
-                    skip_reason = "Excl"
-
                 # --- NEU: Work-Life-Balance auch in Fill-Runden beachten ---
                 # Wenn wir die Regel verletzen würden, überspringen wir auch hier.
                 # Ausnahme: In der allerletzten "Notfall"-Runde (z.B. > 3) könnte man es droppen,
@@ -350,18 +417,26 @@ class GeneratorRounds:
                 if not skip_reason and current_hours + hours_for_this_shift > max_hours_check:
                     skip_reason = "MaxHrs"
 
-                if skip_reason: continue
+                # Vorab vergebene Schichten (Pre-Planning) in den Folgetagen
+                if not skip_reason and self.helpers.conflicts_with_preplanned(user_id_str, current_date_obj,
+                                                                              shift_abbrev):
+                    skip_reason = "PrePlan"
+
+                if skip_reason:
+                    profiler.reject('fill', skip_reason)
+                    continue
 
                 # Kandidat für Fill-Runde gefunden
                 possible_fill_candidates.append(
-                    {'id': user_id_int, 'id_str': user_id_str, 'dog': user_dog, 'hours': current_hours}
+                    {'id': user_id_int, 'id_str': user_id_str, 'dog': user_dog, 'hours': current_hours,
+                     'fairness_hours': current_hours + self.gen.horizon_hour_offsets.get(user_id_int, 0.0)}
                 )
 
             if not possible_fill_candidates:
                 break
 
             # In Fill-Runden sortieren wir rein nach Stunden (Wer hat am wenigsten?)
-            possible_fill_candidates.sort(key=lambda x: x['hours'])
+            possible_fill_candidates.sort(key=lambda x: x['fairness_hours'])
             chosen_user = possible_fill_candidates[0]
 
             # Zuweisung
@@ -370,9 +445,7 @@ class GeneratorRounds:
             user_id_str = chosen_user['id_str']
             user_dog = chosen_user['dog']
 
-            if user_id_str not in self.gen.live_shifts_data:
-                self.gen.live_shifts_data[user_id_str] = {}
-            self.gen.live_shifts_data[user_id_str][date_str] = shift_abbrev
+            self.gen.state_grid.set(user_id_str, current_date_obj, shift_abbrev)
 
             users_unavailable_today.add(user_id_str)
             assignments_today_by_shift[shift_abbrev].add(user_id_int)
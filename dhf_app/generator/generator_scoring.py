@@ -1,7 +1,10 @@
 # dhf_app/generator/generator_scoring.py
 
+import time
 from datetime import timedelta
 
+from .plan_overlay import PlanOverlay
+
 
 class GeneratorScoring:
     """
@@ -14,23 +17,42 @@ class GeneratorScoring:
     def __init__(self, generator_instance):
         self.gen = generator_instance
 
-    def _check_rule_violation_at_date(self, candidate_id_str, check_date, check_shift):
+        # Memo-Caches für den Lookahead
+        # - statisch: (user, datum, schicht) -> bool (Urlaub, WF, Sperre, Ausschluss; gilt für den ganzen Lauf)
+        # - Regeln: (user, datum, schicht, zeilen-version, overlay) -> bool
+        # - Konflikte: (user, datum, schicht, zeilen-version) -> int
+        # Die beiden letzten werden beim Tageswechsel geleert.
+        self._static_block_cache = {}
+        self._rule_cache = {}
+        self._conflict_cache = {}
+        self._cache_date = None
+
+    def _reset_day_caches(self, current_date):
+        """Leert die versionsabhängigen Caches, sobald ein neuer Tag geplant wird."""
+        if self._cache_date != current_date:
+            self._cache_date = current_date
+            self._rule_cache.clear()
+            self._conflict_cache.clear()
+
+    def _is_statically_blocked(self, candidate_id_str, check_date, check_shift):
         """
-        Prüft, ob der Mitarbeiter an 'check_date' die Schicht 'check_shift'
-        machen könnte, basierend auf dem *aktuellen* Planungsstand in live_shifts_data
-        und den harten Regeln. Gibt True zurück, wenn eine Regel verletzt wird.
-        (Diese Funktion ist ähnlich zu Teilen von _get_actually_available_count)
+        Regeln, deren Eingaben sich während der Generierung nicht ändern:
+        Urlaub, genehmigtes Wunschfrei, gesicherte Zellen und Schicht-Ausschlüsse.
         """
+        key = (candidate_id_str, check_date, check_shift)
+        cached = self._static_block_cache.get(key)
+        if cached is not None:
+            return cached
+
+        blocked = False
         date_str = check_date.strftime('%Y-%m-%d')
 
-        # --- Allgemeine Verfügbarkeit prüfen (Urlaub, WF, bestehende Schicht) ---
-        # WICHTIG: Prüfe nur, ob der Tag generell blockiert ist. Die spezifische Schicht
-        # wird später durch Regeln geprüft.
+        # --- Allgemeine Verfügbarkeit prüfen (Urlaub, WF) ---
         vacation_status = self.gen.vacation_requests.get(candidate_id_str, {}).get(check_date)
         if vacation_status in ['Approved', 'Genehmigt']:
-            return True  # Urlaub
+            blocked = True  # Urlaub
 
-        if date_str in self.gen.wunschfrei_requests.get(candidate_id_str, {}):
+        elif date_str in self.gen.wunschfrei_requests.get(candidate_id_str, {}):
             wf_entry = self.gen.wunschfrei_requests[candidate_id_str][date_str]
             wf_status, wf_shift = None, None
             if isinstance(wf_entry, tuple) and len(wf_entry) >= 2:
@@ -38,23 +60,56 @@ class GeneratorScoring:
 
             if wf_status in ['Approved', 'Genehmigt', 'Akzeptiert']:
                 if wf_shift == "" or wf_shift == check_shift:
-                    return True  # WF(Tag) oder WF(Schicht)
-
-        existing_shift = self.gen.live_shifts_data.get(candidate_id_str, {}).get(date_str)
-        if existing_shift and existing_shift not in self.gen.free_shifts_indicators:
-            return True  # Hat schon Schicht
+                    blocked = True  # WF(Tag) oder WF(Schicht)
 
         # --- NEU (Regel 1): Prüfe auf gesicherte Schichten ---
-        if self.gen.locked_shifts_data.get(candidate_id_str, {}).get(date_str) is not None:
+        if not blocked and self.gen.state_grid.is_locked(candidate_id_str, check_date):
+            blocked = True
+
+        # Schicht-Ausschluss
+        if not blocked and check_shift in self.gen.user_preferences[candidate_id_str].get('shift_exclusions', []):
+            blocked = True
+
+        self._static_block_cache[key] = blocked
+        return blocked
+
+    def _check_rule_violation_at_date(self, candidate_id_str, check_date, check_shift, view=None):
+        """
+        Prüft, ob der Mitarbeiter an 'check_date' die Schicht 'check_shift'
+        machen könnte, basierend auf dem *aktuellen* Planungsstand im state_grid
+        (oder einem simulierten PlanOverlay als 'view') und den harten Regeln.
+        Gibt True zurück, wenn eine Regel verletzt wird.
+        (Diese Funktion ist ähnlich zu Teilen von _get_actually_available_count)
+        """
+        if self._is_statically_blocked(candidate_id_str, check_date, check_shift):
             return True
-        # --- ENDE NEU ---
+
+        grid = self.gen.state_grid
+        view = view or grid
+        overlay_key = view.key if view is not grid else ()
+        key = (candidate_id_str, check_date, check_shift, grid.row_version(candidate_id_str), overlay_key)
+        cached = self._rule_cache.get(key)
+        if cached is not None:
+            return cached
+
+        violated = self._check_dynamic_rules(candidate_id_str, check_date, check_shift, view)
+        self._rule_cache[key] = violated
+        return violated
+
+    def _check_dynamic_rules(self, candidate_id_str, check_date, check_shift, view, check_hours=True):
+        """
+        Regeln, die vom aktuellen Planungsstand (Zeile des Mitarbeiters, Stunden) abhängen.
+        Mit check_hours=False entfällt die Stundenprüfung (z.B. wenn der Aufrufer
+        die Monatssumme selbst prüft, wie die lokale Suche).
+        """
+        helpers = self.gen.helpers
+
+        # Bestehende Schicht an diesem Tag
+        if view.is_working(candidate_id_str, check_date):
+            return True  # Hat schon Schicht
 
         # --- Harte Regeln prüfen ---
         user_pref = self.gen.user_preferences[candidate_id_str]
-        # (Hier holen wir die Daten direkt aus dem Generator-Cache)
-        user_data = self.gen.user_data_map.get(int(candidate_id_str), {})
-        user_dog = user_data.get('diensthund')
-
         current_hours = self.gen.live_user_hours.get(int(candidate_id_str), 0.0)
         hours_for_this_shift = self.gen.shift_hours.get(check_shift, 0.0)
         max_hours_override = user_pref.get('max_monthly_hours')
@@ -63,9 +118,9 @@ class GeneratorScoring:
         two_days_ago_obj = check_date - timedelta(days=2)
 
         # Helferfunktionen verwenden
-        prev_shift = self.gen.helpers.get_previous_shift(candidate_id_str, prev_date_obj)
-        one_day_ago_raw_shift = self.gen.helpers.get_previous_raw_shift(candidate_id_str, prev_date_obj)
-        two_days_ago_shift = self.gen.helpers.get_previous_shift(candidate_id_str, two_days_ago_obj)
+        prev_shift = helpers.get_previous_shift(candidate_id_str, prev_date_obj, view)
+        one_day_ago_raw_shift = helpers.get_previous_raw_shift(candidate_id_str, prev_date_obj, view)
+        two_days_ago_shift = helpers.get_previous_shift(candidate_id_str, two_days_ago_obj, view)
 
         # N -> T/6
         if prev_shift == "N." and check_shift in ["T.", "6"]: return True
@@ -76,20 +131,17 @@ class GeneratorScoring:
         # N-F-T
         if check_shift == "T." and one_day_ago_raw_shift in self.gen.free_shifts_indicators and two_days_ago_shift == "N.": return True
 
-        # Schicht-Ausschluss
-        if check_shift in user_pref.get('shift_exclusions', []): return True
-
         # Max Consecutive (HARD LIMIT)
-        consecutive_days = self.gen.helpers.count_consecutive_shifts(candidate_id_str, check_date)
+        consecutive_days = helpers.count_consecutive_shifts(candidate_id_str, check_date, view)
         if consecutive_days >= self.gen.HARD_MAX_CONSECUTIVE_SHIFTS: return True
 
         # Mandatory Rest
-        if self.gen.mandatory_rest_days > 0 and consecutive_days == 0 and not self.gen.helpers.check_mandatory_rest(
-                candidate_id_str, check_date): return True
+        if self.gen.mandatory_rest_days > 0 and consecutive_days == 0 and not helpers.check_mandatory_rest(
+                candidate_id_str, check_date, view): return True
 
         # Max Stunden
         max_hours_check = max_hours_override if max_hours_override is not None else self.gen.MAX_MONTHLY_HOURS
-        if current_hours + hours_for_this_shift > max_hours_check: return True
+        if check_hours and current_hours + hours_for_this_shift > max_hours_check: return True
 
         return False  # Keine Regelverletzung gefunden
 
@@ -99,16 +151,29 @@ class GeneratorScoring:
         wie viele Schichten der Mitarbeiter in den nächsten CONFLICT_LOOKAHEAD_DAYS
         aufgrund *neu entstehender* Regelverletzungen (N->T, N-F-T, MaxConsec, MandRest, N->QA/S)
         nicht mehr machen könnte.
+
+        Die Simulation läuft in einem PlanOverlay; der Live-Status wird nicht verändert.
+        Das Ergebnis wird je (User, Tag, Schicht, Zeilen-Version) gemerkt, sodass
+        wiederholte Bewertungen desselben Slots nur für geänderte Mitarbeiter neu rechnen.
         """
+        self._reset_day_caches(current_date)
+        grid = self.gen.state_grid
+        cache_key = (candidate_id_str, current_date, assigned_shift_today, grid.row_version(candidate_id_str))
+        cached = self._conflict_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        helpers = self.gen.helpers
         conflict_count = 0
 
-        # Temporäre Simulation der heutigen Zuweisung im live_shifts_data
-        original_shift = self.gen.live_shifts_data.get(candidate_id_str, {}).get(current_date.strftime('%Y-%m-%d'))
+        # Simulation der heutigen Zuweisung (Copy-on-Write, kein Schreiben in den Live-Status)
+        overlay = PlanOverlay(grid)
+        overlay.set(candidate_id_str, current_date, assigned_shift_today)
 
-        if candidate_id_str not in self.gen.live_shifts_data:
-            self.gen.live_shifts_data[candidate_id_str] = {}
-
-        self.gen.live_shifts_data[candidate_id_str][current_date.strftime('%Y-%m-%d')] = assigned_shift_today
+        # Diese Werte hängen nicht vom Zukunftstag ab -> einmal berechnen
+        consecutive_days_before_today = helpers.count_consecutive_shifts(candidate_id_str, current_date, overlay)
+        consecutive_days_incl_today = helpers.count_consecutive_shifts(candidate_id_str,
+                                                                       current_date + timedelta(days=1), overlay)
 
         # Iteriere durch die nächsten X Tage
         for i in range(1, self.CONFLICT_LOOKAHEAD_DAYS + 1):
@@ -121,7 +186,7 @@ class GeneratorScoring:
             for future_shift in self.gen.shifts_to_plan:
 
                 # Prüfe harte Regeln mit dem *simulierten* heutigen Eintrag
-                if self._check_rule_violation_at_date(candidate_id_str, future_date, future_shift):
+                if self._check_rule_violation_at_date(candidate_id_str, future_date, future_shift, overlay):
                     # Jetzt prüfen wir, ob die Regelverletzung *durch* die heutige Schicht verursacht wurde.
 
                     # N->T/6 Konflikt durch heutige Zuweisung?
@@ -136,20 +201,18 @@ class GeneratorScoring:
 
                     # N-F-T Konflikt durch heutige Zuweisung?
                     if i == 2 and assigned_shift_today == "N." and future_shift == "T.":
-                        intermediate_shift_simulated = self.gen.helpers.get_previous_raw_shift(candidate_id_str,
-                                                                                               future_date)  # Holt Schicht von Tag i=1
+                        intermediate_shift_simulated = helpers.get_previous_raw_shift(candidate_id_str,
+                                                                                      future_date, overlay)  # Holt Schicht von Tag i=1
                         if intermediate_shift_simulated is None or intermediate_shift_simulated in self.gen.free_shifts_indicators:
                             conflict_count += 1
                             continue
 
                     # Max Consecutive / Mandatory Rest Konflikt durch heutige Zuweisung?
-                    consecutive_days_at_future = self.gen.helpers.count_consecutive_shifts(candidate_id_str,
-                                                                                           future_date)
+                    consecutive_days_at_future = helpers.count_consecutive_shifts(candidate_id_str,
+                                                                                  future_date, overlay)
 
                     if consecutive_days_at_future >= self.gen.HARD_MAX_CONSECUTIVE_SHIFTS:
                         # War die Kette *vor* heute schon zu lang?
-                        consecutive_days_before_today = self.gen.helpers.count_consecutive_shifts(candidate_id_str,
-                                                                                                  current_date)
                         if consecutive_days_before_today < self.gen.HARD_MAX_CONSECUTIVE_SHIFTS:
                             # Ja, die heutige Schicht hat die Kette über das Limit gebracht
                             conflict_count += 1
@@ -157,14 +220,10 @@ class GeneratorScoring:
 
                     is_resting_violated = (self.gen.mandatory_rest_days > 0 and
                                            consecutive_days_at_future == 0 and not
-                                           self.gen.helpers.check_mandatory_rest(candidate_id_str, future_date))
+                                           helpers.check_mandatory_rest(candidate_id_str, future_date, overlay))
 
                     if is_resting_violated:
                         # War die Ruhezeit *vor* heute schon verletzt oder erst durch die heutige Schicht?
-                        consecutive_days_incl_today = self.gen.helpers.count_consecutive_shifts(candidate_id_str,
-                                                                                                current_date + timedelta(
-                                                                                                    days=1))
-
                         if consecutive_days_incl_today >= self.gen.HARD_MAX_CONSECUTIVE_SHIFTS:
                             days_since_today = (future_date - current_date).days
                             if days_since_today <= self.gen.mandatory_rest_days:
@@ -172,15 +231,7 @@ class GeneratorScoring:
                                 conflict_count += 1
                                 continue
 
-        # WICHTIG: Simulation zurücksetzen!
-        if original_shift is None:
-            # Wenn vorher kein Eintrag da war, lösche den simulierten
-            if current_date.strftime('%Y-%m-%d') in self.gen.live_shifts_data.get(candidate_id_str, {}):
-                del self.gen.live_shifts_data[candidate_id_str][current_date.strftime('%Y-%m-%d')]
-        else:
-            # Setze auf den ursprünglichen Wert zurück
-            self.gen.live_shifts_data[candidate_id_str][current_date.strftime('%Y-%m-%d')] = original_shift
-
+        self._conflict_cache[cache_key] = conflict_count
         return conflict_count
 
     def calculate_scores(self, candidate, average_hours, available_candidate_ids,
@@ -214,7 +265,7 @@ class GeneratorScoring:
                 scores['min_hours_score'] = 1 * day_factor
 
         # 2. Fairness Score
-        hours_diff = average_hours - candidate['hours']
+        hours_diff = average_hours - candidate.get('fairness_hours', candidate['hours'])
         if hours_diff > self.gen.fairness_threshold_hours:
             scores['fairness_score'] = self.gen.fairness_score_multiplier * day_factor
 
@@ -271,9 +322,11 @@ class GeneratorScoring:
         # Nur berechnen, wenn nicht am Monatsende (da Lookahead sonst sinnlos)
         if (days_in_month - current_date_obj.day) >= 1:
             # Simuliert die Zuweisung und zählt Folgekonflikte
+            start = time.perf_counter()
             scores['future_conflict_score'] = self._calculate_future_conflicts(
                 candidate_id_str, current_date_obj, shift_abbrev
             )
+            self.gen.profiler.add_time('future_conflicts', time.perf_counter() - start)
             scores['future_conflict_score'] *= 10  # Gewichtung
 
         return scores
\ No newline at end of file
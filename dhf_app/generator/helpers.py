@@ -7,15 +7,18 @@ class GeneratorHelpers:
     """
     Kapselt alle Low-Level-Datenabrufe und Regelprüfungen für den Generator.
     Greift auf den Zustand der Haupt-Generator-Instanz (gen) und deren DataManager zu.
+
+    Alle Schichtabfragen laufen über das ShiftStateGrid (gen.state_grid), das
+    Vormonat, Planungsmonat und Folgemonat in einem Raster vereint.
     """
 
     def __init__(self, generator_instance):
         self.gen = generator_instance
-        self._next_month_shifts = None  # Cache für Folgemonatsdaten (Lazy Loading)
+        self.grid = generator_instance.state_grid
 
         # Schichten, die als "harte" Arbeitstage zählen (für Konsekutiv-Zählung)
         # (Inkludiert QA und S, da dies Anwesenheiten sind)
-        self.hard_work_indicators = {'T.', 'N.', '6', '24', 'QA', 'S'}
+        self.hard_work_indicators = set(self.grid.hard_work_indicators)
 
     def check_time_overlap_optimized(self, shift1_abbrev, shift2_abbrev):
         """
@@ -39,128 +42,54 @@ class GeneratorHelpers:
         overlap = (s1 < e2) and (s2 < e1)
         return overlap
 
-    def get_previous_shift(self, user_id_str, check_date_obj):
+    def get_previous_shift(self, user_id_str, check_date_obj, view=None):
         """
         Holt die *Arbeits*-Schicht vom Vortag (ignoriert 'FREI', 'U', 'X', etc.).
         Gibt die Schichtabkürzung zurück, oder "" falls kein Dienst.
+        'view' erlaubt die Abfrage über ein PlanOverlay statt des Live-Rasters.
         """
-        check_date_str = check_date_obj.strftime('%Y-%m-%d')
-
-        # 1. Prüfe, ob das Datum im Vormonat liegt (Cache DataManager)
-        if check_date_obj.month != self.gen.month:
-            prev_month_data = self.gen.data_manager.get_previous_month_shifts().get(user_id_str, {})
-            shift = prev_month_data.get(check_date_str)
-            if shift and shift not in self.gen.free_shifts_indicators:
-                return shift
-            return ""
-
-        # 2. Datum im aktuellen Monat: Prüfe live_shifts_data (Live-Status des Generators)
-        shifts_data = self.gen.live_shifts_data.get(user_id_str, {})
-        shift = shifts_data.get(check_date_str)
-        if shift and shift not in self.gen.free_shifts_indicators:
-            return shift
-
+        grid = view or self.grid
+        code = grid.get_code(user_id_str, check_date_obj)
+        if code != grid.NO_ENTRY and not grid.is_free_code[code]:
+            return grid.abbrev_of[code]
         return ""
 
-    def get_previous_raw_shift(self, user_id_str, check_date_obj):
+    def get_previous_raw_shift(self, user_id_str, check_date_obj, view=None):
         """
         Holt die Schicht vom Vortag, *inklusive* Freischichten (oder None).
         Wichtig für N-F-T Prüfungen (Nacht -> Frei -> Tag).
         """
-        check_date_str = check_date_obj.strftime('%Y-%m-%d')
-
-        # 1. Vormonat
-        if check_date_obj.month != self.gen.month:
-            prev_month_data = self.gen.data_manager.get_previous_month_shifts().get(user_id_str, {})
-            shift = prev_month_data.get(check_date_str)
-            return shift  # Kann None oder String sein
-
-        # 2. Aktueller Monat (Live)
-        shifts_data = self.gen.live_shifts_data.get(user_id_str, {})
-        shift = shifts_data.get(check_date_str)
-        return shift
+        return (view or self.grid).get(user_id_str, check_date_obj)
 
     def get_next_raw_shift(self, user_id_str, current_date_obj):
         """
         Holt die Schicht des nächsten Tages.
         Wichtig für Isolationsprüfung (Frei -> Arbeit -> Frei).
         """
-        next_date_obj = current_date_obj + timedelta(days=1)
-        next_date_str = next_date_obj.strftime('%Y-%m-%d')
-
-        # 1. Prüfe aktuellen Monatsplan (Live)
-        shift = self.gen.live_shifts_data.get(user_id_str, {}).get(next_date_str)
-        if shift is not None:
-            return shift
-
-        # 2. Prüfe Folgemonat (nur relevant, wenn wir am Monatsende sind)
-        if next_date_obj.month != current_date_obj.month:
-            if self._next_month_shifts is None:
-                self._next_month_shifts = self.gen.data_manager.get_next_month_shifts()
-            shift = self._next_month_shifts.get(user_id_str, {}).get(next_date_str)
-            return shift
-
-        return None
+        return self.grid.get(user_id_str, current_date_obj + timedelta(days=1))
 
     def get_shift_after_next_raw_shift(self, user_id_str, current_date_obj):
         """
         Holt die Schicht des übernächsten Tages.
         """
-        after_next_date_obj = current_date_obj + timedelta(days=2)
-        after_next_date_str = after_next_date_obj.strftime('%Y-%m-%d')
-
-        # 1. Live
-        shift = self.gen.live_shifts_data.get(user_id_str, {}).get(after_next_date_str)
-        if shift is not None:
-            return shift
+        return self.grid.get(user_id_str, current_date_obj + timedelta(days=2))
 
-        # 2. Folgemonat
-        if after_next_date_obj.month != current_date_obj.month:
-            if self._next_month_shifts is None:
-                self._next_month_shifts = self.gen.data_manager.get_next_month_shifts()
-            shift = self._next_month_shifts.get(user_id_str, {}).get(after_next_date_str)
-            return shift
-
-        return None
-
-    def count_consecutive_shifts(self, user_id_str, current_date_obj):
+    def count_consecutive_shifts(self, user_id_str, current_date_obj, view=None):
         """
         Zählt, wie viele Arbeitstage der User *bis* zum 'current_date_obj' (exklusive)
-        ununterbrochen gearbeitet hat (Rückwärtszählung).
+        ununterbrochen gearbeitet hat.
+        Liest den laufenden Zähler aus dem Raster (O(1) statt Rückwärtszählung).
         """
-        count = 0
-        current_check = current_date_obj - timedelta(days=1)
-
-        while True:
-            shift = self.get_previous_raw_shift(user_id_str, current_check)
+        return (view or self.grid).work_streak_before(user_id_str, current_date_obj)
 
-            # Prüfe auf Arbeitsschicht
-            if shift and shift in self.hard_work_indicators:
-                count += 1
-                current_check -= timedelta(days=1)
-            else:
-                break
-        return count
-
-    def count_consecutive_same_shifts(self, user_id_str, current_date_obj, target_shift_abbrev):
+    def count_consecutive_same_shifts(self, user_id_str, current_date_obj, target_shift_abbrev, view=None):
         """
         Zählt, wie oft *dieselbe* Schicht (target_shift_abbrev) direkt nacheinander
-        in der Vergangenheit liegt.
+        in der Vergangenheit liegt (laufender Zähler aus dem Raster).
         """
-        count = 0
-        current_check = current_date_obj - timedelta(days=1)
-
-        while True:
-            shift = self.get_previous_shift(user_id_str, current_check)  # Ignoriert Freischichten
-
-            if shift == target_shift_abbrev:
-                count += 1
-                current_check -= timedelta(days=1)
-            else:
-                break
-        return count
+        return (view or self.grid).same_streak_before(user_id_str, current_date_obj, target_shift_abbrev)
 
-    def check_mandatory_rest(self, user_id_str, current_date_obj):
+    def check_mandatory_rest(self, user_id_str, current_date_obj, view=None):
         """
         Prüft die Einhaltung der obligatorischen Ruhezeit nach einem Block von
         Maximal-Arbeitstagen (HARD_MAX_CONSECUTIVE_SHIFTS).
@@ -169,25 +98,12 @@ class GeneratorHelpers:
         if self.gen.mandatory_rest_days <= 0:
             return True
 
-        # Suche den letzten Block von Arbeitstagen
-        day_before = current_date_obj - timedelta(days=1)
-        free_days_count = 0
-        check_date = day_before
-
-        # Zähle freie Tage rückwärts
-        while True:
-            shift = self.get_previous_raw_shift(user_id_str, check_date)
-            if shift in self.gen.free_shifts_indicators:
-                free_days_count += 1
-                check_date -= timedelta(days=1)
-                # Optimierung: Wenn wir genug freie Tage gefunden haben, ist alles ok
-                if free_days_count >= self.gen.mandatory_rest_days:
-                    return True
-            else:
-                break
-
-        # Wir sind auf einen Arbeitstag gestoßen (check_date)
-        last_work_day_obj = check_date
+        # Freie Tage direkt davor und Länge des Arbeitsblocks vor diesen freien Tagen
+        free_days_count, work_block_length = (view or self.grid).free_streak_before(user_id_str, current_date_obj)
+
+        # Genug freie Tage -> alles ok
+        if free_days_count >= self.gen.mandatory_rest_days:
+            return True
 
         # Wenn wir gar keine freien Tage gefunden haben, befinden wir uns direkt
         # im Anschluss an Arbeitstage. Die normale `count_consecutive_shifts`
@@ -195,12 +111,44 @@ class GeneratorHelpers:
         if free_days_count == 0:
             return True
 
-        # Prüfe, wie lang der Arbeitsblock DAVOR war
-        work_block_length = self.count_consecutive_shifts(user_id_str, last_work_day_obj + timedelta(days=1))
-
-        # WAR der Block maximal lang?
+        # WAR der Block maximal lang? -> Dann ist die Pause zu kurz
         if work_block_length >= self.gen.HARD_MAX_CONSECUTIVE_SHIFTS:
-            # Ja -> Dann MUSS die Pause lang genug sein
-            return free_days_count >= self.gen.mandatory_rest_days
+            return False
+
+        return True
+
+    def conflicts_with_preplanned(self, user_id_str, current_date_obj, shift_abbrev):
+        """
+        Vorwärts-Prüfung gegen vorab vergebene Schichten (gen.preplanned_cells).
+        Die Runden prüfen die Ruhezeiten nur rückwärts; liegt in den Folgetagen
+        schon eine Schicht aus dem Pre-Planning, darf die Zuweisung heute keine
+        Regel mit ihr verletzen (N->T/6, N->QA/S, N-F-T, Max. Folgetage).
+        Gibt True zurück, wenn die Zuweisung einen Konflikt erzeugen würde.
+        """
+        reserved = self.gen.preplanned_cells
+        if not reserved:
+            return False
 
-        return True
\ No newline at end of file
+        next_day = current_date_obj + timedelta(days=1)
+        if shift_abbrev == "N.":
+            if reserved.get((user_id_str, next_day)) in ("T.", "6", "QA", "S"):
+                return True
+            day_after_next = next_day + timedelta(days=1)
+            if reserved.get((user_id_str, day_after_next)) == "T." and \
+                    self.grid.get(user_id_str, next_day) not in self.hard_work_indicators:
+                return True
+
+        # Arbeitsblock, der durch die heutige Schicht mit einer vorab vergebenen verbunden würde
+        following_days = 0
+        touches_reserved = False
+        day = next_day
+        while self.grid.get(user_id_str, day) in self.hard_work_indicators:
+            touches_reserved = touches_reserved or (user_id_str, day) in reserved
+            following_days += 1
+            day += timedelta(days=1)
+        if touches_reserved and shift_abbrev in self.hard_work_indicators:
+            block = self.count_consecutive_shifts(user_id_str, current_date_obj) + 1 + following_days
+            if block > self.gen.HARD_MAX_CONSECUTIVE_SHIFTS:
+                return True
+
+        return False
\ No newline at end of file
@@ -0,0 +1,152 @@
+# dhf_app/generator/horizon.py
+
+from collections import defaultdict
+
+from .cancellation import GenerationCancelled
+from .core import ShiftPlanGenerator
+from .data_manager import ShiftPlanDataManager
+from .generator_persistence import save_generation_batch_to_db
+from .instrumentation import GeneratorProfiler
+
+
+class HorizonPlanGenerator:
+    """
+    Plant mehrere aufeinanderfolgende Monate in einem Lauf (Rolling Horizon).
+
+    - Die Daten werden einmal für den gesamten Zeitraum geladen
+      (ShiftPlanDataManager.load_horizon, eine Abfrage je Entitätstyp).
+    - Die Monate werden nacheinander geplant. Der fertige Plan eines Monats
+      ersetzt im Speicher den Vormonat des nächsten Monats, Serien, Ruhezeiten
+      und Isolation laufen dadurch über die Monatsgrenze weiter.
+    - Die Stunden-Abweichung zum Durchschnitt aus den bereits geplanten
+      Monaten wird in die Fairness der Folgemonate übernommen
+      (ShiftPlanGenerator.horizon_hour_offsets).
+    - Gespeichert wird erst, wenn alle Monate geplant sind, und zwar in einer
+      Transaktion: schlägt ein Monat fehl, bleibt auch keiner der anderen stehen.
+    """
+
+    MAX_MONTHS = 12
+
+    def __init__(self, db_session, year, month, num_months, log_callback=None, variant_id=None,
+                 engine_cls=ShiftPlanGenerator, cancel_token=None):
+        self.db = db_session
+        self.year = year
+        self.month = month
+        self.num_months = max(1, min(int(num_months), self.MAX_MONTHS))
+        self.variant_id = variant_id
+        self.engine_cls = engine_cls
+        self.cancel_token = cancel_token
+        self.log = log_callback if log_callback else lambda msg, p=None: print(msg)
+
+        # Stunden je Mitarbeiter über alle bisher geplanten Monate {user_id_int: Stunden}
+        self.cumulative_hours = defaultdict(float)
+        # Gemeinsames Profil aller Monate (die Generatoren der Monate schreiben hinein)
+        self.profiler = GeneratorProfiler()
+
+    def run(self):
+        """
+        Plant und speichert alle Monate des Horizonts.
+        Gibt True zurück, wenn erfolgreich, sonst False.
+        """
+        try:
+            self.log(f"Initialisiere Generator für {self.num_months} Monate...", 2)
+
+            with self.profiler.phase('load'):
+                data_managers = ShiftPlanDataManager.load_horizon(
+                    self.db, self.year, self.month, self.num_months, self.variant_id
+                )
+
+            plans = []
+            previous_plan = None
+            for index, data_manager in enumerate(data_managers):
+                if previous_plan is not None:
+                    # Vormonat = gerade geplanter Monat (statt Stand der Datenbank)
+                    data_manager.prev_month_shifts = defaultdict(dict, {
+                        uid: dict(days) for uid, days in previous_plan.items()
+                    })
+
+                gen = self.engine_cls(self.db, data_manager.year, data_manager.month,
+                                      self._month_log(index, data_manager), self.variant_id,
+                                      cancel_token=self.cancel_token)
+                gen.profiler = self.profiler
+                with self.profiler.phase('config'):
+                    gen.prepare(data_manager)
+                gen.horizon_hour_offsets = self._hour_offsets(gen)
+                if index == 0:
+                    self.profiler.start_capture(gen.config.generator_profile_capture)
+
+                with self.profiler.phase('plan'):
+                    plan_data = gen.plan_prepared()
+                self._add_month_hours(gen, plan_data)
+                plans.append((data_manager.year, data_manager.month, plan_data))
+                previous_plan = plan_data
+
+            if self.cancel_token is not None:
+                self.cancel_token.raise_if_cancelled()
+            self.log("Speichere Pläne in Datenbank...", 95)
+            # Alle Monate in einer Transaktion: entweder der ganze Horizont oder nichts
+            total_count = 0
+            with self.profiler.phase('persistence'):
+                for year, month, plan_data in plans:
+                    success, count, err = save_generation_batch_to_db(
+                        plan_data, year, month, self.variant_id, commit=False
+                    )
+                    if not success:
+                        self.db.session.rollback()
+                        self.log(f"[FEHLER] DB-Speichern für {month:02d}/{year} fehlgeschlagen: {err} "
+                                 f"(keine Änderungen gespeichert)", 100)
+                        return False
+                    total_count += count
+                try:
+                    self.db.session.commit()
+                except Exception as e:
+                    self.db.session.rollback()
+                    self.log(f"[FEHLER] DB-Speichern fehlgeschlagen: {e} (keine Änderungen gespeichert)", 100)
+                    return False
+
+            self.log(f"Erfolgreich! {total_count} Einträge in {len(plans)} Monaten gespeichert.", 100)
+            return True
+
+        except GenerationCancelled:
+            self.log("[ABBRUCH] Generator-Lauf abgebrochen, es wurde nichts gespeichert.")
+            raise
+
+        except Exception as e:
+            self.db.session.rollback()
+            self.log(f"[CRASH] Kritischer Fehler im Generator: {str(e)}", 0)
+            import traceback
+            traceback.print_exc()
+            return False
+
+        finally:
+            self.profiler.stop_capture()
+
+    def _month_log(self, index, data_manager):
+        """Log-Funktion eines Monats; der Fortschritt wird auf den Anteil des Monats (5-95%) skaliert."""
+        span = 90.0 / self.num_months
+        prefix = f"[{data_manager.month:02d}/{data_manager.year}] "
+
+        def log_callback(msg, progress=None):
+            if progress is not None:
+                progress = int(5 + span * index + span * min(progress, 94) / 95.0)
+            self.log(msg if msg.startswith("[") else prefix + msg, progress)
+
+        return log_callback
+
+    def _hour_offsets(self, gen):
+        """Abweichung der bisherigen Horizont-Stunden vom Durchschnitt der aktiven Mitarbeiter."""
+        if not self.cumulative_hours:
+            return {}
+        user_ids = [u['id'] for u in gen.all_users if u.get('id') is not None]
+        if not user_ids:
+            return {}
+        mean = sum(self.cumulative_hours.get(uid, 0.0) for uid in user_ids) / len(user_ids)
+        return {uid: self.cumulative_hours.get(uid, 0.0) - mean for uid in user_ids}
+
+    def _add_month_hours(self, gen, plan_data):
+        for user_id_str, days in plan_data.items():
+            try:
+                user_id_int = int(user_id_str)
+            except (ValueError, TypeError):
+                continue
+            self.cumulative_hours[user_id_int] += sum(gen.shift_hours.get(abbrev, 0.0) for abbrev in days.values())
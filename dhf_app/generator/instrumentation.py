@@ -0,0 +1,153 @@
+# dhf_app/generator/instrumentation.py
+
+import io
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Optionaler Sampling-Profiler (pip install pyinstrument); cProfile ist immer da
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:
+    PyinstrumentProfiler = None
+
+# --- Messung eines Generator-Laufs ---
+# Jeder Generator hat einen GeneratorProfiler (gen.profiler), der immer
+# mitläuft und nur billige Zähler führt:
+# - Wandzeit je Phase (Laden, Konfiguration, Pre-Planning, Runden, lokale
+#   Suche, Speichern, ...), aufsummiert über alle Aufrufe
+# - Zähler, z.B. bewertete Kandidaten in Runde 1
+# - abgelehnte Kandidaten je Regel (skip_reason ohne Detailwerte, also
+#   "MaxCons" statt "MaxCons(5)")
+# - Zeit in einzelnen Hotspots wie _calculate_future_conflicts
+# Optional (Konfiguration 'generator_profile_capture': 'cprofile' oder
+# 'pyinstrument') wird zusätzlich ein Funktionsprofil aufgezeichnet, nur im
+# Hauptprozess (Portfolio-Läufe liefern ihre Zähler mit, aber kein Profil).
+# Phasen können verschachtelt sein (future_conflicts liegt in round_fair, das
+# in plan). Das Ergebnis landet am Job (GeneratorJob.profile) und in
+# /api/generator/status.
+
+CAPTURE_MODES = ('cprofile', 'pyinstrument')
+# Anzahl Funktionen im cProfile-Auszug
+CAPTURE_TOP_FUNCTIONS = 30
+
+_DETAIL_SUFFIX = re.compile(r'\(.*\)$')
+
+
+def reason_key(skip_reason):
+    """Regelname ohne Detailwerte ('MaxHrs(160.0+12.0>170.0)' -> 'MaxHrs')."""
+    return _DETAIL_SUFFIX.sub('', skip_reason).strip() or skip_reason
+
+
+class GeneratorProfiler:
+    """Phasen-Zeiten, Zähler und Ablehnungsgründe eines Generator-Laufs."""
+
+    def __init__(self):
+        self.phases = defaultdict(lambda: {'seconds': 0.0, 'calls': 0})
+        self.counters = defaultdict(int)
+        self.rejections = defaultdict(int)  # {Runde/Regel: Anzahl}
+        self.started_at = time.perf_counter()
+        self.capture_mode = None
+        self.capture = None
+        self._capture_profiler = None
+
+    # --- Zeiten ---
+
+    @contextmanager
+    def phase(self, name):
+        """Misst die Wandzeit eines Blocks und addiert sie zur Phase 'name'."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds, calls=1):
+        entry = self.phases[name]
+        entry['seconds'] += seconds
+        entry['calls'] += calls
+
+    # --- Zähler ---
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def reject(self, round_name, skip_reason):
+        """Zählt einen abgelehnten Kandidaten unter 'Runde/Regel'."""
+        self.rejections[f"{round_name}/{reason_key(skip_reason)}"] += 1
+
+    # --- Optionales Funktionsprofil ---
+
+    def start_capture(self, mode):
+        """Startet cProfile oder pyinstrument (einmal je Lauf; unbekannt/None: nichts)."""
+        if not mode or self._capture_profiler is not None or self.capture is not None:
+            return
+        mode = str(mode).lower()
+        if mode not in CAPTURE_MODES:
+            return
+        if mode == 'pyinstrument' and PyinstrumentProfiler is None:
+            print("[WARN] pyinstrument ist nicht installiert, verwende cProfile.")
+            mode = 'cprofile'
+
+        if mode == 'pyinstrument':
+            profiler = PyinstrumentProfiler()
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+        try:
+            if mode == 'pyinstrument':
+                profiler.start()
+            else:
+                profiler.enable()
+        except (RuntimeError, ValueError) as e:
+            # z.B. läuft bereits ein anderer Profiler in diesem Thread
+            print(f"[WARN] Profiler konnte nicht gestartet werden: {e}")
+            return
+        self.capture_mode = mode
+        self._capture_profiler = profiler
+
+    def stop_capture(self):
+        """Beendet die Aufzeichnung und legt den Text-Auszug in self.capture ab."""
+        profiler = self._capture_profiler
+        if profiler is None:
+            return
+        self._capture_profiler = None
+
+        if self.capture_mode == 'pyinstrument':
+            profiler.stop()
+            self.capture = profiler.output_text(unicode=True, color=False)
+            return
+
+        import pstats
+        profiler.disable()
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(CAPTURE_TOP_FUNCTIONS)
+        self.capture = stream.getvalue()
+
+    # --- Ergebnis ---
+
+    def merge(self, other):
+        """Übernimmt die Werte eines anderen Profils (dict aus to_dict, z.B. eines Portfolio-Laufs)."""
+        for name, entry in other.get('phases', {}).items():
+            self.add_time(name, entry['seconds'], entry['calls'])
+        for name, amount in other.get('counters', {}).items():
+            self.counters[name] += amount
+        for name, amount in other.get('rejections', {}).items():
+            self.rejections[name] += amount
+
+    def to_dict(self, include_capture=True):
+        data = {
+            "total_seconds": round(time.perf_counter() - self.started_at, 4),
+            "phases": {
+                name: {"seconds": round(entry['seconds'], 4), "calls": entry['calls']}
+                for name, entry in sorted(self.phases.items(), key=lambda item: -item[1]['seconds'])
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "rejections": dict(sorted(self.rejections.items(), key=lambda item: (-item[1], item[0]))),
+        }
+        if include_capture and self.capture is not None:
+            data["capture_mode"] = self.capture_mode
+            data["capture"] = self.capture
+        return data
@@ -0,0 +1,406 @@
+# dhf_app/generator/local_search.py
+
+import calendar
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from .plan_overlay import PlanOverlay
+
+
+class GeneratorLocalSearch:
+    """
+    Optionale Verbesserungsphase nach dem Tag-für-Tag-Durchlauf (Simulated Annealing).
+
+    Arbeitet direkt auf dem Raster des Generators mit drei Nachbarschaften:
+    - Auffüllen:   einen unbesetzten Slot an einen freien Mitarbeiter vergeben
+    - Verschieben: eine generierte Schicht an einen anderen Mitarbeiter abgeben
+    - Tauschen:    zwei Mitarbeiter tauschen ihre Schichten am selben Tag
+
+    Harte Regeln werden über die bestehende Regelprüfung des Scorings geprüft
+    (N->T/6, N->QA/S, N-F-T, Max. Folgetage, Ruhetage), zusätzlich Monatsstunden,
+    Diensthund, freies Wochenende und statische Sperren (Urlaub, Wunschfrei,
+    Ausschluss, gesicherte Zellen). Gesicherte Zellen werden nie verändert.
+    Ein Zug wird verworfen, wenn er die Anzahl regelwidriger Zellen einer
+    betroffenen Zeile erhöht (die Auffüllrunden dürfen Regeln lockern, die
+    lokale Suche macht den Plan dadurch nicht schlechter).
+
+    Energie (kleiner = besser): unbesetzte Slots * UNFILLED_WEIGHT + Varianz der Monatsstunden.
+    Am Ende wird der beste gefundene Zustand wiederhergestellt.
+    """
+
+    UNFILLED_WEIGHT = 10000.0
+    START_TEMPERATURE = 2.0
+    # Abbruch-Prüfung alle n Iterationen
+    CANCEL_CHECK_INTERVAL = 256
+
+    def __init__(self, generator_instance, time_budget_seconds, seed=None):
+        self.gen = generator_instance
+        self.grid = generator_instance.state_grid
+        self.scoring = generator_instance.scoring
+        self.helpers = generator_instance.helpers
+        self.time_budget = float(time_budget_seconds)
+        self.rnd = random.Random(seed or 0)
+
+        gen = self.gen
+        days_in_month = calendar.monthrange(gen.year, gen.month)[1]
+        self.dates = [date(gen.year, gen.month, d) for d in range(1, days_in_month + 1)]
+        self.month_end = self.dates[-1]
+        self.planned_shifts = set(gen.shifts_to_plan)
+
+        self.user_ids = [str(u['id']) for u in gen.all_users if u.get('id') is not None]
+
+        # Diensthunde: {user_id_str: hund} und {hund: [user_id_str]}
+        self.user_dogs = {}
+        self.dog_members = defaultdict(list)
+        for u in gen.all_users:
+            dog = u.get('diensthund')
+            if u.get('id') is not None and dog and dog != '---':
+                self.user_dogs[str(u['id'])] = dog
+                self.dog_members[dog].append(str(u['id']))
+
+        # Vom Generator gesetzte (nicht gesicherte) Zellen je Tag: {date_obj: {user_id_str: abbrev}}
+        self.generated = {}
+        # Gesicherte Arbeitszellen je Tag (werden nie verschoben, aber in der Zeilenprüfung mitbewertet)
+        self.locked = {}
+        for current_date in self.dates:
+            entries = list(self.grid.entries_on(current_date))
+            self.generated[current_date] = {
+                uid_str: shift for uid_str, shift, is_locked in entries
+                if not is_locked and shift
+            }
+            self.locked[current_date] = {
+                uid_str: shift for uid_str, shift, is_locked in entries
+                if is_locked and shift and shift not in gen.free_shifts_indicators
+            }
+
+        self.unfilled = {slot: missing for slot, missing in gen.unfilled_by_slot.items() if missing > 0}
+
+        # Laufende Summen für die Stunden-Varianz (inkl. Horizont-Abweichung der Vormonate)
+        self.hour_offsets = gen.horizon_hour_offsets
+        self.num_users = max(1, len(self.user_ids))
+        self.sum_hours = 0.0
+        self.sum_sq_hours = 0.0
+        for uid_str in self.user_ids:
+            h = self._fairness_hours(uid_str)
+            self.sum_hours += h
+            self.sum_sq_hours += h * h
+
+        # Änderungsprotokoll für das Zurücksetzen auf den besten Zustand
+        # [(user_id_str, date_obj, alte_abk, neue_abk, slot_gefüllt)]
+        self._trail = []
+
+    # --- Energie ---
+
+    def _variance(self, sum_hours=None, sum_sq_hours=None):
+        s = self.sum_hours if sum_hours is None else sum_hours
+        sq = self.sum_sq_hours if sum_sq_hours is None else sum_sq_hours
+        mean = s / self.num_users
+        return max(0.0, sq / self.num_users - mean * mean)
+
+    def _energy(self):
+        return sum(self.unfilled.values()) * self.UNFILLED_WEIGHT + self._variance()
+
+    def _hours(self, user_id_str):
+        return self.gen.live_user_hours.get(int(user_id_str), 0.0)
+
+    def _fairness_hours(self, user_id_str):
+        return self._hours(user_id_str) + self.hour_offsets.get(int(user_id_str), 0.0)
+
+    def _variance_after(self, hour_changes):
+        """Varianz nach Stundenänderungen {user_id_str: delta}, ohne den Zustand zu ändern."""
+        s, sq = self.sum_hours, self.sum_sq_hours
+        for user_id_str, delta in hour_changes.items():
+            old = self._fairness_hours(user_id_str)
+            new = old + delta
+            s += new - old
+            sq += new * new - old * old
+        return self._variance(s, sq)
+
+    # --- Zustand ändern ---
+
+    def _set_cell(self, user_id_str, date_obj, abbrev, fills_slot=False):
+        old = self.generated[date_obj].get(user_id_str)
+        self._trail.append((user_id_str, date_obj, old, abbrev, fills_slot))
+        self._write_cell(user_id_str, date_obj, old, abbrev)
+        if fills_slot:
+            slot = (date_obj, abbrev)
+            self.unfilled[slot] -= 1
+            if self.unfilled[slot] <= 0:
+                del self.unfilled[slot]
+
+    def _write_cell(self, user_id_str, date_obj, old, new):
+        gen = self.gen
+        user_id_int = int(user_id_str)
+        self.grid.set(user_id_str, date_obj, new)
+        if new is None:
+            self.generated[date_obj].pop(user_id_str, None)
+        else:
+            self.generated[date_obj][user_id_str] = new
+
+        old_hours = gen.live_user_hours.get(user_id_int, 0.0)
+        new_hours = old_hours - gen.shift_hours.get(old, 0.0) + gen.shift_hours.get(new, 0.0)
+        gen.live_user_hours[user_id_int] = new_hours
+        offset = self.hour_offsets.get(user_id_int, 0.0)
+        old_hours += offset
+        new_hours += offset
+        self.sum_hours += new_hours - old_hours
+        self.sum_sq_hours += new_hours * new_hours - old_hours * old_hours
+
+        for abbrev, step in ((old, -1), (new, 1)):
+            if abbrev is None:
+                continue
+            gen.live_shift_counts[user_id_int][abbrev] += step
+            if abbrev in ['T.', '6']:
+                gen.live_shift_counts_ratio[user_id_int]['T_OR_6'] += step
+            if abbrev == 'N.':
+                gen.live_shift_counts_ratio[user_id_int]['N_DOT'] += step
+
+    def _undo_to(self, mark):
+        while len(self._trail) > mark:
+            user_id_str, date_obj, old, new, fills_slot = self._trail.pop()
+            self._write_cell(user_id_str, date_obj, new, old)
+            if fills_slot:
+                slot = (date_obj, new)
+                self.unfilled[slot] = self.unfilled.get(slot, 0) + 1
+
+    # --- Regelprüfung ---
+
+    def _row_violations(self, user_id_str, start_date, changes):
+        """
+        Tage der Arbeitszellen der Zeile ab 'start_date' (generierte und gesicherte),
+        die eine harte Regel verletzen, wenn die Zeile um 'changes' ({date_obj: abbrev|None})
+        geändert wird. Die Zellen werden chronologisch in ein Overlay eingefügt, sodass
+        jede Zelle nur gegen ihre Vorgeschichte geprüft wird (alle Regeln schauen nur zurück).
+        """
+        cells = {}
+        d = start_date
+        while d <= self.month_end:
+            abbrev = self.generated[d].get(user_id_str) or self.locked[d].get(user_id_str)
+            if abbrev is not None:
+                cells[d] = abbrev
+            d += timedelta(days=1)
+        cleared = set(cells) | set(changes)
+        for d, abbrev in changes.items():
+            if abbrev is None:
+                cells.pop(d, None)
+            else:
+                cells[d] = abbrev
+
+        overlay = PlanOverlay(self.grid)
+        for d in cleared:
+            overlay.set(user_id_str, d, None)
+
+        same_shift_override = self.gen.user_preferences[user_id_str].get('max_consecutive_same_shift_override')
+        same_shift_limit = same_shift_override if same_shift_override is not None else self.gen.max_consecutive_same_shift_limit
+
+        violations = set()
+        for d in sorted(cells):
+            abbrev = cells[d]
+            if abbrev in self.planned_shifts or user_id_str in self.locked[d]:
+                if self.scoring._check_dynamic_rules(user_id_str, d, abbrev, overlay, check_hours=False):
+                    violations.add(d)
+                elif self.helpers.count_consecutive_same_shifts(user_id_str, d, abbrev, overlay) >= same_shift_limit:
+                    violations.add(d)
+                elif abbrev == "T." and not overlay.is_working(user_id_str, d - timedelta(days=1)) and \
+                        overlay.get(user_id_str, d - timedelta(days=2)) == "N.":
+                    # N-F-T auch über einen leeren Tag (im fertigen Plan ebenfalls frei)
+                    violations.add(d)
+            overlay.set(user_id_str, d, abbrev)
+        return violations
+
+    def _row_ok(self, user_id_str, date_obj, changes):
+        """
+        True, wenn die Änderung an keinem Tag der Zeile eine neue Regelverletzung erzeugt
+        (eine bestehende darf dabei nicht gegen eine andere getauscht werden).
+        """
+        return self._row_violations(user_id_str, date_obj, changes) <= self._row_violations(user_id_str, date_obj, {})
+
+    def _within_max_hours(self, user_id_str, delta):
+        if delta <= 0:
+            return True
+        user_pref = self.gen.user_preferences[user_id_str]
+        max_hours = user_pref.get('max_monthly_hours')
+        if max_hours is None:
+            max_hours = self.gen.MAX_MONTHLY_HOURS
+        return self._hours(user_id_str) + delta <= max_hours
+
+    def _dog_conflict(self, user_id_str, date_obj, shift_abbrev, ignore=()):
+        dog = self.user_dogs.get(user_id_str)
+        if not dog:
+            return False
+        for other_id in self.dog_members[dog]:
+            if other_id == user_id_str or other_id in ignore:
+                continue
+            other_shift = self.grid.get(other_id, date_obj)
+            if not other_shift or other_shift in self.gen.free_shifts_indicators:
+                continue
+            if other_shift == shift_abbrev or self.helpers.check_time_overlap_optimized(shift_abbrev, other_shift):
+                return True
+        return False
+
+    def _can_take(self, user_id_str, date_obj, shift_abbrev, ignore=(), is_new_work_day=True):
+        """Prüfungen für einen Mitarbeiter, der an 'date_obj' die Schicht 'shift_abbrev' übernimmt."""
+        if self.scoring._is_statically_blocked(user_id_str, date_obj, shift_abbrev):
+            return False
+        if self._dog_conflict(user_id_str, date_obj, shift_abbrev, ignore):
+            return False
+        if is_new_work_day and self.gen.weekend_manager and \
+                self.gen.weekend_manager.would_violate_free_weekend_rule(user_id_str, date_obj):
+            return False
+        return True
+
+    def _is_empty(self, user_id_str, date_obj):
+        return self.grid.get_code(user_id_str, date_obj) == self.grid.NO_ENTRY
+
+    # --- Nachbarschaften ---
+    # Jede Methode gibt (Änderungen, Lücken-Delta) zurück oder None, wenn kein gültiger Zug gefunden wurde.
+    # Änderungen: [(user_id_str, date_obj, neue_abk)]
+
+    def _propose_fill(self):
+        slot = self.rnd.choice(list(self.unfilled))
+        date_obj, shift_abbrev = slot
+        hours = self.gen.shift_hours.get(shift_abbrev, 0.0)
+
+        candidates = list(self.user_ids)
+        self.rnd.shuffle(candidates)
+        for user_id_str in candidates:
+            if not self._is_empty(user_id_str, date_obj):
+                continue
+            if not self._within_max_hours(user_id_str, hours):
+                continue
+            if not self._can_take(user_id_str, date_obj, shift_abbrev):
+                continue
+            if not self._row_ok(user_id_str, date_obj, {date_obj: shift_abbrev}):
+                continue
+            return [(user_id_str, date_obj, shift_abbrev)], -1
+        return None
+
+    def _pick_generated_cell(self):
+        date_obj = self.rnd.choice(self.dates)
+        cells = [(uid, s) for uid, s in self.generated[date_obj].items() if s in self.planned_shifts]
+        if not cells:
+            return None
+        user_id_str, shift_abbrev = self.rnd.choice(cells)
+        return date_obj, user_id_str, shift_abbrev
+
+    def _propose_move(self):
+        picked = self._pick_generated_cell()
+        if picked is None:
+            return None
+        date_obj, from_id, shift_abbrev = picked
+        to_id = self.rnd.choice(self.user_ids)
+        if to_id == from_id or not self._is_empty(to_id, date_obj):
+            return None
+
+        hours = self.gen.shift_hours.get(shift_abbrev, 0.0)
+        if not self._within_max_hours(to_id, hours):
+            return None
+        if not self._can_take(to_id, date_obj, shift_abbrev, ignore=(from_id,)):
+            return None
+        if not self._row_ok(to_id, date_obj, {date_obj: shift_abbrev}):
+            return None
+        if not self._row_ok(from_id, date_obj, {date_obj: None}):
+            return None
+        return [(from_id, date_obj, None), (to_id, date_obj, shift_abbrev)], 0
+
+    def _propose_swap(self):
+        picked = self._pick_generated_cell()
+        if picked is None:
+            return None
+        date_obj, user_a, shift_a = picked
+        others = [(uid, s) for uid, s in self.generated[date_obj].items()
+                  if uid != user_a and s in self.planned_shifts and s != shift_a]
+        if not others:
+            return None
+        user_b, shift_b = self.rnd.choice(others)
+
+        hours_a = self.gen.shift_hours.get(shift_a, 0.0)
+        hours_b = self.gen.shift_hours.get(shift_b, 0.0)
+        if not self._within_max_hours(user_a, hours_b - hours_a):
+            return None
+        if not self._within_max_hours(user_b, hours_a - hours_b):
+            return None
+        if not self._can_take(user_a, date_obj, shift_b, ignore=(user_b,), is_new_work_day=False):
+            return None
+        if not self._can_take(user_b, date_obj, shift_a, ignore=(user_a,), is_new_work_day=False):
+            return None
+        if not self._row_ok(user_a, date_obj, {date_obj: shift_b}):
+            return None
+        if not self._row_ok(user_b, date_obj, {date_obj: shift_a}):
+            return None
+        return [(user_a, date_obj, shift_b), (user_b, date_obj, shift_a)], 0
+
+    # --- Hauptschleife ---
+
+    def run(self):
+        """
+        Führt die lokale Suche im Zeitbudget aus und übernimmt den besten Zustand.
+        Gibt ein Dict mit Kennzahlen zurück.
+        """
+        gen = self.gen
+        start_time = time.monotonic()
+        start_unfilled = sum(self.unfilled.values())
+        start_variance = self._variance()
+
+        current_energy = self._energy()
+        best_energy = current_energy
+        best_mark = 0
+        iterations = accepted = 0
+
+        while self.user_ids:
+            elapsed = time.monotonic() - start_time
+            if elapsed >= self.time_budget:
+                break
+            iterations += 1
+            if iterations % self.CANCEL_CHECK_INTERVAL == 0:
+                gen.check_cancelled()
+            temperature = max(1e-3, self.START_TEMPERATURE * (1.0 - elapsed / self.time_budget))
+
+            roll = self.rnd.random()
+            if self.unfilled and roll < 0.5:
+                proposal = self._propose_fill()
+            elif roll < 0.8:
+                proposal = self._propose_move()
+            else:
+                proposal = self._propose_swap()
+            if proposal is None:
+                continue
+
+            changes, unfilled_delta = proposal
+            hour_changes = defaultdict(float)
+            for user_id_str, date_obj, new_abbrev in changes:
+                old_abbrev = self.generated[date_obj].get(user_id_str)
+                hour_changes[user_id_str] += gen.shift_hours.get(new_abbrev, 0.0) - gen.shift_hours.get(old_abbrev, 0.0)
+
+            new_energy = (sum(self.unfilled.values()) + unfilled_delta) * self.UNFILLED_WEIGHT + \
+                self._variance_after(hour_changes)
+            delta = new_energy - current_energy
+            if delta > 0 and self.rnd.random() >= math.exp(-delta / temperature):
+                continue
+
+            for user_id_str, date_obj, new_abbrev in changes:
+                self._set_cell(user_id_str, date_obj, new_abbrev, fills_slot=unfilled_delta < 0)
+            current_energy = new_energy
+            accepted += 1
+
+            if current_energy < best_energy - 1e-9:
+                best_energy = current_energy
+                best_mark = len(self._trail)
+
+        # Besten Zustand wiederherstellen
+        self._undo_to(best_mark)
+
+        gen.unfilled_by_slot = dict(self.unfilled)
+        gen.unfilled_slots = sum(self.unfilled.values())
+
+        return {
+            'iterations': iterations,
+            'accepted': accepted,
+            'filled_slots': start_unfilled - gen.unfilled_slots,
+            'variance_before': start_variance,
+            'variance_after': self._variance(),
+            'seconds': time.monotonic() - start_time,
+        }
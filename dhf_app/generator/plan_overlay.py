@@ -0,0 +1,120 @@
+# dhf_app/generator/plan_overlay.py
+
+from .state_grid import ShiftStateGrid, next_run_values
+
+
+class PlanOverlay:
+    """
+    Copy-on-Write-Sicht auf ein ShiftStateGrid für "Was-wäre-wenn"-Simulationen.
+
+    Änderungen (Codes und die davon abhängigen laufenden Zähler) landen nur in
+    kleinen Delta-Dicts; das Basis-Raster wird nie verändert. Dadurch kann der
+    Lookahead im Scoring Zuweisungen simulieren, ohne den gemeinsamen
+    Generator-Status zu schreiben und wiederherzustellen.
+
+    Bietet dieselben Lese-Methoden wie das Raster (get, get_code, is_working,
+    is_locked, *_streak_before), sodass Helfer und Regelprüfungen beide Sichten
+    gleich behandeln können.
+    """
+
+    NO_ENTRY = ShiftStateGrid.NO_ENTRY
+
+    def __init__(self, grid):
+        self.base = grid
+        self.abbrev_of = grid.abbrev_of
+        self.code_of = grid.code_of
+        self.is_free_code = grid.is_free_code
+        self.is_hard_work_code = grid.is_hard_work_code
+
+        # Deltas: Index -> Wert (nur geänderte Zellen)
+        self._codes = {}
+        self._work = {}
+        self._same = {}
+        self._free = {}
+
+        # Beschreibung der simulierten Änderungen (Teil der Memo-Schlüssel)
+        self.key = ()
+
+    # --- Delta-Zugriff ---
+
+    def _code_at(self, idx):
+        code = self._codes.get(idx)
+        return self.base.codes[idx] if code is None else code
+
+    def _runs_at(self, idx):
+        if idx in self._work:
+            return self._work[idx], self._same[idx], self._free[idx]
+        base = self.base
+        return base.work_run[idx], base.same_run[idx], base.free_run[idx]
+
+    # --- Schreiben (nur im Overlay) ---
+
+    def set(self, user_id_str, date_obj, abbrev):
+        """Simuliert einen Eintrag, ohne das Basis-Raster zu verändern."""
+        base = self.base
+        row = base.row(user_id_str)
+        col = base.col(date_obj)
+        if row is None or col < 0:
+            raise ValueError(f"Simulation für {user_id_str} am {date_obj} außerhalb des Rasters.")
+
+        code = base.code_for(abbrev)
+        idx = row * base.num_days + col
+        self._codes[idx] = code
+        self.key = self.key + ((idx, code),)
+
+        # Zähler ab der geänderten Spalte fortschreiben (bis sie sich nicht mehr ändern)
+        row_start = row * base.num_days
+        row_end = row_start + base.num_days
+        for i in range(idx, row_end):
+            if i > row_start:
+                prev_code = self._code_at(i - 1)
+                prev_work, prev_same, prev_free = self._runs_at(i - 1)
+            else:
+                prev_code, prev_work, prev_same, prev_free = self.NO_ENTRY, 0, 0, 0
+
+            runs = next_run_values(self._code_at(i), prev_code, prev_work, prev_same, prev_free,
+                                   self.is_hard_work_code, self.is_free_code)
+            if i > idx and runs == self._runs_at(i):
+                break
+            self._work[i], self._same[i], self._free[i] = runs
+
+    # --- Lese-Schnittstelle (wie ShiftStateGrid) ---
+
+    def get_code(self, user_id_str, date_obj):
+        base = self.base
+        row = base.row(user_id_str)
+        col = base.col(date_obj)
+        if row is None or col < 0:
+            return self.NO_ENTRY
+        return self._code_at(row * base.num_days + col)
+
+    def get(self, user_id_str, date_obj):
+        return self.abbrev_of[self.get_code(user_id_str, date_obj)]
+
+    def is_working(self, user_id_str, date_obj):
+        code = self.get_code(user_id_str, date_obj)
+        return code != self.NO_ENTRY and not self.is_free_code[code]
+
+    def is_locked(self, user_id_str, date_obj):
+        return self.base.is_locked(user_id_str, date_obj)
+
+    def work_streak_before(self, user_id_str, date_obj):
+        idx = self.base._index_before(user_id_str, date_obj)
+        return self._runs_at(idx)[0] if idx >= 0 else 0
+
+    def same_streak_before(self, user_id_str, date_obj, abbrev):
+        idx = self.base._index_before(user_id_str, date_obj)
+        if idx < 0 or self._code_at(idx) != self.code_of.get(abbrev):
+            return 0
+        return self._runs_at(idx)[1]
+
+    def free_streak_before(self, user_id_str, date_obj):
+        idx = self.base._index_before(user_id_str, date_obj)
+        if idx < 0:
+            return 0, 0
+        free_days = self._runs_at(idx)[2]
+        if free_days == 0:
+            return 0, 0
+        if (idx % self.base.num_days) - free_days < 0:
+            return free_days, 0
+        return free_days, self._runs_at(idx - free_days)[0]
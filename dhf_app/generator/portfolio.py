@@ -0,0 +1,211 @@
+# dhf_app/generator/portfolio.py
+
+import calendar
+import os
+import statistics
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from pickle import PicklingError
+
+from .cancellation import GenerationCancelled
+
+
+def evaluate_plan(gen):
+    """
+    Bewertet einen fertig geplanten Monat eines Generators.
+
+    Gibt (objective, metrics) zurück. Das Zielfunktions-Tupel wird
+    lexikografisch verglichen, kleiner ist besser:
+    1. Unbesetzte Slots
+    2. Stunden-Spreizung (Standardabweichung der Monatsstunden, auf 0.1h gerundet;
+       im Rolling Horizon inkl. der Abweichung aus den Vormonaten)
+    3. Strafen (isolierte Arbeitstage + Avoid-Paare in derselben Schicht)
+    """
+    grid = gen.state_grid
+    days_in_month = calendar.monthrange(gen.year, gen.month)[1]
+    planned_shifts = set(gen.shifts_to_plan)
+
+    offsets = gen.horizon_hour_offsets
+    hours = [gen.live_user_hours.get(u['id'], 0.0) + offsets.get(u['id'], 0.0)
+             for u in gen.all_users if u.get('id') is not None]
+    hour_spread = statistics.pstdev(hours) if len(hours) > 1 else 0.0
+
+    isolated_days = 0
+    avoid_pairs = 0
+    for day in range(1, days_in_month + 1):
+        current_date = date(gen.year, gen.month, day)
+        prev_date = current_date - timedelta(days=1)
+        next_date = current_date + timedelta(days=1)
+
+        assigned_by_shift = defaultdict(set)
+        for uid_str, shift, _is_locked in grid.entries_on(current_date):
+            if shift not in planned_shifts:
+                continue
+            assigned_by_shift[shift].add(int(uid_str))
+            if not grid.is_working(uid_str, prev_date) and not grid.is_working(uid_str, next_date):
+                isolated_days += 1
+
+        for user_ids in assigned_by_shift.values():
+            for uid in user_ids:
+                for _prio, other_id in gen.avoid_priority_map.get(uid, ()):
+                    if other_id in user_ids and uid < other_id:
+                        avoid_pairs += 1
+
+    metrics = {
+        'unfilled_slots': gen.unfilled_slots,
+        'hour_spread': hour_spread,
+        'isolated_days': isolated_days,
+        'avoid_pairs': avoid_pairs,
+    }
+    objective = (gen.unfilled_slots, round(hour_spread, 1), isolated_days + avoid_pairs)
+    return objective, metrics
+
+
+def _run_portfolio_member(generator_cls, data_manager, year, month, variant_id, seed, hour_offsets=None,
+                          parallel_runs=1):
+    """
+    Ein Portfolio-Lauf (läuft im Worker-Prozess).
+    Plant den Monat auf einer losgelösten DataManager-Kopie, ohne zu speichern.
+    Warnungen werden gesammelt, damit sie für den Gewinner ausgegeben werden können.
+    """
+    warnings = []
+
+    def log_callback(msg, progress=None):
+        if msg.startswith("[WARN]"):
+            warnings.append(msg)
+
+    gen = generator_cls(None, year, month, log_callback=log_callback, variant_id=variant_id, seed=seed)
+    gen.horizon_hour_offsets = hour_offsets or {}
+    gen.parallel_runs = parallel_runs
+    gen.prepare(data_manager)
+    gen.plan_month()
+    gen.improve_plan()
+    objective, metrics = evaluate_plan(gen)
+    # Messwerte des Laufs (ohne Funktionsprofil), werden im Hauptprozess zusammengeführt
+    metrics['profile'] = gen.profiler.to_dict(include_capture=False)
+
+    days_in_month = calendar.monthrange(year, month)[1]
+    plan_data = gen.state_grid.to_dict(date(year, month, 1), date(year, month, days_in_month))
+    return seed, objective, metrics, plan_data, warnings
+
+
+class GeneratorPortfolio:
+    """
+    Führt mehrere unabhängige Generator-Läufe mit unterschiedlichen
+    Tie-Break-Seeds parallel aus (ProcessPoolExecutor) und wählt den Plan mit
+    der besten Zielfunktion (siehe evaluate_plan).
+
+    Seed 0 entspricht dem normalen Einzellauf, das Portfolio ist also nie
+    schlechter als ein einzelner Lauf. Gespeichert wird nur der Gewinner
+    (durch den aufrufenden ShiftPlanGenerator).
+    """
+
+    # Intervall für die Abbruch-Prüfung während auf Läufe gewartet wird
+    CANCEL_POLL_SECONDS = 0.5
+
+    def __init__(self, generator_instance, num_runs, max_workers=None):
+        self.gen = generator_instance
+        self.num_runs = num_runs
+        try:
+            self.max_workers = int(max_workers) if max_workers else None
+        except (ValueError, TypeError):
+            self.max_workers = None
+        if not self.max_workers or self.max_workers < 1:
+            self.max_workers = os.cpu_count() or 1
+        self.max_workers = min(self.max_workers, num_runs)
+
+    def run(self):
+        """
+        Führt alle Läufe aus und gibt die Plandaten des Gewinners zurück
+        ({user_id_str: {date_str: abbrev}}).
+        """
+        gen = self.gen
+        gen.log(f"Portfolio: {self.num_runs} Läufe auf bis zu {self.max_workers} Prozessen...", 15)
+
+        data_manager = gen.data_manager.detached_copy()
+        seeds = list(range(self.num_runs))
+
+        try:
+            results = self._run_parallel(data_manager, seeds)
+        except (OSError, NotImplementedError, BrokenProcessPool, PicklingError) as e:
+            gen.log(f"[WARN] Parallele Ausführung nicht möglich ({e}). Läufe werden nacheinander ausgeführt.")
+            results = self._run_sequential(data_manager, seeds)
+
+        if not results:
+            raise RuntimeError("Kein Portfolio-Lauf war erfolgreich.")
+
+        for result in results:
+            gen.profiler.merge(result[2].get('profile', {}))
+        gen.profiler.count('portfolio_runs', len(results))
+
+        # Bester Plan; bei Gleichstand gewinnt der kleinere Seed (deterministisch)
+        seed, objective, metrics, plan_data, warnings = min(results, key=lambda r: (r[1], r[0]))
+        gen.unfilled_slots = metrics['unfilled_slots']
+        for msg in warnings:
+            gen.log(msg)
+        gen.log(
+            f"Portfolio: Lauf {seed} gewählt (Lücken: {metrics['unfilled_slots']}, "
+            f"Stunden-Spreizung: {metrics['hour_spread']:.1f}h, "
+            f"Isolation: {metrics['isolated_days']}, Avoid-Paare: {metrics['avoid_pairs']})", 90
+        )
+        return plan_data
+
+    def _member_args(self, data_manager, seed, parallel_runs=1):
+        gen = self.gen
+        return (type(gen), data_manager, gen.year, gen.month, gen.variant_id, seed, gen.horizon_hour_offsets,
+                parallel_runs)
+
+    def _log_member(self, done, seed, metrics):
+        progress = 15 + int((done / self.num_runs) * 75)
+        self.gen.log(
+            f"Portfolio: Lauf {seed} fertig ({done}/{self.num_runs}) - Lücken: {metrics['unfilled_slots']}, "
+            f"Spreizung: {metrics['hour_spread']:.1f}h", progress
+        )
+
+    def _run_parallel(self, data_manager, seeds):
+        results = []
+        cancelled = False
+        executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {
+                executor.submit(_run_portfolio_member, *self._member_args(data_manager, seed, self.max_workers)): seed
+                for seed in seeds
+            }
+            pending = set(futures)
+            while pending:
+                # Kurzes Timeout, damit ein Abbruch auch während langer Läufe greift
+                done, pending = wait(pending, timeout=self.CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                self.gen.check_cancelled()
+                for future in done:
+                    seed = futures[future]
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        self.gen.log(f"[WARN] Portfolio-Lauf {seed} fehlgeschlagen: {e}")
+                        continue
+                    results.append(result)
+                    self._log_member(len(results), seed, result[2])
+        except GenerationCancelled:
+            cancelled = True
+            raise
+        finally:
+            # Bei Abbruch nicht auf laufende Mitglieder warten, wartende verwerfen
+            executor.shutdown(wait=not cancelled, cancel_futures=cancelled)
+        return results
+
+    def _run_sequential(self, data_manager, seeds):
+        results = []
+        for seed in seeds:
+            self.gen.check_cancelled()
+            try:
+                result = _run_portfolio_member(*self._member_args(data_manager, seed))
+            except Exception as e:
+                self.gen.log(f"[WARN] Portfolio-Lauf {seed} fehlgeschlagen: {e}")
+                continue
+            results.append(result)
+            self._log_member(len(results), seed, result[2])
+        return results
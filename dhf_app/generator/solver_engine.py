@@ -0,0 +1,509 @@
+# dhf_app/generator/solver_engine.py
+
+import calendar
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+# OR-Tools ist optional; ohne Installation fällt die Engine auf den Greedy-Ablauf zurück.
+try:
+    from ortools.sat.python import cp_model
+except ImportError:
+    cp_model = None
+
+from .core import ShiftPlanGenerator
+
+
+class ShiftPlanSolverGenerator(ShiftPlanGenerator):
+    """
+    Alternative Engine: plant den Monat als Ganzes mit dem CP-SAT-Solver (OR-Tools).
+
+    Gleicher Konstruktor und gleicher run()-Ablauf wie ShiftPlanGenerator
+    (Laden, Konfiguration, Speichern, Portfolio/Lokale Suche); ersetzt wird nur
+    plan_month(). Harte Regeln sind Nebenbedingungen:
+    - N. -> T./6/QA/S am Folgetag, N-F-T (mit explizitem Freieintrag dazwischen)
+    - Max. Folgetage (HARD_MAX_CONSECUTIVE_SHIFTS) und Ruhetage nach einem vollen Block
+    - Diensthund: keine gleichen oder zeitlich überlappenden Schichten (_preprocessed_shift_times)
+    - Max. Monatsstunden, Schicht-Ausschlüsse, genehmigtes Wunschfrei, Urlaub, gesicherte Zellen
+    - Mind. ein freies Wochenende (falls der WeekendManager aktiv ist)
+    Die Soft-Scores aus GeneratorScoring (Fairness, Mindeststunden, Partner,
+    Avoid-Partner, Isolation, T/N-Verhältnis) bilden die Zielfunktion. Gelöst wird
+    in zwei Phasen: zuerst werden unbesetzte Slots (Schlupfvariablen) minimiert,
+    danach bei fester Besetzung die Soft-Scores.
+
+    Ohne OR-Tools oder ohne gefundene Lösung wird der Greedy-Ablauf verwendet.
+    """
+
+    # Gewichte der Zielfunktion (Minimierung, ganzzahlig). Die Besetzung wird vorab
+    # in einer eigenen Phase maximiert und danach festgehalten (lexikografisch).
+    WEIGHT_AVOID = 2000  # geteilt durch die Priorität
+    WEIGHT_PARTNER = 100  # geteilt durch die Priorität
+    WEIGHT_RATIO = 1
+
+    # Stunden werden als Zehntelstunden modelliert (CP-SAT rechnet ganzzahlig)
+    HOURS_SCALE = 10
+
+    def plan_month(self):
+        if cp_model is None:
+            self.log("[WARN] OR-Tools ist nicht installiert - verwende die Greedy-Engine.", 15)
+            return super().plan_month()
+
+        self.unfilled_slots = 0
+        self.unfilled_by_slot = {}
+
+        days_in_month = calendar.monthrange(self.year, self.month)[1]
+        self.dates = [date(self.year, self.month, d) for d in range(1, days_in_month + 1)]
+        self.user_id_strs = [str(u['id']) for u in self.all_users if u.get('id') is not None]
+
+        self.log("Solver: Baue Modell...", 15)
+        build_start = time.perf_counter()
+        self.model = cp_model.CpModel()
+        self.x = {}  # (user_id_str, date_obj, shift_abbrev) -> BoolVar
+        self.x_by_user = defaultdict(list)  # user_id_str -> [(shift_abbrev, BoolVar)]
+        self.objective_terms = []
+
+        needs = self._build_assignment_vars()
+        self._add_rest_constraints()
+        self._add_consecutive_constraints()
+        self._add_dog_constraints()
+        self._add_hours_constraints_and_objective(needs)
+        self._add_weekend_constraints()
+        self._add_partner_objective()
+        self._add_isolation_objective()
+        self._add_ratio_objective()
+        slack_vars = self._add_coverage_constraints(needs)
+        self.profiler.add_time('solver_model', time.perf_counter() - build_start)
+
+        time_limit = self.config.generator_solver_time_limit_seconds
+        self.log(f"Solver: {len(self.x)} Variablen, löse (max. {time_limit:.0f}s)...", 20)
+
+        # Phase 1: Besetzung maximieren (nur Schlupf minimieren)
+        start_time = time.monotonic()
+        total_slack = sum(slack_vars.values())
+        self.model.Minimize(total_slack)
+        solver = self._new_solver(time_limit / 2)
+        status = self._solve(solver)
+
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            self.log(f"[WARN] Solver ohne Lösung ({solver.StatusName(status)}) - verwende die Greedy-Engine.", 20)
+            return super().plan_month()
+
+        values = {key: solver.Value(var) for key, var in self.x.items()}
+        slack_values = {slot: solver.Value(var) for slot, var in slack_vars.items()}
+        best_unfilled = sum(slack_values.values())
+        self.log(f"Solver: Besetzung gefunden (Lücken: {best_unfilled}), optimiere Fairness...", 50)
+
+        # Phase 2: Besetzung festhalten, Soft-Scores optimieren (Phase-1-Lösung als Startwert)
+        remaining = time_limit - (time.monotonic() - start_time)
+        if remaining > 1 and self.objective_terms:
+            self.model.Add(total_slack <= best_unfilled)
+            for key, var in self.x.items():
+                self.model.AddHint(var, values[key])
+            self.model.Minimize(sum(self.objective_terms))
+            solver = self._new_solver(remaining)
+            status = self._solve(solver)
+            if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                values = {key: solver.Value(var) for key, var in self.x.items()}
+                slack_values = {slot: solver.Value(var) for slot, var in slack_vars.items()}
+                self.log(f"Solver: {solver.StatusName(status)} (Zielwert {solver.ObjectiveValue():.0f}).", 88)
+
+        self._apply_solution(values, slack_values)
+
+    def _solve(self, solver):
+        """
+        Löst das Modell. Mit Abbruch-Token stoppt ein Wächter-Thread die Suche,
+        sobald der Lauf abgebrochen wird.
+        """
+        with self.profiler.phase('solver_solve'):
+            return self._solve_watched(solver)
+
+    def _solve_watched(self, solver):
+        if self.cancel_token is None:
+            return solver.Solve(self.model)
+
+        finished = threading.Event()
+
+        def watch():
+            while not finished.wait(0.5):
+                if self.cancel_token.is_cancelled():
+                    solver.StopSearch()
+                    return
+
+        watcher = threading.Thread(target=watch, daemon=True)
+        watcher.start()
+        try:
+            status = solver.Solve(self.model)
+        finally:
+            finished.set()
+            watcher.join()
+        self.check_cancelled()
+        return status
+
+    def _new_solver(self, time_limit):
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max(1.0, time_limit)
+        # Threads je Job aus der Konfiguration, im Portfolio geteilt durch die parallelen Läufe
+        solver.parameters.num_workers = max(1, self.config.generator_solver_workers // max(1, self.parallel_runs))
+        solver.parameters.random_seed = self.seed or 0
+        return solver
+
+    # --- Terme (Variable oder Konstante aus dem Raster) ---
+
+    def _shift_term(self, user_id_str, date_obj, shift_abbrev):
+        """BoolVar, falls die Zelle planbar ist; sonst 1/0 je nach festem Eintrag."""
+        var = self.x.get((user_id_str, date_obj, shift_abbrev))
+        if var is not None:
+            return var
+        return 1 if self.state_grid.get(user_id_str, date_obj) == shift_abbrev else 0
+
+    def _work_terms(self, user_id_str, date_obj, hard_only=True):
+        """(Variablen, Konstante) für 'arbeitet an diesem Tag' (harte Arbeit bzw. jeder Nicht-Frei-Eintrag)."""
+        grid = self.state_grid
+        code = grid.get_code(user_id_str, date_obj)
+        if code != grid.NO_ENTRY:
+            if hard_only:
+                return [], 1 if grid.is_hard_work_code[code] else 0
+            return [], 0 if grid.is_free_code[code] else 1
+        return [var for (uid, d, s), var in self._vars_of_day(user_id_str, date_obj)
+                if not hard_only or s in self.hard_work_indicators], 0
+
+    def _vars_of_day(self, user_id_str, date_obj):
+        for shift_abbrev in self.shifts_to_plan:
+            var = self.x.get((user_id_str, date_obj, shift_abbrev))
+            if var is not None:
+                yield (user_id_str, date_obj, shift_abbrev), var
+
+    def _forbid_pair(self, a, b):
+        """Verbietet, dass beide Terme (Variable oder 0/1) gleichzeitig wahr sind."""
+        a_const, b_const = isinstance(a, int), isinstance(b, int)
+        if a_const and b_const:
+            return
+        if a_const:
+            if a:
+                self.model.Add(b == 0)
+            return
+        if b_const:
+            if b:
+                self.model.Add(a == 0)
+            return
+        self.model.AddBoolOr([a.Not(), b.Not()])
+
+    # --- Variablen und Nebenbedingungen ---
+
+    def _build_assignment_vars(self):
+        """Legt x[u, d, s] für alle freien, nicht statisch gesperrten Zellen mit Bedarf an."""
+        grid = self.state_grid
+        needs = {}
+
+        for current_date in self.dates:
+            min_staffing = self.data_manager.get_min_staffing_for_date(current_date)
+            existing_counts = defaultdict(int)
+            for _uid_str, shift, _is_locked in grid.entries_on(current_date):
+                if shift:
+                    existing_counts[shift] += 1
+            for shift_abbrev in self.shifts_to_plan:
+                needs[(current_date, shift_abbrev)] = max(0, min_staffing.get(shift_abbrev, 0) - existing_counts[shift_abbrev])
+
+        for user_id_str in self.user_id_strs:
+            for current_date in self.dates:
+                if grid.get_code(user_id_str, current_date) != grid.NO_ENTRY:
+                    continue
+                day_vars = []
+                for shift_abbrev in self.shifts_to_plan:
+                    if needs[(current_date, shift_abbrev)] <= 0:
+                        continue
+                    if self.scoring._is_statically_blocked(user_id_str, current_date, shift_abbrev):
+                        continue
+                    var = self.model.NewBoolVar(f"x_{user_id_str}_{current_date.day}_{shift_abbrev}")
+                    self.x[(user_id_str, current_date, shift_abbrev)] = var
+                    self.x_by_user[user_id_str].append((shift_abbrev, var))
+                    day_vars.append(var)
+                if len(day_vars) > 1:
+                    self.model.AddAtMostOne(day_vars)
+        return needs
+
+    def _add_rest_constraints(self):
+        """N. -> T./6/QA/S und N-F-T (wie in GeneratorScoring._check_dynamic_rules)."""
+        grid = self.state_grid
+        one_day = timedelta(days=1)
+        after_night_blocked = ["T.", "6", "QA", "S"]
+
+        for user_id_str in self.user_id_strs:
+            for current_date in [self.dates[0] - one_day] + self.dates:
+                night = self._shift_term(user_id_str, current_date, "N.")
+                if isinstance(night, int) and not night:
+                    continue
+                for blocked in after_night_blocked:
+                    self._forbid_pair(night, self._shift_term(user_id_str, current_date + one_day, blocked))
+
+            # N-F-T: Nur mit explizitem Freieintrag zwischen Nacht und Tag (wie die bestehende Regel)
+            for current_date in self.dates:
+                between = grid.get(user_id_str, current_date - one_day)
+                if between is None or between not in self.free_shifts_indicators:
+                    continue
+                self._forbid_pair(self._shift_term(user_id_str, current_date - 2 * one_day, "N."),
+                                  self._shift_term(user_id_str, current_date, "T."))
+
+    def _add_consecutive_constraints(self):
+        """Max. Folgetage und Pflicht-Ruhetage nach einem vollen Block."""
+        grid = self.state_grid
+        limit = self.HARD_MAX_CONSECUTIVE_SHIFTS
+        one_day = timedelta(days=1)
+
+        for user_id_str in self.user_id_strs:
+            # Jedes Fenster aus limit+1 Tagen darf höchstens 'limit' Arbeitstage enthalten
+            window_start = self.dates[0] - timedelta(days=limit)
+            while window_start <= self.dates[-1]:
+                window_vars, window_const = [], 0
+                for offset in range(limit + 1):
+                    day_vars, day_const = self._work_terms(user_id_str, window_start + timedelta(days=offset))
+                    window_vars.extend(day_vars)
+                    window_const += day_const
+                if window_vars:
+                    self.model.Add(sum(window_vars) <= max(0, limit - window_const))
+                window_start += one_day
+
+            if self.mandatory_rest_days <= 0:
+                continue
+
+            # Ruhetage: explizite Freieinträge direkt vor dem Tag, davor ein voller Block
+            for current_date in self.dates:
+                day_vars, _ = self._work_terms(user_id_str, current_date)
+                if not day_vars:
+                    continue
+                free_days = 0
+                check_date = current_date - one_day
+                while True:
+                    code = grid.get_code(user_id_str, check_date)
+                    if code == grid.NO_ENTRY or not grid.is_free_code[code]:
+                        break
+                    free_days += 1
+                    check_date -= one_day
+                if not (0 < free_days < self.mandatory_rest_days):
+                    continue
+
+                block_vars, block_const = [], 0
+                for offset in range(limit):
+                    b_vars, b_const = self._work_terms(user_id_str, check_date - timedelta(days=offset))
+                    block_vars.extend(b_vars)
+                    block_const += b_const
+                if block_const + len(block_vars) < limit:
+                    continue  # Block kann nicht voll sein
+                self.model.Add(sum(day_vars) + sum(block_vars) <= max(0, limit - block_const))
+
+    def _add_dog_constraints(self):
+        """Zwei Hundeführer mit demselben Hund: keine gleiche oder überlappende Schicht am selben Tag."""
+        dog_members = defaultdict(list)
+        for u in self.all_users:
+            dog = u.get('diensthund')
+            if u.get('id') is not None and dog and dog != '---':
+                dog_members[dog].append(str(u['id']))
+
+        def conflicts(shift_a, shift_b):
+            return shift_a == shift_b or self.helpers.check_time_overlap_optimized(shift_a, shift_b)
+
+        for members in dog_members.values():
+            if len(members) < 2:
+                continue
+            for current_date in self.dates:
+                for i, user_a in enumerate(members):
+                    for (uid, d, shift_a), var_a in list(self._vars_of_day(user_a, current_date)):
+                        for user_b in members:
+                            if user_b == user_a:
+                                continue
+                            fixed_b = self.state_grid.get(user_b, current_date)
+                            if fixed_b and fixed_b not in self.free_shifts_indicators and conflicts(shift_a, fixed_b):
+                                self.model.Add(var_a == 0)
+                                continue
+                            if members.index(user_b) < i:
+                                continue  # Paar wurde bereits andersherum behandelt
+                            for (_uid, _d, shift_b), var_b in self._vars_of_day(user_b, current_date):
+                                if conflicts(shift_a, shift_b):
+                                    self._forbid_pair(var_a, var_b)
+
+    def _user_hours_expr(self, user_id_str):
+        """Monatsstunden (Zehntel) als (lineare Summe der Variablen, Konstante)."""
+        scale = self.HOURS_SCALE
+        terms = [int(round(self.shift_hours.get(s, 0.0) * scale)) * var
+                 for s, var in self.x_by_user[user_id_str]]
+        fixed = int(round(self.live_user_hours.get(int(user_id_str), 0.0) * scale))
+        return terms, fixed
+
+    def _add_hours_constraints_and_objective(self, needs):
+        """Max. Monatsstunden (hart), Fairness und Mindeststunden (Ziel)."""
+        scale = self.HOURS_SCALE
+        hour_exprs = {uid: self._user_hours_expr(uid) for uid in self.user_id_strs}
+        self.hour_exprs = hour_exprs
+
+        # Zielwert für die Fairness: Durchschnitt, falls der Bedarf vollständig gedeckt wird
+        demand = sum(int(round(self.shift_hours.get(s, 0.0) * scale)) * n for (d, s), n in needs.items())
+        total_fixed = sum(fixed for _terms, fixed in hour_exprs.values())
+        # Rolling Horizon: Abweichung aus den Vormonaten fließt in den Fairness-Vergleich ein
+        offsets = {uid: int(round(self.horizon_hour_offsets.get(int(uid), 0.0) * scale))
+                   for uid in self.user_id_strs}
+        target = (total_fixed + demand + sum(offsets.values())) // max(1, len(self.user_id_strs))
+        upper = int((self.MAX_MONTHLY_HOURS + 24 * len(self.dates)) * scale) + max(
+            [abs(o) for o in offsets.values()], default=0)
+
+        fairness_weight = max(1, int(round(self.fairness_score_multiplier * 10)))
+        min_hours_weight = max(1, int(round(self.min_hours_score_multiplier * 10)))
+
+        for user_id_str, (terms, fixed) in hour_exprs.items():
+            user_pref = self.user_preferences[user_id_str]
+            max_hours = user_pref.get('max_monthly_hours')
+            if max_hours is None:
+                max_hours = self.MAX_MONTHLY_HOURS
+            if terms:
+                self.model.Add(sum(terms) <= max(0, int(round(max_hours * scale)) - fixed))
+
+            hours = sum(terms) + fixed
+            fairness_hours = hours + offsets[user_id_str]
+            deviation = self.model.NewIntVar(0, upper, f"dev_{user_id_str}")
+            self.model.Add(deviation >= fairness_hours - target)
+            self.model.Add(deviation >= target - fairness_hours)
+            self.objective_terms.append(fairness_weight * deviation)
+
+            min_hours = user_pref.get('min_monthly_hours')
+            if min_hours is not None:
+                shortfall = self.model.NewIntVar(0, upper, f"short_{user_id_str}")
+                self.model.Add(shortfall >= int(round(min_hours * scale)) - hours)
+                self.objective_terms.append(min_hours_weight * shortfall)
+
+    def _add_weekend_constraints(self):
+        """Mind. ein komplett freies Wochenende je Mitarbeiter (WeekendManager)."""
+        if not self.weekend_manager or not self.weekend_manager.weekends:
+            return
+
+        for user_id_str in self.user_id_strs:
+            free_flags = []
+            weekend_day_vars = []
+            for sat, sun in self.weekend_manager.weekends:
+                sat_vars, sat_const = self._work_terms(user_id_str, sat, hard_only=False)
+                sun_vars, sun_const = self._work_terms(user_id_str, sun, hard_only=False)
+                weekend_day_vars.extend(sat_vars + sun_vars)
+                if sat_const or sun_const:
+                    continue  # Bereits durch feste Einträge "verbrannt"
+                flag = self.model.NewBoolVar(f"we_free_{user_id_str}_{sat.day}")
+                if sat_vars or sun_vars:
+                    self.model.Add(sum(sat_vars + sun_vars) == 0).OnlyEnforceIf(flag)
+                free_flags.append(flag)
+
+            if free_flags:
+                self.model.AddBoolOr(free_flags)
+            else:
+                # Wie WeekendManager: kein Wochenende mehr frei -> keine weiteren Wochenend-Dienste
+                for var in weekend_day_vars:
+                    self.model.Add(var == 0)
+
+    def _add_coverage_constraints(self, needs):
+        """Besetzung je (Tag, Schicht): genau der Restbedarf, Fehlmengen über Schlupfvariablen."""
+        vars_by_slot = defaultdict(list)
+        for (uid, d, s), var in self.x.items():
+            vars_by_slot[(d, s)].append(var)
+
+        slack_vars = {}
+        for slot, needed in needs.items():
+            if needed <= 0:
+                continue
+            slack = self.model.NewIntVar(0, needed, f"slack_{slot[0].day}_{slot[1]}")
+            self.model.Add(sum(vars_by_slot[slot]) + slack == needed)
+            slack_vars[slot] = slack
+        return slack_vars
+
+    # --- Zielfunktion (Soft-Scores) ---
+
+    def _add_partner_objective(self):
+        """Bevorzugte Partner in derselben Schicht belohnen, Avoid-Partner bestrafen."""
+        for priority_map, weight, sign in ((self.partner_priority_map, self.WEIGHT_PARTNER, -1),
+                                           (self.avoid_priority_map, self.WEIGHT_AVOID, 1)):
+            for user_id_int, entries in list(priority_map.items()):
+                for prio, other_id_int in entries:
+                    if user_id_int > other_id_int:
+                        continue  # Paare sind symmetrisch hinterlegt
+                    pair_weight = max(1, weight // max(1, prio))
+                    self._add_pair_terms(str(user_id_int), str(other_id_int), pair_weight, sign)
+
+    def _add_pair_terms(self, user_a, user_b, weight, sign):
+        for current_date in self.dates:
+            for shift_abbrev in self.shifts_to_plan:
+                term_a = self._shift_term(user_a, current_date, shift_abbrev)
+                term_b = self._shift_term(user_b, current_date, shift_abbrev)
+                a_const, b_const = isinstance(term_a, int), isinstance(term_b, int)
+                if a_const and b_const:
+                    continue
+                if a_const or b_const:
+                    if (term_a if a_const else term_b):
+                        self.objective_terms.append(sign * weight * (term_b if a_const else term_a))
+                    continue
+                together = self.model.NewBoolVar(f"pair_{user_a}_{user_b}_{current_date.day}_{shift_abbrev}")
+                if sign < 0:
+                    # Belohnung: together nur, wenn beide eingeteilt sind
+                    self.model.AddImplication(together, term_a)
+                    self.model.AddImplication(together, term_b)
+                else:
+                    # Strafe: together muss wahr sein, wenn beide eingeteilt sind
+                    self.model.AddBoolOr([term_a.Not(), term_b.Not(), together])
+                self.objective_terms.append(sign * weight * together)
+
+    def _add_isolation_objective(self):
+        """Einzelne Arbeitstage zwischen freien Tagen bestrafen."""
+        weight = max(1, int(round(self.isolation_score_multiplier * 10)))
+        one_day = timedelta(days=1)
+
+        for user_id_str in self.user_id_strs:
+            for current_date in self.dates:
+                day_vars, day_const = self._work_terms(user_id_str, current_date, hard_only=False)
+                if not day_vars:
+                    continue
+                prev_vars, prev_const = self._work_terms(user_id_str, current_date - one_day, hard_only=False)
+                next_vars, next_const = self._work_terms(user_id_str, current_date + one_day, hard_only=False)
+                if prev_const or next_const:
+                    continue
+                isolated = self.model.NewBoolVar(f"iso_{user_id_str}_{current_date.day}")
+                self.model.Add(isolated >= sum(day_vars) - sum(prev_vars) - sum(next_vars))
+                self.objective_terms.append(weight * isolated)
+
+    def _add_ratio_objective(self):
+        """Abweichung vom gewünschten T/N-Verhältnis (ratio_preference_scale) bestrafen."""
+        day_shifts = [s for s in self.shifts_to_plan if s in ('T.', '6')]
+        if "N." not in self.shifts_to_plan or not day_shifts:
+            return
+
+        for user_id_str in self.user_id_strs:
+            scale_pref = self.user_preferences[user_id_str].get('ratio_preference_scale', 50)
+            if scale_pref == 50:
+                continue
+            counts = self.live_shift_counts_ratio[int(user_id_str)]
+            day_count = sum(var for s, var in self.x_by_user[user_id_str] if s in day_shifts)
+            night_count = sum(var for s, var in self.x_by_user[user_id_str] if s == "N.")
+            day_count = day_count + counts.get('T_OR_6', 0)
+            night_count = night_count + counts.get('N_DOT', 0)
+
+            bound = 100 * 2 * (len(self.dates) + 62)
+            deviation = self.model.NewIntVar(0, bound, f"ratio_{user_id_str}")
+            self.model.Add(deviation >= 100 * day_count - scale_pref * (day_count + night_count))
+            self.model.Add(deviation >= scale_pref * (day_count + night_count) - 100 * day_count)
+            self.objective_terms.append(self.WEIGHT_RATIO * deviation)
+
+    # --- Lösung übernehmen ---
+
+    def _apply_solution(self, values, slack_values):
+        for (user_id_str, current_date, shift_abbrev), value in values.items():
+            if not value:
+                continue
+            user_id_int = int(user_id_str)
+            self.state_grid.set(user_id_str, current_date, shift_abbrev)
+            self.live_user_hours[user_id_int] += self.shift_hours.get(shift_abbrev, 0.0)
+            self.live_shift_counts[user_id_int][shift_abbrev] += 1
+            if shift_abbrev in ['T.', '6']:
+                self.live_shift_counts_ratio[user_id_int]['T_OR_6'] += 1
+            if shift_abbrev == 'N.':
+                self.live_shift_counts_ratio[user_id_int]['N_DOT'] += 1
+
+        for (current_date, shift_abbrev), remaining in sorted(slack_values.items()):
+            if remaining > 0:
+                self.unfilled_slots += remaining
+                self.unfilled_by_slot[(current_date, shift_abbrev)] = remaining
+                self.log(
+                    f"[WARN] Tag {current_date.day}: Konnte {shift_abbrev} nicht voll besetzen (Fehlen: {remaining})")
@@ -0,0 +1,377 @@
+# dhf_app/generator/state_grid.py
+
+from array import array
+from collections import defaultdict
+from datetime import date, timedelta
+
+
+def next_run_values(code, prev_code, prev_work, prev_same, prev_free, is_hard_work, is_free):
+    """
+    Berechnet die laufenden Zähler (work, same, free) einer Zelle aus ihrem Code
+    und den Zählern des Vortags. Gemeinsame Regel für Raster und Overlay.
+    """
+    work = prev_work + 1 if is_hard_work[code] else 0
+    if code == ShiftStateGrid.NO_ENTRY or is_free[code]:
+        same = 0
+    else:
+        same = prev_same + 1 if code == prev_code else 1
+    free = prev_free + 1 if is_free[code] else 0
+    return work, same, free
+
+
+class ShiftStateGrid:
+    """
+    Kompakter Planungsstatus des Generators.
+
+    Hält den Plan als dichtes (Benutzer x Tage)-Raster aus kleinen Integer-Codes
+    statt als verschachteltes Dict {user_id_str: {date_str: abbrev}}.
+    Das Fenster umfasst Vormonat, Planungsmonat und Folgemonat, sodass die
+    Helfer keine Sonderfälle für Monatsgrenzen mehr benötigen.
+
+    Code 0 steht für "kein Eintrag" (entspricht None im alten Dict-Format),
+    alle weiteren Codes werden über die Abkürzungstabelle aufgelöst.
+    Die Umwandlung in das Dict-Format erfolgt nur an den Grenzen
+    (Laden aus dem DataManager, Speichern in die Datenbank).
+    """
+
+    NO_ENTRY = 0
+
+    def __init__(self, window_start, window_end, user_ids, abbreviations,
+                 free_shifts_indicators, hard_work_indicators):
+        self.window_start = window_start
+        self.window_end = window_end
+        self._start_ordinal = window_start.toordinal()
+        self.num_days = (window_end - window_start).days + 1
+
+        # Zeilen-Index je Benutzer (Schlüssel wie im restlichen Generator: str(user_id))
+        self.user_ids = []
+        self.row_of = {}
+        for uid in user_ids:
+            uid_str = str(uid)
+            if uid_str in self.row_of:
+                continue
+            self.row_of[uid_str] = len(self.user_ids)
+            self.user_ids.append(uid_str)
+
+        self.free_shifts_indicators = set(free_shifts_indicators)
+        self.hard_work_indicators = set(hard_work_indicators)
+
+        # Code-Tabelle: Index -> Abkürzung (Index 0 = kein Eintrag)
+        self.abbrev_of = [None]
+        self.code_of = {}
+        # Vorberechnete Eigenschaften je Code (schneller als Set-Lookups auf Strings)
+        self.is_free_code = [False]
+        self.is_hard_work_code = [False]
+
+        # Leerer String (z.B. gesperrte leere Zelle) bekommt immer einen festen Code
+        self.code_for("")
+        for abbrev in abbreviations:
+            self.code_for(abbrev)
+
+        size = len(self.user_ids) * self.num_days
+        self.codes = array('H', bytes(2 * size))
+        self.locked = bytearray(size)
+
+        # Laufende Zähler je Zelle (jeweils inkl. des Tages selbst):
+        # - work_run: ununterbrochene harte Arbeitstage bis zu diesem Tag
+        # - same_run: gleiche Arbeitsschicht in Folge bis zu diesem Tag
+        # - free_run: freie Tage in Folge bis zu diesem Tag (Abstand zum letzten Block)
+        # Sie werden bei jedem set() ab der geänderten Spalte vorwärts fortgeschrieben.
+        self.work_run = array('H', bytes(2 * size))
+        self.same_run = array('H', bytes(2 * size))
+        self.free_run = array('H', bytes(2 * size))
+
+        # Versionszähler je Zeile: wird bei jeder Änderung erhöht (Schlüssel für Memo-Caches)
+        self.row_versions = [0] * len(self.user_ids)
+
+        # Undo-Log für simulierte Zuweisungen (snapshot/restore), None = inaktiv
+        self._undo_log = None
+        self._snapshot_depth = 0
+
+    @classmethod
+    def from_data_manager(cls, data_manager, free_shifts_indicators, hard_work_indicators):
+        """
+        Baut das Raster aus den Daten des ShiftPlanDataManager
+        (Vormonat, Planungsmonat inkl. gesicherter Zellen, Folgemonat).
+        """
+        start_curr = date(data_manager.year, data_manager.month, 1)
+        window_start = (start_curr - timedelta(days=1)).replace(day=1)
+        next_start = (start_curr.replace(day=28) + timedelta(days=4)).replace(day=1)
+        window_end = (next_start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+        # Alle Benutzer, die im Fenster vorkommen (auch inaktive mit bestehenden Einträgen)
+        user_ids = [u['id'] for u in data_manager.all_users if u.get('id') is not None]
+        for source in (data_manager.existing_shifts_data, data_manager.prev_month_shifts,
+                       data_manager.next_month_shifts, data_manager.locked_shifts_data):
+            user_ids.extend(source.keys())
+
+        abbreviations = [st.abbreviation for st in
+                         sorted(data_manager.shift_types.values(), key=lambda st: st.id)]
+
+        grid = cls(window_start, window_end, user_ids, abbreviations,
+                   free_shifts_indicators, hard_work_indicators)
+        grid.load_dict(data_manager.prev_month_shifts)
+        grid.load_dict(data_manager.next_month_shifts)
+        grid.load_dict(data_manager.existing_shifts_data)
+        grid.load_dict(data_manager.locked_shifts_data, locked=True)
+        grid.rebuild_runs()
+        return grid
+
+    # --- Code-Tabelle ---
+
+    def code_for(self, abbrev):
+        """Gibt den Code einer Abkürzung zurück und legt unbekannte Abkürzungen an."""
+        if abbrev is None:
+            return self.NO_ENTRY
+        code = self.code_of.get(abbrev)
+        if code is None:
+            code = len(self.abbrev_of)
+            self.abbrev_of.append(abbrev)
+            self.code_of[abbrev] = code
+            self.is_free_code.append(abbrev in self.free_shifts_indicators)
+            self.is_hard_work_code.append(abbrev in self.hard_work_indicators)
+        return code
+
+    # --- Index-Berechnung ---
+
+    def row(self, user_id_str):
+        """Zeilen-Index eines Benutzers oder None."""
+        return self.row_of.get(user_id_str)
+
+    def row_version(self, user_id_str):
+        """Änderungszähler der Zeile eines Benutzers (0 für unbekannte Benutzer)."""
+        row = self.row_of.get(user_id_str)
+        return self.row_versions[row] if row is not None else 0
+
+    def col(self, date_obj):
+        """Spalten-Index eines Datums oder -1, wenn es außerhalb des Fensters liegt."""
+        col = date_obj.toordinal() - self._start_ordinal
+        if 0 <= col < self.num_days:
+            return col
+        return -1
+
+    def date_of(self, col):
+        return self.window_start + timedelta(days=col)
+
+    def code_at(self, row, col):
+        """Roh-Zugriff über Indizes (ohne Grenzprüfung der Zeile)."""
+        if col < 0 or col >= self.num_days:
+            return self.NO_ENTRY
+        return self.codes[row * self.num_days + col]
+
+    # --- Zugriff über Benutzer-ID und Datum ---
+
+    def get_code(self, user_id_str, date_obj):
+        row = self.row_of.get(user_id_str)
+        if row is None:
+            return self.NO_ENTRY
+        col = date_obj.toordinal() - self._start_ordinal
+        if col < 0 or col >= self.num_days:
+            return self.NO_ENTRY
+        return self.codes[row * self.num_days + col]
+
+    def get(self, user_id_str, date_obj):
+        """Schicht-Abkürzung an einem Tag oder None (kein Eintrag)."""
+        return self.abbrev_of[self.get_code(user_id_str, date_obj)]
+
+    def set(self, user_id_str, date_obj, abbrev):
+        """Setzt (oder löscht bei None) den Eintrag eines Benutzers an einem Tag."""
+        row = self.row_of.get(user_id_str)
+        if row is None:
+            row = self._add_user(user_id_str)
+        col = self.col(date_obj)
+        if col < 0:
+            raise ValueError(f"Datum {date_obj} liegt außerhalb des Planungsfensters.")
+        idx = row * self.num_days + col
+        code = self.code_for(abbrev)
+        if self.codes[idx] == code:
+            return
+        if self._undo_log is not None:
+            self._undo_log.append((idx, self.codes[idx], None, None, None))
+        self.codes[idx] = code
+        self.row_versions[row] += 1
+        self._update_runs(row, col)
+
+    def is_locked(self, user_id_str, date_obj):
+        row = self.row_of.get(user_id_str)
+        if row is None:
+            return False
+        col = self.col(date_obj)
+        if col < 0:
+            return False
+        return bool(self.locked[row * self.num_days + col])
+
+    def is_working(self, user_id_str, date_obj):
+        """True, wenn ein Eintrag existiert, der keine Freischicht ist."""
+        code = self.get_code(user_id_str, date_obj)
+        return code != self.NO_ENTRY and not self.is_free_code[code]
+
+    def entries_on(self, date_obj):
+        """
+        Liefert alle Einträge eines Tages als (user_id_str, abbrev, is_locked).
+        Zellen ohne Eintrag und ohne Sperre werden übersprungen.
+        """
+        col = self.col(date_obj)
+        if col < 0:
+            return
+        num_days = self.num_days
+        for row, uid_str in enumerate(self.user_ids):
+            idx = row * num_days + col
+            code = self.codes[idx]
+            locked = bool(self.locked[idx])
+            if code != self.NO_ENTRY or locked:
+                yield uid_str, self.abbrev_of[code], locked
+
+    # --- Laufende Zähler (Streaks) ---
+
+    def work_streak_before(self, user_id_str, date_obj):
+        """Harte Arbeitstage in Folge direkt *vor* date_obj."""
+        idx = self._index_before(user_id_str, date_obj)
+        return self.work_run[idx] if idx >= 0 else 0
+
+    def same_streak_before(self, user_id_str, date_obj, abbrev):
+        """Wie oft 'abbrev' direkt *vor* date_obj in Folge geplant ist."""
+        idx = self._index_before(user_id_str, date_obj)
+        if idx < 0 or self.codes[idx] != self.code_of.get(abbrev):
+            return 0
+        return self.same_run[idx]
+
+    def free_streak_before(self, user_id_str, date_obj):
+        """
+        Freie Tage in Folge direkt *vor* date_obj sowie die Länge des
+        Arbeitsblocks davor, als Tupel (free_days, work_block_length).
+        """
+        idx = self._index_before(user_id_str, date_obj)
+        if idx < 0:
+            return 0, 0
+        free_days = self.free_run[idx]
+        if free_days == 0:
+            return 0, 0
+        col = (idx % self.num_days) - free_days
+        if col < 0:
+            return free_days, 0
+        return free_days, self.work_run[idx - free_days]
+
+    def rebuild_runs(self):
+        """Berechnet alle laufenden Zähler neu (nach dem Laden oder als Konsistenz-Fallback)."""
+        for row in range(len(self.user_ids)):
+            self._update_runs(row, 0, full=True)
+
+    def snapshot(self):
+        """
+        Startet eine Simulation: Alle folgenden set()-Aufrufe werden protokolliert
+        und können mit restore(token) rückgängig gemacht werden. Verschachtelbar.
+        """
+        if self._undo_log is None:
+            self._undo_log = []
+        self._snapshot_depth += 1
+        return len(self._undo_log)
+
+    def restore(self, token):
+        """Setzt den Zustand (Codes und Zähler) auf den Stand von snapshot() zurück."""
+        log = self._undo_log
+        while len(log) > token:
+            idx, code, work, same, free = log.pop()
+            if work is None:
+                self.codes[idx] = code
+                self.row_versions[idx // self.num_days] += 1
+            else:
+                self.work_run[idx] = work
+                self.same_run[idx] = same
+                self.free_run[idx] = free
+        self._snapshot_depth -= 1
+        if self._snapshot_depth <= 0:
+            self._snapshot_depth = 0
+            self._undo_log = None
+
+    def _index_before(self, user_id_str, date_obj):
+        row = self.row_of.get(user_id_str)
+        if row is None:
+            return -1
+        col = date_obj.toordinal() - self._start_ordinal - 1
+        if col < 0 or col >= self.num_days:
+            return -1
+        return row * self.num_days + col
+
+    def _update_runs(self, row, col, full=False):
+        """
+        Schreibt die Zähler ab 'col' vorwärts fort. Bricht ab, sobald sich ein
+        Folgetag nicht mehr ändert (typisch: der nächste Tag ist noch leer),
+        daher im Generator-Ablauf praktisch O(1) pro Zuweisung.
+        """
+        num_days = self.num_days
+        base = row * num_days
+        codes = self.codes
+        work_run, same_run, free_run = self.work_run, self.same_run, self.free_run
+        is_hard_work, is_free = self.is_hard_work_code, self.is_free_code
+        undo = self._undo_log
+
+        for c in range(col, num_days):
+            idx = base + c
+            code = codes[idx]
+            if c > 0:
+                prev_code = codes[idx - 1]
+                prev_work, prev_same, prev_free = work_run[idx - 1], same_run[idx - 1], free_run[idx - 1]
+            else:
+                prev_code, prev_work, prev_same, prev_free = self.NO_ENTRY, 0, 0, 0
+
+            work, same, free = next_run_values(code, prev_code, prev_work, prev_same, prev_free,
+                                               is_hard_work, is_free)
+
+            if work == work_run[idx] and same == same_run[idx] and free == free_run[idx]:
+                if c > col and not full:
+                    break
+                continue
+            if undo is not None:
+                undo.append((idx, None, work_run[idx], same_run[idx], free_run[idx]))
+            work_run[idx] = work
+            same_run[idx] = same
+            free_run[idx] = free
+
+    # --- Konvertierung an den Grenzen ---
+
+    def load_dict(self, shifts_data, locked=False):
+        """Übernimmt Daten im Format {user_id_str: {date_str: abbrev}}."""
+        for uid_str, days in shifts_data.items():
+            uid_str = str(uid_str)
+            row = self.row_of.get(uid_str)
+            if row is None:
+                row = self._add_user(uid_str)
+            base = row * self.num_days
+            for date_str, abbrev in days.items():
+                col = self.col(date.fromisoformat(date_str))
+                if col < 0:
+                    continue
+                if locked:
+                    self.locked[base + col] = 1
+                self.codes[base + col] = self.code_for(abbrev)
+
+    def to_dict(self, start_date, end_date):
+        """
+        Exportiert den Bereich [start_date, end_date] im Format
+        {user_id_str: {date_str: abbrev}} (nur Zellen mit Eintrag).
+        """
+        result = defaultdict(dict)
+        first_col = max(0, start_date.toordinal() - self._start_ordinal)
+        last_col = min(self.num_days - 1, end_date.toordinal() - self._start_ordinal)
+        date_strs = [self.date_of(c).strftime('%Y-%m-%d') for c in range(first_col, last_col + 1)]
+
+        for row, uid_str in enumerate(self.user_ids):
+            base = row * self.num_days
+            for offset, col in enumerate(range(first_col, last_col + 1)):
+                code = self.codes[base + col]
+                if code != self.NO_ENTRY:
+                    result[uid_str][date_strs[offset]] = self.abbrev_of[code]
+        return result
+
+    def _add_user(self, user_id_str):
+        """Erweitert das Raster um eine Zeile (nur für Benutzer außerhalb der Ladedaten)."""
+        row = len(self.user_ids)
+        self.row_of[user_id_str] = row
+        self.user_ids.append(user_id_str)
+        self.codes.extend(array('H', bytes(2 * self.num_days)))
+        self.locked.extend(bytearray(self.num_days))
+        for counter in (self.work_run, self.same_run, self.free_run):
+            counter.extend(array('H', bytes(2 * self.num_days)))
+        self.row_versions.append(0)
+        return row
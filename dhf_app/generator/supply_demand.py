@@ -0,0 +1,124 @@
+# dhf_app/generator/supply_demand.py
+
+import calendar
+from datetime import date
+
+# --- Angebot/Bedarf-Profil des Monats ---
+# Für jeden Slot (Tag, Schicht) aus shifts_to_plan wird in einem Durchlauf
+# verglichen, wie viele Mitarbeiter statisch verfügbar sind (Angebot) und wie
+# viele laut Mindestbesetzung noch fehlen (Bedarf). Das Angebot kommt aus den
+# Eligibility-Bitsets (Urlaub, Wunschfrei, Sperre, Ausschluss); abgezogen wird
+# je Tag eine Bitmaske der Mitarbeiter, die an dem Tag schon eingetragen sind
+# (z.B. QA/S-Schulungen, manuelle Schichten). Die Zählung ist damit ein
+# AND/NOT plus Popcount je Slot statt einer Schleife über alle Mitarbeiter.
+#
+# Engpässe (Puffer = Angebot - offener Bedarf) werden über den ganzen Monat
+# gerankt. Das Pre-Planning besetzt die engsten Slots vor der Tag-für-Tag-
+# Schleife; /api/generator/profile zeigt das Profil vor dem Generieren an.
+
+
+def _popcount(mask):
+    return bin(mask).count('1')
+
+
+class SupplyDemandProfile:
+    """
+    Angebot und Bedarf je (Tag, Schicht) für einen vorbereiteten Generator
+    (nach ShiftPlanGenerator.prepare). Liest nur den aktuellen Stand des
+    Rasters; nach Zuweisungen liefert refresh_slot() die neuen Werte.
+    """
+
+    def __init__(self, generator_instance):
+        self.gen = generator_instance
+        self.eligibility = generator_instance.eligibility
+
+        days_in_month = calendar.monthrange(generator_instance.year, generator_instance.month)[1]
+        self.dates = [date(generator_instance.year, generator_instance.month, d)
+                      for d in range(1, days_in_month + 1)]
+        self._bit_of = {uid_str: 1 << idx for idx, uid_str in enumerate(self.eligibility.user_id_strs)}
+
+        self.slots = []
+        for current_date in self.dates:
+            self.slots.extend(self._profile_day(current_date))
+
+    def _day_state(self, current_date):
+        """Bitmaske der an dem Tag eingetragenen Mitarbeiter und Besetzung je Schicht."""
+        busy_mask = 0
+        assigned = {}
+        free_shifts = self.gen.free_shifts_indicators
+        for uid_str, shift, is_locked in self.gen.state_grid.entries_on(current_date):
+            if shift:
+                assigned[shift] = assigned.get(shift, 0) + 1
+            if (shift and shift not in free_shifts) or is_locked:
+                busy_mask |= self._bit_of.get(uid_str, 0)
+        return busy_mask, assigned
+
+    def _profile_day(self, current_date, only_shift=None):
+        min_staffing = self.gen.data_manager.get_min_staffing_for_date(current_date)
+        shifts = [s for s in self.gen.shifts_to_plan if min_staffing.get(s, 0) > 0]
+        if only_shift is not None:
+            shifts = [s for s in shifts if s == only_shift]
+        if not shifts:
+            return []
+
+        busy_mask, assigned = self._day_state(current_date)
+        slots = []
+        for shift_abbrev in shifts:
+            required = min_staffing[shift_abbrev]
+            staffed = assigned.get(shift_abbrev, 0)
+            open_need = max(0, required - staffed)
+            available_mask = self.eligibility.available_mask(current_date, shift_abbrev)
+            supply = _popcount(available_mask & ~busy_mask)
+            slots.append({
+                'date': current_date,
+                'shift': shift_abbrev,
+                'required': required,
+                'assigned': staffed,
+                'open': open_need,
+                'supply': supply,
+                'slack': supply - open_need,
+                # Anteil des freien Angebots, den der Slot braucht (>= 1: nicht besetzbar)
+                'pressure': (open_need / supply) if supply else (float('inf') if open_need else 0.0),
+                'is_holiday': current_date in self.gen.holidays_in_month,
+            })
+        return slots
+
+    def refresh_slot(self, current_date, shift_abbrev):
+        """Profil eines Slots nach dem aktuellen Stand des Rasters (None: kein Bedarf)."""
+        slots = self._profile_day(current_date, shift_abbrev)
+        return slots[0] if slots else None
+
+    def ranked(self):
+        """Slots mit offenem Bedarf, engste zuerst (Puffer, dann Auslastung, dann Datum)."""
+        order = {s: i for i, s in enumerate(self.gen.shifts_to_plan)}
+        return sorted(
+            (slot for slot in self.slots if slot['open'] > 0),
+            key=lambda slot: (slot['slack'], -slot['pressure'], slot['date'], order[slot['shift']])
+        )
+
+    def critical_slots(self, buffer):
+        """Gerankte Slots, deren Angebot höchstens den offenen Bedarf plus Puffer deckt."""
+        return [slot for slot in self.ranked() if slot['slack'] <= buffer]
+
+    def to_dict(self, buffer, limit=None):
+        """JSON-taugliche Zusammenfassung (für /api/generator/profile)."""
+        def serialize(slot):
+            data = dict(slot, date=slot['date'].isoformat())
+            if data['pressure'] == float('inf'):
+                data['pressure'] = None
+            else:
+                data['pressure'] = round(data['pressure'], 3)
+            return data
+
+        ranked = self.ranked()
+        critical = [slot for slot in ranked if slot['slack'] <= buffer]
+        return {
+            "year": self.gen.year,
+            "month": self.gen.month,
+            "shifts_to_plan": list(self.gen.shifts_to_plan),
+            "buffer": buffer,
+            "critical_count": len(critical),
+            "uncoverable_count": sum(1 for slot in ranked if slot['slack'] < 0),
+            "bottlenecks": [serialize(slot) for slot in (ranked[:limit] if limit else ranked)],
+            "days": [serialize(slot) for slot in self.slots],
+        }
@@ -77,13 +77,10 @@ class WeekendManager:
                 continue
 
             # Prüfen anderer Wochenenden anhand der Live-Daten (und Locked Shifts)
-            sat_str = sat.strftime('%Y-%m-%d')
-            sun_str = sun.strftime('%Y-%m-%d')
-
             # Hilfsfunktion: Ist an einem Tag Arbeit?
             # Arbeit ist definiert als: Eintrag vorhanden UND nicht in free_shifts_indicators (wie 'X', 'Urlaub', etc.)
-            is_sat_work = self._is_working_day(user_id_str, sat_str)
-            is_sun_work = self._is_working_day(user_id_str, sun_str)
+            is_sat_work = self._is_working_day(user_id_str, sat)
+            is_sun_work = self._is_working_day(user_id_str, sun)
 
             if is_sat_work or is_sun_work:
                 burned_weekends_indices.add(idx)
@@ -96,21 +93,13 @@ class WeekendManager:
 
         return False
 
-    def _is_working_day(self, user_id_str, date_str):
+    def _is_working_day(self, user_id_str, date_obj):
         """
         Prüft effizient, ob an einem Tag gearbeitet wird.
         Berücksichtigt Live-Daten, Locked-Daten.
         Urlaub und Wunschfrei werden implizit als "nicht Arbeit" betrachtet,
         da sie entweder als 'X'/'U' im Plan stehen oder gar nicht belegt sind (und damit frei).
         """
-        # 1. Live-Daten (Generator-Status)
-        shift = self.gen.live_shifts_data.get(user_id_str, {}).get(date_str)
-        if shift and shift not in self.gen.free_shifts_indicators:
-            return True
-
-        # 2. Locked-Daten (Manuelle Vorbelegungen, die vllt noch nicht in Live kopiert wurden, sicherheitshalber)
-        locked_shift = self.gen.locked_shifts_data.get(user_id_str, {}).get(date_str)
-        if locked_shift and locked_shift not in self.gen.free_shifts_indicators:
-            return True
-
-        return False
\ No newline at end of file
+        # Live-Daten (Generator-Status). Gelockte Zellen sind im Raster bereits
+        # enthalten und werden vom Generator nie überschrieben.
+        return self.gen.state_grid.is_working(user_id_str, date_obj)
\ No newline at end of file
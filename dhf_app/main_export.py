@@ -2,7 +2,6 @@ import sys
 import os
 import datetime
 import imgkit
-from sqlalchemy import extract
 from flask_mail import Message
 
 # Pfad zur App finden
@@ -13,6 +12,8 @@ try:
     from dhf_app import create_app
     from dhf_app.extensions import db, mail
     from dhf_app.models import User, Shift
+    from dhf_app.date_ranges import in_month
+    from dhf_app.plan_read_model import fetch_shift_rows
 except ImportError as e:
     print(f"FEHLER: App konnte nicht geladen werden: {e}")
     sys.exit(1)
@@ -48,11 +49,10 @@ def run_export_job():
             User.email != ""
         ).all()
 
-        # Schichten laden
-        shifts_db = Shift.query.filter(
-            extract('year', Shift.date) == YEAR,
-            extract('month', Shift.date) == MONTH
-        ).all()
+        # Schichten laden (schlanke Zeilen mit Schichtart, siehe plan_read_model.py)
+        shifts_db = fetch_shift_rows(
+            in_month(Shift.date, YEAR, MONTH)
+        )
 
         # Daten aufbereiten (für das Bild)
         employees_list = [{'id': u.id, 'name': f"{u.vorname} {u.name}", 'is_active': True} for u in users]
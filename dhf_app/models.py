@@ -3,6 +3,7 @@
 from .extensions import db
 from flask_login import UserMixin
 from datetime import datetime
+import json
 # NEU: Importiere das Gamification Model (muss hier stehen, da es in to_dict() verwendet wird)
 from .models_gamification import UserGamificationStats
 
@@ -209,6 +210,13 @@ class PlanVariant(db.Model):
 
 
 class Shift(db.Model):
+    # Monats- und Zellenabfragen filtern nach Variante und Datumsbereich
+    # (siehe date_ranges.py), Personenabfragen nach Mitarbeiter und Datum
+    __table_args__ = (
+        db.Index('ix_shift_variant_date_user', 'variant_id', 'date', 'user_id'),
+        db.Index('ix_shift_user_date', 'user_id', 'date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
@@ -263,7 +271,7 @@ class SpecialDate(db.Model):
     """
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    date = db.Column(db.Date, nullable=True)
+    date = db.Column(db.Date, nullable=True, index=True)
     type = db.Column(db.String(20), nullable=False, index=True)
 
     def safe_date_iso(self, date_obj):
@@ -502,7 +510,7 @@ class ShiftQuery(db.Model):
     sender = db.relationship('User', foreign_keys=[sender_user_id])
     target_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     target_user = db.relationship('User', foreign_keys=[target_user_id])
-    shift_date = db.Column(db.Date, nullable=False)
+    shift_date = db.Column(db.Date, nullable=False, index=True)
     message = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(50), nullable=False, default='offen', index=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -631,3 +639,178 @@ class EmailTemplate(db.Model):
             "description": self.description,
             "available_placeholders": self.available_placeholders
         }
+
+
+class GeneratorJob(db.Model):
+    """
+    Ein Lauf des Schichtplan-Generators (Status, Fortschritt, Log).
+    Liegt in der DB, damit alle Worker-Prozesse denselben Stand sehen.
+
+    Solange der Job aktiv ist (queued/running), hält er für jeden Monat seines
+    Horizonts eine Zeile in GeneratorJobLock (siehe dort).
+    """
+    __tablename__ = 'generator_job'
+
+    ACTIVE_STATUSES = ('queued', 'running')
+    LOG_LIMIT = 100
+
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    variant_id = db.Column(db.Integer, db.ForeignKey('plan_variant.id', ondelete='SET NULL'), nullable=True)
+    engine = db.Column(db.String(20), nullable=False, default='greedy')
+    params = db.Column(db.Text, nullable=True)  # JSON, z.B. {"months": 3}
+
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    logs = db.Column(db.Text, nullable=True)  # JSON-Liste, Ringpuffer (LOG_LIMIT)
+    log_count = db.Column(db.Integer, nullable=False, default=0)  # Anzahl aller Log-Zeilen
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    worker_id = db.Column(db.String(100), nullable=True, index=True)  # Prozess, in dessen Pool der Job wartet/läuft
+    profile = db.Column(db.Text, nullable=True)  # JSON, Messwerte des Laufs (generator/instrumentation.py)
+
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    @staticmethod
+    def make_lock_key(year, month, variant_id):
+        return f"{int(year)}-{int(month):02d}-{variant_id if variant_id else 'main'}"
+
+    @staticmethod
+    def make_lock_keys(year, month, variant_id, months=1):
+        """Lock-Schlüssel aller Monate ab (year, month), einer je Monat."""
+        keys = []
+        y, m = int(year), int(month)
+        for _ in range(max(1, int(months))):
+            keys.append(GeneratorJob.make_lock_key(y, m, variant_id))
+            y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+        return keys
+
+    def get_params(self):
+        try:
+            return json.loads(self.params) if self.params else {}
+        except (json.JSONDecodeError, TypeError):
+            return {}
+
+    def get_logs(self):
+        try:
+            return json.loads(self.logs) if self.logs else []
+        except (json.JSONDecodeError, TypeError):
+            return []
+
+    def get_profile(self):
+        try:
+            return json.loads(self.profile) if self.profile else None
+        except (json.JSONDecodeError, TypeError):
+            return None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "year": self.year,
+            "month": self.month,
+            "variant_id": self.variant_id,
+            "engine": self.engine,
+            "params": self.get_params(),
+            "status": self.status,
+            "is_running": self.status in self.ACTIVE_STATUSES,
+            "progress": self.progress,
+            "logs": self.get_logs(),
+            "log_count": self.log_count,
+            "cancel_requested": self.cancel_requested,
+            "profile": self.get_profile(),
+            "created_by_id": self.created_by_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class GeneratorJobLock(db.Model):
+    """
+    Reservierung eines (Jahr, Monat, Variante)-Slots durch einen aktiven Generator-Job.
+    Ein Job über mehrere Monate legt alle Zeilen in einer Transaktion an; der
+    Primärschlüssel erzwingt so höchstens einen aktiven Job je Monat und Variante.
+    Die Zeilen werden gelöscht, sobald der Job endet.
+    """
+    __tablename__ = 'generator_job_lock'
+
+    lock_key = db.Column(db.String(50), primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('generator_job.id', ondelete='CASCADE'), nullable=False, index=True)
+
+
+class GeneratorWorker(db.Model):
+    """
+    Lebenszeichen eines Prozesses, der Generator-Jobs ausführt (id = "host:pid").
+    Wartende Jobs gelten nur dann als verwaist, wenn ihr Prozess hier kein
+    aktuelles heartbeat_at mehr schreibt.
+    """
+    __tablename__ = 'generator_worker'
+
+    id = db.Column(db.String(100), primary_key=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class PlanVersion(db.Model):
+    """
+    Versionszähler für zwischengespeicherte Plan-Ansichten (siehe plan_cache.py).
+    'scope' ist z.B. 'month:2025-03', 'year:2025' oder 'ref'; jede Änderung
+    an den zugehörigen Daten erhöht 'version'.
+    """
+    __tablename__ = 'plan_version'
+
+    scope = db.Column(db.String(40), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ShiftJournalEntry(db.Model):
+    """
+    Änderungsjournal des Schichtplans (siehe shift_journal.py).
+    Die id ist die fortlaufende Sequenznummer für den Delta-Abgleich;
+    kind ist 'cell' (eine Zelle user_id/date) oder 'reset' (ganzer Monat).
+    """
+    __tablename__ = 'shift_journal'
+    # AUTOINCREMENT: SQLite darf gelöschte (kompaktierte) Nummern nicht neu vergeben
+    __table_args__ = (
+        db.Index('ix_shift_journal_month', 'year', 'month', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False, default='cell')
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    variant_id = db.Column(db.Integer, nullable=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    date = db.Column(db.Date, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class TrainingStatus(db.Model):
+    """
+    Materialisierter Ausbildungsstand je Mitarbeiter (siehe training_status.py):
+    das späteste Datum einer QA- bzw. S-Schicht über alle Varianten, auch
+    wenn es in der Zukunft liegt. Wird beim Schreiben von Schichten gepflegt.
+    """
+    __tablename__ = 'training_status'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    latest_qa = db.Column(db.Date, nullable=True)
+    latest_s = db.Column(db.Date, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class VacationUsage(db.Model):
+    """
+    Verbrauchte Urlaubstage (EU-Schichten im Hauptplan) je Mitarbeiter und Jahr
+    (siehe vacation_usage.py). Wird beim Schreiben von Schichten gepflegt.
+    """
+    __tablename__ = 'vacation_usage'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    used = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
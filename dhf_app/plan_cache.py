@@ -0,0 +1,220 @@
+# dhf_app/plan_cache.py
+
+import calendar
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from sqlalchemy import event, insert, select, update, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import PlanVersion, Shift, ShiftQuery, ShiftPlanStatus, PlanVariant, User, ShiftType, Role, SpecialDate
+from .models_dogs import Dog, DogAssignment
+from .models_gamification import UserGamificationStats
+
+# --- Versionsbereiche (Scopes) ---
+# month:YYYY-MM  Schichten, Anfragen, Status und Varianten des Monats (alle Varianten)
+# year:YYYY      Hauptplan-Schichten des Jahres (Urlaubsverbrauch in der Monatsansicht)
+# shifts         jede Schichtänderung (Ausbildungs-Warnungen sehen über den Monat hinaus)
+# ref            Stammdaten der Ansicht (Mitarbeiter, Schichtarten, Hunde, XP)
+# shifttypes     nur Schichtarten (Stammdaten-Cache, siehe reference_data.py)
+# calendar       Sondertermine/Feiertage (Stammdaten-Cache)
+REF_SCOPE = 'ref'
+SHIFTS_SCOPE = 'shifts'
+SHIFTTYPES_SCOPE = 'shifttypes'
+CALENDAR_SCOPE = 'calendar'
+
+# Modelle, deren Änderung nur die Stammdaten betrifft
+_REF_MODELS = (User, ShiftType, Role, Dog, DogAssignment, UserGamificationStats)
+
+
+def month_scope(year, month):
+    return f"month:{int(year)}-{int(month):02d}"
+
+
+def year_scope(year):
+    return f"year:{int(year)}"
+
+
+def scopes_for_date(day):
+    """
+    Monats-Scopes, die eine Änderung an diesem Tag betrifft. Der Monatsletzte
+    gehört auch zur Ansicht des Folgemonats (Übertrag, Vormonats-Schichten).
+    """
+    scopes = {month_scope(day.year, day.month)}
+    next_day = day + timedelta(days=1)
+    if next_day.month != day.month:
+        scopes.add(month_scope(next_day.year, next_day.month))
+    return scopes
+
+
+def scopes_for_shift(day, variant_id):
+    """Scopes für eine geänderte Schicht (Tag, Variante)."""
+    scopes = scopes_for_date(day) | {SHIFTS_SCOPE}
+    if variant_id is None:
+        scopes.add(year_scope(day.year))
+    return scopes
+
+
+def scopes_for_month_shifts(year, month, variant_id):
+    """Scopes für Massen-Änderungen an den Schichten eines ganzen Monats."""
+    last_day = date(year, month, calendar.monthrange(year, month)[1])
+    return scopes_for_shift(last_day, variant_id)
+
+
+def snapshot_scopes(year, month, role_class):
+    """Scopes, von denen der Monats-Snapshot einer Rollenklasse abhängt."""
+    scopes = [month_scope(year, month), year_scope(year), REF_SCOPE]
+    if role_class == 'admin':
+        scopes.append(SHIFTS_SCOPE)
+    return scopes
+
+
+def read_versions(scopes):
+    """Aktuelle Versionen als Tupel (fehlende Scopes zählen als 0). Eine Abfrage."""
+    rows = db.session.execute(
+        select(PlanVersion.scope, PlanVersion.version).where(PlanVersion.scope.in_(scopes))
+    ).all()
+    versions = dict(rows)
+    return tuple(versions.get(scope, 0) for scope in scopes)
+
+
+def _bump(connection, scopes):
+    table = PlanVersion.__table__
+    # Feste Reihenfolge, damit sich parallele Schreiber nicht gegenseitig blockieren
+    for scope in sorted(scopes):
+        stmt = update(table).where(table.c.scope == scope).values(version=table.c.version + 1)
+        if connection.execute(stmt).rowcount:
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(table).values(scope=scope, version=1))
+        except IntegrityError:
+            # Gleichzeitig von einem anderen Schreiber angelegt
+            connection.execute(stmt)
+
+
+def bump_plan_versions(scopes):
+    """
+    Erhöht die Versionen innerhalb der laufenden Transaktion (für Massen-Updates
+    per Query.update/delete, die am Flush-Listener vorbeigehen).
+    """
+    if scopes:
+        _bump(db.session.connection(), scopes)
+
+
+def attribute_values(obj, attr):
+    """Aktueller und (bei Änderung) vorheriger Wert eines Attributs."""
+    history = inspect(obj).attrs[attr].history
+    values = list(history.added or ()) + list(history.deleted or ()) + list(history.unchanged or ())
+    if not values:
+        # Abgelaufenes Attribut (z.B. nach commit): vor dem Flush noch ladbar
+        values = [getattr(obj, attr, None)]
+    return values
+
+
+def _scopes_for_object(obj):
+    if isinstance(obj, Shift):
+        scopes = set()
+        for day in attribute_values(obj, 'date'):
+            if not isinstance(day, date):
+                continue
+            for variant_id in attribute_values(obj, 'variant_id'):
+                scopes |= scopes_for_shift(day, variant_id)
+        return scopes
+    if isinstance(obj, ShiftQuery):
+        scopes = set()
+        for day in attribute_values(obj, 'shift_date'):
+            if isinstance(day, date):
+                scopes |= scopes_for_date(day)
+        return scopes
+    if isinstance(obj, (ShiftPlanStatus, PlanVariant)):
+        if obj.year and obj.month:
+            return {month_scope(obj.year, obj.month)}
+        return set()
+    if isinstance(obj, ShiftType):
+        return {REF_SCOPE, SHIFTTYPES_SCOPE}
+    if isinstance(obj, SpecialDate):
+        return {CALENDAR_SCOPE}
+    if isinstance(obj, _REF_MODELS):
+        return {REF_SCOPE}
+    return set()
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_version_scopes(session, flush_context, instances):
+    """Sammelt die von diesem Flush betroffenen Scopes (Objekte sind hier noch vollständig ladbar)."""
+    scopes = session.info.setdefault('plan_version_scopes', set())
+    for obj in session.new:
+        scopes |= _scopes_for_object(obj)
+    for obj in session.deleted:
+        scopes |= _scopes_for_object(obj)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            scopes |= _scopes_for_object(obj)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_versions_after_flush(session, flush_context):
+    """Erhöht die gesammelten Versionen in derselben Transaktion wie die Änderung."""
+    scopes = session.info.pop('plan_version_scopes', None)
+    if scopes:
+        _bump(session.connection(), scopes)
+
+
+class _Snapshot:
+    __slots__ = ('token', 'body', 'etag', 'created')
+
+    def __init__(self, token, body):
+        self.token = token
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.created = time.monotonic()
+
+
+class PlanSnapshotCache:
+    """
+    Prozess-lokaler Cache der serialisierten Monatsansicht (GET /shifts).
+
+    Schlüssel: (Jahr, Monat, Variante, Rollenklasse). Ein Eintrag gilt, solange
+    die Versionen seiner Scopes (Token) unverändert sind; die Versionen liegen
+    in der DB, alle Worker sehen dieselben. Die TTL ist nur eine Absicherung für
+    Daten ohne eigenen Zähler.
+    """
+
+    def __init__(self, max_entries=64, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, token):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.token != token or time.monotonic() - entry.created > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, token, body):
+        entry = _Snapshot(token, body)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+plan_snapshot_cache = PlanSnapshotCache()
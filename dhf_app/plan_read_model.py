@@ -0,0 +1,226 @@
+# dhf_app/plan_read_model.py
+
+from sqlalchemy import select
+
+from .extensions import db
+from .models import Shift, ShiftQuery, User, Role
+from .models_dogs import Dog
+from .models_gamification import UserGamificationStats
+from .reference_data import shift_type_data
+
+# --- Lese-Modell für Plan-Ansichten ---
+# Monatsansicht, Export, Benachrichtigungen und Statistik brauchen nur einzelne
+# Spalten. Statt voller ORM-Objekte (Identity-Map, instrumentierte Attribute,
+# nachgeladene Beziehungen) werden Tupel geladen und in schlanke Zeilenobjekte
+# mit __slots__ gepackt. Die Attribute heißen wie am Modell, to_dict() liefert
+# dieselbe Struktur (außer bei QueryRow, siehe dort).
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def shift_types_by_id(shift_types=None):
+    """{id: ShiftType}; ohne Liste alle Schichtarten aus dem Stammdaten-Cache."""
+    if shift_types is None:
+        return shift_type_data().by_id
+    return {st.id: st for st in shift_types}
+
+
+class ShiftRow:
+    """Schicht ohne ORM. shift_type ist die (geteilte) Schichtart oder None."""
+
+    __slots__ = ('id', 'user_id', 'date', 'shifttype_id', 'is_locked', 'is_trade',
+                 'variant_id', 'dog_id', 'dog_name', 'shift_type')
+
+    COLUMNS = (Shift.id, Shift.user_id, Shift.date, Shift.shifttype_id, Shift.is_locked, Shift.is_trade,
+               Shift.variant_id, Shift.dog_id, Dog.name)
+
+    def __init__(self, row, types_by_id):
+        (self.id, self.user_id, self.date, self.shifttype_id, self.is_locked, self.is_trade,
+         self.variant_id, self.dog_id, self.dog_name) = row
+        self.shift_type = types_by_id.get(self.shifttype_id)
+
+    def to_dict(self):
+        abbr = ""
+        if self.shift_type:
+            abbr = self.shift_type.abbreviation
+        elif self.shifttype_id is not None:
+            abbr = "ERR"
+
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "date": self.date.isoformat(),
+            "shifttype_id": self.shifttype_id,
+            "shifttype_abbreviation": abbr,
+            "is_locked": self.is_locked,
+            "is_trade": self.is_trade,
+            "variant_id": self.variant_id,
+            "dog_id": self.dog_id,
+            "dog_name": self.dog_name
+        }
+
+
+def fetch_shift_rows(*criteria, types_by_id=None):
+    """Schichten zu den Filterbedingungen als ShiftRow, sortiert nach id."""
+    if types_by_id is None:
+        types_by_id = shift_types_by_id()
+    rows = db.session.execute(
+        select(*ShiftRow.COLUMNS)
+        .outerjoin(Dog, Shift.dog_id == Dog.id)
+        .where(*criteria)
+        .order_by(Shift.id)
+    )
+    return [ShiftRow(row, types_by_id) for row in rows]
+
+
+def iter_shift_rows(*criteria, types_by_id=None, order_by=(Shift.id,), yield_per=500):
+    """
+    Wie fetch_shift_rows, aber als Generator über einen serverseitigen Cursor
+    (für Exporte über viele Monate, siehe streaming.py).
+    """
+    if types_by_id is None:
+        types_by_id = shift_types_by_id()
+    rows = db.session.execute(
+        select(*ShiftRow.COLUMNS)
+        .outerjoin(Dog, Shift.dog_id == Dog.id)
+        .where(*criteria)
+        .order_by(*order_by)
+        .execution_options(yield_per=yield_per)
+    )
+    for row in rows:
+        yield ShiftRow(row, types_by_id)
+
+
+class RoleRow:
+    __slots__ = ('id', 'name', 'description')
+
+    def __init__(self, role_id, name, description):
+        self.id = role_id
+        self.name = name
+        self.description = description
+
+    def to_dict(self):
+        return {"id": self.id, "name": self.name, "description": self.description}
+
+
+# Spalten von User, die User.to_dict() ausgibt
+_USER_FIELDS = (
+    'id', 'vorname', 'name', 'email', 'role_id', 'geburtstag', 'telefon', 'eintrittsdatum',
+    'aktiv_ab_datum', 'inaktiv_ab_datum', 'urlaub_gesamt', 'urlaub_rest', 'diensthund',
+    'tutorial_gesehen', 'password_geaendert', 'zuletzt_online', 'shift_plan_visible',
+    'shift_plan_sort_order', 'force_password_change', 'can_see_statistics', 'active_pet_asset',
+    'active_theme', 'last_training_qa', 'last_training_shooting', 'is_manual_dog_handler',
+    'is_hidden_dog_handler', 'active_dog_id', 'failed_login_attempts',
+)
+
+
+class UserRow:
+    """Mitarbeiter ohne ORM, mit Rolle, XP-Werten und Namen des aktiven Hundes."""
+
+    __slots__ = _USER_FIELDS + ('role', 'experience_points', 'current_level', 'current_rank', 'active_dog_name')
+
+    COLUMNS = tuple(getattr(User, field) for field in _USER_FIELDS) + (
+        Role.name, Role.description,
+        UserGamificationStats.id, UserGamificationStats.points_total,
+        UserGamificationStats.current_level, UserGamificationStats.current_rank,
+        Dog.name,
+    )
+
+    def __init__(self, row):
+        for field, value in zip(_USER_FIELDS, row):
+            setattr(self, field, value)
+        (role_name, role_description, stats_id, points_total, current_level, current_rank,
+         self.active_dog_name) = row[len(_USER_FIELDS):]
+
+        self.role = RoleRow(self.role_id, role_name, role_description) if role_name is not None else None
+
+        # Wie User.to_dict(): Standardwerte ohne Gamification-Eintrag
+        if stats_id is None:
+            self.experience_points, self.current_level, self.current_rank = 0, 1, "Anwärter"
+        else:
+            self.experience_points, self.current_level, self.current_rank = points_total, current_level, current_rank
+
+    def to_dict(self):
+        return {
+            "id": self.id, "vorname": self.vorname, "name": self.name, "email": self.email,
+            "role": self.role.to_dict() if self.role else None, "role_id": self.role_id,
+            "geburtstag": _iso(self.geburtstag), "telefon": self.telefon,
+            "eintrittsdatum": _iso(self.eintrittsdatum),
+            "aktiv_ab_datum": _iso(self.aktiv_ab_datum),
+            "inaktiv_ab_datum": _iso(self.inaktiv_ab_datum),
+            "urlaub_gesamt": self.urlaub_gesamt, "urlaub_rest": self.urlaub_rest,
+            "diensthund": self.diensthund, "tutorial_gesehen": self.tutorial_gesehen,
+            "password_geaendert": _iso(self.password_geaendert),
+            "zuletzt_online": _iso(self.zuletzt_online),
+            "shift_plan_visible": self.shift_plan_visible,
+            "shift_plan_sort_order": self.shift_plan_sort_order,
+            "force_password_change": self.force_password_change,
+            "can_see_statistics": self.can_see_statistics,
+            "experience_points": self.experience_points,
+            "current_level": self.current_level,
+            "current_rank": self.current_rank,
+            "active_pet_asset": self.active_pet_asset,
+            "active_theme": self.active_theme,
+            "last_training_qa": _iso(self.last_training_qa),
+            "last_training_shooting": _iso(self.last_training_shooting),
+            "is_manual_dog_handler": self.is_manual_dog_handler,
+            "is_hidden_dog_handler": self.is_hidden_dog_handler,
+            "active_dog_id": self.active_dog_id,
+            "active_dog_name": self.active_dog_name,
+            "failed_login_attempts": self.failed_login_attempts
+        }
+
+
+def fetch_plan_users(month_start, month_end):
+    """
+    Im Plan sichtbare Mitarbeiter des Monats (aktiv bis Monatsende, nicht vor
+    dem Monat inaktiv geworden), sortiert wie in der Monatsansicht.
+    """
+    rows = db.session.execute(
+        select(*UserRow.COLUMNS)
+        .outerjoin(Role, User.role_id == Role.id)
+        .outerjoin(UserGamificationStats, UserGamificationStats.user_id == User.id)
+        .outerjoin(Dog, User.active_dog_id == Dog.id)
+        .where(
+            User.shift_plan_visible == True,
+            (User.aktiv_ab_datum.is_(None)) | (User.aktiv_ab_datum <= month_end),
+            (User.inaktiv_ab_datum.is_(None)) | (User.inaktiv_ab_datum >= month_start)
+        )
+        .order_by(User.shift_plan_sort_order, User.name)
+    )
+    return [UserRow(row) for row in rows]
+
+
+class QueryRow:
+    """
+    Anfrage ohne ORM. to_dict() ist die schlanke Form ohne Namen und Rolle von
+    Absender/Ziel (die ShiftQuery.to_dict() per Beziehung nachlädt).
+    """
+
+    __slots__ = ('id', 'sender_user_id', 'target_user_id', 'shift_date', 'message', 'status', 'created_at')
+
+    COLUMNS = (ShiftQuery.id, ShiftQuery.sender_user_id, ShiftQuery.target_user_id, ShiftQuery.shift_date,
+               ShiftQuery.message, ShiftQuery.status, ShiftQuery.created_at)
+
+    def __init__(self, row):
+        (self.id, self.sender_user_id, self.target_user_id, self.shift_date,
+         self.message, self.status, self.created_at) = row
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "sender_user_id": self.sender_user_id,
+            "target_user_id": self.target_user_id,
+            "shift_date": self.shift_date.isoformat(),
+            "message": self.message,
+            "status": self.status,
+            "created_at": _iso(self.created_at)
+        }
+
+
+def fetch_query_rows(*criteria, order_by=()):
+    """Anfragen zu den Filterbedingungen als QueryRow."""
+    rows = db.session.execute(select(*QueryRow.COLUMNS).where(*criteria).order_by(*order_by))
+    return [QueryRow(row) for row in rows]
@@ -0,0 +1,196 @@
+# dhf_app/reference_data.py
+
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+import calendar
+
+from sqlalchemy import select, or_
+
+from .extensions import db
+from .models import User, ShiftType, SpecialDate
+from .plan_cache import read_versions, bump_plan_versions, REF_SCOPE, SHIFTTYPES_SCOPE, CALENDAR_SCOPE
+
+# --- Stammdaten-Cache ---
+# Schichtarten (mit vorverarbeiteten Zeiten und Besetzungsregeln), Sondertermine
+# je Jahr und die Mitarbeiterliste je Monat ändern sich selten, werden aber von
+# Monatsansicht, Regelprüfung, Tauschbörse und Generator bei jedem Aufruf
+# gebraucht. Der Cache hält sie prozessweit. Ein Eintrag gilt, solange die
+# Versionen seiner Scopes (plan_cache.py) unverändert sind: der Flush-Listener
+# zählt sie bei jeder Änderung hoch, die Admin-Routen rufen zusätzlich
+# invalidate_reference_data() auf (verwirft die lokalen Einträge sofort und
+# erhöht die Versionen auch bei Massen-Updates).
+#
+# Die gelieferten Objekte werden geteilt und dürfen nicht verändert werden.
+
+# Art der Stammdaten -> Scope (für invalidate_reference_data)
+KIND_SCOPES = {
+    'shift_types': SHIFTTYPES_SCOPE,
+    'calendar': CALENDAR_SCOPE,
+    'users': REF_SCOPE,
+}
+
+
+class ShiftTypeRecord:
+    """Schichtart ohne ORM: dieselben Attribute wie ShiftType, to_dict() liefert eine Kopie."""
+
+    def __init__(self, data):
+        self.__dict__.update(data)
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class ShiftTypeData:
+    """
+    Alle Schichtarten und daraus abgeleitete Daten:
+
+    - shift_types: ShiftTypeRecord, sortiert wie die Besetzungstabelle
+    - by_id / by_abbreviation: Zugriff per ID bzw. Abkürzung (by_id in ID-Reihenfolge)
+    - preprocessed_times: {Abkürzung: (Start, Ende)} in Minuten, nur Arbeitsschichten mit Zeiten
+    - staffing_rules: Mindestbesetzung {'weekday_staffing': {Wochentag: {Abk.: n}}, 'holiday_staffing': {Abk.: n}}
+
+    Abgeleitete Daten entstehen in ID-Reihenfolge, wie sie der Generator bisher
+    direkt aus der Tabelle gelesen hat.
+    """
+
+    def __init__(self, shift_types):
+        by_id_order = sorted(shift_types, key=lambda st: st.id)
+        self.shift_types = shift_types
+        self.by_id = {st.id: st for st in by_id_order}
+        self.by_abbreviation = {st.abbreviation: st for st in shift_types}
+        self.preprocessed_times = _preprocess_shift_times(by_id_order)
+        self.staffing_rules = _build_staffing_rules(by_id_order)
+
+
+def _preprocess_shift_times(shift_types):
+    """Schichtzeiten (HH:MM) als Minuten-Intervalle; Übernachtschichten enden nach 24:00."""
+    preprocessed = {}
+    for st in shift_types:
+        if not st.is_work_shift or not st.start_time or not st.end_time:
+            continue
+        try:
+            s_t = datetime.strptime(st.start_time, '%H:%M').time()
+            e_t = datetime.strptime(st.end_time, '%H:%M').time()
+        except ValueError:
+            continue
+        s_min = s_t.hour * 60 + s_t.minute
+        e_min = e_t.hour * 60 + e_t.minute
+        if e_min <= s_min:
+            e_min += 24 * 60
+        preprocessed[st.abbreviation] = (s_min, e_min)
+    return preprocessed
+
+
+def _build_staffing_rules(shift_types):
+    """Mindestbesetzung je Wochentag (0 = Montag) und an Feiertagen."""
+    rules = {'weekday_staffing': {}, 'holiday_staffing': {}}
+    for st in shift_types:
+        mapping = [
+            st.min_staff_mo, st.min_staff_di, st.min_staff_mi,
+            st.min_staff_do, st.min_staff_fr, st.min_staff_sa, st.min_staff_so
+        ]
+        for day_idx, amount in enumerate(mapping):
+            if amount > 0:
+                rules['weekday_staffing'].setdefault(str(day_idx), {})[st.abbreviation] = amount
+        if st.min_staff_holiday > 0:
+            rules['holiday_staffing'][st.abbreviation] = st.min_staff_holiday
+    return rules
+
+
+class ReferenceDataCache:
+    """
+    Prozess-lokaler Cache der Stammdaten. Schlüssel -> (Scopes, Token, Wert);
+    das Token sind die Versionen der Scopes beim Laden.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, scopes, loader):
+        token = read_versions(scopes)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == token:
+                self._entries.move_to_end(key)
+                return entry[2]
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = (frozenset(scopes), token, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, scopes=None):
+        """Verwirft alle Einträge, die von einem der Scopes abhängen (None: alle)."""
+        with self._lock:
+            if scopes is None:
+                self._entries.clear()
+                return
+            for key in [key for key, entry in self._entries.items() if entry[0] & set(scopes)]:
+                del self._entries[key]
+
+
+reference_cache = ReferenceDataCache()
+
+
+def invalidate_reference_data(*kinds):
+    """
+    Für Routen, die Stammdaten ändern ('shift_types', 'calendar', 'users'):
+    erhöht die Versionen in der laufenden Transaktion (andere Worker laden
+    nach dem Commit neu) und verwirft die Einträge dieses Prozesses.
+    """
+    scopes = {KIND_SCOPES[kind] for kind in kinds}
+    bump_plan_versions(scopes)
+    reference_cache.invalidate(scopes)
+
+
+def _load_shift_type_data():
+    shift_types = db.session.execute(
+        select(ShiftType).order_by(ShiftType.staffing_sort_order, ShiftType.abbreviation)
+    ).scalars().all()
+    return ShiftTypeData([ShiftTypeRecord(st.to_dict()) for st in shift_types])
+
+
+def shift_type_data():
+    """Alle Schichtarten mit abgeleiteten Daten (siehe ShiftTypeData)."""
+    return reference_cache.get('shift_types', [SHIFTTYPES_SCOPE], _load_shift_type_data)
+
+
+def get_special_dates(year):
+    """Sondertermine des Jahres als Liste (Datum, Typ), sortiert nach ID."""
+    def load():
+        start, end = date(year, 1, 1), date(year + 1, 1, 1)
+        return tuple(db.session.execute(
+            select(SpecialDate.date, SpecialDate.type)
+            .where(SpecialDate.date >= start, SpecialDate.date < end)
+            .order_by(SpecialDate.id)
+        ).all())
+
+    return reference_cache.get(('special_dates', int(year)), [CALENDAR_SCOPE], load)
+
+
+def get_month_roster(year, month):
+    """
+    Im Plan sichtbare Mitarbeiter, die im Monat aktiv sind (User.to_dict(),
+    sortiert wie im Plan): aktiv spätestens am Monatsende und nicht schon vor
+    dem Monat inaktiv geworden.
+    """
+    def load():
+        month_end = date(year, month, calendar.monthrange(year, month)[1])
+        prev_month_end = date(year, month, 1) - timedelta(days=1)
+        users = db.session.execute(
+            select(User).where(
+                User.shift_plan_visible == True,
+                or_(User.aktiv_ab_datum.is_(None), User.aktiv_ab_datum <= month_end),
+                or_(User.inaktiv_ab_datum.is_(None), User.inaktiv_ab_datum > prev_month_end)
+            ).order_by(User.shift_plan_sort_order, User.name)
+        ).scalars().all()
+        return tuple(u.to_dict() for u in users)
+
+    return reference_cache.get(('roster', int(year), int(month)), [REF_SCOPE], load)
@@ -6,8 +6,13 @@ from .models import User, Role, ShiftType, Shift, GlobalSetting, UpdateLog, User
 from .extensions import db, bcrypt
 from flask_login import login_required, current_user
 from .utils import admin_required
+from .streaming import stream_json, wants_stream, YIELD_PER
+from .vacation_usage import load_vacation_usage, check_vacation_usage
+from .reference_data import invalidate_reference_data
 from datetime import datetime, date
-from sqlalchemy import desc, or_, func, extract
+from sqlalchemy import desc, or_
+from sqlalchemy.orm import joinedload
+import math
 # --- NEU: Import für E-Mail Service ---
 from .email_service import send_email
 # --- NEU: Import für Bild-Test ---
@@ -67,6 +72,21 @@ def get_activity_logs():
         # Sortierung: Neueste zuerst
         query = query.order_by(desc(ActivityLog.timestamp))
 
+        # Große Seiten (oder ?stream=1 / ?format=ndjson) zeilenweise vom Cursor,
+        # Struktur wie bei paginate()
+        if wants_stream(per_page):
+            page = max(page, 1)
+            if per_page < 1:
+                per_page = 20
+            total = query.order_by(None).count()
+            items = query.options(joinedload(ActivityLog.user)) \
+                .limit(per_page).offset((page - 1) * per_page).yield_per(YIELD_PER)
+            return stream_json(items, envelope={
+                "total": total,
+                "pages": math.ceil(total / per_page) if total else 0,
+                "page": page,
+            })
+
         # Paginierung
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
 
@@ -203,18 +223,7 @@ def get_users():
 
     # --- NEU: Urlaubsberechnung (Jahressicht) ---
     current_year = datetime.utcnow().year
-    eu_type = ShiftType.query.filter_by(abbreviation='EU').first()
-    vacation_usage = {}
-
-    if eu_type:
-        usage_query = db.session.query(Shift.user_id, func.count(Shift.id)) \
-            .filter(
-            Shift.shifttype_id == eu_type.id,
-            extract('year', Shift.date) == current_year,
-            Shift.variant_id == None
-        ) \
-            .group_by(Shift.user_id).all()
-        vacation_usage = {uid: count for uid, count in usage_query}
+    vacation_usage = load_vacation_usage(current_year)
 
     result = []
     for user in users:
@@ -228,6 +237,29 @@ def get_users():
     return jsonify(result), 200
 
 
+@admin_bp.route('/admin/vacation_usage', methods=['GET'])
+@admin_required
+def check_vacation_usage_route():
+    """
+    Konsistenzprüfung des Urlaubsverbrauchs: Abweichungen zwischen der Tabelle
+    vacation_usage und einer vollständigen Zählung der EU-Schichten.
+    """
+    mismatches = check_vacation_usage()
+    return jsonify({"consistent": not mismatches, "mismatches": mismatches}), 200
+
+
+@admin_bp.route('/admin/vacation_usage/rebuild', methods=['POST'])
+@admin_required
+def rebuild_vacation_usage():
+    """Baut vacation_usage neu auf, falls die Prüfung Abweichungen findet."""
+    try:
+        mismatches = check_vacation_usage(repair=True)
+        return jsonify({"repaired": len(mismatches), "mismatches": mismatches}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": f"Fehler beim Neuaufbau: {str(e)}"}), 500
+
+
 @admin_bp.route('/users', methods=['POST'])
 @admin_required
 def create_user():
@@ -256,6 +288,7 @@ def create_user():
 
         # _log_update_event("Benutzerverwaltung", f"Neuer Benutzer '{data['vorname']} {data['name']}' erstellt. (PW-Änderung erzwungen)") # DEAKTIVIERT
 
+        invalidate_reference_data('users')
         db.session.commit()
         return jsonify(new_user.to_dict()), 201
 
@@ -309,6 +342,7 @@ def update_user(user_id):
 
         # _log_update_event("Benutzerverwaltung", desc_msg) # DEAKTIVIERT
 
+        invalidate_reference_data('users')
         db.session.commit()
         return jsonify(user.to_dict()), 200
 
@@ -348,6 +382,7 @@ def delete_user(user_id):
     db.session.delete(user)
     # _log_update_event("Benutzerverwaltung", f"Benutzer '{name}' gelöscht.") # DEAKTIVIERT
 
+    invalidate_reference_data('users')
     db.session.commit()
     return jsonify({"message": "Benutzer erfolgreich gelöscht"}), 200
 
@@ -370,6 +405,7 @@ def update_user_display_settings():
 
         # _log_update_event("Mitarbeiter Sortierung", "Anzeige- und Sortiereinstellungen aktualisiert.") # DEAKTIVIERT
 
+        invalidate_reference_data('users')
         db.session.commit()
         return jsonify({"message": "Anzeige-Einstellungen gespeichert"}), 200
     except Exception as e:
@@ -571,6 +607,7 @@ def update_dog_handler_data(user_id):
                     return jsonify({"message": "Ungültiges Datumsformat für Schießen (erwartet YYYY-MM-DD)"}), 400
             user.last_training_shooting = val
 
+        invalidate_reference_data('users')
         db.session.commit()
         return jsonify(user.to_dict()), 200
 
@@ -672,6 +709,7 @@ def create_shifttype():
     )
     db.session.add(new_type)
     # _log_update_event("Schichtarten", f"Neue Schichtart '{data['name']}' erstellt.") # DEAKTIVIERT
+    invalidate_reference_data('shift_types')
     db.session.commit()
     return jsonify(new_type.to_dict()), 201
 
@@ -703,6 +741,7 @@ def update_shifttype(type_id):
     st.staffing_sort_order = data.get('staffing_sort_order', st.staffing_sort_order)
 
     # _log_update_event("Schichtarten", f"Schichtart '{st.name}' aktualisiert.") # DEAKTIVIERT
+    invalidate_reference_data('shift_types')
     db.session.commit()
     return jsonify(st.to_dict()), 200
 
@@ -718,6 +757,7 @@ def delete_shifttype(type_id):
 
     name = st.name
     db.session.delete(st)
+    invalidate_reference_data('shift_types')
     db.session.commit()
     # _log_update_event("Schichtarten", f"Schichtart '{name}' gelöscht.") # DEAKTIVIERT
     return jsonify({"message": "Schicht-Typ gelöscht"}), 200
@@ -742,6 +782,7 @@ def update_staffing_order():
                 type_map[type_id].staffing_sort_order = order
 
         # _log_update_event("Schichtarten", "Sortierreihenfolge der Besetzung (SOLL/IST) aktualisiert.") # DEAKTIVIERT
+        invalidate_reference_data('shift_types')
         db.session.commit()
         return jsonify({"message": "Sortierreihenfolge der Besetzung gespeichert"}), 200
     except Exception as e:
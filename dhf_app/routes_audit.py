@@ -2,6 +2,8 @@ from flask import Blueprint, jsonify, request
 from .models_audit import AuditLog
 from .utils import admin_required
 from sqlalchemy import desc
+from sqlalchemy.orm import joinedload
+from .streaming import stream_json, wants_stream, YIELD_PER
 
 audit_bp = Blueprint('audit', __name__, url_prefix='/api/audit')
 
@@ -11,7 +13,10 @@ audit_bp = Blueprint('audit', __name__, url_prefix='/api/audit')
 def get_logs():
     try:
         # Parameter aus der URL lesen
-        limit = request.args.get('limit', 100, type=int)
+        limit = request.args.get('limit', type=int)
+        stream = wants_stream(limit)
+        if limit is None and not stream:
+            limit = 100
         action_filter = request.args.get('action')
         user_filter = request.args.get('user')
 
@@ -28,7 +33,17 @@ def get_logs():
             query = query.filter(AuditLog.user_name.ilike(f"%{user_filter}%"))
 
         # Sortierung: Neueste zuerst
-        logs = query.order_by(desc(AuditLog.timestamp)).limit(limit).all()
+        query = query.order_by(desc(AuditLog.timestamp))
+        if limit is not None:
+            query = query.limit(limit)
+
+        # Große Exporte (oder ?stream=1 / ?format=ndjson) zeilenweise vom Cursor;
+        # ohne limit dann das gesamte Protokoll
+        if stream:
+            query = query.options(joinedload(AuditLog.user)).yield_per(YIELD_PER)
+            return stream_json(query)
+
+        logs = query.all()
 
         return jsonify([log.to_dict() for log in logs]), 200
     except Exception as e:
@@ -1,12 +1,13 @@
 from flask import Blueprint, request, jsonify, current_app
 from .models import SpecialDate, UpdateLog  # <<< UpdateLog importiert
 from .extensions import db
+from .date_ranges import in_year
+from .reference_data import invalidate_reference_data
 # --- KORREKTUR: Import aus utils.py ---
 from .utils import admin_required
 # --- ENDE KORREKTUR ---
 from flask_login import login_required
 from datetime import datetime
-from sqlalchemy import extract
 from dateutil.easter import easter
 from datetime import datetime, timedelta
 
@@ -54,7 +55,7 @@ def get_special_dates():
         try:
             query = query.filter(
                 db.or_(
-                    extract('year', SpecialDate.date) == int(year),
+                    in_year(SpecialDate.date, int(year)),
                     SpecialDate.date == None
                 )
             )
@@ -133,6 +134,7 @@ def create_special_date():
 
         _log_update_event(log_area, f"Neuer Termin '{name}' hinzugefügt am {parsed_date.strftime('%d.%m.%Y')}.")
 
+        invalidate_reference_data('calendar')
         db.session.commit()
         return jsonify(new_date.to_dict()), 201
     except Exception as e:
@@ -189,6 +191,7 @@ def update_special_date(date_id):
 
         _log_update_event(log_area, f"Termin '{event.name}' aktualisiert.")
 
+        invalidate_reference_data('calendar')
         db.session.commit()
         return jsonify(event.to_dict()), 200
     except Exception as e:
@@ -225,6 +228,7 @@ def delete_special_date(date_id):
 
         _log_update_event(log_area, f"Termin '{name}' gelöscht.")
 
+        invalidate_reference_data('calendar')
         db.session.commit()
         return jsonify({"message": "Termin gelöscht"}), 200
     except Exception as e:
@@ -280,6 +284,7 @@ def calculate_holidays():
         _log_update_event("Feiertage & Termine",
                           f"Feiertagsdaten für {year} neu berechnet (Akt.: {updated_count}, Neu: {created_count}).")
 
+        invalidate_reference_data('calendar')
         db.session.commit()
 
         return jsonify({
@@ -1,123 +1,172 @@
 # dhf_app/routes_generator.py
 
 from flask import Blueprint, request, jsonify, current_app
+from flask_login import current_user
 from .utils import admin_required
-from .models import GlobalSetting, UpdateLog, User
+from .models import GlobalSetting, UpdateLog, User, GeneratorJob
 from .extensions import db
+from .services_generator import (
+    GeneratorJobService, GENERATOR_ENGINES, DEFAULT_ENGINE, MAX_HORIZON_MONTHS, DEFAULT_JOB_STALE_SECONDS,
+    ShiftPlanGenerator
+)
 import json
-import threading
 from datetime import datetime
 
-# Wir importieren die Generator-Klasse
-try:
-    from .generator.core import ShiftPlanGenerator
-except ImportError:
-    ShiftPlanGenerator = None
-
 generator_bp = Blueprint('generator', __name__, url_prefix='/api/generator')
 
-# Globale Variablen zur Statusverfolgung
-GENERATOR_STATE = {
-    "is_running": False,
-    "progress": 0,
-    "status": "idle",
-    "logs": [],
-    "instance": None
-}
-
-
-def _generator_task(app, year, month, variant_id=None):
-    """
-    Der Hintergrund-Task, der den Generator ausführt.
-    Jetzt mit Unterstützung für Varianten.
-    """
-    with app.app_context():
-        try:
-            GENERATOR_STATE["is_running"] = True
-            GENERATOR_STATE["status"] = "running"
-            GENERATOR_STATE["progress"] = 0
-            GENERATOR_STATE["logs"] = []
-
-            def log_callback(msg, progress=None):
-                if progress is not None:
-                    GENERATOR_STATE["progress"] = progress
-                GENERATOR_STATE["logs"].append(msg)
-                if len(GENERATOR_STATE["logs"]) > 100:
-                    GENERATOR_STATE["logs"].pop(0)
-
-            if ShiftPlanGenerator:
-                # <<< NEU: variant_id übergeben
-                gen = ShiftPlanGenerator(db, year, month, log_callback, variant_id)
-                GENERATOR_STATE["instance"] = gen
-                success = gen.run()
-
-                if success:
-                    GENERATOR_STATE["status"] = "finished"
-                    GENERATOR_STATE["progress"] = 100
-
-                    # Info für Log
-                    plan_info = f"Variante {variant_id}" if variant_id else "Hauptplan"
-
-                    new_log = UpdateLog(
-                        area="Schichtplan Generator",
-                        description=f"Plan für {month:02d}/{year} ({plan_info}) erfolgreich generiert.",
-                        updated_at=datetime.utcnow()
-                    )
-                    db.session.add(new_log)
-                    db.session.commit()
-                else:
-                    GENERATOR_STATE["status"] = "error"
-            else:
-                log_callback("[CRITICAL] Generator-Klasse nicht gefunden.")
-                GENERATOR_STATE["status"] = "error"
-
-        except Exception as e:
-            GENERATOR_STATE["status"] = "error"
-            GENERATOR_STATE["logs"].append(f"[EXCEPTION] {str(e)}")
-            current_app.logger.error(f"Generator Exception: {e}")
-        finally:
-            GENERATOR_STATE["is_running"] = False
+# Status, wenn (noch) kein Job existiert
+IDLE_STATUS = {"is_running": False, "status": "idle", "progress": 0, "logs": [], "log_count": 0}
 
 
 @generator_bp.route('/start', methods=['POST'])
 @admin_required
 def start_generator():
     """
-    Startet den Generator-Prozess.
-    Erwartet optional 'variant_id' im Body.
+    Legt einen Generator-Job an und startet ihn im Hintergrund.
+    Erwartet optional 'variant_id', 'engine' ('greedy' oder 'cpsat') und
+    'months' (Anzahl aufeinanderfolgender Monate ab year/month, Standard 1) im Body.
+    Pro (Jahr, Monat, Variante) ist nur ein aktiver Job erlaubt.
     """
-    if GENERATOR_STATE["is_running"]:
-        return jsonify({"message": "Generator läuft bereits."}), 409
-
-    data = request.get_json()
+    data = request.get_json() or {}
     year = data.get('year')
     month = data.get('month')
     # <<< NEU: Variant ID auslesen
     variant_id = data.get('variant_id') # Kann None sein
 
+    engine = data.get('engine') or DEFAULT_ENGINE
+
     if not year or not month:
         return jsonify({"message": "Jahr und Monat erforderlich."}), 400
 
+    if engine not in GENERATOR_ENGINES:
+        return jsonify({"message": f"Unbekannte Engine: {engine}"}), 400
+
+    try:
+        months = int(data.get('months') or 1)
+    except (ValueError, TypeError):
+        return jsonify({"message": "Ungültige Anzahl Monate."}), 400
+    if not 1 <= months <= MAX_HORIZON_MONTHS:
+        return jsonify({"message": f"Anzahl Monate muss zwischen 1 und {MAX_HORIZON_MONTHS} liegen."}), 400
+
+    return _create_and_submit(year, month, variant_id, engine, months)
+
+
+def _create_and_submit(year, month, variant_id, engine, months):
+    stale_seconds = current_app.config.get('GENERATOR_JOB_STALE_SECONDS', DEFAULT_JOB_STALE_SECONDS)
+    job, active_job = GeneratorJobService.create_job(
+        year, month, variant_id, engine, months, current_user.id, stale_seconds
+    )
+    if not job:
+        return jsonify({
+            "message": "Generator läuft bereits für diesen Plan.",
+            "job": active_job.to_dict() if active_job else None
+        }), 409
+
     app = current_app._get_current_object()
-    # <<< NEU: variant_id an Thread übergeben
-    thread = threading.Thread(target=_generator_task, args=(app, year, month, variant_id))
-    thread.start()
+    GeneratorJobService.submit(app, job)
 
-    return jsonify({"message": "Generator gestartet."}), 202
+    return jsonify({"message": "Generator gestartet.", "job": job.to_dict()}), 202
 
 
 @generator_bp.route('/status', methods=['GET'])
 @admin_required
 def get_generator_status():
     """
-    Gibt den aktuellen Status zurück.
+    Gibt den Status eines Jobs zurück: 'job_id' oder (year, month, variant_id)
+    als Query-Parameter, sonst der zuletzt angelegte Job.
     """
-    return jsonify({
-        "is_running": GENERATOR_STATE["is_running"],
-        "status": GENERATOR_STATE["status"],
-        "progress": GENERATOR_STATE["progress"],
-        "logs": GENERATOR_STATE["logs"]
-    }), 200
+    job_id = request.args.get('job_id', type=int)
+    if job_id:
+        job = db.session.get(GeneratorJob, job_id)
+    else:
+        query = GeneratorJob.query
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+        if year and month:
+            query = query.filter_by(year=year, month=month,
+                                    variant_id=request.args.get('variant_id', type=int))
+        job = query.order_by(GeneratorJob.id.desc()).first()
+
+    if not job:
+        return jsonify(IDLE_STATUS), 200
+    return jsonify(job.to_dict()), 200
+
+
+@generator_bp.route('/jobs', methods=['GET'])
+@admin_required
+def list_generator_jobs():
+    """Die letzten Generator-Jobs (neueste zuerst), optional gefiltert nach 'status'."""
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    query = GeneratorJob.query
+    status = request.args.get('status')
+    if status:
+        query = query.filter_by(status=status)
+    jobs = query.order_by(GeneratorJob.id.desc()).limit(limit).all()
+    return jsonify([job.to_dict() for job in jobs]), 200
+
+
+@generator_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@admin_required
+def get_generator_job(job_id):
+    job = db.session.get(GeneratorJob, job_id)
+    if not job:
+        return jsonify({"message": "Job nicht gefunden."}), 404
+    return jsonify(job.to_dict()), 200
+
+
+@generator_bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_generator_job(job_id):
+    """Bricht einen wartenden oder laufenden Job ab (laufende an der nächsten Prüfstelle)."""
+    job = GeneratorJobService.request_cancel(job_id)
+    if not job:
+        return jsonify({"message": "Job nicht gefunden."}), 404
+    if job.status not in GeneratorJob.ACTIVE_STATUSES and job.status != 'cancelled':
+        return jsonify({"message": "Job ist bereits beendet.", "job": job.to_dict()}), 409
+    return jsonify({"message": "Abbruch angefordert.", "job": job.to_dict()}), 202
+
+
+@generator_bp.route('/jobs/<int:job_id>/restart', methods=['POST'])
+@admin_required
+def restart_generator_job(job_id):
+    """Startet einen beendeten, abgebrochenen oder fehlgeschlagenen Job mit denselben Parametern neu."""
+    job = db.session.get(GeneratorJob, job_id)
+    if not job:
+        return jsonify({"message": "Job nicht gefunden."}), 404
+    if job.status in GeneratorJob.ACTIVE_STATUSES:
+        return jsonify({"message": "Job läuft noch.", "job": job.to_dict()}), 409
+
+    months = job.get_params().get('months', 1)
+    return _create_and_submit(job.year, job.month, job.variant_id, job.engine, months)
+
+
+@generator_bp.route('/profile', methods=['GET'])
+@admin_required
+def get_supply_demand_profile():
+    """
+    Angebot/Bedarf-Profil eines Monats vor dem Generieren: statisch verfügbare
+    Mitarbeiter je (Tag, Schicht) gegen die Mindestbesetzung, engste Slots
+    zuerst ('bottlenecks', optional auf 'limit' gekürzt). Query-Parameter:
+    year, month, optional variant_id.
+    """
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+    variant_id = request.args.get('variant_id', type=int)
+    limit = request.args.get('limit', type=int)
+
+    if not year or not month or not 1 <= month <= 12:
+        return jsonify({"message": "Jahr und Monat erforderlich."}), 400
+    if ShiftPlanGenerator is None:
+        return jsonify({"message": "Generator nicht verfügbar."}), 500
+
+    try:
+        gen = ShiftPlanGenerator(db, year, month, log_callback=lambda msg, p=None: None, variant_id=variant_id)
+        profile = gen.supply_demand_profile()
+        return jsonify(profile.to_dict(gen.CRITICAL_BUFFER, limit)), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": f"Fehler beim Berechnen des Profils: {str(e)}"}), 500
 
 
 @generator_bp.route('/config', methods=['GET'])
@@ -142,7 +191,13 @@ def get_generator_config():
         "fairness_threshold_hours": 10.0,
         "min_hours_score_multiplier": 5.0,
         "max_monthly_hours": 170.0,
-        "shifts_to_plan": ["6", "T.", "N."]
+        "shifts_to_plan": ["6", "T.", "N."],
+        "generator_portfolio_runs": 1,
+        "generator_local_search_seconds": 0,
+        "generator_solver_time_limit_seconds": 30,
+        "generator_solver_workers": 4,
+        "generator_critical_preplanning": True,
+        "generator_profile_capture": None
     }
     return jsonify(default_config), 200
 
@@ -10,6 +10,7 @@ from .models_market import ShiftMarketOffer, ShiftMarketResponse
 from .services_shift_change import ShiftChangeService
 from .services_market import MarketService
 from .utils import admin_required
+from .streaming import stream_json, wants_stream, YIELD_PER
 
 market_bp = Blueprint('market', __name__, url_prefix='/api/market')
 
@@ -342,8 +343,14 @@ def get_market_history():
         return jsonify({"message": "Zugriff verweigert."}), 403
 
     try:
-        limit = request.args.get('limit', 50, type=int)
-        history = MarketService.get_market_history(limit)
+        limit = request.args.get('limit', type=int)
+
+        # Große Abrufe (oder ?stream=1 / ?format=ndjson) zeilenweise; ohne limit dann die gesamte Historie
+        if wants_stream(limit):
+            history = MarketService.iter_market_history(limit, yield_per=YIELD_PER)
+            return stream_json(history, serialize=dict)
+
+        history = MarketService.get_market_history(limit if limit is not None else 50)
         return jsonify(history), 200
     except Exception as e:
         return jsonify({"message": f"Fehler beim Laden der Historie: {str(e)}"}), 500
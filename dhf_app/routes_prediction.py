@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
 from .models import Shift, ShiftType, SpecialDate, User
 from .utils import admin_required
-from sqlalchemy import extract, func
+from .date_ranges import in_month
+from sqlalchemy import func
 from sqlalchemy.orm import joinedload
 from datetime import date, timedelta
 import calendar
@@ -19,8 +20,7 @@ def get_historical_factor(year, month, weekday):
     target_year = year - 1
     # Wir schauen uns den ganzen Monat im Vorjahr an
     shifts = Shift.query.join(ShiftType).filter(
-        extract('year', Shift.date) == target_year,
-        extract('month', Shift.date) == month,
+        in_month(Shift.date, target_year, month),
         ShiftType.abbreviation.in_(['K', 'KK', 'K.'])
     ).all()
 
@@ -129,8 +129,7 @@ def analyze_risk():
 
     # Daten laden
     shifts_current = Shift.query.options(joinedload(Shift.shift_type)).filter(
-        extract('year', Shift.date) == year,
-        extract('month', Shift.date) == month,
+        in_month(Shift.date, year, month),
         Shift.variant_id == variant_id
     ).all()
 
@@ -141,8 +140,7 @@ def analyze_risk():
 
     all_types = ShiftType.query.all()
     holidays = SpecialDate.query.filter(
-        extract('year', SpecialDate.date) == year,
-        extract('month', SpecialDate.date) == month,
+        in_month(SpecialDate.date, year, month),
         SpecialDate.type == 'holiday'
     ).all()
     holiday_days = {h.date.day for h in holidays}
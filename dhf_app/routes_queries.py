@@ -3,14 +3,16 @@
 from flask import Blueprint, request, jsonify, current_app
 from .models import ShiftQuery, User, FeedbackReport, UpdateLog, ShiftQueryReply, Role, UserShiftLimit, ShiftType, Shift
 from .extensions import db
+from .date_ranges import in_month
 from sqlalchemy.orm import joinedload
 from .utils import admin_required, scheduler_or_admin_required, query_roles_required
 from flask_login import login_required, current_user
-from sqlalchemy import extract, func, or_
+from sqlalchemy import func, or_
 from datetime import datetime
 from sqlalchemy.sql import select
 from sqlalchemy.exc import IntegrityError
 from .email_service import send_email
+from .plan_cache import bump_plan_versions, scopes_for_date
 from collections import defaultdict
 
 # Erstellt einen Blueprint. Alle Routen hier beginnen mit /api/queries
@@ -38,8 +40,7 @@ def _calculate_usage(user_id, year, month, shifttype_id, abbreviation):
     # 1. Zähle echte Schichten im Plan (genehmigt) -> NUR HAUPTPLAN (variant_id=None)
     shift_count = Shift.query.filter(
         Shift.user_id == user_id,
-        extract('year', Shift.date) == year,
-        extract('month', Shift.date) == month,
+        in_month(Shift.date, year, month),
         Shift.shifttype_id == shifttype_id,
         Shift.variant_id == None  # WICHTIG: Nur Hauptplan zählen!
     ).count()
@@ -49,8 +50,7 @@ def _calculate_usage(user_id, year, month, shifttype_id, abbreviation):
     search_pattern = f"Anfrage für: {abbreviation}%"
     query_count = ShiftQuery.query.filter(
         ShiftQuery.sender_user_id == user_id,
-        extract('year', ShiftQuery.shift_date) == year,
-        extract('month', ShiftQuery.shift_date) == month,
+        in_month(ShiftQuery.shift_date, year, month),
         ShiftQuery.status == 'offen',
         ShiftQuery.message.like(search_pattern)
     ).count()
@@ -100,16 +100,21 @@ def get_notifications_summary():
                 )
             ).distinct(ShiftQueryReply.query_id).subquery()
 
+            # Nur die benötigten Spalten (Absender, Text, Rolle des Absenders)
             base_query = db.session.query(
-                ShiftQuery,
+                ShiftQuery.sender_user_id,
+                ShiftQuery.message,
+                Role.name.label('sender_role_name'),
                 last_reply_user_sq.c.user_id.label('last_replier_id')
             ).filter(
                 ShiftQuery.status == 'offen'
+            ).outerjoin(
+                User, ShiftQuery.sender_user_id == User.id
+            ).outerjoin(
+                Role, User.role_id == Role.id
             ).outerjoin(
                 last_reply_user_sq,
                 ShiftQuery.id == last_reply_user_sq.c.query_id
-            ).options(
-                joinedload(ShiftQuery.sender).joinedload(User.role)
             )
 
             if user_role == 'Hundeführer':
@@ -126,9 +131,9 @@ def get_notifications_summary():
             new_notes = 0
             waiting = 0
 
-            for query, last_replier_id in query_results:
-                sender_role_name = query.sender.role.name if query.sender and query.sender.role else ""
-                is_wunsch = (sender_role_name == 'Hundeführer' and query.message.startswith("Anfrage für:"))
+            for sender_user_id, message, sender_role_name, last_replier_id in query_results:
+                sender_role_name = sender_role_name or ""
+                is_wunsch = (sender_role_name == 'Hundeführer' and message.startswith("Anfrage für:"))
 
                 if user_role == 'Planschreiber' and is_wunsch:
                     continue
@@ -136,7 +141,7 @@ def get_notifications_summary():
                 action_required = False
 
                 if last_replier_id is None:
-                    if query.sender_user_id == current_user_id:
+                    if sender_user_id == current_user_id:
                         waiting += 1
                     else:
                         action_required = True
@@ -366,8 +371,7 @@ def get_shift_queries():
         if year and month:
             try:
                 query = query.filter(
-                    extract('year', ShiftQuery.shift_date) == int(year),
-                    extract('month', ShiftQuery.shift_date) == int(month)
+                    in_month(ShiftQuery.shift_date, int(year), int(month))
                 )
             except ValueError:
                 return jsonify({"message": "Ungültiges Jahr oder Monat"}), 400
@@ -552,6 +556,8 @@ def bulk_delete_queries():
 
         # Löschen durchführen (performant via SQL DELETE)
         ShiftQuery.query.filter(ShiftQuery.id.in_(query_ids)).delete(synchronize_session=False)
+        # Massen-Löschung läuft am Flush-Listener vorbei
+        bump_plan_versions(set().union(*(scopes_for_date(q.shift_date) for q in queries)))
 
         db.session.commit()
 
@@ -1,16 +1,28 @@
 # dhf_app/routes_shifts.py
 
 from flask import Blueprint, request, jsonify, current_app
-from .models import Shift, ShiftType, User, ShiftPlanStatus, UpdateLog, ShiftQuery, SpecialDate, Role, PlanVariant
+from .models import Shift, User, ShiftPlanStatus, UpdateLog, ShiftQuery, Role, PlanVariant
 from .models_dogs import DogAssignment # NEU: Für die Historien-Abfrage
 from .extensions import db, socketio
 from .utils import admin_required
 from .models_audit import log_audit
 from flask_login import login_required, current_user
-from sqlalchemy import extract, func, or_, and_
+from sqlalchemy import or_, and_
 from sqlalchemy.orm import joinedload
+from .date_ranges import in_month, in_year
 from datetime import datetime, timedelta, date, time
 from .violation_manager import ViolationManager
+from .plan_cache import (
+    plan_snapshot_cache, read_versions, snapshot_scopes, bump_plan_versions, scopes_for_month_shifts
+)
+from .shift_journal import (
+    latest_seq, read_changed_cells, record_month_reset, maybe_compact_journal, DEFAULT_JOURNAL_RETENTION_DAYS
+)
+from .training_status import load_training_status, refresh_training_status
+from .vacation_usage import load_vacation_usage, refresh_vacation_usage
+from .plan_read_model import fetch_shift_rows, iter_shift_rows, fetch_plan_users, fetch_query_rows, shift_types_by_id
+from .streaming import stream_json, YIELD_PER
+from .reference_data import shift_type_data, get_special_dates
 import calendar
 from collections import defaultdict
 from .email_service import send_template_email
@@ -69,29 +81,6 @@ def get_quarter_dates(year, month):
     return start_date, end_date
 
 
-def get_latest_shift_date(user_id, abbreviation, limit_date):
-    """
-    Sucht das Datum der letzten Schicht eines bestimmten Typs (QA/S) vor oder am limit_date.
-    """
-    last_shift = Shift.query.join(ShiftType).filter(
-        Shift.user_id == user_id,
-        ShiftType.abbreviation == abbreviation,
-        Shift.date <= limit_date
-    ).order_by(Shift.date.desc()).first()
-
-    return last_shift.date if last_shift else None
-
-
-def has_planned_shift_between(user_id, abbreviation, start_date, end_date):
-    """Prüft monats- und variantenübergreifend, ob die Schicht bereits geplant ist."""
-    return db.session.query(Shift.id).join(ShiftType).filter(
-        Shift.user_id == user_id,
-        ShiftType.abbreviation == abbreviation,
-        Shift.date >= start_date,
-        Shift.date <= end_date
-    ).first() is not None
-
-
 def calculate_training_warnings(users, shifts_current_month, year, month):
     """
     Prüft Fälligkeiten basierend auf DB-Einträgen und tatsächlichen Schichten.
@@ -109,23 +98,36 @@ def calculate_training_warnings(users, shifts_current_month, year, month):
     # Quartalsgrenzen für den Planungsmonat
     q_start, q_end = get_quarter_dates(year, month)
 
-    for user in users:
-        # Check: Ist User Hundeführer?
-        is_hf = (user.role and user.role.name == 'Hundeführer') or user.is_manual_dog_handler
-
-        if not is_hf or user.is_hidden_dog_handler:
-            continue
+    # Eine bereits eingetragene S-Schicht in einem kommenden Monat muss
+    # auch in der früheren Monatsansicht als eingeplant gelten. Der
+    # 90-Tage-Horizont entspricht dem regulären Schießintervall und
+    # verhindert, dass beliebig weit entfernte Einträge Warnungen löschen.
+    shooting_lookahead_end = plan_view_end + timedelta(days=90)
+
+    # Nur Hundeführer (nicht ausgeblendet)
+    dog_handlers = [
+        user for user in users
+        if ((user.role and user.role.name == 'Hundeführer') or user.is_manual_dog_handler)
+        and not user.is_hidden_dog_handler
+    ]
+
+    # Letzte Schicht bis Monatsende und bereits geplante Termine aller
+    # Hundeführer auf einmal (monats- und variantenübergreifend)
+    latest_shift_dates, planned_trainings = load_training_status(
+        [user.id for user in dog_handlers],
+        plan_view_end,
+        {'QA': (q_start, q_end), 'S': (plan_view_date, shooting_lookahead_end)}
+    )
 
+    for user in dog_handlers:
         # --- A. Quartalsausbildung (QA) ---
         # 1. Letztes Datum ermitteln (DB Profil ODER letzte Schicht)
         # Vergangene QA für den Status sowie unabhängig davon jede bereits
         # geplante QA bis zum Quartalsende ermitteln. Die getrennte Prüfung
         # verhindert, dass ein manuelles Profildatum einen Zukunftstermin
         # versehentlich überlagert.
-        last_qa_shift = get_latest_shift_date(user.id, 'QA', plan_view_end)
-        qa_already_planned = has_planned_shift_between(
-            user.id, 'QA', q_start, q_end
-        )
+        last_qa_shift = latest_shift_dates.get((user.id, 'QA'))
+        qa_already_planned = (user.id, 'QA') in planned_trainings
         last_qa_manual = user.last_training_qa
 
         last_qa_real = None
@@ -166,7 +168,7 @@ def calculate_training_warnings(users, shifts_current_month, year, month):
 
         # --- B. Schießen (S) - 90 Tage ---
         # 1. Letztes Datum ermitteln
-        last_s_shift = get_latest_shift_date(user.id, 'S', plan_view_end)
+        last_s_shift = latest_shift_dates.get((user.id, 'S'))
         last_s_manual = user.last_training_shooting
 
         last_s_real = None
@@ -186,14 +188,7 @@ def calculate_training_warnings(users, shifts_current_month, year, month):
             s_due_date = last_s_real + timedelta(days=90)
             is_overdue = s_due_date < plan_view_date
 
-        # Eine bereits eingetragene S-Schicht in einem kommenden Monat muss
-        # auch in der früheren Monatsansicht als eingeplant gelten. Der
-        # 90-Tage-Horizont entspricht dem regulären Schießintervall und
-        # verhindert, dass beliebig weit entfernte Einträge Warnungen löschen.
-        shooting_lookahead_end = plan_view_end + timedelta(days=90)
-        shooting_already_planned = has_planned_shift_between(
-            user.id, 'S', plan_view_date, shooting_lookahead_end
-        )
+        shooting_already_planned = (user.id, 'S') in planned_trainings
 
         # 3. Warnung, wenn die Fälligkeit in diesem Monat (oder davor) liegt
         # und noch kein Schießtermin im sinnvollen Planungshorizont existiert.
@@ -215,7 +210,68 @@ def calculate_training_warnings(users, shifts_current_month, year, month):
 
 
 
+def _wish_query_shift_type(query, shift_types_map):
+    """Schichtart einer Wunsch-Anfrage ('Anfrage für: X?') oder None."""
+    if not query.message or not query.message.startswith("Anfrage für:"):
+        return None
+    parts = query.message.split(":")
+    if len(parts) > 1:
+        abbr = parts[1].strip().replace('?', '')
+        return shift_types_map.get(abbr)
+    return None
+
+
+def _calculate_total_hours_bulk(user_ids, year, month, shifts_current_month, shifts_prev_last_day,
+                                open_queries, shift_types_map):
+    """
+    Monatsstunden mehrerer Mitarbeiter aus bereits geladenen Daten (ohne eigene Abfragen).
+
+    - shifts_current_month: Schichten des Monats (gewählte Variante), mit shift_type
+    - shifts_prev_last_day: Hauptplan-Schichten am letzten Tag des Vormonats
+    - open_queries: offene Anfragen vom letzten Tag des Vormonats bis Monatsende
+
+    Regeln: Arbeitsschichten zählen mit ihren Stunden, am Monatsletzten ohne den
+    Übertrag (hours_spillover), der Übertrag vom Vormonatsletzten zählt dazu.
+    Offene Wunsch-Anfragen ('Anfrage für: X') zählen beim Absender wie Schichten.
+    """
+    try:
+        days_in_month = calendar.monthrange(year, month)[1]
+        last_day_of_current_month = date(year, month, days_in_month)
+        first_day_of_current_month = date(year, month, 1)
+        last_day_of_previous_month = first_day_of_current_month - timedelta(days=1)
+    except ValueError:
+        return {user_id: 0.0 for user_id in user_ids}
+
+    totals = {user_id: 0.0 for user_id in user_ids}
+
+    def add(user_id, st, shift_date):
+        if user_id not in totals or not st or not st.is_work_shift:
+            return
+        spillover = float(st.hours_spillover or 0.0)
+        if shift_date == last_day_of_previous_month:
+            if spillover > 0:
+                totals[user_id] += spillover
+            return
+        totals[user_id] += float(st.hours or 0.0)
+        if shift_date == last_day_of_current_month and spillover > 0:
+            totals[user_id] -= spillover
+
+    for shift in shifts_current_month:
+        add(shift.user_id, shift.shift_type, shift.date)
+
+    for shift in shifts_prev_last_day:
+        add(shift.user_id, shift.shift_type, last_day_of_previous_month)
+
+    for q in open_queries:
+        if q.shift_date is None or not (last_day_of_previous_month <= q.shift_date <= last_day_of_current_month):
+            continue
+        add(q.sender_user_id, _wish_query_shift_type(q, shift_types_map), q.shift_date)
+
+    return {user_id: round(total, 2) for user_id, total in totals.items()}
+
+
 def _calculate_user_total_hours(user_id, year, month, shift_types_map=None, variant_id=None):
+    """Monatsstunden eines Mitarbeiters (lädt nur dessen Daten, siehe _calculate_total_hours_bulk)."""
     try:
         days_in_month = calendar.monthrange(year, month)[1]
         last_day_of_current_month = date(year, month, days_in_month)
@@ -225,80 +281,33 @@ def _calculate_user_total_hours(user_id, year, month, shift_types_map=None, vari
         return 0.0
 
     if shift_types_map is None:
-        all_types = ShiftType.query.all()
-        shift_types_map = {st.abbreviation: st for st in all_types}
+        shift_types_map = shift_type_data().by_abbreviation
 
-    total_hours = 0.0
-
-    shifts_in_this_month = Shift.query.options(joinedload(Shift.shift_type)).filter(
+    types_by_id = shift_types_by_id(shift_types_map.values())
+    shifts_in_this_month = fetch_shift_rows(
         Shift.user_id == user_id,
-        extract('year', Shift.date) == year,
-        extract('month', Shift.date) == month,
-        Shift.variant_id == variant_id
-    ).all()
-
-    for shift in shifts_in_this_month:
-        if shift.shift_type and shift.shift_type.is_work_shift:
-            try:
-                total_hours += float(shift.shift_type.hours or 0.0)
-                if shift.date == last_day_of_current_month and (shift.shift_type.hours_spillover or 0.0) > 0:
-                    total_hours -= float(shift.shift_type.hours_spillover or 0.0)
-            except Exception:
-                pass
+        in_month(Shift.date, year, month),
+        Shift.variant_id == variant_id,
+        types_by_id=types_by_id
+    )
 
-    shifts_on_last_day_prev_month = Shift.query.options(joinedload(Shift.shift_type)).filter(
+    shifts_on_last_day_prev_month = fetch_shift_rows(
         Shift.user_id == user_id,
         Shift.date == last_day_of_previous_month,
-        Shift.variant_id == None
-    ).all()
-
-    for shift in shifts_on_last_day_prev_month:
-        if shift.shift_type and shift.shift_type.is_work_shift and (shift.shift_type.hours_spillover or 0.0) > 0:
-            try:
-                total_hours += float(shift.shift_type.hours_spillover or 0.0)
-            except Exception:
-                pass
-
-    queries_this_month = ShiftQuery.query.filter(
-        ShiftQuery.sender_user_id == user_id,
-        extract('year', ShiftQuery.shift_date) == year,
-        extract('month', ShiftQuery.shift_date) == month,
-        ShiftQuery.status == 'offen'
-    ).all()
+        Shift.variant_id == None,
+        types_by_id=types_by_id
+    )
 
-    for q in queries_this_month:
-        if q.message.startswith("Anfrage für:"):
-            parts = q.message.split(":")
-            if len(parts) > 1:
-                abbr = parts[1].strip().replace('?', '')
-                st = shift_types_map.get(abbr)
-                if st and st.is_work_shift:
-                    try:
-                        total_hours += float(st.hours or 0.0)
-                        if q.shift_date == last_day_of_current_month and (st.hours_spillover or 0.0) > 0:
-                            total_hours -= float(st.hours_spillover or 0.0)
-                    except Exception:
-                        pass
-
-    queries_prev_month_last_day = ShiftQuery.query.filter(
+    open_queries = fetch_query_rows(
         ShiftQuery.sender_user_id == user_id,
-        ShiftQuery.shift_date == last_day_of_previous_month,
+        ShiftQuery.shift_date >= last_day_of_previous_month,
+        ShiftQuery.shift_date <= last_day_of_current_month,
         ShiftQuery.status == 'offen'
-    ).all()
-
-    for q in queries_prev_month_last_day:
-        if q.message.startswith("Anfrage für:"):
-            parts = q.message.split(":")
-            if len(parts) > 1:
-                abbr = parts[1].strip().replace('?', '')
-                st = shift_types_map.get(abbr)
-                if st and st.is_work_shift and (st.hours_spillover or 0.0) > 0:
-                    try:
-                        total_hours += float(st.hours_spillover or 0.0)
-                    except Exception:
-                        pass
+    )
 
-    return round(total_hours, 2)
+    totals = _calculate_total_hours_bulk([user_id], year, month, shifts_in_this_month,
+                                         shifts_on_last_day_prev_month, open_queries, shift_types_map)
+    return totals[user_id]
 
 
 def _calculate_actual_staffing(shifts_in_month_dicts, queries_in_month_dicts, shifttypes_dicts, year, month):
@@ -364,6 +373,11 @@ def _calculate_actual_staffing(shifts_in_month_dicts, queries_in_month_dicts, sh
 @shifts_bp.route('/shifts', methods=['GET'])
 @login_required
 def get_shifts():
+    """
+    Monatsansicht des Schichtplans. Die Antwort wird je (Jahr, Monat, Variante,
+    Rollenklasse) zwischengespeichert, bis sich die zugehörigen Daten ändern
+    (siehe plan_cache.py); mit If-None-Match gibt es 304.
+    """
     try:
         year = int(request.args.get('year'))
         month = int(request.args.get('month'))
@@ -372,36 +386,61 @@ def get_shifts():
     except (TypeError, ValueError):
         return jsonify({"message": "Ungültige Parameter"}), 400
 
+    snapshot = _get_cached_snapshot(year, month, variant_id)
+
+    if snapshot.etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(snapshot.body, status=200, mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    # Browser darf speichern, muss aber jedes Mal nachfragen (304 bei unverändertem Plan)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _get_cached_snapshot(year, month, variant_id):
+    """Serialisierte Monatsansicht aus dem Cache (bzw. neu gebaut) für den aktuellen Benutzer."""
+    is_admin = bool(current_user.role and current_user.role.name == 'admin')
+    role_class = 'admin' if is_admin else 'user'
+    cache_key = (year, month, variant_id, role_class)
+    token = read_versions(snapshot_scopes(year, month, role_class))
+
+    snapshot = plan_snapshot_cache.get(cache_key, token)
+    if snapshot is None:
+        payload = _build_shifts_payload(year, month, variant_id, include_training_warnings=is_admin)
+        snapshot = plan_snapshot_cache.put(cache_key, token, current_app.json.dumps(payload).encode('utf-8'))
+    return snapshot
+
+
+def _build_shifts_payload(year, month, variant_id, include_training_warnings=False):
+    """Baut die komplette Monatsansicht für GET /shifts (ohne Cache)."""
+    # Vor den Daten lesen: Änderungen dazwischen liefert der nächste Delta-Abgleich erneut
+    sync_seq = latest_seq()
+
     current_month_start_date = date(year, month, 1)
     days_in_month = calendar.monthrange(year, month)[1]
     current_month_end_date = date(year, month, days_in_month)
     prev_month_end_date = current_month_start_date - timedelta(days=1)
 
-    # User laden (mit Rolle für HF-Check)
-    users_query = User.query.options(joinedload(User.role)).filter(
-        User.shift_plan_visible == True,
-        or_(User.aktiv_ab_datum.is_(None), User.aktiv_ab_datum <= current_month_end_date)
-    )
-    all_users_pre_filter = users_query.order_by(User.shift_plan_sort_order, User.name).all()
+    # Nur benötigte Spalten als schlanke Zeilen (siehe plan_read_model.py)
+    users = fetch_plan_users(current_month_start_date, current_month_end_date)
 
-    users = []
-    for user in all_users_pre_filter:
-        if user.inaktiv_ab_datum is None or user.inaktiv_ab_datum > prev_month_end_date:
-            users.append(user)
+    type_data = shift_type_data()
+    shift_types = type_data.shift_types
+    st_map = type_data.by_abbreviation
+    types_by_id = type_data.by_id
 
-    shifts_current_month = Shift.query.options(joinedload(Shift.shift_type)).filter(
-        extract('year', Shift.date) == year,
-        extract('month', Shift.date) == month,
-        Shift.variant_id == variant_id
-    ).all()
+    shifts_current_month = fetch_shift_rows(
+        in_month(Shift.date, year, month),
+        Shift.variant_id == variant_id,
+        types_by_id=types_by_id
+    )
 
-    shifts_prev_month = Shift.query.options(joinedload(Shift.shift_type)).filter(
+    shifts_prev_month = fetch_shift_rows(
         Shift.date == prev_month_end_date,
-        Shift.variant_id == None
-    ).all()
-
-    shift_types = ShiftType.query.order_by(ShiftType.staffing_sort_order, ShiftType.abbreviation).all()
-    st_map = {st.abbreviation: st for st in shift_types}
+        Shift.variant_id == None,
+        types_by_id=types_by_id
+    )
 
     shifts_data = [s.to_dict() for s in shifts_current_month]
     shifts_last_month_data = [s.to_dict() for s in shifts_prev_month]
@@ -409,12 +448,12 @@ def get_shifts():
     # --- NEU: ERLEDIGTE WUNSCHANFRAGEN EXPORTIEREN ---
     approved_wishes_dict = {}
     try:
-        approved_queries = ShiftQuery.query.filter(
-            extract('year', ShiftQuery.shift_date) == year,
-            extract('month', ShiftQuery.shift_date) == month,
+        approved_queries = fetch_query_rows(
+            in_month(ShiftQuery.shift_date, year, month),
             ShiftQuery.status.in_(['erledigt', 'ignoriert']),
-            ShiftQuery.message.like('Anfrage für:%')
-        ).order_by(ShiftQuery.created_at.asc(), ShiftQuery.id.asc()).all()
+            ShiftQuery.message.like('Anfrage für:%'),
+            order_by=(ShiftQuery.created_at.asc(), ShiftQuery.id.asc())
+        )
         
         for q in approved_queries:
             if q.target_user_id and q.shift_date:
@@ -459,18 +498,8 @@ def get_shifts():
 
 
     # --- Berechnung des verbleibenden Urlaubs (Jahres-Sicht) ---
-    eu_type = ShiftType.query.filter_by(abbreviation='EU').first()
-    vacation_usage = {}
-
-    if eu_type:
-        usage_query = db.session.query(Shift.user_id, func.count(Shift.id)) \
-            .filter(
-            Shift.shifttype_id == eu_type.id,
-            extract('year', Shift.date) == year,
-            Shift.variant_id == None  # Nur Hauptplan zählt für Verbrauch
-        ) \
-            .group_by(Shift.user_id).all()
-        vacation_usage = {uid: count for uid, count in usage_query}
+    # Verbrauch je Mitarbeiter aus vacation_usage (nur Hauptplan, siehe vacation_usage.py)
+    vacation_usage = load_vacation_usage(year, [u['id'] for u in users_data])
 
     for u_dict in users_data:
         u_id = u_dict['id']
@@ -488,18 +517,22 @@ def get_shifts():
 
     shifts_all_data = shifts_data + shifts_last_month_data
 
-    totals_dict = {}
-    for user in users:
-        totals_dict[user.id] = _calculate_user_total_hours(user.id, year, month, st_map, variant_id)
+    # Offene Anfragen vom Vormonatsletzten bis Monatsende (Stunden-Übertrag und Besetzung)
+    open_queries = fetch_query_rows(
+        ShiftQuery.shift_date >= prev_month_end_date,
+        ShiftQuery.shift_date <= current_month_end_date,
+        ShiftQuery.status == 'offen'
+    )
+
+    totals_dict = _calculate_total_hours_bulk(
+        [user.id for user in users], year, month,
+        shifts_current_month, shifts_prev_month, open_queries, st_map
+    )
 
-    violation_manager = ViolationManager(shifttypes_data)
+    violation_manager = ViolationManager(shifttypes_data, preprocessed_shift_times=type_data.preprocessed_times)
     violations_set = violation_manager.calculate_all_violations(year, month, shifts_all_data, users_data)
 
-    queries_for_calc = ShiftQuery.query.filter(
-        extract('year', ShiftQuery.shift_date) == year,
-        extract('month', ShiftQuery.shift_date) == month,
-        ShiftQuery.status == 'offen'
-    ).all()
+    queries_for_calc = [q for q in open_queries if q.shift_date >= current_month_start_date]
     queries_data = [q.to_dict() for q in queries_for_calc]
 
     staffing_actual = _calculate_actual_staffing(shifts_data, queries_data, shifttypes_data, year, month)
@@ -526,10 +559,10 @@ def get_shifts():
     # ------------------------------------------
 
     training_warnings = []
-    if current_user.role and current_user.role.name == 'admin':
+    if include_training_warnings:
         training_warnings = calculate_training_warnings(users, shifts_current_month, year, month)
 
-    response = jsonify({
+    return {
         "shifts": shifts_data,
         "users": users_data,
         "totals": totals_dict,
@@ -539,11 +572,259 @@ def get_shifts():
         "plan_status": plan_status_data,
         "current_variant_id": variant_id,
         "approved_wishes": approved_wishes_dict,
-        "training_warnings": training_warnings
-    })
-    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-    response.headers['Pragma'] = 'no-cache'
-    return response, 200
+        "training_warnings": training_warnings,
+        "sync_seq": sync_seq
+    }
+
+
+
+@shifts_bp.route('/shifts/changes', methods=['GET'])
+@login_required
+def get_shift_changes():
+    """
+    Delta-Abgleich der Monatsansicht: Zellen, die sich seit der Sequenznummer
+    'since' geändert haben ('sync_seq' aus GET /shifts bzw. 'seq' der letzten
+    Antwort), dazu die neu berechneten Stunden der betroffenen Mitarbeiter, die
+    Besetzung der betroffenen Tage und die Regelverletzungen des Monats.
+
+    Fehlt 'since' oder reicht das Journal nicht aus (kompaktiert, Monat geleert
+    oder veröffentlicht, zu viele Änderungen), kommt stattdessen die komplette
+    Ansicht: {"mode": "snapshot", "snapshot": <GET /shifts>}.
+    """
+    try:
+        year = int(request.args.get('year'))
+        month = int(request.args.get('month'))
+        since_raw = request.args.get('since')
+        since = int(since_raw) if since_raw not in (None, '', 'null') else None
+        variant_id_raw = request.args.get('variant_id')
+        variant_id = int(variant_id_raw) if variant_id_raw and variant_id_raw != 'null' else None
+    except (TypeError, ValueError):
+        return jsonify({"message": "Ungültige Parameter"}), 400
+
+    retention_days = current_app.config.get('SHIFT_JOURNAL_RETENTION_DAYS', DEFAULT_JOURNAL_RETENTION_DAYS)
+    if maybe_compact_journal(retention_days):
+        db.session.commit()
+
+    # Vor den Daten lesen (siehe _build_shifts_payload)
+    seq = latest_seq()
+    cells = read_changed_cells(year, month, variant_id, since)
+
+    if cells is None:
+        snapshot = _get_cached_snapshot(year, month, variant_id)
+        body = b'{"mode": "snapshot", "snapshot": ' + snapshot.body + b'}'
+        return current_app.response_class(body, status=200, mimetype='application/json')
+
+    payload = _build_shift_delta(year, month, variant_id, cells)
+    payload.update({"mode": "delta", "since": since, "seq": seq})
+    return jsonify(payload), 200
+
+
+@shifts_bp.route('/shifts/export', methods=['GET'])
+@admin_required
+def export_shifts():
+    """
+    Alle Schichten eines Jahres (oder mit 'month' eines Monats) als gestreamtes
+    JSON-Array bzw. mit ?format=ndjson als NDJSON, z.B. für den Abgleich mit der
+    Lohnabrechnung. Zeilen wie in GET /shifts, sortiert nach Datum und Mitarbeiter.
+    GET /shifts selbst bleibt beim zwischengespeicherten Snapshot (ETag).
+    """
+    try:
+        year = int(request.args.get('year'))
+        month_raw = request.args.get('month')
+        month = int(month_raw) if month_raw else None
+        variant_id_raw = request.args.get('variant_id')
+        variant_id = int(variant_id_raw) if variant_id_raw and variant_id_raw != 'null' else None
+        date_filter = in_month(Shift.date, year, month) if month else in_year(Shift.date, year)
+    except (TypeError, ValueError):
+        return jsonify({"message": "Ungültige Parameter"}), 400
+
+    rows = iter_shift_rows(
+        date_filter,
+        Shift.variant_id == variant_id,
+        order_by=(Shift.date, Shift.user_id, Shift.id),
+        yield_per=YIELD_PER
+    )
+    return stream_json(rows)
+
+
+def _calculate_month_violations(year, month, variant_id, shifttypes_data, types_by_id=None,
+                                preprocessed_shift_times=None):
+    """Regelverletzungen des Monats wie in der Monatsansicht (Monat der Variante + Vormonatsletzter)."""
+    current_month_start = date(year, month, 1)
+    prev_month_end = current_month_start - timedelta(days=1)
+    current_month_end = date(year, month, calendar.monthrange(year, month)[1])
+
+    if types_by_id is None:
+        types_by_id = shift_types_by_id()
+
+    shifts_current = fetch_shift_rows(
+        Shift.date >= current_month_start,
+        Shift.date <= current_month_end,
+        Shift.variant_id == variant_id,
+        types_by_id=types_by_id
+    )
+
+    shifts_prev = fetch_shift_rows(
+        Shift.date == prev_month_end,
+        Shift.variant_id == None,
+        types_by_id=types_by_id
+    )
+
+    all_shifts_data = [s.to_dict() for s in shifts_current] + [s.to_dict() for s in shifts_prev]
+
+    users_data = [u.to_dict() for u in fetch_plan_users(current_month_start, current_month_end)]
+
+    vm = ViolationManager(shifttypes_data, preprocessed_shift_times=preprocessed_shift_times)
+    return vm.calculate_all_violations(year, month, all_shifts_data, users_data)
+
+
+def _calculate_days_staffing(year, month, days, variant_id, shifttypes_data):
+    """Ist-Besetzung nur für die angegebenen Tage des Monats: {shifttype_id: {Tag: Anzahl}}."""
+    if not days:
+        return {}
+    # Für die Besetzung zählt nur shifttype_id, die Schichtart selbst wird nicht gebraucht
+    day_shifts = fetch_shift_rows(
+        Shift.date.in_(days),
+        Shift.variant_id == variant_id,
+        types_by_id={}
+    )
+    day_queries = fetch_query_rows(
+        ShiftQuery.shift_date.in_(days),
+        ShiftQuery.status == 'offen'
+    )
+    staffing_month = _calculate_actual_staffing(
+        [s.to_dict() for s in day_shifts], [q.to_dict() for q in day_queries], shifttypes_data, year, month
+    )
+    return {
+        shifttype_id: {day.day: counts[day.day] for day in days}
+        for shifttype_id, counts in staffing_month.items()
+    }
+
+
+def _calculate_cell_violation_delta(user, cell_date, variant_id, old_abbrev, shifttypes_data, types_by_id=None,
+                                    preprocessed_shift_times=None):
+    """
+    Verletzungen, die durch das Umsetzen der Zelle (user, cell_date) hinzukommen
+    bzw. wegfallen. Lädt nur die Person, ihre Hunde-Partner und deren Schichten
+    von cell_date-2 bis cell_date+2 (siehe ViolationManager.calculate_cell_violation_delta).
+    """
+    year, month = cell_date.year, cell_date.month
+    current_month_start = date(year, month, 1)
+    prev_month_end = current_month_start - timedelta(days=1)
+    current_month_end = date(year, month, calendar.monthrange(year, month)[1])
+
+    if user is None:
+        return set(), set()
+
+    people = [user]
+    if user.diensthund and user.diensthund != '---':
+        people = User.query.filter(or_(User.id == user.id, User.diensthund == user.diensthund)).all()
+
+    # Gleiche Sichtbarkeit wie in der Monatsansicht
+    users_data = [
+        {"id": u.id, "diensthund": u.diensthund} for u in people
+        if u.shift_plan_visible
+        and (u.aktiv_ab_datum is None or u.aktiv_ab_datum <= current_month_end)
+        and (u.inaktiv_ab_datum is None or u.inaktiv_ab_datum > prev_month_end)
+    ]
+
+    nearby_shifts = fetch_shift_rows(
+        Shift.user_id.in_([u.id for u in people]),
+        Shift.date >= max(cell_date - timedelta(days=2), prev_month_end),
+        Shift.date <= min(cell_date + timedelta(days=2), current_month_end),
+        or_(
+            and_(Shift.date >= current_month_start, Shift.variant_id == variant_id),
+            and_(Shift.date == prev_month_end, Shift.variant_id == None)
+        ),
+        types_by_id=types_by_id
+    )
+
+    vm = ViolationManager(shifttypes_data, preprocessed_shift_times=preprocessed_shift_times)
+    return vm.calculate_cell_violation_delta(
+        year, month, user.id, cell_date, old_abbrev, [s.to_dict() for s in nearby_shifts], users_data
+    )
+
+
+def _build_shift_delta(year, month, variant_id, cells):
+    """
+    Antwort des Delta-Abgleichs für die geänderten Zellen (user_id, date).
+    Lädt nur die Schichten der betroffenen Mitarbeiter und Tage.
+    """
+    current_month_start = date(year, month, 1)
+    current_month_end = date(year, month, calendar.monthrange(year, month)[1])
+    prev_month_end = current_month_start - timedelta(days=1)
+
+    user_ids = sorted({user_id for user_id, _ in cells})
+    month_days = sorted({day for _, day in cells if day >= current_month_start})
+
+    type_data = shift_type_data()
+    st_map = type_data.by_abbreviation
+    shifttypes_data = [st.to_dict() for st in type_data.shift_types]
+    types_by_id = type_data.by_id
+
+    changes = []
+    totals = {}
+    staffing_actual = {}
+    if cells:
+        user_shifts = fetch_shift_rows(
+            Shift.user_id.in_(user_ids),
+            Shift.date >= current_month_start,
+            Shift.date <= current_month_end,
+            Shift.variant_id == variant_id,
+            types_by_id=types_by_id
+        )
+        user_shifts_prev = fetch_shift_rows(
+            Shift.user_id.in_(user_ids),
+            Shift.date == prev_month_end,
+            Shift.variant_id == None,
+            types_by_id=types_by_id
+        )
+
+        # Offene Wunsch-Anfragen zählen beim Absender zu den Stunden
+        open_queries = fetch_query_rows(
+            ShiftQuery.shift_date >= prev_month_end,
+            ShiftQuery.shift_date <= current_month_end,
+            ShiftQuery.status == 'offen',
+            ShiftQuery.sender_user_id.in_(user_ids)
+        )
+
+        approved_wishes = {}
+        if month_days:
+            approved_queries = fetch_query_rows(
+                ShiftQuery.target_user_id.in_(user_ids),
+                ShiftQuery.shift_date.in_(month_days),
+                ShiftQuery.status.in_(['erledigt', 'ignoriert']),
+                ShiftQuery.message.like('Anfrage für:%'),
+                order_by=(ShiftQuery.created_at.asc(), ShiftQuery.id.asc())
+            )
+            for q in approved_queries:
+                approved_wishes[(q.target_user_id, q.shift_date)] = _extract_wish_abbreviation(q)
+
+        shifts_by_cell = {(s.user_id, s.date): s for s in user_shifts + user_shifts_prev}
+        for user_id, day in sorted(cells, key=lambda cell: (cell[1], cell[0])):
+            shift = shifts_by_cell.get((user_id, day))
+            shift_dict = shift.to_dict() if shift else None
+            requested_abbr = approved_wishes.get((user_id, day))
+            if shift_dict and requested_abbr:
+                shift_dict['approved_wunsch_abbr'] = requested_abbr
+                shift_dict['is_approved_wunsch'] = shift_dict.get('shifttype_abbreviation') == requested_abbr
+            changes.append({"user_id": user_id, "date": day.isoformat(), "shift": shift_dict})
+
+        totals = _calculate_total_hours_bulk(
+            user_ids, year, month, user_shifts, user_shifts_prev, open_queries, st_map
+        )
+
+        staffing_actual = _calculate_days_staffing(year, month, month_days, variant_id, shifttypes_data)
+
+    violations = _calculate_month_violations(year, month, variant_id, shifttypes_data, types_by_id,
+                                             type_data.preprocessed_times)
+
+    return {
+        "changes": changes,
+        "totals": totals,
+        "staffing_actual": staffing_actual,
+        "violations": list(violations)
+    }
 
 
 def _parse_date_from_payload(data):
@@ -649,13 +930,17 @@ def clear_shift_plan():
 
     try:
         num_deleted = Shift.query.filter(
-            extract('year', Shift.date) == year,
-            extract('month', Shift.date) == month,
+            in_month(Shift.date, year, month),
             Shift.is_locked == False,
             Shift.variant_id == variant_id
         ).delete(synchronize_session=False)
 
         if num_deleted > 0:
+            # Massen-Löschung läuft am Flush-Listener vorbei
+            bump_plan_versions(scopes_for_month_shifts(year, month, variant_id))
+            record_month_reset(year, month, variant_id)
+            refresh_training_status()
+            refresh_vacation_usage(years=[year])
             db.session.commit()
 
             log_audit(
@@ -700,7 +985,8 @@ def save_shift():
         if status_obj and status_obj.is_locked:
             return jsonify({"message": "Plan gesperrt."}), 403
 
-    free_type = ShiftType.query.filter_by(abbreviation='FREI').first()
+    type_data = shift_type_data()
+    free_type = type_data.by_abbreviation.get('FREI')
     is_free = (shifttype_id is None) or (free_type and shifttype_id == free_type.id) or (shifttype_id == 0)
 
     try:
@@ -710,12 +996,12 @@ def save_shift():
 
         old_val = "FREI"
         if existing_shift and existing_shift.shifttype_id:
-            st = ShiftType.query.get(existing_shift.shifttype_id)
+            st = type_data.by_id.get(existing_shift.shifttype_id)
             if st: old_val = st.abbreviation
 
         new_val = "FREI"
         if not is_free and shifttype_id:
-            st_new = ShiftType.query.get(shifttype_id)
+            st_new = type_data.by_id.get(shifttype_id)
             if not st_new:
                 return jsonify({"message": "Schichtart nicht gefunden."}), 404
             new_val = st_new.abbreviation
@@ -812,57 +1098,29 @@ def save_shift():
         else:
             response_data.update({"message": "Gelöscht"})
 
+        types_data = [st.to_dict() for st in type_data.by_id.values()]
+        st_map = type_data.by_abbreviation
+
         response_data['new_total_hours'] = _calculate_user_total_hours(user_id, shift_date.year, shift_date.month,
-                                                                      variant_id=variant_id)
+                                                                      shift_types_map=st_map, variant_id=variant_id)
 
-        eu_type = ShiftType.query.filter_by(abbreviation='EU').first()
+        eu_type = st_map.get('EU')
         if eu_type and variant_id is None:
-            used_count = db.session.query(func.count(Shift.id)).filter(
-                Shift.user_id == user_id,
-                Shift.shifttype_id == eu_type.id,
-                extract('year', Shift.date) == shift_date.year,
-                Shift.variant_id == None
-            ).scalar()
+            used_count = load_vacation_usage(shift_date.year, [user_id]).get(user_id, 0)
 
             total_budget = (target_user.urlaub_gesamt or 0) + (target_user.urlaub_rest or 0)
             response_data['new_vacation_remaining'] = total_budget - used_count
 
-        year = shift_date.year
-        month = shift_date.month
-        current_month_start = date(year, month, 1)
-        prev_month_end = current_month_start - timedelta(days=1)
-        days_in_month = calendar.monthrange(year, month)[1]
-        current_month_end = date(year, month, days_in_month)
-
-        shifts_current = Shift.query.options(joinedload(Shift.shift_type)).filter(
-            extract('year', Shift.date) == year,
-            extract('month', Shift.date) == month,
-            Shift.variant_id == variant_id
-        ).all()
-
-        shifts_prev = Shift.query.options(joinedload(Shift.shift_type)).filter(
-            Shift.date == prev_month_end,
-            Shift.variant_id == None
-        ).all()
-
-        all_shifts_data = [s.to_dict() for s in shifts_current] + [s.to_dict() for s in shifts_prev]
-
-        users_check = User.query.filter(
-            User.shift_plan_visible == True,
-            or_(User.aktiv_ab_datum.is_(None), User.aktiv_ab_datum <= current_month_end)
-        ).all()
-        users_data = []
-        for u in users_check:
-            if u.inaktiv_ab_datum is None or u.inaktiv_ab_datum > prev_month_end:
-                users_data.append(u.to_dict())
-
-        all_types = ShiftType.query.all()
-        types_data = [st.to_dict() for st in all_types]
-
-        vm = ViolationManager(types_data)
-        violations_set = vm.calculate_all_violations(year, month, all_shifts_data, users_data)
-
-        response_data['violations'] = list(violations_set)
+        # Nur das, was sich durch diese eine Zelle ändern kann
+        added, removed = _calculate_cell_violation_delta(
+            target_user, shift_date, variant_id, old_val, types_data, type_data.by_id,
+            type_data.preprocessed_times
+        )
+        response_data['violations_added'] = sorted(added)
+        response_data['violations_removed'] = sorted(removed)
+        response_data['staffing_actual'] = _calculate_days_staffing(
+            shift_date.year, shift_date.month, [shift_date], variant_id, types_data
+        )
 
         socket_payload = {
             'type': 'single',
@@ -982,11 +1240,10 @@ def send_completion_notification():
 
         days_in_month = calendar.monthrange(year, month)[1]
         days_header = []
-        special_dates = SpecialDate.query.filter(
-            extract('year', SpecialDate.date) == year,
-            extract('month', SpecialDate.date) == month
-        ).all()
-        special_dates_map = {sd.date.day: sd.type for sd in special_dates}
+        special_dates_map = {
+            event_date.day: event_type for event_date, event_type in get_special_dates(year)
+            if event_date.month == month
+        }
 
         for day in range(1, days_in_month + 1):
             is_weekend = date(year, month, day).weekday() >= 5
@@ -1010,11 +1267,13 @@ def send_completion_notification():
             if u.inaktiv_ab_datum is None or u.inaktiv_ab_datum > prev_month_end_date:
                 all_visible_users.append(u)
 
-        shifts_db = Shift.query.options(joinedload(Shift.shift_type)).filter(
-            extract('year', Shift.date) == year,
-            extract('month', Shift.date) == month,
-            Shift.variant_id == None
-        ).all()
+        types_by_id = shift_type_data().by_id
+        shift_types = list(types_by_id.values())
+        shifts_db = fetch_shift_rows(
+            in_month(Shift.date, year, month),
+            Shift.variant_id == None,
+            types_by_id=types_by_id
+        )
 
         shift_map = {}
         for s in shifts_db:
@@ -1027,7 +1286,6 @@ def send_completion_notification():
                     'bg_priority': s.shift_type.prioritize_background
                 }
 
-        shift_types = ShiftType.query.all()
         st_hours = {st.id: (st.hours or 0.0) for st in shift_types}
         st_spill = {st.id: (st.hours_spillover or 0.0) for st in shift_types}
         st_is_work = {st.id: st.is_work_shift for st in shift_types}
@@ -1035,10 +1293,11 @@ def send_completion_notification():
 
         user_hours_map = defaultdict(float)
         current_month_last_day = date(year, month, days_in_month)
-        shifts_prev_last_day = Shift.query.options(joinedload(Shift.shift_type)).filter(
+        shifts_prev_last_day = fetch_shift_rows(
             Shift.date == prev_month_end_date,
-            Shift.variant_id == None
-        ).all()
+            Shift.variant_id == None,
+            types_by_id=types_by_id
+        )
 
         for s in shifts_db:
             if s.shifttype_id and st_is_work.get(s.shifttype_id):
@@ -1,9 +1,11 @@
 # dhf_app/routes_statistics.py
 
 from flask import Blueprint, request, jsonify, current_app
-from sqlalchemy import func, extract, desc, and_, or_
+from sqlalchemy import func, desc, and_, or_
 from .models import Shift, ShiftType, User
 from .extensions import db
+from .date_ranges import in_month, in_year
+from .plan_read_model import fetch_shift_rows
 from .utils import stats_permission_required
 from datetime import datetime, date
 
@@ -49,12 +51,11 @@ def get_shift_rankings():
         # Filterliste
         filters = []
 
-        # 1. Jahr (Pflicht)
-        filters.append(extract('year', Shift.date) == year)
-
-        # 2. Monat (Optional)
+        # 1. Jahr (Pflicht), 2. Monat (Optional)
         if month:
-            filters.append(extract('month', Shift.date) == int(month))
+            filters.append(in_month(Shift.date, year, int(month)))
+        else:
+            filters.append(in_year(Shift.date, year))
 
         # 3. Keine Entwürfe/Varianten zählen
         filters.append(Shift.variant_id.is_(None))
@@ -125,19 +126,21 @@ def get_user_statistics(user_id):
         else:
             year = int(year)
 
-        # Wir holen die echten Schicht-Objekte, um die Daten zu sammeln
-        shifts = db.session.query(Shift, ShiftType).join(
-            ShiftType, Shift.shifttype_id == ShiftType.id
-        ).filter(
+        # Schlanke Zeilen (Datum + Schichtart) statt ORM-Objekte, sortiert nach Datum
+        shifts = fetch_shift_rows(
             Shift.user_id == user_id,
-            extract('year', Shift.date) == year,
+            in_year(Shift.date, year),
             Shift.variant_id.is_(None)  # WICHTIG: Keine Varianten
-        ).order_by(Shift.date).all()
+        )
+        shifts.sort(key=lambda s: s.date)
 
         # Daten in Python aggregieren
         stats_map = {}  # shifttype_id -> {meta, count, hours, dates list}
 
-        for shift, shift_type in shifts:
+        for shift in shifts:
+            shift_type = shift.shift_type
+            if shift_type is None:
+                continue
             sid = shift_type.id
             if sid not in stats_map:
                 stats_map[sid] = {
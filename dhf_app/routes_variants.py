@@ -8,8 +8,13 @@ from .models_shift_change import ShiftChangeRequest
 from .models_gamification import GamificationLog
 from .extensions import db
 from .utils import admin_required
+from .plan_cache import bump_plan_versions, scopes_for_month_shifts
+from .shift_journal import record_month_reset
+from .training_status import refresh_training_status
+from .vacation_usage import refresh_vacation_usage
+from .date_ranges import in_month
 from datetime import datetime
-from sqlalchemy import extract, insert, select, literal, and_
+from sqlalchemy import insert, select, literal, and_
 
 # Blueprint erstellen
 variants_bp = Blueprint('variants', __name__, url_prefix='/api/variants')
@@ -97,8 +102,7 @@ def create_variant():
         db.session.flush()  
 
         source_filter = and_(
-            extract('year', Shift.date) == year,
-            extract('month', Shift.date) == month,
+            in_month(Shift.date, year, month),
             Shift.variant_id == source_variant_id  
         )
 
@@ -149,8 +153,7 @@ def publish_variant(variant_id):
 
     try:
         shifts_to_delete_query = db.session.query(Shift.id).filter(
-            extract('year', Shift.date) == year,
-            extract('month', Shift.date) == month,
+            in_month(Shift.date, year, month),
             Shift.variant_id == None
         )
 
@@ -169,8 +172,7 @@ def publish_variant(variant_id):
         db.session.flush()
 
         delete_count = Shift.query.filter(
-            extract('year', Shift.date) == year,
-            extract('month', Shift.date) == month,
+            in_month(Shift.date, year, month),
             Shift.variant_id == None
         ).delete(synchronize_session=False)
 
@@ -178,6 +180,12 @@ def publish_variant(variant_id):
             Shift.variant_id == variant_id
         ).update({Shift.variant_id: None}, synchronize_session=False)
 
+        # Massen-Updates laufen am Flush-Listener vorbei
+        bump_plan_versions(scopes_for_month_shifts(year, month, None))
+        record_month_reset(year, month, None)
+        refresh_training_status()
+        refresh_vacation_usage(years=[year])
+
         status = ShiftPlanStatus.query.filter_by(year=year, month=month).first()
         if not status:
             status = ShiftPlanStatus(year=year, month=month, status='In Bearbeitung')
@@ -0,0 +1,388 @@
+# dhf_app/services_generator.py
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .extensions import db, socketio
+from .models import GeneratorJob, GeneratorJobLock, GeneratorWorker, UpdateLog
+from .generator.cancellation import CancellationToken, GenerationCancelled
+
+# Wir importieren die Generator-Klassen (Engines)
+try:
+    from .generator.core import ShiftPlanGenerator
+    from .generator.solver_engine import ShiftPlanSolverGenerator
+    from .generator.horizon import HorizonPlanGenerator
+except ImportError:
+    ShiftPlanGenerator = None
+    ShiftPlanSolverGenerator = None
+    HorizonPlanGenerator = None
+
+# Wählbare Engines (gleicher Konstruktor und run()-Ablauf)
+GENERATOR_ENGINES = {
+    "greedy": ShiftPlanGenerator,
+    "cpsat": ShiftPlanSolverGenerator,
+}
+DEFAULT_ENGINE = "greedy"
+# Obergrenze für den Rolling Horizon (Monate je Lauf)
+MAX_HORIZON_MONTHS = 12
+
+# Standardwerte (überschreibbar über app.config)
+DEFAULT_MAX_CONCURRENT_JOBS = 2
+DEFAULT_JOB_STALE_SECONDS = 300
+
+
+class _JobReporter:
+    """
+    Schreibt Fortschritt und Log eines laufenden Jobs in die DB und sendet ihn
+    per Socket.IO ('generator_progress').
+
+    Nutzt eine eigene, kurzlebige Session, damit die Session des Generators
+    (geladene Objekte, offene Transaktion) unberührt bleibt. Geschrieben wird
+    höchstens alle FLUSH_INTERVAL Sekunden; ein Heartbeat-Thread hält den Job
+    auch während langer Solver-Phasen ohne Log-Ausgabe als lebendig markiert.
+    """
+
+    FLUSH_INTERVAL = 0.5
+    HEARTBEAT_SECONDS = 30
+
+    def __init__(self, engine, job):
+        self.engine = engine
+        self.job_id = job.id
+        self.meta = {"year": job.year, "month": job.month, "variant_id": job.variant_id, "engine": job.engine}
+        self.logs = deque(job.get_logs(), maxlen=GeneratorJob.LOG_LIMIT)
+        self.log_count = job.log_count or 0
+        self.progress = job.progress or 0
+        self.status = job.status
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def start(self):
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._heartbeat.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.HEARTBEAT_SECONDS):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[GeneratorJob {self.job_id}] Heartbeat fehlgeschlagen: {e}")
+
+    def log(self, msg, progress=None):
+        with self._lock:
+            self.logs.append(msg)
+            self.log_count += 1
+            if progress is not None:
+                self.progress = progress
+        if time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self, release_locks=False, **fields):
+        """
+        Schreibt den aktuellen Stand (plus optionale Felder wie status) und sendet ihn.
+        Mit release_locks werden in derselben Transaktion die Monats-Locks des Jobs freigegeben.
+        """
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if 'status' in fields:
+                self.status = fields['status']
+            if 'progress' in fields:
+                self.progress = fields['progress']
+            values = {
+                "progress": self.progress,
+                "logs": json.dumps(list(self.logs)),
+                "log_count": self.log_count,
+                "heartbeat_at": datetime.utcnow(),
+            }
+            values.update(fields)
+            payload = dict(self.meta, id=self.job_id, status=self.status, progress=self.progress,
+                           is_running=self.status in GeneratorJob.ACTIVE_STATUSES,
+                           logs=list(self.logs), log_count=self.log_count)
+
+        with Session(self.engine) as session:
+            session.query(GeneratorJob).filter_by(id=self.job_id).update(values)
+            if release_locks:
+                session.query(GeneratorJobLock).filter_by(job_id=self.job_id).delete()
+            session.commit()
+
+        try:
+            socketio.emit('generator_progress', payload)
+        except Exception:
+            # Ohne Socket-Verbindung bleibt das Polling über /status
+            pass
+
+
+class GeneratorJobService:
+    """
+    Verwaltung der Generator-Jobs.
+
+    - Jeder Lauf ist ein GeneratorJob-Datensatz (Status, Fortschritt, Log),
+      alle Worker-Prozesse sehen denselben Stand.
+    - Höchstens ein aktiver Job je (Jahr, Monat, Variante), erzwungen über
+      GeneratorJobLock (eine Zeile je Monat des Horizonts).
+    - Ausgeführt wird in einem begrenzten Thread-Pool je Prozess
+      (GENERATOR_MAX_CONCURRENT_JOBS); weitere Jobs warten als 'queued'.
+      Jeder Job merkt sich seinen Prozess (worker_id), der Prozess meldet sich
+      regelmäßig in GeneratorWorker.
+    - Abbruch ist kooperativ: cancel_requested in der DB bzw. das
+      CancellationToken des Jobs wird vom Generator regelmäßig geprüft.
+    """
+
+    _executor = None
+    _executor_lock = threading.Lock()
+    # Abbruch-Tokens der Jobs dieses Prozesses {job_id: CancellationToken}
+    _tokens = {}
+
+    @classmethod
+    def _get_executor(cls, app):
+        with cls._executor_lock:
+            if cls._executor is None:
+                max_workers = app.config.get('GENERATOR_MAX_CONCURRENT_JOBS', DEFAULT_MAX_CONCURRENT_JOBS)
+                cls._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)),
+                                                   thread_name_prefix='generator-job')
+                threading.Thread(target=cls._worker_heartbeat_loop, args=(db.engine,), daemon=True).start()
+            return cls._executor
+
+    @staticmethod
+    def _worker_id():
+        # Bei jedem Aufruf neu, damit geforkte Worker-Prozesse eine eigene ID haben
+        return f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+    @classmethod
+    def _touch_worker(cls, connection):
+        """Schreibt das Lebenszeichen dieses Prozesses (innerhalb der laufenden Transaktion)."""
+        table = GeneratorWorker.__table__
+        worker_id = cls._worker_id()
+        stmt = update(table).where(table.c.id == worker_id).values(heartbeat_at=datetime.utcnow())
+        if connection.execute(stmt).rowcount:
+            return
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(table).values(id=worker_id, heartbeat_at=datetime.utcnow()))
+        except IntegrityError:
+            connection.execute(stmt)
+
+    @classmethod
+    def _worker_heartbeat_loop(cls, engine):
+        while True:
+            time.sleep(_JobReporter.HEARTBEAT_SECONDS)
+            try:
+                with engine.begin() as connection:
+                    cls._touch_worker(connection)
+            except Exception as e:
+                print(f"[GeneratorWorker {cls._worker_id()}] Heartbeat fehlgeschlagen: {e}")
+
+    @staticmethod
+    def expire_stale_jobs(stale_seconds=DEFAULT_JOB_STALE_SECONDS):
+        """
+        Markiert laufende Jobs ohne Heartbeat und wartende Jobs, deren Worker-Prozess
+        seit stale_seconds kein Lebenszeichen mehr gibt (z.B. Prozess neu gestartet),
+        als Fehler und gibt ihre (Jahr, Monat, Variante)-Slots wieder frei.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+        live_workers = select(GeneratorWorker.id).where(GeneratorWorker.heartbeat_at >= cutoff)
+        stale_jobs = GeneratorJob.query.filter(or_(
+            and_(GeneratorJob.status == 'running', GeneratorJob.heartbeat_at < cutoff),
+            and_(GeneratorJob.status == 'queued', GeneratorJob.created_at < cutoff,
+                 or_(GeneratorJob.worker_id.is_(None), GeneratorJob.worker_id.not_in(live_workers)))
+        )).all()
+        for job in stale_jobs:
+            logs = job.get_logs()
+            if job.status == 'queued':
+                logs.append("[FEHLER] Job wurde nicht gestartet, als abgebrochen markiert.")
+            else:
+                logs.append("[FEHLER] Job ohne Lebenszeichen, als abgebrochen markiert.")
+            job.logs = json.dumps(logs[-GeneratorJob.LOG_LIMIT:])
+            job.log_count = (job.log_count or 0) + 1
+            job.status = 'error'
+            job.finished_at = datetime.utcnow()
+            GeneratorJobLock.query.filter_by(job_id=job.id).delete()
+        # Abgelaufene Worker-Einträge aufräumen (ein aktiver Prozess legt seinen neu an)
+        removed_workers = GeneratorWorker.query.filter(GeneratorWorker.heartbeat_at < cutoff).delete()
+        if stale_jobs or removed_workers:
+            db.session.commit()
+        return len(stale_jobs)
+
+    @staticmethod
+    def create_job(year, month, variant_id=None, engine=DEFAULT_ENGINE, months=1, user_id=None, stale_seconds=None):
+        """
+        Legt einen Job an und reserviert alle Monate seines Horizonts.
+        Gibt (job, None) zurück oder (None, aktiver_job), wenn einer dieser
+        Monate (gleiche Variante) bereits von einem Job belegt ist.
+        """
+        GeneratorJobService.expire_stale_jobs(stale_seconds or DEFAULT_JOB_STALE_SECONDS)
+
+        lock_keys = GeneratorJob.make_lock_keys(year, month, variant_id, months)
+        job = GeneratorJob(
+            year=year,
+            month=month,
+            variant_id=variant_id,
+            engine=engine,
+            params=json.dumps({"months": months}),
+            status='queued',
+            created_by_id=user_id
+        )
+        db.session.add(job)
+        try:
+            # Job und Monats-Locks in einer Transaktion
+            db.session.flush()
+            db.session.add_all([GeneratorJobLock(lock_key=key, job_id=job.id) for key in lock_keys])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            active_job = GeneratorJob.query.join(
+                GeneratorJobLock, GeneratorJobLock.job_id == GeneratorJob.id
+            ).filter(GeneratorJobLock.lock_key.in_(lock_keys)).first()
+            return None, active_job
+        return job, None
+
+    @classmethod
+    def submit(cls, app, job):
+        """Übergibt einen angelegten Job an den Thread-Pool dieses Prozesses."""
+        job_id = job.id
+        executor = cls._get_executor(app)
+        GeneratorJob.query.filter_by(id=job_id).update({"worker_id": cls._worker_id()})
+        cls._touch_worker(db.session.connection())
+        db.session.commit()
+        token = CancellationToken(poll=cls._make_cancel_poll(db.engine, job_id))
+        cls._tokens[job_id] = token
+        executor.submit(cls._run_job, app, job_id, token)
+
+    @staticmethod
+    def _make_cancel_poll(engine, job_id):
+        def poll():
+            with Session(engine) as session:
+                return bool(session.query(GeneratorJob.cancel_requested).filter_by(id=job_id).scalar())
+        return poll
+
+    @classmethod
+    def request_cancel(cls, job_id):
+        """
+        Fordert den Abbruch an. Wartende Jobs werden sofort beendet, laufende
+        brechen an der nächsten Prüfstelle ab. Gibt den Job zurück (oder None).
+        """
+        job = db.session.get(GeneratorJob, job_id)
+        if not job:
+            return None
+
+        if job.status == 'queued':
+            # Atomar, falls der Job gerade von einem Worker gestartet wird
+            updated = GeneratorJob.query.filter_by(id=job_id, status='queued').update({
+                "status": 'cancelled',
+                "cancel_requested": True,
+                "finished_at": datetime.utcnow()
+            })
+            if updated:
+                GeneratorJobLock.query.filter_by(job_id=job_id).delete()
+            db.session.commit()
+            if updated:
+                db.session.refresh(job)
+                return job
+
+        if job.status == 'running':
+            job.cancel_requested = True
+            db.session.commit()
+            token = cls._tokens.get(job_id)
+            if token is not None:
+                token.cancel()
+
+        return job
+
+    @classmethod
+    def _run_job(cls, app, job_id, token):
+        """Führt einen Job im Pool-Thread aus."""
+        with app.app_context():
+            reporter = None
+            final_status = 'error'
+            try:
+                # queued -> running (atomar; ein zwischenzeitlich abgebrochener Job wird übersprungen)
+                started = GeneratorJob.query.filter_by(id=job_id, status='queued').update({
+                    "status": 'running',
+                    "started_at": datetime.utcnow(),
+                    "heartbeat_at": datetime.utcnow()
+                })
+                db.session.commit()
+                if not started:
+                    return
+
+                job = db.session.get(GeneratorJob, job_id)
+                reporter = _JobReporter(db.engine, job)
+                reporter.start()
+                reporter.flush()
+
+                final_status = cls._execute(job, reporter, token)
+
+            except GenerationCancelled:
+                final_status = 'cancelled'
+            except Exception as e:
+                final_status = 'error'
+                if reporter is not None:
+                    reporter.log(f"[EXCEPTION] {str(e)}")
+                app.logger.error(f"Generator Exception: {e}")
+                traceback.print_exc()
+            finally:
+                cls._tokens.pop(job_id, None)
+                if reporter is not None:
+                    reporter.stop()
+                    progress = 100 if final_status == 'finished' else reporter.progress
+                    try:
+                        reporter.flush(status=final_status, progress=progress, release_locks=True,
+                                       finished_at=datetime.utcnow())
+                    except Exception as e:
+                        app.logger.error(f"GeneratorJob {job_id}: Status konnte nicht gespeichert werden: {e}")
+                db.session.remove()
+
+    @staticmethod
+    def _execute(job, reporter, token):
+        """Startet die Engine für den Job und gibt den Endstatus zurück."""
+        generator_cls = GENERATOR_ENGINES.get(job.engine)
+        if not generator_cls:
+            reporter.log("[CRITICAL] Generator-Klasse nicht gefunden.")
+            return 'error'
+
+        year, month, variant_id = job.year, job.month, job.variant_id
+        months = job.get_params().get('months', 1)
+
+        if months > 1:
+            gen = HorizonPlanGenerator(db, year, month, months, reporter.log, variant_id,
+                                       engine_cls=generator_cls, cancel_token=token)
+        else:
+            gen = generator_cls(db, year, month, reporter.log, variant_id, cancel_token=token)
+
+        try:
+            success = gen.run()
+        finally:
+            # Messwerte auch bei Fehler/Abbruch am Job ablegen (/api/generator/status)
+            reporter.flush(profile=json.dumps(gen.profiler.to_dict()))
+        if not success:
+            return 'error'
+
+        # Info für Log
+        plan_info = f"Variante {variant_id}" if variant_id else "Hauptplan"
+        range_info = f"{month:02d}/{year}" + (f" (+{months - 1} Folgemonate)" if months > 1 else "")
+
+        new_log = UpdateLog(
+            area="Schichtplan Generator",
+            description=f"Plan für {range_info} ({plan_info}) erfolgreich generiert.",
+            updated_at=datetime.utcnow()
+        )
+        db.session.add(new_log)
+        db.session.commit()
+        return 'finished'
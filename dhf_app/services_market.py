@@ -2,11 +2,13 @@
 
 from datetime import timedelta, datetime, date
 import json
-from sqlalchemy import and_, or_, func, extract
+from sqlalchemy import and_, or_, func
 from sqlalchemy.orm import joinedload
 from .extensions import db
 from .models import User, Shift, ShiftType
+from .reference_data import shift_type_data
 from .models_market import ShiftMarketOffer, ShiftMarketResponse
+from .date_ranges import in_month
 
 
 class MarketService:
@@ -181,18 +183,27 @@ class MarketService:
         """
         Holt die Historie abgeschlossener, abgebrochener, abgelaufener und archivierter Tausche.
         """
-        history = ShiftMarketOffer.query.options(
+        return list(MarketService.iter_market_history(limit))
+
+    @staticmethod
+    def iter_market_history(limit=None, yield_per=None):
+        """
+        Wie get_market_history, aber als Generator (limit=None: gesamte Historie).
+        Mit yield_per werden die Angebote blockweise vom Cursor gelesen (Streaming).
+        """
+        query = ShiftMarketOffer.query.options(
             joinedload(ShiftMarketOffer.shift).joinedload(Shift.shift_type),
             joinedload(ShiftMarketOffer.offering_user),
             joinedload(ShiftMarketOffer.accepted_by_user)
         ).filter(
             ShiftMarketOffer.status.in_(['done', 'cancelled', 'rejected', 'expired', 'archived_no_interest'])
-        ).order_by(ShiftMarketOffer.created_at.desc()).limit(limit).all()
+        ).order_by(ShiftMarketOffer.created_at.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        type_map_name = {abbr: st.name for abbr, st in shift_type_data().by_abbreviation.items()}
 
-        all_types = db.session.query(ShiftType).all()
-        type_map_name = {st.abbreviation: st.name for st in all_types}
+        history = query.yield_per(yield_per) if yield_per else query.all()
 
-        results = []
         for offer in history:
             shift_date_str = "Datum Unbekannt"
             shift_abbr = "?"
@@ -217,7 +228,7 @@ class MarketService:
 
             full_shift_info = f"{shift_abbr} ({shift_name}) am {shift_date_str}"
 
-            results.append({
+            yield {
                 "id": offer.id,
                 "offering_user": f"{offer.offering_user.vorname} {offer.offering_user.name}" if offer.offering_user else "Unbekannt",
                 "accepted_by": f"{offer.accepted_by_user.vorname} {offer.accepted_by_user.name}" if offer.accepted_by_user else "-",
@@ -226,8 +237,7 @@ class MarketService:
                 "note": offer.note,
                 "shift_info": full_shift_info,
                 "created_at": offer.created_at.isoformat()
-            })
-        return results
+            }
 
     @staticmethod
     def delete_history_entry(offer_id):
@@ -275,12 +285,15 @@ class MarketService:
 
         users_working_today = {s.user_id for s in shifts_today}
 
+        # Schichtarten aus dem Stammdaten-Cache statt je Schicht nachzuladen
+        types_by_id = shift_type_data().by_id
         dogs_active_today = []
         for s in shifts_today:
-            if s.user and s.user.diensthund and s.user.diensthund != '---' and s.shift_type:
+            shift_type = types_by_id.get(s.shifttype_id)
+            if s.user and s.user.diensthund and s.user.diensthund != '---' and shift_type:
                 dogs_active_today.append({
                     'dog': s.user.diensthund,
-                    'shift_type': s.shift_type,
+                    'shift_type': shift_type,
                     'user_id': s.user_id
                 })
 
@@ -365,8 +378,7 @@ class MarketService:
                 func.sum(ShiftType.hours)
             ).join(ShiftType, Shift.shifttype_id == ShiftType.id).filter(
                 Shift.user_id.in_(interested_user_ids),
-                extract('year', Shift.date) == shift_year,
-                extract('month', Shift.date) == shift_month,
+                in_month(Shift.date, shift_year, shift_month),
                 Shift.variant_id == None
             ).group_by(Shift.user_id).all()
 
@@ -0,0 +1,153 @@
+# dhf_app/shift_journal.py
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, func, insert, select, delete, or_, and_
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import Shift, ShiftJournalEntry
+from .plan_cache import attribute_values
+
+# --- Änderungsjournal für den Delta-Abgleich (GET /shifts/changes) ---
+# Jede Schichtänderung schreibt eine Zeile (Zelle user_id/date), die id ist die
+# fortlaufende Sequenznummer. ORM-Änderungen (Routen, Tauschbörse, Generator)
+# erfasst der Flush-Listener; Massen-Updates per Query.update/delete melden den
+# ganzen Monat mit record_month_reset() (-> Client lädt komplett).
+
+DEFAULT_JOURNAL_RETENTION_DAYS = 14
+COMPACT_INTERVAL_SECONDS = 3600
+# Mehr geänderte Zellen lohnen kein Delta mehr
+MAX_DELTA_CELLS = 500
+# Einträge dieses Alters werden immer mitgeliefert: Eine Transaktion mit
+# kleinerer id kann nach einer mit größerer id committen (Sequenz-Lücke).
+JOURNAL_GRACE_SECONDS = 10
+
+_compact_lock = threading.Lock()
+_last_compaction = 0.0
+
+
+def _cells_for_shift(obj):
+    """(user_id, date, variant_id) der Schicht, bei Änderung alter und neuer Stand."""
+    cells = set()
+    for day in attribute_values(obj, 'date'):
+        if not isinstance(day, date):
+            continue
+        for user_id in attribute_values(obj, 'user_id'):
+            for variant_id in attribute_values(obj, 'variant_id'):
+                cells.add((user_id, day, variant_id))
+    return cells
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_journal_cells(session, flush_context, instances):
+    cells = session.info.setdefault('shift_journal_cells', set())
+    for obj in session.new:
+        if isinstance(obj, Shift):
+            cells |= _cells_for_shift(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Shift):
+            cells |= _cells_for_shift(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Shift) and session.is_modified(obj, include_collections=False):
+            cells |= _cells_for_shift(obj)
+
+
+@event.listens_for(Session, 'after_flush')
+def _write_journal_after_flush(session, flush_context):
+    cells = session.info.pop('shift_journal_cells', None)
+    if cells:
+        rows = [
+            {"kind": 'cell', "year": day.year, "month": day.month, "variant_id": variant_id,
+             "user_id": user_id, "date": day}
+            for user_id, day, variant_id in sorted(cells, key=lambda c: (c[1], c[0], c[2] or 0))
+        ]
+        session.connection().execute(insert(ShiftJournalEntry.__table__), rows)
+
+
+def record_month_reset(year, month, variant_id):
+    """Meldet eine Massen-Änderung des ganzen Monats (innerhalb der laufenden Transaktion)."""
+    db.session.connection().execute(insert(ShiftJournalEntry.__table__).values(
+        kind='reset', year=year, month=month, variant_id=variant_id
+    ))
+
+
+def latest_seq():
+    """Höchste vergebene Sequenznummer (0 bei leerem Journal)."""
+    return db.session.execute(select(func.max(ShiftJournalEntry.id))).scalar() or 0
+
+
+def read_changed_cells(year, month, variant_id, since):
+    """
+    Geänderte Zellen der Monatsansicht seit 'since' als Menge von (user_id, date),
+    einschließlich des Vormonatsletzten (Hauptplan). None, wenn das Journal dafür
+    nicht ausreicht (kompaktiert, Monat per Massen-Update geändert, zu viele
+    Änderungen) und der Client die komplette Ansicht braucht.
+    """
+    if since is None or since < 0:
+        return None
+
+    min_id, max_id = db.session.execute(
+        select(func.min(ShiftJournalEntry.id), func.max(ShiftJournalEntry.id))
+    ).one()
+    if max_id is None:
+        # Leeres Journal: nur ein Stand vom selben leeren Journal ist gültig
+        return set() if since == 0 else None
+    if since > max_id or since < min_id - 1:
+        return None
+
+    first_day = date(year, month, 1)
+    prev_month_end = first_day - timedelta(days=1)
+    entry = ShiftJournalEntry
+    rows = db.session.execute(
+        select(entry.kind, entry.year, entry.month, entry.variant_id, entry.user_id, entry.date).where(
+            or_(
+                and_(entry.year == year, entry.month == month),
+                and_(entry.year == prev_month_end.year, entry.month == prev_month_end.month)
+            ),
+            or_(
+                entry.id > since,
+                entry.created_at >= datetime.utcnow() - timedelta(seconds=JOURNAL_GRACE_SECONDS)
+            )
+        )
+    ).all()
+
+    cells = set()
+    for kind, entry_year, entry_month, entry_variant_id, user_id, day in rows:
+        in_month = (entry_year, entry_month) == (year, month)
+        # Der Vormonatsletzte wird immer aus dem Hauptplan angezeigt
+        if entry_variant_id != (variant_id if in_month else None):
+            continue
+        if kind == 'reset':
+            return None
+        if in_month or day == prev_month_end:
+            cells.add((user_id, day))
+    if len(cells) > MAX_DELTA_CELLS:
+        return None
+    return cells
+
+
+def compact_journal(retention_days=DEFAULT_JOURNAL_RETENTION_DAYS):
+    """
+    Löscht Einträge älter als retention_days. Der neueste Eintrag bleibt stehen,
+    damit read_changed_cells() die Lücke vor der kleinsten id erkennt.
+    """
+    newest = latest_seq()
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    result = db.session.execute(
+        delete(ShiftJournalEntry).where(ShiftJournalEntry.created_at < cutoff, ShiftJournalEntry.id < newest)
+    )
+    return result.rowcount or 0
+
+
+def maybe_compact_journal(retention_days=DEFAULT_JOURNAL_RETENTION_DAYS):
+    """compact_journal() höchstens alle COMPACT_INTERVAL_SECONDS je Prozess."""
+    global _last_compaction
+    with _compact_lock:
+        now = time.monotonic()
+        if _last_compaction and now - _last_compaction < COMPACT_INTERVAL_SECONDS:
+            return 0
+        _last_compaction = now
+    return compact_journal(retention_days)
@@ -0,0 +1,106 @@
+# dhf_app/streaming.py
+
+from flask import current_app, request, stream_with_context
+
+# --- Gestreamte JSON-Antworten ---
+# Große Listen (Audit-Log, Aktivitäten, Tauschhistorie, Schichtexport) werden
+# nicht erst komplett als Python-Liste aufgebaut und dann per jsonify
+# serialisiert, sondern Zeile für Zeile aus einem serverseitigen Cursor
+# (Query.yield_per bzw. execution_options(yield_per=...)) geschrieben. Der
+# Speicherbedarf bleibt damit konstant, und der Client bekommt das erste Byte,
+# bevor die erste Zeile gelesen ist.
+#
+# Formate:
+# - JSON (Standard): dieselbe Struktur wie bisher mit jsonify, also ein Array
+#   oder ein Objekt mit Array (envelope)
+# - NDJSON (?format=ndjson): ein JSON-Objekt je Zeile, für Massenabrufe
+
+YIELD_PER = 500          # Zeilen je Abruf vom Cursor
+FLUSH_BYTES = 64 * 1024  # Puffergröße je gesendetem Chunk
+STREAM_THRESHOLD = 1000  # ab so vielen angeforderten Zeilen wird automatisch gestreamt
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_ndjson():
+    """True bei ?format=ndjson."""
+    return request.args.get('format', '').lower() == 'ndjson'
+
+
+def wants_stream(requested_rows=None):
+    """
+    Soll die Antwort gestreamt werden? Ja bei ?stream=1, ?format=ndjson oder
+    wenn mehr als STREAM_THRESHOLD Zeilen angefordert sind (None = unbegrenzt
+    zählt nur bei ausdrücklichem Wunsch).
+    """
+    if wants_ndjson() or request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return requested_rows is not None and requested_rows > STREAM_THRESHOLD
+
+
+def _to_dict(row):
+    return row.to_dict()
+
+
+def _chunks(rows, serialize, ndjson, envelope, items_key):
+    dumps = current_app.json.dumps
+
+    if ndjson:
+        opening, separator, closing = '', '\n', '\n'
+    elif envelope is not None:
+        # Objekt mit den übrigen Feldern vorneweg, die Liste als letztes Feld
+        fields = [f"{dumps(key)}: {dumps(value)}" for key, value in envelope.items() if key != items_key]
+        fields.append(f"{dumps(items_key)}: [")
+        opening = '{' + ', '.join(fields)
+        separator, closing = ',', ']}'
+    else:
+        opening, separator, closing = '[', ',', ']'
+
+    # Erstes Byte sofort, noch vor der ersten Datenbankzeile
+    yield opening
+
+    buffer, size, first = [], 0, True
+    try:
+        for row in rows:
+            piece = dumps(serialize(row))
+            if not first:
+                piece = separator + piece
+            first = False
+            buffer.append(piece)
+            size += len(piece)
+            if size >= FLUSH_BYTES:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+    except Exception as e:
+        # Statuscode ist bereits gesendet: Abbruch protokollieren und weiterreichen,
+        # damit der Server die Chunked-Antwort ohne Abschluss beendet. Ein sauber
+        # beendetes, aber gekürztes NDJSON wäre für den Client nicht erkennbar.
+        current_app.logger.error(f"Fehler beim Streamen der Antwort: {e}")
+        raise
+
+    if ndjson and first:
+        closing = ''
+    buffer.append(closing)
+    yield ''.join(buffer)
+
+
+def stream_json(rows, serialize=None, envelope=None, items_key='items', ndjson=None):
+    """
+    Streamt 'rows' (Iterator, z.B. query.yield_per(YIELD_PER)) als JSON-Antwort.
+
+    - serialize: Funktion Zeile -> dict (Standard: row.to_dict())
+    - envelope: optionales dict mit weiteren Feldern; die Zeilen landen dann
+      unter 'items_key' (im NDJSON-Format entfällt der Umschlag)
+    - ndjson: None = aus der Anfrage (?format=ndjson)
+    """
+    if ndjson is None:
+        ndjson = wants_ndjson()
+    generator = _chunks(rows, serialize or _to_dict, ndjson, None if ndjson else envelope, items_key)
+    response = current_app.response_class(
+        stream_with_context(generator),
+        status=200,
+        mimetype=NDJSON_MIMETYPE if ndjson else 'application/json'
+    )
+    # Reverse-Proxys (nginx) sollen nicht puffern, sonst kommt das erste Byte erst am Ende
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
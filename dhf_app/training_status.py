@@ -0,0 +1,201 @@
+# dhf_app/training_status.py
+
+from datetime import datetime
+
+from sqlalchemy import event, select, insert, delete, func, literal, and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import Shift, ShiftType, User, TrainingStatus
+from .plan_cache import attribute_values
+
+# --- Ausbildungsstand (QA/S) für calculate_training_warnings ---
+# Alle Hundeführer werden mit zwei gruppierten Abfragen beantwortet (späteste
+# Schicht bis zum Stichtag, geplante Schicht im Zeitfenster) statt mit vier
+# Abfragen je Person. Die Tabelle training_status hält zusätzlich je Mitarbeiter
+# das späteste QA-/S-Datum; lässt sich die Antwort daraus eindeutig ableiten,
+# entfällt für diese Person die Abfrage ganz.
+
+TRAINING_ABBREVIATIONS = ('QA', 'S')
+_SUMMARY_COLUMNS = {'QA': 'latest_qa', 'S': 'latest_s'}
+
+
+def _latest_date_subquery(abbreviation):
+    return (
+        select(func.max(Shift.date))
+        .join(ShiftType, Shift.shifttype_id == ShiftType.id)
+        .where(Shift.user_id == User.id, ShiftType.abbreviation == abbreviation)
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+
+def refresh_training_status(user_ids=None, connection=None):
+    """
+    Berechnet die Zeilen von training_status neu (alle Mitarbeiter, wenn
+    user_ids None ist). Läuft innerhalb der laufenden Transaktion, z.B. nach
+    Massen-Updates per Query.update/delete, die am Flush-Listener vorbeigehen.
+    """
+    if user_ids is not None:
+        user_ids = sorted(user_ids)
+        if not user_ids:
+            return
+    connection = connection or db.session.connection()
+    table = TrainingStatus.__table__
+
+    delete_stmt = delete(table)
+    source = select(
+        User.id,
+        _latest_date_subquery('QA'),
+        _latest_date_subquery('S'),
+        literal(datetime.utcnow(), db.DateTime)
+    )
+    if user_ids is not None:
+        delete_stmt = delete_stmt.where(table.c.user_id.in_(user_ids))
+        source = source.where(User.id.in_(user_ids))
+
+    insert_stmt = insert(table).from_select(['user_id', 'latest_qa', 'latest_s', 'updated_at'], source)
+    try:
+        with connection.begin_nested():
+            connection.execute(delete_stmt)
+            connection.execute(insert_stmt)
+    except IntegrityError:
+        # Gleichzeitig von einem anderen Schreiber neu angelegt: erneut ersetzen
+        connection.execute(delete_stmt)
+        connection.execute(insert_stmt)
+
+
+def _training_shifttype_ids(session):
+    """IDs der QA-/S-Schichtarten (einmal je Session)."""
+    ids = session.info.get('training_shifttype_ids')
+    if ids is None:
+        ids = set(session.execute(
+            select(ShiftType.id).where(ShiftType.abbreviation.in_(TRAINING_ABBREVIATIONS))
+        ).scalars())
+        session.info['training_shifttype_ids'] = ids
+    return ids
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_training_users(session, flush_context, instances):
+    changed_shifts = []
+    for obj in list(session.new) + list(session.deleted) + list(session.dirty):
+        if not isinstance(obj, (Shift, ShiftType)):
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, ShiftType):
+            # Neue oder umbenannte Schichtart: alles neu berechnen
+            session.info['training_status_all'] = True
+            session.info.pop('training_shifttype_ids', None)
+        else:
+            changed_shifts.append(obj)
+
+    if not changed_shifts or session.info.get('training_status_all'):
+        return
+
+    training_ids = _training_shifttype_ids(session)
+    users = session.info.setdefault('training_status_users', set())
+    for obj in changed_shifts:
+        if training_ids.intersection(attribute_values(obj, 'shifttype_id')):
+            users.update(attribute_values(obj, 'user_id'))
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_training_after_flush(session, flush_context):
+    refresh_all = session.info.pop('training_status_all', False)
+    users = session.info.pop('training_status_users', None)
+    if refresh_all:
+        refresh_training_status(None, session.connection())
+    elif users:
+        refresh_training_status(users, session.connection())
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _forget_training_shifttype_ids(session):
+    session.info.pop('training_shifttype_ids', None)
+
+
+def load_training_status(user_ids, limit_date, windows, use_summary=True):
+    """
+    Ausbildungsstand mehrerer Mitarbeiter (alle Varianten).
+
+    - limit_date: Stichtag für die späteste Schicht
+    - windows: {Abkürzung: (von, bis)} für die Frage "bereits geplant?"
+
+    Rückgabe (latest, planned):
+    - latest: {(user_id, Abkürzung): Datum der spätesten Schicht <= limit_date}
+    - planned: Menge von (user_id, Abkürzung) mit einer Schicht im Zeitfenster
+    """
+    user_ids = list(user_ids)
+    latest = {}
+    planned = set()
+    open_latest = {(user_id, abbrev) for user_id in user_ids for abbrev in TRAINING_ABBREVIATIONS}
+    open_planned = {(user_id, abbrev) for user_id in user_ids for abbrev in windows}
+    if not user_ids:
+        return latest, planned
+
+    if use_summary:
+        rows = db.session.execute(
+            select(TrainingStatus).where(TrainingStatus.user_id.in_(user_ids))
+        ).scalars()
+        for row in rows:
+            for abbrev, column in _SUMMARY_COLUMNS.items():
+                key = (row.user_id, abbrev)
+                latest_date = getattr(row, column)
+                # Das späteste Datum überhaupt beantwortet beide Fragen, solange
+                # es nicht hinter dem Stichtag bzw. dem Zeitfenster liegt.
+                if latest_date is None or latest_date <= limit_date:
+                    open_latest.discard(key)
+                    if latest_date is not None:
+                        latest[key] = latest_date
+                if abbrev in windows:
+                    start, end = windows[abbrev]
+                    if latest_date is None or latest_date < start:
+                        open_planned.discard(key)
+                    elif latest_date <= end:
+                        open_planned.discard(key)
+                        planned.add(key)
+
+    if open_latest:
+        rows = db.session.execute(
+            select(Shift.user_id, ShiftType.abbreviation, func.max(Shift.date))
+            .join(ShiftType, Shift.shifttype_id == ShiftType.id)
+            .where(
+                Shift.user_id.in_({user_id for user_id, _ in open_latest}),
+                ShiftType.abbreviation.in_({abbrev for _, abbrev in open_latest}),
+                Shift.date <= limit_date
+            )
+            .group_by(Shift.user_id, ShiftType.abbreviation)
+        ).all()
+        for user_id, abbrev, latest_date in rows:
+            if (user_id, abbrev) in open_latest:
+                latest[(user_id, abbrev)] = latest_date
+
+    if open_planned:
+        rows = db.session.execute(
+            select(Shift.user_id, ShiftType.abbreviation)
+            .join(ShiftType, Shift.shifttype_id == ShiftType.id)
+            .where(
+                Shift.user_id.in_({user_id for user_id, _ in open_planned}),
+                or_(*(
+                    and_(ShiftType.abbreviation == abbrev, Shift.date >= start, Shift.date <= end)
+                    for abbrev, (start, end) in windows.items()
+                ))
+            )
+            .group_by(Shift.user_id, ShiftType.abbreviation)
+        ).all()
+        for user_id, abbrev in rows:
+            if (user_id, abbrev) in open_planned:
+                planned.add((user_id, abbrev))
+
+    return latest, planned
+
+
+def init_training_status():
+    """Füllt training_status beim Start, falls die Tabelle noch leer ist (z.B. nach dem Update)."""
+    if db.session.execute(select(TrainingStatus.user_id).limit(1)).first() is None:
+        refresh_training_status()
+        db.session.commit()
@@ -0,0 +1,236 @@
+# dhf_app/vacation_usage.py
+
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, select, insert, update, delete, func, extract, literal, inspect, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import Shift, ShiftType, VacationUsage
+from .date_ranges import in_year
+
+# --- Urlaubsverbrauch je Mitarbeiter und Jahr ---
+# Verbrauchter Urlaub = Anzahl der EU-Schichten im Hauptplan (variant_id None)
+# im Kalenderjahr. Statt bei jedem Laden des Plans und nach jeder Änderung per
+# COUNT über das ganze Jahr zu zählen, hält die Tabelle vacation_usage den Wert
+# je (Mitarbeiter, Jahr). Der Flush-Listener verbucht jede geschriebene Schicht
+# als +1/-1 in derselben Transaktion. Massen-Updates per Query.update/delete
+# gehen daran vorbei und rufen refresh_vacation_usage() auf;
+# check_vacation_usage() vergleicht die Tabelle mit einer vollständigen Zählung.
+
+VACATION_ABBREVIATION = 'EU'
+_STATE_COLUMNS = ('user_id', 'date', 'shifttype_id', 'variant_id')
+
+
+def _usage_select(user_ids=None, years=None):
+    """(user_id, Jahr, Anzahl) der EU-Schichten im Hauptplan."""
+    year = extract('year', Shift.date)
+    stmt = (
+        select(Shift.user_id, year, func.count(Shift.id))
+        .join(ShiftType, Shift.shifttype_id == ShiftType.id)
+        .where(
+            ShiftType.abbreviation == VACATION_ABBREVIATION,
+            Shift.variant_id.is_(None),
+            Shift.user_id.isnot(None)
+        )
+        .group_by(Shift.user_id, year)
+    )
+    if user_ids is not None:
+        stmt = stmt.where(Shift.user_id.in_(user_ids))
+    if years is not None:
+        stmt = stmt.where(or_(*(in_year(Shift.date, y) for y in years)))
+    return stmt
+
+
+def refresh_vacation_usage(user_ids=None, years=None, connection=None):
+    """
+    Zählt vacation_usage neu (optional nur für die angegebenen Mitarbeiter
+    und/oder Jahre). Läuft innerhalb der laufenden Transaktion, z.B. nach
+    Massen-Updates per Query.update/delete, die am Flush-Listener vorbeigehen.
+    """
+    if user_ids is not None:
+        user_ids = sorted(user_ids)
+        if not user_ids:
+            return
+    if years is not None:
+        years = sorted(years)
+        if not years:
+            return
+    connection = connection or db.session.connection()
+    table = VacationUsage.__table__
+
+    delete_stmt = delete(table)
+    if user_ids is not None:
+        delete_stmt = delete_stmt.where(table.c.user_id.in_(user_ids))
+    if years is not None:
+        delete_stmt = delete_stmt.where(table.c.year.in_(years))
+
+    insert_stmt = insert(table).from_select(
+        ['user_id', 'year', 'used', 'updated_at'],
+        _usage_select(user_ids, years).add_columns(literal(datetime.utcnow(), db.DateTime))
+    )
+    try:
+        with connection.begin_nested():
+            connection.execute(delete_stmt)
+            connection.execute(insert_stmt)
+    except IntegrityError:
+        # Gleichzeitig von einem anderen Schreiber neu angelegt: erneut ersetzen
+        connection.execute(delete_stmt)
+        connection.execute(insert_stmt)
+
+
+def _apply_deltas(deltas, connection):
+    """Verbucht {(user_id, Jahr): Differenz}; fehlt eine Zeile, wird das Paar neu gezählt."""
+    table = VacationUsage.__table__
+    now = datetime.utcnow()
+    for (user_id, year), delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        result = connection.execute(
+            update(table)
+            .where(table.c.user_id == user_id, table.c.year == year)
+            .values(used=table.c.used + delta, updated_at=now)
+        )
+        if result.rowcount == 0:
+            refresh_vacation_usage([user_id], [year], connection)
+
+
+def _vacation_shifttype_ids(session):
+    """IDs der EU-Schichtarten (einmal je Session)."""
+    ids = session.info.get('vacation_shifttype_ids')
+    if ids is None:
+        ids = set(session.execute(
+            select(ShiftType.id).where(ShiftType.abbreviation == VACATION_ABBREVIATION)
+        ).scalars())
+        session.info['vacation_shifttype_ids'] = ids
+    return ids
+
+
+def _usage_key(state, vacation_ids):
+    """(user_id, Jahr), wenn der Zustand als Urlaubstag zählt, sonst None."""
+    if state is None:
+        return None
+    user_id, day, shifttype_id, variant_id = state
+    if user_id is None or not hasattr(day, 'year') or variant_id is not None:
+        return None
+    if shifttype_id not in vacation_ids:
+        return None
+    return user_id, day.year
+
+
+def _stored_state(session, obj):
+    """
+    Zustand der Schicht vor dieser Änderung. Aus der Attribut-Historie; wurde
+    ein Attribut ungeladen überschrieben (nach commit abgelaufen), steht der
+    alte Wert noch in der Datenbank, da der Flush erst folgt.
+    """
+    attrs = inspect(obj).attrs
+    values = []
+    for column in _STATE_COLUMNS:
+        history = attrs[column].history
+        if history.deleted:
+            values.append(history.deleted[0])
+        elif history.unchanged:
+            values.append(history.unchanged[0])
+        elif history.added:
+            table = Shift.__table__
+            row = session.execute(
+                select(*(table.c[name] for name in _STATE_COLUMNS)).where(table.c.id == obj.id)
+            ).first()
+            return tuple(row) if row else None
+        else:
+            values.append(getattr(obj, column, None))
+    return tuple(values)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_vacation_deltas(session, flush_context, instances):
+    changed_shifts = []
+    for obj in list(session.new) + list(session.deleted) + list(session.dirty):
+        if not isinstance(obj, (Shift, ShiftType)):
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, ShiftType):
+            # Neue, gelöschte oder umbenannte Schichtart: alles neu zählen
+            if obj not in session.dirty or inspect(obj).attrs.abbreviation.history.has_changes():
+                session.info['vacation_usage_all'] = True
+                session.info.pop('vacation_shifttype_ids', None)
+        else:
+            changed_shifts.append(obj)
+
+    if not changed_shifts or session.info.get('vacation_usage_all'):
+        return
+
+    vacation_ids = _vacation_shifttype_ids(session)
+    if not vacation_ids:
+        return
+
+    deltas = session.info.setdefault('vacation_usage_deltas', defaultdict(int))
+    for obj in changed_shifts:
+        old = None if obj in session.new else _stored_state(session, obj)
+        new = None if obj in session.deleted else tuple(getattr(obj, column) for column in _STATE_COLUMNS)
+        old_key = _usage_key(old, vacation_ids)
+        new_key = _usage_key(new, vacation_ids)
+        if old_key != new_key:
+            if old_key:
+                deltas[old_key] -= 1
+            if new_key:
+                deltas[new_key] += 1
+
+
+@event.listens_for(Session, 'after_flush')
+def _write_vacation_usage_after_flush(session, flush_context):
+    refresh_all = session.info.pop('vacation_usage_all', False)
+    deltas = session.info.pop('vacation_usage_deltas', None)
+    if refresh_all:
+        refresh_vacation_usage(connection=session.connection())
+    elif deltas:
+        _apply_deltas(deltas, session.connection())
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _forget_vacation_state(session):
+    session.info.pop('vacation_shifttype_ids', None)
+    session.info.pop('vacation_usage_deltas', None)
+    session.info.pop('vacation_usage_all', None)
+
+
+def load_vacation_usage(year, user_ids=None):
+    """{user_id: verbrauchte Urlaubstage} im Jahr (fehlende Mitarbeiter: 0)."""
+    stmt = select(VacationUsage.user_id, VacationUsage.used).where(VacationUsage.year == year)
+    if user_ids is not None:
+        stmt = stmt.where(VacationUsage.user_id.in_(list(user_ids)))
+    return {user_id: used for user_id, used in db.session.execute(stmt)}
+
+
+def check_vacation_usage(repair=False):
+    """
+    Vergleicht vacation_usage mit einer vollständigen Zählung über Shift.
+    Rückgabe: Liste der Abweichungen; mit repair=True wird die Tabelle danach
+    neu aufgebaut und gespeichert.
+    """
+    expected = {(user_id, int(year)): used for user_id, year, used in db.session.execute(_usage_select())}
+    stored = {(row.user_id, row.year): row.used for row in db.session.execute(select(VacationUsage)).scalars()}
+
+    mismatches = []
+    for user_id, year in sorted(set(expected) | set(stored)):
+        stored_used = stored.get((user_id, year), 0)
+        expected_used = expected.get((user_id, year), 0)
+        if stored_used != expected_used:
+            mismatches.append({"user_id": user_id, "year": year, "stored": stored_used, "expected": expected_used})
+
+    if mismatches and repair:
+        refresh_vacation_usage()
+        db.session.commit()
+    return mismatches
+
+
+def init_vacation_usage():
+    """Füllt vacation_usage beim Start, falls die Tabelle noch leer ist (z.B. nach dem Update)."""
+    if db.session.execute(select(VacationUsage.user_id).limit(1)).first() is None:
+        refresh_vacation_usage()
+        db.session.commit()
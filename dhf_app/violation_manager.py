@@ -6,6 +6,8 @@ from collections import defaultdict
 import calendar
 from sqlalchemy import extract
 
+from .violation_rules import np, PlanMatrix, DEFAULT_RULES
+
 
 # from .extensions import db # Nicht nötig, da Daten übergeben werden
 
@@ -18,11 +20,16 @@ class ViolationManager:
     Die Logik ist von den Flask-Routen entkoppelt, um Regel 4 zu erfüllen.
     """
 
-    def __init__(self, shift_types):
+    def __init__(self, shift_types, rules=None, preprocessed_shift_times=None):
         # Schichtarten werden beim Initialisieren des Managers geladen und vorverarbeitet
-        self._preprocessed_shift_times = self.preprocess_shift_times(shift_types)
+        # (bereits vorverarbeitete Zeiten, z.B. aus dem Stammdaten-Cache, werden übernommen)
+        if preprocessed_shift_times is None:
+            preprocessed_shift_times = self.preprocess_shift_times(shift_types)
+        self._preprocessed_shift_times = preprocessed_shift_times
         # Hilfskarte von Abkürzung zu Schicht-Objekt
         self.shift_types_map = {st['abbreviation']: st for st in shift_types}
+        # Regelsatz der Monatsprüfung (siehe violation_rules.py), z.B. DEFAULT_RULES + generator_rules(...)
+        self.rules = tuple(rules) if rules is not None else DEFAULT_RULES
 
     def preprocess_shift_times(self, shift_types):
         """
@@ -76,7 +83,27 @@ class ViolationManager:
         """
         Prüft den gesamten Monat auf Konflikte (Ruhezeit, Hunde) und gibt ein Set
         von Verletzungen als Tupel (user_id, day) zurück.
+
+        Mit NumPy als Matrix (Personen x Tage) über den Regelsatz self.rules,
+        sonst mit der Schleifen-Prüfung (nur Ruhezeit und Hunde).
         """
+        if np is None:
+            return self._calculate_all_violations_loop(year, month, shifts_in_month, users)
+
+        matrix = PlanMatrix(year, month, shifts_in_month, users,
+                            self.shift_types_map, self._preprocessed_shift_times)
+        if not matrix.user_ids:
+            return set()
+
+        hits = np.zeros((len(matrix.user_ids), matrix.days_in_month), dtype=bool)
+        for rule in self.rules:
+            hits |= rule.evaluate(matrix)
+
+        rows, cols = np.nonzero(hits)
+        return {(matrix.user_ids[row], int(col) + 1) for row, col in zip(rows.tolist(), cols.tolist())}
+
+    def _calculate_all_violations_loop(self, year, month, shifts_in_month, users):
+        """Ursprüngliche Prüfung je Person und Tag (Fallback ohne NumPy)."""
         violations = set()
 
         # Mapping von Datum auf Schicht-Abkürzung (für schnellen Zugriff)
@@ -162,4 +189,83 @@ class ViolationManager:
                                 violations.add((u1['id'], day))
                                 violations.add((u2['id'], day))
 
-        return violations
\ No newline at end of file
+        return violations
+
+    # --- INKREMENTELLE PRÜFUNG (eine geänderte Zelle) ---
+
+    # Schichten, die nach einer Nachtschicht eine Ruhezeitverletzung auslösen
+    REST_CONFLICTS_AFTER_NIGHT = ("T.", "6", "QA", "S")
+
+    def _work_abbrev(self, shifts_map, user_id, day):
+        """Abkürzung der Arbeitsschicht an 'day' (date) oder ''."""
+        abbrev = shifts_map.get((user_id, day))
+        if abbrev and self.shift_types_map.get(abbrev, {}).get('is_work_shift'):
+            return abbrev
+        return ""
+
+    def _is_cell_violated(self, year, month, user_id, day, shifts_map, user_map):
+        """
+        Gleiche Regeln wie calculate_all_violations, aber nur für die Zelle
+        (user_id, day). shifts_map: (user_id, date) -> Abkürzung.
+        """
+        if user_id not in user_map or day.year != year or day.month != month:
+            return False
+
+        current = self._work_abbrev(shifts_map, user_id, day)
+
+        # Ruhezeit: N. am Vortag -> heute, oder N. heute -> Folgetag
+        previous = self._work_abbrev(shifts_map, user_id, day - timedelta(days=1))
+        if previous == 'N.' and current in self.REST_CONFLICTS_AFTER_NIGHT:
+            return True
+        following = self._work_abbrev(shifts_map, user_id, day + timedelta(days=1))
+        if current == 'N.' and following in self.REST_CONFLICTS_AFTER_NIGHT:
+            return True
+
+        # Hund: andere Person mit demselben Hund und überlappender Schicht am selben Tag
+        dog = user_map[user_id].get('diensthund')
+        if current and dog and dog != '---':
+            for other_id, other in user_map.items():
+                if other_id == user_id or other.get('diensthund') != dog:
+                    continue
+                other_abbrev = self._work_abbrev(shifts_map, other_id, day)
+                if other_abbrev and self._check_time_overlap_optimized(current, other_abbrev):
+                    return True
+
+        return False
+
+    def calculate_cell_violation_delta(self, year, month, user_id, cell_date, old_abbrev, shifts_nearby, users):
+        """
+        Änderung der Verletzungen durch das Umsetzen einer einzelnen Zelle.
+
+        - shifts_nearby: Schicht-Dicts (neuer Stand) der Person und ihrer
+          Hunde-Partner von cell_date-2 bis cell_date+2, so wie sie in der
+          Monatsansicht stehen (Monat der Variante, Vormonatsletzter aus dem Hauptplan)
+        - old_abbrev: Abkürzung der Zelle vor der Änderung (None/'' = frei)
+        - users: die sichtbaren Personen davon (Dicts mit 'id' und 'diensthund')
+
+        Betroffen sind nur die Ruhezeit-Paare um cell_date und die Hunde-Überlappung
+        an cell_date. Rückgabe: (hinzugekommen, weggefallen) als Mengen von (user_id, day).
+        """
+        user_map = {u['id']: u for u in users}
+
+        after_map = {}
+        for s in shifts_nearby:
+            abbrev = s.get('shifttype_abbreviation')
+            if abbrev:
+                after_map[(s['user_id'], datetime.strptime(s['date'], '%Y-%m-%d').date())] = abbrev
+
+        before_map = dict(after_map)
+        if old_abbrev:
+            before_map[(user_id, cell_date)] = old_abbrev
+        else:
+            before_map.pop((user_id, cell_date), None)
+
+        cells = {(user_id, cell_date + timedelta(days=offset)) for offset in (-1, 0, 1)}
+        dog = user_map.get(user_id, {}).get('diensthund')
+        if dog and dog != '---':
+            cells |= {(other_id, cell_date) for other_id, other in user_map.items()
+                      if other.get('diensthund') == dog}
+
+        before = {(u, d.day) for u, d in cells if self._is_cell_violated(year, month, u, d, before_map, user_map)}
+        after = {(u, d.day) for u, d in cells if self._is_cell_violated(year, month, u, d, after_map, user_map)}
+        return after - before, before - after
@@ -0,0 +1,244 @@
+# dhf_app/violation_rules.py
+# Vektorisierte Regelprüfung für die Monatsansicht (genutzt vom ViolationManager)
+
+import calendar
+from datetime import date, timedelta
+
+# NumPy ist optional; ohne Installation nutzt der ViolationManager die Schleifen-Prüfung.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Abkürzungen, die nie zeitlich überlappen (wie ViolationManager._check_time_overlap_optimized)
+NON_OVERLAPPING_ABBREVS = ('U', 'X', 'EU', 'WF', '', 'FREI')
+
+
+class PlanMatrix:
+    """
+    Der Monat als (Personen x Tage)-Matrix aus Schicht-Codes.
+
+    - Spalte 0 ist der letzte Tag des Vormonats, Spalte d der Tag d des Monats,
+      die letzte Spalte der Erste des Folgemonats (falls mitgeliefert)
+    - Code 0 = keine Arbeitsschicht, 1..K = Arbeitsschichten (codes[abbrev])
+    - dog_ids: Hund je Zeile als Zahl, -1 = kein Hund
+
+    Die Regeln arbeiten nur auf diesen Arrays; Ergebnis ist je Regel eine
+    boolesche Matrix (Personen x Monatstage).
+    """
+
+    def __init__(self, year, month, shifts_in_month, users, shift_types_map, preprocessed_shift_times):
+        self.year = year
+        self.month = month
+        self.days_in_month = calendar.monthrange(year, month)[1]
+
+        self.user_ids = [u['id'] for u in users]
+        row_of = {user_id: row for row, user_id in enumerate(self.user_ids)}
+
+        # Codes nur für Arbeitsschichten (wie get_shift_abbrev der Schleifen-Prüfung)
+        self.abbrev_of = [""]
+        self.codes = {}
+        for abbrev, st in shift_types_map.items():
+            if st.get('is_work_shift'):
+                self.codes[abbrev] = len(self.abbrev_of)
+                self.abbrev_of.append(abbrev)
+
+        first_day = date(year, month, 1)
+        col_of = {(first_day + timedelta(days=offset)).strftime('%Y-%m-%d'): offset + 1
+                  for offset in range(-1, self.days_in_month + 1)}
+
+        self.grid = np.zeros((len(self.user_ids), self.days_in_month + 2), dtype=np.int16)
+        for s in shifts_in_month:
+            row = row_of.get(s.get('user_id'))
+            col = col_of.get(s.get('date'))
+            if row is None or col is None:
+                continue
+            # Einträge ohne Abkürzung zählen nicht (wie shifts_map der Schleifen-Prüfung)
+            abbrev = s.get('shifttype_abbreviation')
+            if abbrev:
+                self.grid[row, col] = self.codes.get(abbrev, 0)
+
+        dog_index = {}
+        self.dog_ids = np.full(len(self.user_ids), -1, dtype=np.int32)
+        for row, u in enumerate(users):
+            dog = u.get('diensthund')
+            if dog and dog != '---':
+                self.dog_ids[row] = dog_index.setdefault(dog, len(dog_index))
+
+        # Überlappungstabelle Code x Code aus den vorverarbeiteten Zeiten
+        num_codes = len(self.abbrev_of)
+        starts = np.zeros(num_codes)
+        ends = np.zeros(num_codes)
+        timed = np.zeros(num_codes, dtype=bool)
+        for code, abbrev in enumerate(self.abbrev_of):
+            if code == 0 or abbrev in NON_OVERLAPPING_ABBREVS or abbrev not in preprocessed_shift_times:
+                continue
+            starts[code], ends[code] = preprocessed_shift_times[abbrev]
+            timed[code] = True
+        self.overlap = (
+            (starts[:, None] < ends[None, :]) & (starts[None, :] < ends[:, None])
+            & timed[:, None] & timed[None, :]
+        )
+
+    def code_mask(self, abbrevs):
+        """Boolesche Matrix (alle Spalten): Zelle enthält eine der Abkürzungen."""
+        codes = [self.codes[a] for a in abbrevs if a in self.codes]
+        return np.isin(self.grid, codes)
+
+    @property
+    def work(self):
+        return self.grid > 0
+
+    def month_cells(self, mask):
+        """Nur die Monatstage (ohne Vormonats- und Folgemonatsspalte)."""
+        return mask[:, 1:self.days_in_month + 1]
+
+
+def _runs(mask):
+    """Länge der ununterbrochenen True-Folge bis einschließlich jeder Spalte (zeilenweise)."""
+    values = mask.astype(np.int32)
+    totals = np.cumsum(values, axis=1)
+    resets = np.maximum.accumulate(np.where(values == 0, totals, 0), axis=1)
+    return totals - resets
+
+
+class ViolationRule:
+    """Basisklasse: evaluate(matrix) liefert eine boolesche Matrix (Personen x Monatstage)."""
+
+    name = "rule"
+
+    def evaluate(self, matrix):
+        raise NotImplementedError
+
+
+class RestAfterNightRule(ViolationRule):
+    """N. gefolgt von T./6/QA/S am Folgetag: beide Zellen."""
+
+    name = "rest_after_night"
+
+    def __init__(self, night="N.", conflicts=("T.", "6", "QA", "S")):
+        self.night = night
+        self.conflicts = conflicts
+
+    def evaluate(self, matrix):
+        pairs = matrix.code_mask([self.night])[:, :-1] & matrix.code_mask(self.conflicts)[:, 1:]
+        hits = np.zeros_like(matrix.grid, dtype=bool)
+        hits[:, :-1] |= pairs
+        hits[:, 1:] |= pairs
+        return matrix.month_cells(hits)
+
+
+class DogOverlapRule(ViolationRule):
+    """Gleicher Diensthund, zeitlich überlappende Schichten am selben Tag: alle Beteiligten."""
+
+    name = "dog_overlap"
+
+    def evaluate(self, matrix):
+        hits = np.zeros((len(matrix.user_ids), matrix.days_in_month), dtype=bool)
+        month_grid = matrix.month_cells(matrix.grid)
+        for dog in np.unique(matrix.dog_ids[matrix.dog_ids >= 0]):
+            rows = np.nonzero(matrix.dog_ids == dog)[0]
+            if len(rows) < 2:
+                continue
+            codes = month_grid[rows]
+            # (Person, Partner, Tag): Überlappung mit einer anderen Person der Gruppe
+            pair_overlap = matrix.overlap[codes[:, None, :], codes[None, :, :]]
+            pair_overlap &= ~np.eye(len(rows), dtype=bool)[:, :, None]
+            hits[rows] |= pair_overlap.any(axis=1)
+        return hits
+
+
+class NightFreeDayRule(ViolationRule):
+    """Generator-Regel N-F-T: T. nach genau einem freien Tag auf eine Nachtschicht."""
+
+    name = "night_free_day"
+
+    def __init__(self, night="N.", day="T."):
+        self.night = night
+        self.day = day
+
+    def evaluate(self, matrix):
+        hits = np.zeros_like(matrix.grid, dtype=bool)
+        hits[:, 2:] = (matrix.code_mask([self.day])[:, 2:] & ~matrix.work[:, 1:-1]
+                       & matrix.code_mask([self.night])[:, :-2])
+        return matrix.month_cells(hits)
+
+
+class MaxConsecutiveRule(ViolationRule):
+    """Generator-Regel: mehr als 'limit' Arbeitstage in Folge (markiert die Tage über dem Limit)."""
+
+    name = "max_consecutive"
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def evaluate(self, matrix):
+        return matrix.month_cells(_runs(matrix.work) > self.limit)
+
+
+class MaxSameShiftRule(ViolationRule):
+    """Generator-Regel: dieselbe Schicht öfter als 'limit' mal in Folge."""
+
+    name = "max_same_shift"
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def evaluate(self, matrix):
+        same = np.zeros_like(matrix.grid, dtype=bool)
+        same[:, 1:] = (matrix.grid[:, 1:] == matrix.grid[:, :-1]) & matrix.work[:, 1:]
+        # Lauf gleicher Schichten = Wiederholungen + der erste Tag
+        return matrix.month_cells((_runs(same) + 1 > self.limit) & matrix.work)
+
+
+class MandatoryRestRule(ViolationRule):
+    """
+    Generator-Regel: nach einem Block von mindestens 'block_length' Arbeitstagen
+    müssen 'rest_days' freie Tage folgen; markiert den zu frühen Arbeitstag.
+    """
+
+    name = "mandatory_rest"
+
+    def __init__(self, block_length, rest_days):
+        self.block_length = block_length
+        self.rest_days = rest_days
+
+    def evaluate(self, matrix):
+        work = matrix.work
+        work_runs = _runs(work)
+        free_runs = _runs(~work)
+
+        hits = np.zeros_like(work)
+        if self.rest_days <= 0:
+            return matrix.month_cells(hits)
+
+        # Für jeden Tag x: freie Tage direkt davor und Länge des Blocks davor
+        free_before = np.zeros_like(free_runs)
+        free_before[:, 1:] = free_runs[:, :-1]
+        block_col = np.arange(work.shape[1])[None, :] - 1 - free_before
+        block_length = np.where(
+            block_col >= 0,
+            np.take_along_axis(work_runs, np.clip(block_col, 0, None), axis=1),
+            0
+        )
+        hits = work & (free_before > 0) & (free_before < self.rest_days) & (block_length >= self.block_length)
+        return matrix.month_cells(hits)
+
+
+# Regeln der Monatsansicht (Ausgabe wie bisher)
+DEFAULT_RULES = (RestAfterNightRule(), DogOverlapRule())
+
+
+def generator_rules(generator_config):
+    """
+    Harte Regeln des Generators als Regelsatz für die Monatsansicht
+    (Werte aus der Generator-Konfiguration, siehe routes_generator.get_generator_config).
+    """
+    max_consecutive = int(generator_config.get('max_consecutive_same_shift', 4))
+    rest_days = int(generator_config.get('mandatory_rest_days_after_max_shifts', 2))
+    return (
+        NightFreeDayRule(),
+        MaxConsecutiveRule(max_consecutive),
+        MaxSameShiftRule(max_consecutive),
+        MandatoryRestRule(max_consecutive, rest_days),
+    )
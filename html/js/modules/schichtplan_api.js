@@ -26,6 +26,14 @@ export const PlanApi = {
         return await apiFetch(url);
     },
 
+    async fetchShiftChanges(year, month, since, variantId = null) {
+        let url = `/api/shifts/changes?year=${year}&month=${month}&since=${since}`;
+        if (variantId !== null) {
+            url += `&variant_id=${variantId}`;
+        }
+        return await apiFetch(url);
+    },
+
     async fetchSpecialDates(year, type) {
         return await apiFetch(`/api/special_dates?type=${type}&year=${year}`);
     },
@@ -120,8 +128,13 @@ export const PlanApi = {
         return await apiFetch('/api/generator/start', 'POST', payload);
     },
 
-    async getGeneratorStatus() {
-        return await apiFetch('/api/generator/status');
+    async getGeneratorStatus(jobId = null) {
+        const query = jobId !== null ? `?job_id=${jobId}` : '';
+        return await apiFetch(`/api/generator/status${query}`);
+    },
+
+    async cancelGeneratorJob(jobId) {
+        return await apiFetch(`/api/generator/jobs/${jobId}/cancel`, 'POST');
     },
 
     // --- KRANKMELDUNGEN / SCHICHT-ANTRÄGE ---
@@ -2,6 +2,7 @@
 
 import { PlanState } from './schichtplan_state.js';
 import { PlanApi } from './schichtplan_api.js';
+import { PlanSocket } from './schichtplan_socket.js';
 
 /**
  * Modul für die Generator-Steuerung und Visualisierung (HUD).
@@ -16,6 +17,8 @@ export const PlanGeneratorUI = {
     visualInterval: null,
     visualQueue: [],
     processedLogCount: 0,
+    currentJobId: null,
+    jobFinished: false,
 
     /**
      * Initialisiert das Modul.
@@ -23,6 +26,12 @@ export const PlanGeneratorUI = {
      */
     init(renderGridFn) {
         this.renderGrid = renderGridFn;
+        // Fortschritt per Socket.IO; Polling bleibt als Rückfall aktiv
+        PlanSocket.onGeneratorProgress = (data) => {
+            if (this.currentJobId !== null && data.id === this.currentJobId) {
+                this.applyGeneratorStatus(data);
+            }
+        };
         this._bindGeneratorEvents();
         this._bindSettingsEvents();
     },
@@ -75,6 +84,8 @@ export const PlanGeneratorUI = {
                 // --- RESET ---
                 this.visualQueue = [];
                 this.processedLogCount = 0;
+                this.currentJobId = null;
+                this.jobFinished = false;
 
                 document.querySelectorAll('.hud-day-box').forEach(b => {
                     b.classList.remove('done', 'processing', 'warning', 'critical');
@@ -104,11 +115,12 @@ export const PlanGeneratorUI = {
                     const variantIdToSend = PlanState.currentVariantId !== undefined ? PlanState.currentVariantId : null;
                     console.log(`Starte Generator für: ${PlanState.currentMonth}/${PlanState.currentYear}, Variante: ${variantIdToSend}`);
 
-                    await PlanApi.startGenerator(PlanState.currentYear, PlanState.currentMonth, variantIdToSend);
+                    const response = await PlanApi.startGenerator(PlanState.currentYear, PlanState.currentMonth, variantIdToSend);
+                    this.currentJobId = response && response.job ? response.job.id : null;
 
                     // Polling starten
                     if (this.generatorInterval) clearInterval(this.generatorInterval);
-                    this.generatorInterval = setInterval(() => this.pollGeneratorStatus(), 1000);
+                    this.generatorInterval = setInterval(() => this.pollGeneratorStatus(), 2000);
 
                 } catch (error) {
                     console.error("Fehler beim Starten:", error);
@@ -400,48 +412,63 @@ export const PlanGeneratorUI = {
 
     async pollGeneratorStatus() {
         try {
-            const statusData = await PlanApi.getGeneratorStatus();
-            const progFill = document.getElementById('gen-progress-fill');
-            if (progFill) progFill.style.width = `${statusData.progress || 0}%`;
+            const statusData = await PlanApi.getGeneratorStatus(this.currentJobId);
+            this.applyGeneratorStatus(statusData);
+        } catch (e) { console.error("Poll Error:", e); }
+    },
 
-            if (statusData.logs && statusData.logs.length > 0) {
-                const newLogs = statusData.logs;
-                const startIdx = this.processedLogCount;
+    /**
+     * Übernimmt einen Job-Status (aus Polling oder Socket-Push).
+     * Das Log ist ein Ringpuffer; 'log_count' zählt alle Zeilen des Jobs.
+     */
+    applyGeneratorStatus(statusData) {
+        if (this.jobFinished) return;
 
-                for (let i = startIdx; i < newLogs.length; i++) {
-                    const logMsg = newLogs[i];
-                    let className = 'hud-log-line';
-                    if (logMsg.includes('[FEHLER]')) className += ' error';
-                    else if (logMsg.includes('[WARN]')) className += ' highlight';
-                    else if (logMsg.includes('erfolgreich')) className += ' success';
+        const progFill = document.getElementById('gen-progress-fill');
+        if (progFill) progFill.style.width = `${statusData.progress || 0}%`;
 
-                    this.visualQueue.push({
-                        type: 'log',
-                        content: `<div class="${className}">&gt; ${logMsg}</div>`
-                    });
-                }
+        if (statusData.logs && statusData.logs.length > 0) {
+            const newLogs = statusData.logs;
+            const totalCount = statusData.log_count !== undefined ? statusData.log_count : newLogs.length;
+            const firstIdx = totalCount - newLogs.length;
+
+            for (let i = Math.max(this.processedLogCount, firstIdx); i < totalCount; i++) {
+                const logMsg = newLogs[i - firstIdx];
+                let className = 'hud-log-line';
+                if (logMsg.includes('[FEHLER]') || logMsg.includes('[ABBRUCH]')) className += ' error';
+                else if (logMsg.includes('[WARN]')) className += ' highlight';
+                else if (logMsg.includes('erfolgreich')) className += ' success';
 
-                this.processedLogCount = newLogs.length;
+                this.visualQueue.push({
+                    type: 'log',
+                    content: `<div class="${className}">&gt; ${logMsg}</div>`
+                });
             }
 
-            if (statusData.status === 'finished' || statusData.status === 'error') {
-                if (this.generatorInterval) clearInterval(this.generatorInterval);
-                this.generatorInterval = null;
+            this.processedLogCount = Math.max(this.processedLogCount, totalCount);
+        }
 
-                if (statusData.status === 'finished') {
-                    this.visualQueue.push({
-                        type: 'log',
-                        content: '<div class="hud-log-line success">> VORGANG ABGESCHLOSSEN.</div>'
-                    });
-                    this.visualQueue.push({ type: 'finish' });
+        if (['finished', 'error', 'cancelled'].includes(statusData.status)) {
+            this.jobFinished = true;
+            if (this.generatorInterval) clearInterval(this.generatorInterval);
+            this.generatorInterval = null;
 
-                } else {
-                    const statusText = document.getElementById('gen-status-text');
-                    if (statusText) { statusText.textContent = "ABBRUCH"; statusText.style.color = "#e74c3c"; }
-                    const startBtn = document.getElementById('start-generator-btn');
-                    if (startBtn) { startBtn.disabled = false; startBtn.textContent = "FEHLER"; }
+            if (statusData.status === 'finished') {
+                this.visualQueue.push({
+                    type: 'log',
+                    content: '<div class="hud-log-line success">> VORGANG ABGESCHLOSSEN.</div>'
+                });
+                this.visualQueue.push({ type: 'finish' });
+
+            } else {
+                const statusText = document.getElementById('gen-status-text');
+                if (statusText) { statusText.textContent = "ABBRUCH"; statusText.style.color = "#e74c3c"; }
+                const startBtn = document.getElementById('start-generator-btn');
+                if (startBtn) {
+                    startBtn.disabled = false;
+                    startBtn.textContent = statusData.status === 'cancelled' ? "ABGEBROCHEN" : "FEHLER";
                 }
             }
-        } catch (e) { console.error("Poll Error:", e); }
+        }
     }
 };
\ No newline at end of file
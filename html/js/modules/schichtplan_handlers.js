@@ -181,13 +181,12 @@ export const PlanHandlers = {
             // 1. Zelle neu zeichnen (um den neuen Schichttyp anzuzeigen)
             PlanRenderer.refreshSingleCell(userId, dateStr);
 
-            // 2. Violations aktualisieren und betroffene Zellen refreshen
-            const oldViolations = new Set(PlanState.currentViolations);
-            PlanState.currentViolations.clear();
-            if (savedData.violations) {
-                savedData.violations.forEach(v => PlanState.currentViolations.add(`${v[0]}-${v[1]}`));
-            }
-            const affectedCells = new Set([...oldViolations, ...PlanState.currentViolations]);
+            // 2. Violations aktualisieren (Server liefert nur die Änderung) und betroffene Zellen refreshen
+            const removedViolations = (savedData.violations_removed || []).map(v => `${v[0]}-${v[1]}`);
+            const addedViolations = (savedData.violations_added || []).map(v => `${v[0]}-${v[1]}`);
+            removedViolations.forEach(v => PlanState.currentViolations.delete(v));
+            addedViolations.forEach(v => PlanState.currentViolations.add(v));
+            const affectedCells = new Set([...removedViolations, ...addedViolations]);
 
             affectedCells.forEach(violationKey => {
                 const parts = violationKey.split('-');
@@ -204,11 +203,21 @@ export const PlanHandlers = {
             });
 
             // 3. Besetzung (Staffing) INTELLIGENT aktualisieren
-            if (oldShiftAbbrev) {
-                StaffingModule.updateLocalStaffing(oldShiftAbbrev, dateStr, -1);
-            }
-            if (!shiftWasDeleted && shiftType) {
-                StaffingModule.updateLocalStaffing(shiftType.abbreviation, dateStr, 1);
+            if (savedData.staffing_actual) {
+                // Ist-Werte des Tages vom Server (inkl. offener Wunsch-Anfragen)
+                Object.entries(savedData.staffing_actual).forEach(([shiftTypeId, days]) => {
+                    PlanState.currentStaffingActual[shiftTypeId] = {
+                        ...(PlanState.currentStaffingActual[shiftTypeId] || {}),
+                        ...days
+                    };
+                });
+            } else {
+                if (oldShiftAbbrev) {
+                    StaffingModule.updateLocalStaffing(oldShiftAbbrev, dateStr, -1);
+                }
+                if (!shiftWasDeleted && shiftType) {
+                    StaffingModule.updateLocalStaffing(shiftType.abbreviation, dateStr, 1);
+                }
             }
             StaffingModule.refreshStaffingGrid();
 
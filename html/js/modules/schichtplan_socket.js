@@ -10,15 +10,22 @@ export const PlanSocket = {
     socket: null,
     renderGrid: null,
     updateStatusUI: null,
+    // Delta-Abgleich (nur geänderte Zellen), Fallback ist renderGrid
+    syncChanges: null,
+    hasConnected: false,
+    // Optionaler Callback für Generator-Fortschritt (gesetzt vom Generator-Modul)
+    onGeneratorProgress: null,
 
     /**
      * Initialisiert die Socket-Verbindung.
      * @param {Function} renderGridFn - Callback zum Aktualisieren des Grids.
      * @param {Function} updateStatusUIFn - Callback zum Aktualisieren der Status-Leiste.
+     * @param {Function} syncChangesFn - Optional: Delta-Abgleich statt komplettem Neuladen.
      */
-    init(renderGridFn, updateStatusUIFn) {
+    init(renderGridFn, updateStatusUIFn, syncChangesFn = null) {
         this.renderGrid = renderGridFn;
         this.updateStatusUI = updateStatusUIFn;
+        this.syncChanges = syncChangesFn;
         this.setupConnection();
     },
 
@@ -33,20 +40,23 @@ export const PlanSocket = {
 
         this.socket.on('connect', () => {
             console.log("WebSocket verbunden: Echtzeit-Updates aktiv.");
+            // Nach einem Verbindungsabbruch verpasste Änderungen nachholen
+            if (this.hasConnected) this._refreshShifts();
+            this.hasConnected = true;
         });
 
         // Event: Eine einzelne Schicht wurde geändert
         this.socket.on('shift_update', (data) => {
             if (this._isUpdateRelevant(data)) {
-                // isSilent = true -> Kein Blur-Effekt, "Magic Update"
-                if (this.renderGrid) this.renderGrid(true);
+                // Ohne Blur-Effekt, nur geänderte Zellen ("Magic Update")
+                this._refreshShifts();
             }
         });
 
         // Event: Schicht gesperrt/entsperrt
         this.socket.on('shift_lock_update', (data) => {
             if (this._isUpdateRelevant(data)) {
-                if (this.renderGrid) this.renderGrid(true);
+                this._refreshShifts();
             }
         });
 
@@ -60,6 +70,11 @@ export const PlanSocket = {
             }
         });
 
+        // Event: Fortschritt eines Generator-Jobs
+        this.socket.on('generator_progress', (data) => {
+            if (this.onGeneratorProgress) this.onGeneratorProgress(data);
+        });
+
         // Event: Plan Status geändert (Gesperrt/Freigabe)
         this.socket.on('plan_status_update', (data) => {
             if (data.year === PlanState.currentYear && data.month === PlanState.currentMonth) {
@@ -73,6 +88,17 @@ export const PlanSocket = {
         });
     },
 
+    /**
+     * Aktualisiert die Schichten der Ansicht: per Delta-Abgleich, sonst komplett (silent).
+     */
+    _refreshShifts() {
+        if (this.syncChanges) {
+            this.syncChanges();
+        } else if (this.renderGrid) {
+            this.renderGrid(true);
+        }
+    },
+
     /**
      * Prüft, ob ein eingehendes Event für die aktuelle Ansicht relevant ist.
      */
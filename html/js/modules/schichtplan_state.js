@@ -29,6 +29,7 @@ export const PlanState = {
     currentSpecialDates: {}, // Key: dateStr -> Type
     currentStaffingActual: {}, // Nested Object
     currentPlanStatus: {}, // {status, is_locked, ...}
+    syncSeq: null, // Sequenznummer für den Delta-Abgleich (GET /shifts/changes)
 
     // NEU: Trainings-Warnungen
     trainingWarnings: [], // Array von {user_id, name, type, due_date, message}
@@ -349,7 +349,8 @@ async function initialize() {
         // Socket: Echtzeit-Updates
         PlanSocket.init(
             renderGrid,
-            PlanUIHelper.updatePlanStatusUI.bind(PlanUIHelper)
+            PlanUIHelper.updatePlanStatusUI.bind(PlanUIHelper),
+            syncShiftChanges
         );
         initializeResponsivePlanResize();
 
@@ -469,32 +470,7 @@ async function renderGrid(isSilent = false) {
         ]);
 
         // --- STATE UPDATE ---
-
-        // Users & Shifts ins State-Objekt mappen
-        PlanState.allUsers = shiftPayload.users;
-        PlanState.approvedWishes = shiftPayload.approved_wishes || {};
-        PlanState.currentShifts = {};
-        shiftPayload.shifts.forEach(s => {
-            const key = `${s.user_id}-${s.date}`;
-            const fullShiftType = PlanState.allShiftTypes[s.shifttype_id];
-            PlanState.currentShifts[key] = { ...s, shift_type: fullShiftType };
-        });
-
-        // Last Month
-        PlanState.currentShiftsLastMonth = {};
-        if (shiftPayload.shifts_last_month) {
-            shiftPayload.shifts_last_month.forEach(s => {
-                const fullShiftType = PlanState.allShiftTypes[s.shifttype_id];
-                PlanState.currentShiftsLastMonth[s.user_id] = { ...s, shift_type: fullShiftType };
-            });
-        }
-
-        // Stats & Violations
-        PlanState.currentTotals = shiftPayload.totals;
-        PlanState.currentViolations.clear();
-        if (shiftPayload.violations) {
-            shiftPayload.violations.forEach(v => PlanState.currentViolations.add(`${v[0]}-${v[1]}`));
-        }
+        applyShiftPayload(shiftPayload);
 
         // --- MARKET OFFERS & GHOST LOGIC ---
         PlanState.currentMarketOffers = {};
@@ -535,22 +511,6 @@ async function renderGrid(isSilent = false) {
         // Change Requests (Pending)
         PlanState.currentChangeRequests = pendingRequestsResult || [];
 
-        // Staffing (Ist-Zustand) & Plan-Status
-        PlanState.currentStaffingActual = shiftPayload.staffing_actual || {};
-        PlanState.currentPlanStatus = shiftPayload.plan_status || {
-            year: PlanState.currentYear, month: PlanState.currentMonth,
-            status: "In Bearbeitung", is_locked: false, plan_name: "Hauptplan"
-        };
-
-        // --- NEU: Hauptplan-Namen cachen ---
-        if (PlanState.currentVariantId === null) {
-            PlanState.mainPlanName = PlanState.currentPlanStatus.plan_name || "Hauptplan";
-        }
-        // -----------------------------------
-
-        // Trainings-Warnungen
-        PlanState.trainingWarnings = shiftPayload.training_warnings || [];
-
         // Special Dates
         PlanState.currentSpecialDates = {};
         await loadFullSpecialDates();
@@ -560,37 +520,10 @@ async function renderGrid(isSilent = false) {
 
         // --- UI UPDATES ---
 
-        // 1. Status Bar aktualisieren
-        PlanUIHelper.updatePlanStatusUI(PlanState.currentPlanStatus);
-
-        // 1.5 Tabs neu zeichnen (wegen eventuell neu geladener Namen)
-        PlanNavigation.renderVariantTabs();
-
-        // 2. Grid DOM bauen
-        PlanRenderer.buildGridDOM({
-            onCellClick: (e, user, dateStr, cell, isOwn) =>
-                PlanInteraction.handleCellClick(e, user, dateStr, cell, isOwn),
-
-            onCellEnter: (user, dateStr, cell) => {
-                PlanState.hoveredCellContext = { userId: user.id, dateStr, userName: `${user.vorname} ${user.name}`, cellElement: cell };
-                if (!PlanState.isVisitor) cell.classList.add('hovered');
-            },
-            onCellLeave: () => {
-                if (PlanState.hoveredCellContext && PlanState.hoveredCellContext.cellElement) {
-                    PlanState.hoveredCellContext.cellElement.classList.remove('hovered');
-                }
-                PlanState.hoveredCellContext = null;
-            }
-        });
-
-        // 3. Staffing Table aufbauen
-        StaffingModule.buildStaffingTable();
-        
-        // --- Den Filter aus dem Cache (passend zur Variante) laden und anwenden ---
-        loadFilterState();
-        applyStaffingFilters();
+        // 1.-4. Status, Grid, Besetzung, Banner
+        rebuildPlanViews();
 
-        // 4. Highlight
+        // 5. Highlight
         if(PlanState.pendingHighlight) {
             const h = PlanState.pendingHighlight;
             setTimeout(() => {
@@ -599,10 +532,6 @@ async function renderGrid(isSilent = false) {
             }, 100);
         }
 
-        // 5. Banner & Visuals
-        PlanBanner.renderUnifiedBanner();
-        PlanBanner.markPendingTakeovers();
-
         // 6. Market Badge im Header updaten
         const badge = document.getElementById('market-badge');
         if (badge) {
@@ -623,6 +552,184 @@ async function renderGrid(isSilent = false) {
     }
 }
 
+/**
+ * Überträgt die Monatsansicht aus GET /shifts in den PlanState.
+ */
+function applyShiftPayload(shiftPayload) {
+    // Users & Shifts ins State-Objekt mappen
+    PlanState.allUsers = shiftPayload.users;
+    PlanState.approvedWishes = shiftPayload.approved_wishes || {};
+    PlanState.currentShifts = {};
+    shiftPayload.shifts.forEach(s => {
+        const key = `${s.user_id}-${s.date}`;
+        const fullShiftType = PlanState.allShiftTypes[s.shifttype_id];
+        PlanState.currentShifts[key] = { ...s, shift_type: fullShiftType };
+    });
+
+    // Last Month
+    PlanState.currentShiftsLastMonth = {};
+    if (shiftPayload.shifts_last_month) {
+        shiftPayload.shifts_last_month.forEach(s => {
+            const fullShiftType = PlanState.allShiftTypes[s.shifttype_id];
+            PlanState.currentShiftsLastMonth[s.user_id] = { ...s, shift_type: fullShiftType };
+        });
+    }
+
+    // Stats & Violations
+    PlanState.currentTotals = shiftPayload.totals;
+    PlanState.currentViolations.clear();
+    if (shiftPayload.violations) {
+        shiftPayload.violations.forEach(v => PlanState.currentViolations.add(`${v[0]}-${v[1]}`));
+    }
+
+    // Staffing (Ist-Zustand) & Plan-Status
+    PlanState.currentStaffingActual = shiftPayload.staffing_actual || {};
+    PlanState.currentPlanStatus = shiftPayload.plan_status || {
+        year: PlanState.currentYear, month: PlanState.currentMonth,
+        status: "In Bearbeitung", is_locked: false, plan_name: "Hauptplan"
+    };
+
+    // --- NEU: Hauptplan-Namen cachen ---
+    if (PlanState.currentVariantId === null) {
+        PlanState.mainPlanName = PlanState.currentPlanStatus.plan_name || "Hauptplan";
+    }
+    // -----------------------------------
+
+    // Trainings-Warnungen
+    PlanState.trainingWarnings = shiftPayload.training_warnings || [];
+
+    // Stand für den Delta-Abgleich (GET /shifts/changes)
+    PlanState.syncSeq = shiftPayload.sync_seq ?? null;
+}
+
+/**
+ * Baut Grid, Besetzung und Banner aus dem PlanState neu auf (ohne Laden).
+ */
+function rebuildPlanViews() {
+    // 1. Status Bar aktualisieren
+    PlanUIHelper.updatePlanStatusUI(PlanState.currentPlanStatus);
+
+    // 1.5 Tabs neu zeichnen (wegen eventuell neu geladener Namen)
+    PlanNavigation.renderVariantTabs();
+
+    // 2. Grid DOM bauen
+    PlanRenderer.buildGridDOM({
+        onCellClick: (e, user, dateStr, cell, isOwn) =>
+            PlanInteraction.handleCellClick(e, user, dateStr, cell, isOwn),
+
+        onCellEnter: (user, dateStr, cell) => {
+            PlanState.hoveredCellContext = { userId: user.id, dateStr, userName: `${user.vorname} ${user.name}`, cellElement: cell };
+            if (!PlanState.isVisitor) cell.classList.add('hovered');
+        },
+        onCellLeave: () => {
+            if (PlanState.hoveredCellContext && PlanState.hoveredCellContext.cellElement) {
+                PlanState.hoveredCellContext.cellElement.classList.remove('hovered');
+            }
+            PlanState.hoveredCellContext = null;
+        }
+    });
+
+    // 3. Staffing Table aufbauen
+    StaffingModule.buildStaffingTable();
+    
+    // --- Den Filter aus dem Cache (passend zur Variante) laden und anwenden ---
+    loadFilterState();
+    applyStaffingFilters();
+
+    // 4. Banner & Visuals
+    PlanBanner.renderUnifiedBanner();
+    PlanBanner.markPendingTakeovers();
+}
+
+/**
+ * Überträgt die Antwort des Delta-Abgleichs in den PlanState.
+ */
+function applyShiftDelta(delta) {
+    const monthPrefix = `${PlanState.currentYear}-${String(PlanState.currentMonth).padStart(2, '0')}`;
+
+    delta.changes.forEach(change => {
+        const shift = change.shift
+            ? { ...change.shift, shift_type: PlanState.allShiftTypes[change.shift.shifttype_id] }
+            : null;
+
+        if (change.date.startsWith(monthPrefix)) {
+            const key = `${change.user_id}-${change.date}`;
+            if (shift) PlanState.currentShifts[key] = shift;
+            else delete PlanState.currentShifts[key];
+        } else {
+            // Letzter Tag des Vormonats (Übertrag)
+            if (shift) PlanState.currentShiftsLastMonth[change.user_id] = shift;
+            else delete PlanState.currentShiftsLastMonth[change.user_id];
+        }
+    });
+
+    Object.assign(PlanState.currentTotals, delta.totals || {});
+
+    Object.entries(delta.staffing_actual || {}).forEach(([shiftTypeId, days]) => {
+        PlanState.currentStaffingActual[shiftTypeId] = {
+            ...(PlanState.currentStaffingActual[shiftTypeId] || {}),
+            ...days
+        };
+    });
+
+    PlanState.currentViolations.clear();
+    (delta.violations || []).forEach(v => PlanState.currentViolations.add(`${v[0]}-${v[1]}`));
+
+    PlanState.syncSeq = delta.seq;
+}
+
+let shiftSyncRunning = false;
+let shiftSyncQueued = false;
+
+/**
+ * Holt nur die seit dem letzten Stand geänderten Zellen (Live-Updates, Reconnect).
+ * Fehlt der Stand oder reicht das Journal des Servers nicht, kommt die
+ * komplette Monatsansicht mit derselben Antwort.
+ */
+async function syncShiftChanges() {
+    if (PlanState.syncSeq === null || PlanState.syncSeq === undefined) {
+        return renderGrid(true);
+    }
+    // Überlappende Events zu einem Folgeabgleich zusammenfassen
+    if (shiftSyncRunning) {
+        shiftSyncQueued = true;
+        return;
+    }
+    shiftSyncRunning = true;
+
+    try {
+        do {
+            shiftSyncQueued = false;
+            const year = PlanState.currentYear;
+            const month = PlanState.currentMonth;
+            const variantId = PlanState.currentVariantId;
+
+            const result = await PlanApi.fetchShiftChanges(year, month, PlanState.syncSeq, variantId);
+
+            // Ansicht wurde inzwischen gewechselt (renderGrid lädt dann ohnehin komplett)
+            if (year !== PlanState.currentYear || month !== PlanState.currentMonth ||
+                variantId !== PlanState.currentVariantId) {
+                return;
+            }
+
+            if (result.mode === 'snapshot') {
+                applyShiftPayload(result.snapshot);
+                rebuildPlanViews();
+            } else if (result.changes.length > 0) {
+                applyShiftDelta(result);
+                rebuildPlanViews();
+            } else {
+                PlanState.syncSeq = result.seq;
+            }
+        } while (shiftSyncQueued);
+    } catch (error) {
+        console.warn("Delta-Abgleich fehlgeschlagen, lade komplett:", error);
+        await renderGrid(true);
+    } finally {
+        shiftSyncRunning = false;
+    }
+}
+
 // --- DIENSTHUND WARNUNGEN RENDERN ---
 function renderDogAlerts(alerts) {
     const container = document.getElementById('dog-alerts-container');